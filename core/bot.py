@@ -40,7 +40,7 @@ from pydantic import BaseModel
 from sqlalchemy import select, create_engine
 
 from core.config import GlobalConfig
-from core.models import response_model
+from core.models import perm_model, response_model
 from core.orm import orm, Base
 from core.orm.tables import GroupPerm, MemberPerm
 from utils.launch_time import LaunchTimeService, add_launch_time
@@ -129,8 +129,18 @@ class Umaru:
             Ariadne.launch_manager.add_service(FastAPIService(fastapi))
         # 推后导入，避免循环导入
         from utils.alembic import AlembicService
+        from utils.asset_store import AssetStoreService
+        from utils.conversation_store import ConversationStoreService
+        from utils.http_session import HttpSessionService
+        from utils.render_pool import RenderPoolService
+        from utils.sandbox_pool import SandboxPoolService
 
         Ariadne.launch_manager.add_service(AlembicService())
+        Ariadne.launch_manager.add_service(HttpSessionService())
+        Ariadne.launch_manager.add_service(AssetStoreService())
+        Ariadne.launch_manager.add_service(RenderPoolService())
+        Ariadne.launch_manager.add_service(SandboxPoolService())
+        Ariadne.launch_manager.add_service(ConversationStoreService())
         Ariadne.launch_manager.add_service(UpdaterService())
         Ariadne.launch_manager.add_service(LaunchTimeService())
         self.config_check()
@@ -192,6 +202,8 @@ class Umaru:
         logger.success("成功更新master权限!")
         await self.update_admins_permission(admin_list)
         logger.success("成功更新admins权限!")
+        # 预热权限缓存
+        await perm_model.get_perm_cache().load()
         from core.control import Distribute
 
         Distribute.distribute_initialize()
@@ -254,6 +266,7 @@ class Umaru:
                     },
                     [GroupPerm.group_id == group.id],
                 )
+                perm_model.get_perm_cache().set_group_perm(group.id, perm)
                 self.initialized_group_list.append(group.id)
                 group_init_counter += 1
         if app.account not in self.initialized_app_list:
@@ -288,6 +301,7 @@ class Umaru:
                 {"group_id": group.id, "group_name": group.name, "active": True},
                 [GroupPerm.group_id == group.id],
             )
+            perm_model.get_perm_cache().set_group_perm(group.id, 1)
             return True
 
     async def init_group(self, app: Ariadne, group: Group):
@@ -308,6 +322,8 @@ class Umaru:
             },
             [GroupPerm.group_id == group.id],
         )
+        perm_cache = perm_model.get_perm_cache()
+        perm_cache.set_group_perm(group.id, perm)
         self.initialized_app_list.append(app.account)
         # 更新成员权限
         member_list = await app.get_member_list(group)
@@ -320,6 +336,7 @@ class Umaru:
                     MemberPerm.group_id == group.id,
                 ],
             )
+            perm_cache.set_member_perm(group.id, self.config.Master, 256)
         if result := await orm.fetch_all(
             select(MemberPerm.qq).where(
                 MemberPerm.perm == 128,
@@ -335,6 +352,7 @@ class Umaru:
                         MemberPerm.group_id == group.id,
                     ],
                 )
+                perm_cache.set_member_perm(group.id, admin, 128)
         await response_model.get_acc_controller().init_group(
             group.id, member_list, app.account
         )
@@ -370,6 +388,9 @@ class Umaru:
                 for group_id in group_id_list
             ],
         )
+        perm_cache = perm_model.get_perm_cache()
+        for group_id in group_id_list:
+            perm_cache.set_member_perm(group_id, self.config.Master, 256)
 
     # 更新admins权限
     async def update_admins_permission(self, admin_list: list[int] | None = None):
@@ -406,6 +427,10 @@ class Umaru:
                 for admin in admin_list
             ],
         )
+        perm_cache = perm_model.get_perm_cache()
+        for group_id in group_id_list:
+            for admin in admin_list:
+                perm_cache.set_member_perm(group_id, admin, 128)
 
     def set_log(self, log_str: str):
         self.logs.append(log_str.strip())
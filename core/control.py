@@ -14,11 +14,12 @@ from loguru import logger
 from sqlalchemy import select
 
 from core.config import GlobalConfig
-from core.models import saya_model, frequency_model, response_model
+from core.models import saya_model, frequency_model, response_model, perm_model
 from core.orm import orm
-from core.orm.tables import MemberPerm, GroupPerm, GroupSetting
+from core.orm.tables import MemberPerm, GroupPerm
 
 global_config = create(GlobalConfig)
+perm_cache = perm_model.get_perm_cache()
 
 
 class Permission:
@@ -82,12 +83,8 @@ class Permission:
 
     @staticmethod
     async def get_user_perm_byID(group_id: int, member_id: int) -> int:
-        if result := await orm.fetch_one(
-            select(MemberPerm.perm).where(
-                MemberPerm.group_id == group_id, MemberPerm.qq == member_id
-            )
-        ):
-            return result[0]
+        if (perm := await perm_cache.get_member_perm(group_id, member_id)) is not None:
+            return perm
         else:
             return Permission.User
 
@@ -127,32 +124,24 @@ class Permission:
 
     @staticmethod
     async def get_group_perm_type(group_id: int) -> str:
-        if result := await orm.fetch_one(
-            select(GroupSetting.permission_type).where(
-                GroupSetting.group_id == group_id
-            )
-        ):
-            return result[0]
+        if setting := await perm_cache.get_group_setting(group_id):
+            return setting["permission_type"]
         else:
             return "default"
 
     @staticmethod
     async def require_user_perm(group_id: int, member_id: int, perm: int) -> bool:
-        if result := await orm.fetch_one(
-            select(MemberPerm.perm).where(
-                MemberPerm.group_id == group_id, MemberPerm.qq == member_id
-            )
-        ):
-            return result[0] >= perm
+        if (
+            user_perm := await perm_cache.get_member_perm(group_id, member_id)
+        ) is not None:
+            return user_perm >= perm
         else:
             return Permission.User >= perm
 
     @staticmethod
     async def require_group_perm(group_id: int, perm: int) -> bool:
-        if result := await orm.fetch_one(
-            select(GroupPerm.perm).where(GroupPerm.group_id == group_id)
-        ):
-            return result[0] >= perm
+        if (group_perm := await perm_cache.get_group_perm(group_id)) is not None:
+            return group_perm >= perm
         else:
             return Permission.ActiveGroup >= perm
 
@@ -168,26 +157,18 @@ class Permission:
         if not group_id:
             # 查询是否在全局黑当中
             # 如果有查询到数据，则返回用户的权限等级
-            if result := await orm.fetch_one(
-                select(MemberPerm.perm).where(
-                    MemberPerm.qq == sender.id, MemberPerm.group_id == 0
-                )
-            ):
-                return result[0]
+            if (perm := await perm_cache.get_member_perm(0, sender.id)) is not None:
+                return perm
             else:
                 if sender.id == global_config.Master:
                     return Permission.Master
-                elif sender.id in cls.get_BotAdminsList():
+                elif sender.id in await cls.get_BotAdminsList():
                     return Permission.BotAdmin
                 else:
                     return Permission.User
         # 如果有查询到数据，则返回用户的权限等级
-        if result := await orm.fetch_one(
-            select(MemberPerm.perm).where(
-                MemberPerm.group_id == group_id, MemberPerm.qq == sender.id
-            )
-        ):
-            return result[0]
+        if (perm := await perm_cache.get_member_perm(group_id, sender.id)) is not None:
+            return perm
         # 如果没有查询到数据，则写入初始权限
         else:
             perm = cls.member_permStr_dict[event.sender.permission.name]
@@ -200,6 +181,7 @@ class Permission:
                     ],
                     data={"group_id": group_id, "qq": sender.id, "perm": perm},
                 )
+                perm_cache.set_member_perm(group_id, sender.id, perm)
             return perm
 
     @classmethod
@@ -215,45 +197,59 @@ class Permission:
             event: GroupMessage | FriendMessage,
             source: Source or None = None,
         ):
-            # 获取并判断用户的权限等级
-            user_level = await cls.get_user_perm(event)
-            if user_level < perm:
-                if user_level in [Permission.GlobalBlack, Permission.GroupBlack]:
-                    raise ExecutionStop
-                if if_noticed:
-                    if isinstance(event, GroupMessage):
-                        await app.send_message(
-                            event.sender.group,
-                            MessageChain(
-                                f"权限不足!(你的权限:{user_level}/需要权限:{perm})"
-                            ),
-                            quote=source,
-                        )
-                    else:
-                        await app.send_message(
-                            event.sender,
-                            MessageChain(
-                                f"权限不足!(你的权限:{user_level}/需要权限:{perm})"
-                            ),
-                            quote=source,
-                        )
-                raise ExecutionStop
+            await cls.user_check(app, event, source, perm, if_noticed)
             return Depend(wrapper)
 
         return Depend(wrapper)
 
+    @classmethod
+    async def user_check(
+        cls,
+        app: Ariadne,
+        event: GroupMessage | FriendMessage,
+        source: Source | None,
+        perm: int,
+        if_noticed: bool,
+        context: "EventContext | None" = None,
+    ):
+        """判断用户权限，不满足时抛出ExecutionStop"""
+        # 获取并判断用户的权限等级
+        if context:
+            user_level = await context.get_user_perm()
+        else:
+            user_level = await cls.get_user_perm(event)
+        if user_level < perm:
+            if user_level in [Permission.GlobalBlack, Permission.GroupBlack]:
+                raise ExecutionStop
+            if if_noticed:
+                if isinstance(event, GroupMessage):
+                    await app.send_message(
+                        event.sender.group,
+                        MessageChain(
+                            f"权限不足!(你的权限:{user_level}/需要权限:{perm})"
+                        ),
+                        quote=source,
+                    )
+                else:
+                    await app.send_message(
+                        event.sender,
+                        MessageChain(
+                            f"权限不足!(你的权限:{user_level}/需要权限:{perm})"
+                        ),
+                        quote=source,
+                    )
+            raise ExecutionStop
+
     @classmethod
     async def get_group_perm(cls, group: Group) -> int:
         """
         根据传入的群实例获取群权限
         :return: 查询到的权限
         """
-        # 查询数据库
+        # 查询缓存
         # 如果有查询到数据，则返回群的权限等级
-        if result := await orm.fetch_one(
-            select(GroupPerm.perm).where(GroupPerm.group_id == group.id)
-        ):
-            return result[0]
+        if (group_perm := await perm_cache.get_group_perm(group.id)) is not None:
+            return group_perm
         # 如果没有查询到数据，则返回1（活跃群）,并写入初始权限1
         else:
             if group.id == global_config.test_group:
@@ -271,6 +267,7 @@ class Permission:
                     },
                     [GroupPerm.group_id == group.id],
                 )
+                perm_cache.set_group_perm(group.id, perm)
                 return Permission.ActiveGroup
 
     @classmethod
@@ -284,25 +281,39 @@ class Permission:
         async def wrapper(
             app: Ariadne, event: GroupMessage | FriendMessage, src: Source
         ):
-            if isinstance(event, FriendMessage):
-                return Depend(wrapper)
-            # 获取并判断群的权限等级
-            group = event.sender.group
-            group_perm = await cls.get_group_perm(group)
-            if group_perm < perm:
-                if if_noticed and group_perm != 0:
-                    await app.send_message(
-                        group,
-                        MessageChain(
-                            f"权限不足!(当前群权限:{group_perm}/需要权限:{perm})"
-                        ),
-                        quote=src,
-                    )
-                raise ExecutionStop
+            await cls.group_check(app, event, src, perm, if_noticed)
             return Depend(wrapper)
 
         return Depend(wrapper)
 
+    @classmethod
+    async def group_check(
+        cls,
+        app: Ariadne,
+        event: GroupMessage | FriendMessage,
+        src: Source | None,
+        perm: int,
+        if_noticed: bool,
+        context: "EventContext | None" = None,
+    ):
+        """判断群权限，不满足时抛出ExecutionStop"""
+        if isinstance(event, FriendMessage):
+            return
+        # 获取并判断群的权限等级
+        group = event.sender.group
+        if context:
+            group_perm = await context.get_group_perm()
+        else:
+            group_perm = await cls.get_group_perm(group)
+        if group_perm < perm:
+            if if_noticed and group_perm != 0:
+                await app.send_message(
+                    group,
+                    MessageChain(f"权限不足!(当前群权限:{group_perm}/需要权限:{perm})"),
+                    quote=src,
+                )
+            raise ExecutionStop
+
 
 class Function:
     """功能判断"""
@@ -312,46 +323,66 @@ class Function:
         async def judge(
             app: Ariadne, group: Group | Friend, source: Source or None = None
         ):
-            if isinstance(group, Friend):
-                return Depend(judge)
-            # 如果module_name不在modules_list里面就添加
-            module_controller = saya_model.get_module_controller()
-            if module_name not in module_controller.modules:
-                module_controller.add_module(module_name)
-            if not group:
-                return
-            # 如果group不在modules里面就添加
-            if str(group.id) not in module_controller.modules[module_name]:
-                module_controller.add_group(group)
-            module_meta = module_controller.get_metadata_from_module_name(module_name)
-            # 如果在维护就停止
-            if not module_controller.if_module_available(module_name):
+            await cls.check(app, group, source, module_name, notice)
+            return
+
+        return Depend(judge)
+
+    @staticmethod
+    async def check(
+        app: Ariadne,
+        group: Group | Friend,
+        source: Source | None,
+        module_name: str,
+        notice: bool,
+        module_meta: saya_model.Metadata | None = None,
+    ):
+        """
+        判断插件是否可用、群开关是否开启，不满足时抛出ExecutionStop
+        :param module_meta: 预先读取的插件元数据，为空时仅在需要通知时读取
+        """
+        if isinstance(group, Friend):
+            return
+        # 如果module_name不在modules_list里面就添加
+        module_controller = saya_model.get_module_controller()
+        if module_name not in module_controller.modules:
+            module_controller.add_module(module_name)
+        if not group:
+            return
+        # 如果group不在modules里面就添加
+        if str(group.id) not in module_controller.modules[module_name]:
+            module_controller.add_group(group)
+        # 如果在维护就停止
+        if not module_controller.if_module_available(module_name):
+            if notice and module_controller.if_module_notice_on(module_name, group):
+                module_meta = (
+                    module_meta
+                    or module_controller.get_metadata_from_module_name(module_name)
+                )
+                await app.send_message(
+                    group,
+                    MessageChain(
+                        f"{module_meta.display_name or module_name}插件正在维护~"
+                    ),
+                    quote=source,
+                )
+            raise ExecutionStop
+        else:
+            # 如果群未打开开关就停止
+            if not module_controller.if_module_switch_on(module_name, group):
                 if notice and module_controller.if_module_notice_on(module_name, group):
+                    module_meta = (
+                        module_meta
+                        or module_controller.get_metadata_from_module_name(module_name)
+                    )
                     await app.send_message(
                         group,
                         MessageChain(
-                            f"{module_meta.display_name or module_name}插件正在维护~"
+                            f"{module_meta.display_name or module_name}插件已关闭\n请使用‘-开启 插件编号’来打开插件\n插件编号请使用‘帮助’获取"
                         ),
                         quote=source,
                     )
                 raise ExecutionStop
-            else:
-                # 如果群未打开开关就停止
-                if not module_controller.if_module_switch_on(module_name, group):
-                    if notice and module_controller.if_module_notice_on(
-                        module_name, group
-                    ):
-                        await app.send_message(
-                            group,
-                            MessageChain(
-                                f"{module_meta.display_name or module_name}插件已关闭\n请使用‘-开启 插件编号’来打开插件\n插件编号请使用‘帮助’获取"
-                            ),
-                            quote=source,
-                        )
-                    raise ExecutionStop
-            return
-
-        return Depend(judge)
 
 
 class Distribute:
@@ -370,39 +401,50 @@ class Distribute:
             event: GroupMessage | FriendMessage,
             source: Source,
         ):
-            if not cls.initialization_completed:
-                raise ExecutionStop
-            # 如果是调试模式，则只响应Master
-            if global_config.debug_mode and event.sender.id != global_config.Master:
-                raise ExecutionStop
-            if isinstance(event, FriendMessage):
-                return Depend(wrapper)
-            if event.sender.id in global_config.bot_accounts:
-                raise ExecutionStop
-            group_id = group.id
-            account_controller = response_model.get_acc_controller()
-            bot_account = app.account
-            if len(Ariadne.service.connections.keys()) == 1:
-                return
-            if bot_account not in account_controller.initialized_bot_list:
-                await account_controller.init_account(bot_account)
-            if not account_controller.check_initialization(group_id, bot_account):
-                await account_controller.init_group(
-                    group_id, await app.get_member_list(group_id), bot_account
-                )
-                raise ExecutionStop
-            res_acc = await account_controller.get_response_account(group_id, source.id)
-            if not Ariadne.current(res_acc).connection.status.available:
-                account_controller.account_dict.pop(group_id)
-                raise ExecutionStop
-            if bot_account != await account_controller.get_response_account(
-                group_id, source.id
-            ):
-                raise ExecutionStop
+            await cls.check(group, app, event, source)
             return Depend(wrapper)
 
         return Depend(wrapper)
 
+    @classmethod
+    async def check(
+        cls,
+        group: Group | Friend,
+        app: Ariadne,
+        event: GroupMessage | FriendMessage,
+        source: Source,
+    ):
+        """判断当前bot是否应响应该消息，不应响应时抛出ExecutionStop"""
+        if not cls.initialization_completed:
+            raise ExecutionStop
+        # 如果是调试模式，则只响应Master
+        if global_config.debug_mode and event.sender.id != global_config.Master:
+            raise ExecutionStop
+        if isinstance(event, FriendMessage):
+            return
+        if event.sender.id in global_config.bot_accounts:
+            raise ExecutionStop
+        group_id = group.id
+        account_controller = response_model.get_acc_controller()
+        bot_account = app.account
+        if len(Ariadne.service.connections.keys()) == 1:
+            return
+        if bot_account not in account_controller.initialized_bot_list:
+            await account_controller.init_account(bot_account)
+        if not account_controller.check_initialization(group_id, bot_account):
+            await account_controller.init_group(
+                group_id, await app.get_member_list(group_id), bot_account
+            )
+            raise ExecutionStop
+        res_acc = await account_controller.get_response_account(group_id, source.id)
+        if not Ariadne.current(res_acc).connection.status.available:
+            account_controller.account_dict.pop(group_id)
+            raise ExecutionStop
+        if bot_account != await account_controller.get_response_account(
+            group_id, source.id
+        ):
+            raise ExecutionStop
+
     @classmethod
     def distribute_initialize(cls):
         setattr(cls, "initialization_completed", True)
@@ -427,52 +469,224 @@ class FrequencyLimitation:
         """
 
         async def judge(app: Ariadne, event: GroupMessage | FriendMessage, src: Source):
-            if isinstance(event, FriendMessage):
-                return Depend(judge)
-            group_id = event.sender.group.id
-            sender_id = event.sender.id
-            # 是否开启频率限制
-            if frequency_limitation_switch := await orm.fetch_one(
-                select(GroupSetting.frequency_limitation).where(
-                    GroupSetting.group_id == group_id
-                )
-            ):
-                frequency_limitation_switch = frequency_limitation_switch[0]
-            if not frequency_limitation_switch:
-                return
-            # 是否越权
-            if await Permission.get_user_perm(event) >= override_perm:
-                return
-
-            frequency_controller = frequency_model.get_frequency_controller()
-            frequency_controller.add_weight(module_name, group_id, sender_id, weight)
-            # 如果已经在黑名单则返回
-            if frequency_controller.blacklist_judge(group_id, sender_id):
-                if not frequency_controller.blacklist_noticed_judge(
-                    group_id, sender_id
-                ):
-                    await app.send_message(
-                        event.sender.group,
-                        MessageChain("检测到大量请求,加入黑名单5分钟!"),
-                        quote=src,
-                    )
-                    frequency_controller.blacklist_notice(group_id, sender_id)
-                raise ExecutionStop
-            current_weight = frequency_controller.get_weight(
-                module_name, group_id, sender_id
+            await cls.check(
+                app, event, src, module_name, weight, total_weights, override_perm
             )
-            if (current_weight + weight) >= total_weights:
+            return
+
+        return Depend(judge)
+
+    @staticmethod
+    async def check(
+        app: Ariadne,
+        event: GroupMessage | FriendMessage,
+        src: Source | None,
+        module_name: str,
+        weight: int,
+        total_weights: int,
+        override_perm: int,
+        context: "EventContext | None" = None,
+    ):
+        """判断调用频率，超过限制时抛出ExecutionStop"""
+        if isinstance(event, FriendMessage):
+            return
+        group_id = event.sender.group.id
+        sender_id = event.sender.id
+        # 是否开启频率限制
+        if context:
+            group_setting = await context.get_group_setting()
+        else:
+            group_setting = await perm_cache.get_group_setting(group_id)
+        if not (group_setting and group_setting["frequency_limitation"]):
+            return
+        # 是否越权
+        if context:
+            user_level = await context.get_user_perm()
+        else:
+            user_level = await Permission.get_user_perm(event)
+        if user_level >= override_perm:
+            return
+
+        frequency_controller = frequency_model.get_frequency_controller()
+        frequency_controller.add_weight(module_name, group_id, sender_id, weight)
+        # 如果已经在黑名单则返回
+        if frequency_controller.blacklist_judge(group_id, sender_id):
+            if not frequency_controller.blacklist_noticed_judge(group_id, sender_id):
                 await app.send_message(
                     event.sender.group,
-                    MessageChain(
-                        f"超过频率调用限制!({current_weight + weight}/{total_weights})\n"
-                        f"休息一会儿吧~继续高频访问会被加入临时全局黑名单哦~"
-                    ),
+                    MessageChain("检测到大量请求,加入黑名单5分钟!"),
                     quote=src,
                 )
-                raise ExecutionStop
+                frequency_controller.blacklist_notice(group_id, sender_id)
+            raise ExecutionStop
+        current_weight = frequency_controller.get_weight(
+            module_name, group_id, sender_id
+        )
+        if (current_weight + weight) >= total_weights:
+            await app.send_message(
+                event.sender.group,
+                MessageChain(
+                    f"超过频率调用限制!({current_weight + weight}/{total_weights})\n"
+                    f"休息一会儿吧~继续高频访问会被加入临时全局黑名单哦~"
+                ),
+                quote=src,
+            )
+            raise ExecutionStop
 
-        return Depend(judge)
+
+class EventContext:
+    """单个事件在判断链中共享的上下文，同一事件的群设置、群权限和用户权限只获取一次"""
+
+    __slots__ = ("event", "_user_perm", "_group_perm", "_group_setting", "_fetched")
+
+    def __init__(self, event: GroupMessage | FriendMessage):
+        self.event = event
+        self._user_perm: int | None = None
+        self._group_perm: int | None = None
+        self._group_setting: dict | None = None
+        self._fetched = False
+
+    async def get_user_perm(self) -> int:
+        if self._user_perm is None:
+            self._user_perm = await Permission.get_user_perm(self.event)
+        return self._user_perm
+
+    async def get_group_perm(self) -> int:
+        if self._group_perm is None:
+            self._group_perm = await Permission.get_group_perm(self.event.sender.group)
+        return self._group_perm
+
+    async def get_group_setting(self) -> dict | None:
+        if not self._fetched:
+            self._group_setting = await perm_cache.get_group_setting(
+                self.event.sender.group.id
+            )
+            self._fetched = True
+        return self._group_setting
+
+
+class Gate:
+    """组合判断
+
+    将 Distribute/Function/FrequencyLimitation/Permission.group_require/Permission.user_require
+    合并为一个Depend，按原有顺序在一次调用内完成全部判断，并共享同一个EventContext。
+    插件元数据在安装(调用require)时读取，不会在每条消息时重复读取。
+
+    用法:
+    @decorate(Gate.require(channel.module, channel.metadata.level, Permission.User))
+    等价于:
+    @decorate(
+        Distribute.require(),
+        Function.require(channel.module),
+        FrequencyLimitation.require(channel.module),
+        Permission.group_require(channel.metadata.level),
+        Permission.user_require(Permission.User),
+    )
+    """
+
+    @classmethod
+    def require(
+        cls,
+        module_name: str,
+        group_perm: int = Permission.ActiveGroup,
+        user_perm: int = Permission.User,
+        *,
+        distribute: bool = True,
+        function_notice: bool = True,
+        frequency_limitation: bool = True,
+        weight: int = 2,
+        total_weights: int = 12,
+        override_perm: int = Permission.GroupAdmin,
+        group_notice: bool = False,
+        user_notice: bool = True,
+    ):
+        """
+        :param module_name: 插件名字
+        :param group_perm: 群权限等级
+        :param user_perm: 用户权限等级
+        :param distribute: 是否进行多bot响应分配
+        :param function_notice: 插件关闭/维护时是否通知
+        :param frequency_limitation: 是否进行频率限制
+        :param weight: 增加权重
+        :param total_weights: 总权重
+        :param override_perm: 频率限制越级权限
+        :param group_notice: 群权限不足时是否通知
+        :param user_notice: 用户权限不足时是否通知
+        """
+        module_meta = saya_model.get_module_controller().get_metadata_from_module_name(
+            module_name
+        )
+
+        async def gate(
+            app: Ariadne,
+            event: GroupMessage | FriendMessage,
+            source: Source,
+        ):
+            await cls.check(
+                app,
+                event,
+                source,
+                module_name,
+                module_meta,
+                group_perm,
+                user_perm,
+                distribute=distribute,
+                function_notice=function_notice,
+                frequency_limitation=frequency_limitation,
+                weight=weight,
+                total_weights=total_weights,
+                override_perm=override_perm,
+                group_notice=group_notice,
+                user_notice=user_notice,
+            )
+            return
+
+        return Depend(gate)
+
+    @staticmethod
+    async def check(
+        app: Ariadne,
+        event: GroupMessage | FriendMessage,
+        source: Source | None,
+        module_name: str,
+        module_meta: saya_model.Metadata | None,
+        group_perm: int,
+        user_perm: int,
+        *,
+        distribute: bool = True,
+        function_notice: bool = True,
+        frequency_limitation: bool = True,
+        weight: int = 2,
+        total_weights: int = 12,
+        override_perm: int = Permission.GroupAdmin,
+        group_notice: bool = False,
+        user_notice: bool = True,
+    ):
+        """按顺序完成全部判断，任一不满足时抛出ExecutionStop"""
+        context = EventContext(event)
+        src_place = (
+            event.sender.group if isinstance(event, GroupMessage) else event.sender
+        )
+        if distribute:
+            await Distribute.check(src_place, app, event, source)
+        await Function.check(
+            app, src_place, source, module_name, function_notice, module_meta
+        )
+        if frequency_limitation:
+            await FrequencyLimitation.check(
+                app,
+                event,
+                source,
+                module_name,
+                weight,
+                total_weights,
+                override_perm,
+                context,
+            )
+        await Permission.group_check(
+            app, event, source, group_perm, group_notice, context
+        )
+        await Permission.user_check(app, event, source, user_perm, user_notice, context)
 
 
 class Config:
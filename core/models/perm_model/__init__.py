@@ -0,0 +1,216 @@
+import asyncio
+from abc import ABC
+from collections import OrderedDict
+
+from creart import AbstractCreator, CreateTargetInfo, add_creator, create, exists_module
+from loguru import logger
+from sqlalchemy import select
+
+from core.orm import orm
+from core.orm.tables import GroupPerm, GroupSetting, MemberPerm
+
+perm_cache_instance = None
+
+# GroupSetting 各字段的默认值，与表定义保持一致
+GROUP_SETTING_DEFAULT = {
+    "frequency_limitation": True,
+    "response_type": "random",
+    "permission_type": "default",
+}
+
+
+class PermissionCache:
+    """权限缓存(写穿透)
+
+    启动后从 MemberPerm/GroupPerm/GroupSetting 一次性加载，
+    所有写入数据库的地方在写入成功后同步更新缓存，
+    因此权限判断链在正常情况下不需要访问数据库。
+
+    group_perm = {
+        group_id: perm
+    }
+
+    group_setting = {
+        group_id: {
+            "frequency_limitation": True,
+            "response_type": "random",
+            "permission_type": "default",
+        }
+    }
+
+    member_perm = OrderedDict({
+        (group_id, qq): perm / None(数据库中无记录)
+    })
+    """
+
+    def __init__(self, max_members: int = 50000):
+        # 群权限和群设置数量与群数量相当，全部常驻内存
+        self.group_perm: dict[int, int] = {}
+        self.group_setting: dict[int, dict] = {}
+        # 成员权限使用LRU，长尾成员按需从数据库加载
+        self.member_perm: OrderedDict[tuple[int, int], int | None] = OrderedDict()
+        self.max_members = max_members
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self._load_lock = asyncio.Lock()
+
+    async def load(self) -> None:
+        """从数据库加载全部群权限、群设置和成员权限"""
+        async with self._load_lock:
+            group_perm = {
+                row[0]: row[1]
+                for row in await orm.fetch_all(
+                    select(GroupPerm.group_id, GroupPerm.perm)
+                )
+            }
+            group_setting = {
+                row[0]: {
+                    "frequency_limitation": row[1],
+                    "response_type": row[2],
+                    "permission_type": row[3],
+                }
+                for row in await orm.fetch_all(
+                    select(
+                        GroupSetting.group_id,
+                        GroupSetting.frequency_limitation,
+                        GroupSetting.response_type,
+                        GroupSetting.permission_type,
+                    )
+                )
+            }
+            member_perm = OrderedDict(
+                ((row[0], row[1]), row[2])
+                for row in await orm.fetch_all(
+                    select(MemberPerm.group_id, MemberPerm.qq, MemberPerm.perm)
+                )
+            )
+            # 加载期间发生的写穿透一定不旧于快照，覆盖在快照之上
+            group_perm.update(self.group_perm)
+            group_setting.update(self.group_setting)
+            member_perm.update(self.member_perm)
+            self.group_perm = group_perm
+            self.group_setting = group_setting
+            self.member_perm = member_perm
+            self._evict()
+            self.loaded = True
+            logger.success(
+                f"权限缓存加载完成: 群权限{len(self.group_perm)}条, "
+                f"群设置{len(self.group_setting)}条, 成员权限{len(self.member_perm)}条"
+            )
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            await self.load()
+
+    def invalidate(self) -> None:
+        """清空缓存，下次查询时重新加载"""
+        self.group_perm.clear()
+        self.group_setting.clear()
+        self.member_perm.clear()
+        self.loaded = False
+
+    def _evict(self) -> None:
+        while len(self.member_perm) > self.max_members:
+            self.member_perm.popitem(last=False)
+
+    # 查询
+    async def get_member_perm(self, group_id: int, qq: int) -> int | None:
+        """
+        获取成员在数据库中的权限
+        :return: 权限等级，数据库中没有记录时返回None
+        """
+        await self.ensure_loaded()
+        key = (group_id, qq)
+        if key in self.member_perm:
+            self.hits += 1
+            self.member_perm.move_to_end(key)
+            return self.member_perm[key]
+        self.misses += 1
+        result = await orm.fetch_one(
+            select(MemberPerm.perm).where(
+                MemberPerm.group_id == group_id, MemberPerm.qq == qq
+            )
+        )
+        perm = result[0] if result else None
+        self.member_perm[key] = perm
+        self._evict()
+        return perm
+
+    async def get_group_perm(self, group_id: int) -> int | None:
+        """
+        获取群在数据库中的权限
+        :return: 权限等级，数据库中没有记录时返回None
+        """
+        await self.ensure_loaded()
+        self.hits += 1
+        return self.group_perm.get(group_id)
+
+    async def get_group_setting(self, group_id: int) -> dict | None:
+        """
+        获取群设置
+        :return: 群设置字典，数据库中没有记录时返回None
+        """
+        await self.ensure_loaded()
+        self.hits += 1
+        return self.group_setting.get(group_id)
+
+    # 写穿透，需要在数据库写入成功后调用
+    def set_member_perm(self, group_id: int, qq: int, perm: int) -> None:
+        self.member_perm[(group_id, qq)] = perm
+        self.member_perm.move_to_end((group_id, qq))
+        self._evict()
+
+    def del_member_perm(self, group_id: int, qq: int) -> None:
+        self.member_perm[(group_id, qq)] = None
+        self.member_perm.move_to_end((group_id, qq))
+        self._evict()
+
+    def del_member_perms(self, qq: int) -> None:
+        """删除某个成员在所有群的权限"""
+        for key in self.member_perm:
+            if key[1] == qq:
+                self.member_perm[key] = None
+
+    def set_group_perm(self, group_id: int, perm: int) -> None:
+        self.group_perm[group_id] = perm
+
+    def update_group_setting(self, group_id: int, data: dict) -> None:
+        setting = self.group_setting.get(group_id) or GROUP_SETTING_DEFAULT.copy()
+        setting.update(
+            {key: value for key, value in data.items() if key in GROUP_SETTING_DEFAULT}
+        )
+        self.group_setting[group_id] = setting
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "group_perm": len(self.group_perm),
+            "group_setting": len(self.group_setting),
+            "member_perm": len(self.member_perm),
+        }
+
+
+def get_perm_cache() -> PermissionCache:
+    global perm_cache_instance
+    if not perm_cache_instance:
+        perm_cache_instance = create(PermissionCache)
+    return perm_cache_instance
+
+
+class PermissionCacheClassCreator(AbstractCreator, ABC):
+    targets = (CreateTargetInfo("core.models.perm_model", "PermissionCache"),)
+
+    @staticmethod
+    def available() -> bool:
+        return exists_module("core.models.perm_model")
+
+    @staticmethod
+    def create(create_type: type[PermissionCache]) -> PermissionCache:
+        return PermissionCache()
+
+
+add_creator(PermissionCacheClassCreator)
@@ -6,9 +6,9 @@ from creart import AbstractCreator, CreateTargetInfo, add_creator, create, exist
 from graia.ariadne import Ariadne
 from graia.ariadne.model import Group, Member
 from loguru import logger
-from sqlalchemy import select
 
 from core.config import GlobalConfig
+from core.models import perm_model
 from core.orm import orm
 from core.orm.tables import GroupSetting
 
@@ -68,21 +68,22 @@ class AccountController:
 
     @staticmethod
     async def get_response_type(group_id: int) -> str:
-        if result := await orm.fetch_one(
-            select(GroupSetting.response_type).where(GroupSetting.group_id == group_id)
-        ):
-            return result[0]
+        if setting := await perm_model.get_perm_cache().get_group_setting(group_id):
+            return setting["response_type"]
         else:
             return "random"
 
     @staticmethod
     async def change_response_type(group_id: int, response_type: str):
         if response_type in {"random", "deterministic"}:
-            return await orm.insert_or_update(
+            await orm.insert_or_update(
                 table=GroupSetting,
                 data={"group_id": group_id, "response_type": response_type},
                 condition=[GroupSetting.group_id == group_id],
             )
+            return perm_model.get_perm_cache().update_group_setting(
+                group_id, {"response_type": response_type}
+            )
         else:
             return
 
@@ -174,6 +175,9 @@ class AccountController:
                 GroupSetting.group_id == group_id,
             ],
         )
+        perm_model.get_perm_cache().update_group_setting(
+            group_id, {"response_type": "random"}
+        )
 
     async def init_all_group(self):
         if self.all_initialized:
@@ -212,6 +216,9 @@ class AccountController:
                     GroupSetting.group_id == group.id,
                 ],
             )
+            perm_model.get_perm_cache().update_group_setting(
+                group.id, {"response_type": "random"}
+            )
         self.initialized_bot_list.append(bot_account)
 
     @staticmethod
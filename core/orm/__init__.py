@@ -1,11 +1,30 @@
+import asyncio
+import sqlite3
+import time
 from asyncio import Lock
 
 from creart import create
 from loguru import logger
-from sqlalchemy import MetaData, inspect, delete, update, select, insert, text, event
+from sqlalchemy import (
+    MetaData,
+    inspect,
+    delete,
+    update,
+    select,
+    insert,
+    text,
+    event,
+    bindparam,
+    tuple_,
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+from sqlalchemy.sql.schema import Column, UniqueConstraint
 
 from core.config import GlobalConfig
 
@@ -17,16 +36,110 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor.execute("PRAGMA synchronous = normal;")
     cursor.execute("PRAGMA temp_store = memory;")
     cursor.execute("PRAGMA cache_size = 10000;")
+    cursor.execute("PRAGMA busy_timeout = 5000;")
     cursor.close()
 
 
+def set_sqlite_query_only(dbapi_connection, connection_record):
+    """只读连接池中的连接禁止写入"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = 1;")
+    cursor.close()
+
+
+class WriteStats:
+    """写队列统计"""
+
+    def __init__(self):
+        self.commits = 0
+        self.jobs = 0
+        self.statements = 0
+        self.failed_commits = 0
+        self.total_commit_time = 0.0
+        self.last_commit_time = 0.0
+        self.max_commit_time = 0.0
+
+    def record(self, jobs: int, statements: int, commit_time: float):
+        self.commits += 1
+        self.jobs += jobs
+        self.statements += statements
+        self.total_commit_time += commit_time
+        self.last_commit_time = commit_time
+        self.max_commit_time = max(self.max_commit_time, commit_time)
+
+
+# 各数据库驱动单条语句允许的最大参数数量
+PARAMETER_LIMITS = {
+    "sqlite": 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999,
+    "postgresql": 32767,
+    "mysql": 65535,
+}
+
+
+def parse_equal_conditions(condition) -> dict | None:
+    """
+    解析条件是否全部为 列 == 值 的形式
+    :return: {列名: 值}，无法解析时返回None
+    """
+    result = {}
+    for clause in condition:
+        if not (
+            isinstance(clause, BinaryExpression)
+            and clause.operator is operators.eq
+            and isinstance(clause.left, Column)
+            and isinstance(clause.right, BindParameter)
+        ):
+            return None
+        result[clause.left.key] = clause.right.value
+    return result or None
+
+
+def get_unique_keys(table) -> set[frozenset[str]]:
+    """获取表的主键、唯一约束和唯一索引对应的列集合"""
+    table = getattr(table, "__table__", table)
+    keys = {frozenset(column.key for column in table.primary_key.columns)}
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            keys.add(frozenset(column.key for column in constraint.columns))
+    for index in table.indexes:
+        if index.unique:
+            keys.add(frozenset(column.key for column in index.columns))
+    keys.update(frozenset([column.key]) for column in table.columns if column.unique)
+    keys.discard(frozenset())
+    return keys
+
+
+def get_required_columns(table) -> set[str]:
+    """获取插入时必须提供的列：非空、没有默认值且不是自增主键"""
+    table = getattr(table, "__table__", table)
+    return {
+        column.key
+        for column in table.columns
+        if not column.nullable
+        and column.default is None
+        and column.server_default is None
+        and column is not table.autoincrement_column
+    }
+
+
 class AsyncORM:
     """对象关系映射（Object Relational Mapping）"""
 
-    def __init__(self, db_link: str, db_mutex: Lock or None = None):
+    def __init__(
+        self,
+        db_link: str,
+        db_mutex: Lock or None = None,
+        write_queue: bool | None = None,
+        read_pool_size: int = 5,
+        max_batch_size: int = 200,
+    ):
         """
         AsyncORM类可以支持多种数据库，只需要将不同的数据库链接字符串传入db_link函数即可。
         :param db_link: 数据库链接
+        :param db_mutex: sqlite下所有语句共用的锁，仅在未启用写队列时使用
+        :param write_queue: 是否启用写队列模式，为None时对sqlite文件数据库自动启用
+        :param read_pool_size: 写队列模式下只读连接池大小
+        :param max_batch_size: 写队列模式下每次提交最多合并的任务数
         """
         self.db_link = db_link
         """
@@ -59,16 +172,50 @@ class AsyncORM:
         """
         self.async_session = sessionmaker(bind=self.engine, class_=AsyncSession)
         """
+        已注册的数据迁移函数
+        """
+        self.migrations = []
+        """
         Lock
         """
         self.db_mutex = (
             db_mutex or Lock() if self.db_link.startswith("sqlite") else None
         )
+        """
+        写队列模式
+        sqlite已开启WAL，读语句在只读连接池上并发执行；
+        写语句交给唯一的写入任务，每次将队列中已有的任务合并为一个事务提交。
+        内存数据库无法跨连接共享，不启用该模式。
+        """
+        if write_queue is None:
+            write_queue = self.db_link.startswith("sqlite") and not (
+                ":memory:" in self.db_link or self.db_link.rstrip("/").endswith(":")
+            )
+        self.write_queue_mode = write_queue
+        self.max_batch_size = max_batch_size
+        self.write_queue: asyncio.Queue | None = None
+        self.writer_task: asyncio.Task | None = None
+        self.write_stats = WriteStats()
+        if self.write_queue_mode:
+            self.read_engine = create_async_engine(
+                db_link,
+                echo=False,
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=read_pool_size,
+                max_overflow=0,
+            )
+            if self.db_link.startswith("sqlite"):
+                event.listen(
+                    self.read_engine.sync_engine, "connect", set_sqlite_query_only
+                )
+            self.read_session = sessionmaker(bind=self.read_engine, class_=AsyncSession)
+            self.write_queue = asyncio.Queue()
 
     async def close(self):
         """关闭数据库连接"""
         try:
             logger.warning("注意:正在关闭数据库连接!")
+            await self.stop_writer()
             async with self.async_session() as session:
                 await session.commit()
             if self.async_session:
@@ -95,8 +242,136 @@ class AsyncORM:
         async with self.engine.connect() as conn:
             return await conn.run_sync(lambda x: inspect(x).get_table_names())
 
+    # 数据迁移
+    def migration(self, func):
+        """
+        注册数据迁移函数(装饰器)
+        迁移函数接收同步连接，需要可重复执行，在建表后、检查模型差异前调用
+        """
+        self.migrations.append(func)
+        return func
+
+    async def run_migrations(self):
+        """执行所有已注册的数据迁移"""
+        for func in self.migrations:
+            async with self.engine.begin() as conn:
+                await conn.run_sync(func)
+
+    # 写队列
+    def start_writer(self):
+        """启动写入任务"""
+        if self.writer_task is None or self.writer_task.done():
+            self.writer_task = asyncio.create_task(self._writer())
+
+    async def stop_writer(self):
+        """等待队列中的写入完成后停止写入任务"""
+        if self.writer_task is None or self.writer_task.done():
+            return
+        await self.write_queue.join()
+        self.writer_task.cancel()
+        self.writer_task = None
+        await self.read_engine.dispose()
+
+    async def submit(self, statements: list) -> list:
+        """
+        提交写入任务并等待其所在事务提交
+        :param statements: [(sql, parameters)]
+        :return: 每条语句的执行结果
+        """
+        self.start_writer()
+        future = asyncio.get_running_loop().create_future()
+        await self.write_queue.put((statements, future))
+        return await future
+
+    async def _writer(self):
+        while True:
+            jobs = [await self.write_queue.get()]
+            # 让出一次事件循环，使同一轮中提交的写入合并到同一个事务
+            await asyncio.sleep(0)
+            while len(jobs) < self.max_batch_size and not self.write_queue.empty():
+                jobs.append(self.write_queue.get_nowait())
+            try:
+                try:
+                    results = await self._commit(jobs)
+                except Exception as e:
+                    self.write_stats.failed_commits += 1
+                    if len(jobs) == 1:
+                        self._set_future(jobs[0][1], exception=e)
+                        continue
+                    # 合并提交失败时逐个任务重新提交，使异常只影响对应的调用方
+                    for job in jobs:
+                        try:
+                            self._set_future(job[1], (await self._commit([job]))[0])
+                        except Exception as job_e:
+                            self._set_future(job[1], exception=job_e)
+                else:
+                    for job, result in zip(jobs, results):
+                        self._set_future(job[1], result)
+            finally:
+                for _ in jobs:
+                    self.write_queue.task_done()
+
+    async def _commit(self, jobs: list) -> list:
+        start = time.perf_counter()
+        results = []
+        async with self.async_session() as session:
+            try:
+                for statements, _ in jobs:
+                    results.append(
+                        [
+                            await session.execute(sql, params)
+                            for sql, params in statements
+                        ]
+                    )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise e
+        self.write_stats.record(
+            len(jobs),
+            sum(len(statements) for statements, _ in jobs),
+            time.perf_counter() - start,
+        )
+        return results
+
+    @staticmethod
+    def _set_future(future: asyncio.Future, result=None, exception=None):
+        # 调用方可能已经超时取消
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        """写队列统计"""
+        write_stats = self.write_stats
+        return {
+            "write_queue_mode": self.write_queue_mode,
+            "queue_depth": self.write_queue.qsize() if self.write_queue else 0,
+            "commits": write_stats.commits,
+            "failed_commits": write_stats.failed_commits,
+            "jobs": write_stats.jobs,
+            "statements": write_stats.statements,
+            "avg_jobs_per_commit": write_stats.jobs / write_stats.commits
+            if write_stats.commits
+            else 0.0,
+            "avg_commit_ms": write_stats.total_commit_time / write_stats.commits * 1000
+            if write_stats.commits
+            else 0.0,
+            "last_commit_ms": write_stats.last_commit_time * 1000,
+            "max_commit_ms": write_stats.max_commit_time * 1000,
+        }
+
     # 利用模型直接进行增删改查
     async def execute(self, sql, parameters=None):
+        if self.write_queue_mode:
+            # 读语句在只读连接池上并发执行，其余语句进入写队列
+            if getattr(sql, "is_select", False):
+                async with self.read_session() as session:
+                    return await session.execute(sql, parameters)
+            return (await self.submit([(sql, parameters)]))[0]
         async with self.async_session() as session:
             try:
                 if self.db_mutex:
@@ -112,12 +387,24 @@ class AsyncORM:
                     self.db_mutex.release()
 
     async def execute_all(self, sql_list):
+        await self.execute_statements([(sql, None) for sql in sql_list])
+
+    async def execute_statements(self, statements: list):
+        """
+        在同一个事务中执行多条语句
+        :param statements: [(sql, parameters)]，parameters为list时按executemany执行
+        """
+        if not statements:
+            return
+        if self.write_queue_mode:
+            await self.submit(statements)
+            return
         async with self.async_session() as session:
             try:
                 if self.db_mutex:
                     await self.db_mutex.acquire()
-                for sql in sql_list:
-                    await session.execute(sql)
+                for sql, parameters in statements:
+                    await session.execute(sql, parameters)
                 await session.commit()
             except Exception as e:
                 await session.rollback()
@@ -155,10 +442,13 @@ class AsyncORM:
         :param table: 表
         :param data_list: 数据列表，每个元素是一个dict，表示一条记录
         """
-        # 构造所有的insert语句
-        insert_stmts = [insert(table).values(**data) for data in data_list]
+        # 相同字段的记录合并为一次executemany
+        statements = [
+            (insert(self.core_table(table)), rows)
+            for rows in self.group_by_keys(data_list).values()
+        ]
         # 执行批量插入操作
-        await self.execute_all(insert_stmts)
+        await self.execute_statements(statements)
 
     async def delete(self, table, condition):
         """
@@ -174,12 +464,30 @@ class AsyncORM:
         :param table: 表
         :param conditions_list: 条件列表，每个元素是一个tuple或list，表示该记录的条件
         """
-        # 构造所有的delete语句
-        delete_stmts = [
-            delete(table).where(*condition) for condition in conditions_list
-        ]
-        # 执行批量删除操作
-        await self.execute_all(delete_stmts)
+        if not conditions_list:
+            return
+        parsed = [parse_equal_conditions(condition) for condition in conditions_list]
+        key_columns = list(parsed[0]) if parsed[0] else None
+        if key_columns is None or any(
+            item is None or list(item) != key_columns for item in parsed
+        ):
+            # 无法合并的条件逐条删除
+            await self.execute_all(
+                [delete(table).where(*condition) for condition in conditions_list]
+            )
+            return
+        # 条件均为相同列的等值条件时，合并为 IN 删除
+        core_table = self.core_table(table)
+        columns = [core_table.c[key] for key in key_columns]
+        values = [tuple(item[key] for key in key_columns) for item in parsed]
+        statements = []
+        for chunk in self.chunks(values, len(columns)):
+            if len(columns) == 1:
+                clause = columns[0].in_([value[0] for value in chunk])
+            else:
+                clause = tuple_(*columns).in_(chunk)
+            statements.append((delete(core_table).where(clause), None))
+        await self.execute_statements(statements)
 
     async def update(self, table, data, condition):
         """
@@ -197,13 +505,33 @@ class AsyncORM:
         :param data_list: 更新的数据列表，每个元素是一个dict，表示一条记录的数据
         :param conditions_list: 条件列表，每个元素是一个tuple或list，表示该记录的条件
         """
-        # 构造所有的update语句
-        update_stmts = [
-            update(table).where(*condition).values(**data)
-            for data, condition in zip(data_list, conditions_list)
-        ]
+        if not data_list:
+            return
+        core_table = self.core_table(table)
+        groups = {}
+        update_stmts = []
+        for data, condition in zip(data_list, conditions_list):
+            if (parsed := parse_equal_conditions(condition)) is None:
+                update_stmts.append(
+                    (update(table).where(*condition).values(**data), None)
+                )
+                continue
+            # 条件列与更新列相同的记录合并为一次executemany
+            key = (tuple(parsed), tuple(data))
+            groups.setdefault(key, []).append(
+                {**{f"_c_{k}": v for k, v in parsed.items()}, **data}
+            )
+        for (condition_keys, data_keys), rows in groups.items():
+            stmt = (
+                update(core_table)
+                .where(
+                    *[core_table.c[k] == bindparam(f"_c_{k}") for k in condition_keys]
+                )
+                .values({k: bindparam(k) for k in data_keys})
+            )
+            update_stmts.append((stmt, rows))
         # 执行批量更新操作
-        await self.execute_all(update_stmts)
+        await self.execute_statements(update_stmts)
 
     async def insert_or_update(self, table, data, condition):
         """
@@ -212,6 +540,8 @@ class AsyncORM:
         :param data: 数据
         :param condition: 条件
         """
+        if self.get_upsert_keys(table, [data], [condition]):
+            return await self.insert_or_update_batch(table, [data], [condition])
         # 判断是否存在符合条件的数据
         exist = (await self.execute(select(table).where(*condition))).all()
         if exist:
@@ -226,10 +556,19 @@ class AsyncORM:
     async def insert_or_update_batch(self, table, data_list, conditions_list):
         """
         批量插入或更新数据
+        条件为唯一键上的等值条件时使用数据库原生的 ON CONFLICT / ON DUPLICATE KEY 批量写入，
+        否则逐条查询后插入或更新
         :param table: 表
         :param data_list: 数据列表，每个元素是一个dict，表示一条记录的数据
         :param conditions_list: 条件列表，每个元素是一个tuple或list，表示该记录的条件，与data_list中的元素一一对应
         """
+        if not data_list:
+            return
+        if key_columns := self.get_upsert_keys(table, data_list, conditions_list):
+            await self.execute_statements(
+                self.build_upsert(table, data_list, conditions_list, key_columns)
+            )
+            return
         stmts = []
         for data, condition in zip(data_list, conditions_list):
             exist = (await self.execute(select(table).where(*condition))).all()
@@ -249,10 +588,103 @@ class AsyncORM:
         :param data: 数据
         :param condition: 条件
         """
+        if key_columns := self.get_upsert_keys(table, [data], [condition]):
+            statements = self.build_upsert(
+                table, [data], [condition], key_columns, ignore=True
+            )
+            return await self.execute(*statements[0])
         if not (await self.execute(select(table).where(*condition))).all():
             return await self.execute(insert(table).values(**data))
         return None
 
+    # 批量写入工具
+    @staticmethod
+    def core_table(table):
+        """ORM模型转换为Core表，executemany时不走ORM批量逻辑"""
+        return getattr(table, "__table__", table)
+
+    @staticmethod
+    def group_by_keys(data_list) -> dict[tuple, list[dict]]:
+        """按字段集合分组，多行VALUES和executemany要求每行字段相同"""
+        groups = {}
+        for data in data_list:
+            groups.setdefault(tuple(sorted(data)), []).append(data)
+        return groups
+
+    def chunks(self, rows: list, column_count: int):
+        """按驱动参数上限切分"""
+        limit = PARAMETER_LIMITS.get(self.engine.dialect.name, 999)
+        size = max(1, limit // max(1, column_count))
+        for i in range(0, len(rows), size):
+            yield rows[i : i + size]
+
+    def get_upsert_keys(self, table, data_list, conditions_list) -> list[str] | None:
+        """
+        判断能否使用原生upsert
+        原生upsert的INSERT部分在处理冲突之前就会检查非空约束，
+        所以数据(含条件中的唯一键)需要包含所有必填列，只更新部分字段时走逐条查询
+        :return: 条件均为同一唯一键上的等值条件时返回该唯一键的列名，否则返回None
+        """
+        if self.engine.dialect.name not in PARAMETER_LIMITS or not conditions_list:
+            return None
+        required = get_required_columns(table)
+        key_columns = None
+        for data, condition in zip(data_list, conditions_list):
+            if (parsed := parse_equal_conditions(condition)) is None:
+                return None
+            if not required.issubset(data.keys() | parsed.keys()):
+                return None
+            if key_columns is None:
+                key_columns = list(parsed)
+                if frozenset(key_columns) not in get_unique_keys(table):
+                    return None
+            elif list(parsed) != key_columns:
+                return None
+        return key_columns
+
+    def build_upsert(
+        self, table, data_list, conditions_list, key_columns, ignore: bool = False
+    ) -> list:
+        """
+        构造原生upsert语句，相同字段的记录按executemany执行
+        :param ignore: 冲突时跳过而不是更新
+        :return: [(sql, rows)]
+        """
+        core_table = self.core_table(table)
+        dialect = self.engine.dialect.name
+        # 条件中的唯一键值补充到数据中
+        rows = {}
+        for data, condition in zip(data_list, conditions_list):
+            row = {**parse_equal_conditions(condition), **data}
+            # 同一批次内相同唯一键只保留最后一条，避免一条语句内重复冲突
+            rows[tuple(row[key] for key in key_columns)] = row
+        statements = []
+        for keys, group in self.group_by_keys(rows.values()).items():
+            update_columns = [key for key in keys if key not in key_columns]
+            for chunk in self.chunks(group, len(keys)):
+                if dialect == "mysql":
+                    stmt = mysql.insert(core_table)
+                    if ignore or not update_columns:
+                        stmt = stmt.prefix_with("IGNORE")
+                    else:
+                        stmt = stmt.on_duplicate_key_update(
+                            {key: stmt.inserted[key] for key in update_columns}
+                        )
+                else:
+                    dialect_insert = (
+                        sqlite.insert if dialect == "sqlite" else postgresql.insert
+                    )
+                    stmt = dialect_insert(core_table)
+                    if ignore or not update_columns:
+                        stmt = stmt.on_conflict_do_nothing(index_elements=key_columns)
+                    else:
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=key_columns,
+                            set_={key: stmt.excluded[key] for key in update_columns},
+                        )
+                statements.append((stmt, chunk))
+        return statements
+
     async def select(self, el, condition=None):
         """
         查询数据"
@@ -26,7 +26,7 @@ from sqlalchemy import select
 from core.bot import Umaru
 from core.config import GlobalConfig
 from core.control import Distribute, FrequencyLimitation, Function, Permission
-from core.models import response_model, saya_model
+from core.models import perm_model, response_model, saya_model
 from core.orm import orm
 from core.orm.tables import GroupPerm, GroupSetting, MemberPerm
 from utils.image import get_img_base64_str, get_user_avatar_url
@@ -45,6 +45,7 @@ core = create(Umaru)
 
 module_controller = saya_model.get_module_controller()
 account_controller = response_model.get_acc_controller()
+perm_cache = perm_model.get_perm_cache()
 
 saya = Saya.current()
 channel = Channel.current()
@@ -137,6 +138,7 @@ async def change_user_perm(
                 ],
                 data={"group_id": target_group.id, "qq": target, "perm": perm},
             )
+            perm_cache.set_member_perm(target_group.id, target, perm)
     response_text = f"共解析{len(targets)}个目标\n其中{len(targets) - len(error_targets)}个执行成功,{len(error_targets)}个失败"
     if error_targets:
         response_text += "\n\n失败目标:"
@@ -197,6 +199,7 @@ async def change_group_perm(
         },
         [GroupPerm.group_id == target_group.id],
     )
+    perm_cache.set_group_perm(target_group.id, perm)
     return await app.send_message(
         group,
         MessageChain(f"已修改群{target_group.name}({target_group.id})权限为{perm}"),
@@ -244,6 +247,9 @@ async def change_group_perm_type(
         data={"permission_type": permission_type},
         condition=[GroupSetting.group_id == target_group.id],
     )
+    perm_cache.update_group_setting(
+        target_group.id, {"permission_type": permission_type}
+    )
     if permission_type == "admin":
         for member in await target_app.get_member_list(target_group):
             if (
@@ -262,6 +268,7 @@ async def change_group_perm_type(
                         MemberPerm.group_id == group.id,
                     ],
                 )
+                perm_cache.set_member_perm(group.id, member.id, Permission.GroupAdmin)
     else:
         for member in await target_app.get_member_list(group):
             target_perm = Permission.member_permStr_dict[member.permission.name]
@@ -277,6 +284,7 @@ async def change_group_perm_type(
                         MemberPerm.group_id == group.id,
                     ],
                 )
+                perm_cache.set_member_perm(group.id, member.id, target_perm)
     return await app.send_message(
         group,
         MessageChain(
@@ -511,6 +519,7 @@ async def change_globalBlack(
                     data={"qq": target, "group_id": 0, "perm": -1},
                     condition=[MemberPerm.qq == target, MemberPerm.group_id == 0],
                 )
+                perm_cache.set_member_perm(0, target, Permission.GlobalBlack)
         else:
             if target not in global_black_list:
                 error_targets.append((target, f"{target}不在全局黑名单内!"))
@@ -519,6 +528,7 @@ async def change_globalBlack(
                     table=MemberPerm,
                     condition=[MemberPerm.qq == target, MemberPerm.group_id == 0],
                 )
+                perm_cache.del_member_perm(0, target)
     response_text = f"共解析{len(targets)}个目标\n其中{len(targets) - len(error_targets)}个执行成功,{len(error_targets)}个失败"
     if error_targets:
         response_text += "\n\n失败目标:"
@@ -624,6 +634,7 @@ async def change_botAdmin(
                     MemberPerm.qq == target,
                 ],
             )
+            perm_cache.del_member_perms(target)
             await core.update_admins_permission()
         else:
             error_targets.append((target, f"{target}还不是BOT管理哦!"))
@@ -699,6 +710,7 @@ async def auto_del_perm(app: Ariadne, group: Group, member: Member):
         table=MemberPerm,
         condition=[MemberPerm.qq == member.id, MemberPerm.group_id == group.id],
     )
+    perm_cache.del_member_perm(group.id, member.id)
     if Permission.GroupOwner >= target_perm >= Permission.GroupAdmin:
         return await app.send_message(
             group, f"已自动删除退群成员{member.name}({member.id})的权限"
@@ -712,22 +724,19 @@ async def auto_add_perm(
 ):
     if app.account != await account_controller.get_response_account(group.id):
         return
-    permission_type = "default"
-    if result := await orm.fetch_one(
-        select(GroupSetting.permission_type).where(GroupSetting.group_id == group.id)
-    ):
-        permission_type = result[0]
+    permission_type = await Permission.get_group_perm_type(group.id)
     if permission_type == "admin":
         await orm.insert_or_update(
             table=MemberPerm,
             data={"qq": member.id, "group_id": group.id, "perm": 32},
             condition=[MemberPerm.qq == member.id, MemberPerm.group_id == group.id],
         )
+        perm_cache.set_member_perm(group.id, member.id, Permission.GroupAdmin)
         await app.send_message(
             group, f"已自动修改成员{member.name}({member.id})的权限为32"
         )
     if event.member.id == config.Master:
-        return await orm.insert_or_update(
+        await orm.insert_or_update(
             table=MemberPerm,
             data={
                 "qq": event.member.id,
@@ -739,6 +748,9 @@ async def auto_add_perm(
                 MemberPerm.group_id == event.member.group.id,
             ],
         )
+        return perm_cache.set_member_perm(
+            event.member.group.id, event.member.id, Permission.Master
+        )
     elif event.member.id in await Permission.get_BotAdminsList():
         await orm.insert_or_update(
             table=MemberPerm,
@@ -752,6 +764,9 @@ async def auto_add_perm(
                 MemberPerm.group_id == event.member.group.id,
             ],
         )
+        perm_cache.set_member_perm(
+            event.member.group.id, event.member.id, Permission.BotAdmin
+        )
 
 
 # 自动修改群管理权限
@@ -768,13 +783,7 @@ async def auto_change_admin_perm(app: Ariadne, event: MemberPermissionChangeEven
     if (target_member.id in admin_list) or target_member.id == config.Master:
         return
     # 跳过管理组
-    permission_type = "default"
-    if result := await orm.fetch_one(
-        select(GroupSetting.permission_type).where(
-            GroupSetting.group_id == target_group.id
-        )
-    ):
-        permission_type = result[0]
+    permission_type = await Permission.get_group_perm_type(target_group.id)
     if permission_type == "admin":
         return
     if event.current.name == "Owner":
@@ -803,6 +812,7 @@ async def auto_change_admin_perm(app: Ariadne, event: MemberPermissionChangeEven
             MemberPerm.group_id == event.member.group.id,
         ],
     )
+    perm_cache.set_member_perm(event.member.group.id, event.member.id, target_perm)
     return await app.send_message(
         target_group,
         MessageChain(
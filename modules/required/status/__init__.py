@@ -18,8 +18,11 @@ from graia.scheduler.saya import SchedulerSchema
 
 from core.bot import Umaru
 from core.config import GlobalConfig
-from core.control import Distribute, FrequencyLimitation, Function, Permission
-from core.models import response_model, saya_model
+from core.control import Gate, Permission
+from core.models import perm_model, response_model, saya_model
+from core.orm import orm
+from utils.conversation_store import conversation_store
+from utils.render_cache import render_cache
 from utils.version_info import get_full_version_info
 
 config = create(GlobalConfig)
@@ -114,11 +117,13 @@ async def message_counter():
 # 接收事件
 @listen(GroupMessage, FriendMessage)
 @decorate(
-    Distribute.require(),
-    Function.require(channel.module),
-    FrequencyLimitation.require(channel.module),
-    Permission.group_require(channel.metadata.level, if_noticed=True),
-    Permission.user_require(Permission.User, if_noticed=True),
+    Gate.require(
+        channel.module,
+        channel.metadata.level,
+        Permission.User,
+        group_notice=True,
+        user_notice=True,
+    )
 )
 @dispatch(Twilight([FullMatch("-bot").space(SpacePolicy.PRESERVE)]))
 async def status(app: Ariadne, src_place: Group | Friend, source: Source):
@@ -149,6 +154,10 @@ async def status(app: Ariadne, src_place: Group | Friend, source: Source):
     )
     real_time_received_message_count = message_count.get_receive_count()
     real_time_sent_message_count = message_count.get_send_count()
+    perm_cache_stats = perm_model.get_perm_cache().stats()
+    db_stats = orm.stats()
+    render_cache_stats = render_cache.stats()
+    conversation_stats = conversation_store.stats()
 
     # 版本信息块
     version_info = f"版本信息：v{version}\n"
@@ -167,6 +176,14 @@ async def status(app: Ariadne, src_place: Group | Friend, source: Source):
             build_info += f"构建日期：{b2v_info['build_date']}\n"
         build_info += f"构建类型：{b2v_info['build_type']}\n"
 
+    # 数据库信息块
+    db_info = ""
+    if db_stats["write_queue_mode"]:
+        db_info = (
+            f"数据库写队列：{db_stats['queue_depth']} "
+            f"(平均提交:{db_stats['avg_commit_ms']:.1f}ms)\n"
+        )
+
     await app.send_message(
         src_place,
         MessageChain(
@@ -180,6 +197,13 @@ async def status(app: Ariadne, src_place: Group | Friend, source: Source):
             f"在线bot数量：{len([app_item for app_item in core.apps if Ariadne.current(app_item.account).connection.status.available])}/"
             f"{len(core.apps)}\n",
             f"活动群组数量：{len(account_controller.total_groups.keys())}\n",
+            f"权限缓存命中：{perm_cache_stats['hit_rate']:.1%} "
+            f"({perm_cache_stats['hits']}/{perm_cache_stats['hits'] + perm_cache_stats['misses']})\n",
+            f"图片缓存命中：{render_cache_stats['hit_rate']:.1%} "
+            f"({render_cache_stats['hits']}/{render_cache_stats['hits'] + render_cache_stats['misses']})\n",
+            f"AI对话：内存{conversation_stats['hot']}个({conversation_stats['memory'] / 1024 / 1024:.1f}MB) "
+            f"磁盘{conversation_stats['stored']}个 (换出:{conversation_stats['evictions']}次 恢复:{conversation_stats['rehydrations']}次)\n",
+            db_info,
             version_info,
             build_info,
             "项目地址：https://github.com/g1331/xiaomai-bot",
@@ -1,5 +1,8 @@
 import mimetypes
 import re
+import time
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
 from pathlib import Path
 
 import aiohttp
@@ -23,6 +26,8 @@ from graia.ariadne.message.parser.twilight import (
 from graia.ariadne.model import Group, Member
 from graia.saya import Channel
 from graia.saya.builtins.broadcast.schema import ListenerSchema
+from graia.scheduler import timers
+from graia.scheduler.saya import SchedulerSchema
 from graiax.playwright import PlaywrightBrowser
 from loguru import logger
 from pydantic import ValidationError
@@ -35,6 +40,8 @@ from core.control import (
     Permission,
 )
 from core.models import response_model, saya_model
+from utils.conversation_store import conversation_store
+from utils.reply_chunker import ReplyChunker
 from utils.text2img import html2img
 from utils.text2img.md2img import (
     HighlightTheme,
@@ -297,6 +304,13 @@ async def init():
     logger.success("AI Chat模块初始化完成")
 
 
+# 闲置的对话换出到磁盘，下次对话时恢复
+@channel.use(SchedulerSchema(timers.every_custom_minutes(5)))
+async def evict_idle_conversations():
+    evicted = await g_manager.evict_idle()
+    logger.debug(f"已换出{evicted}个闲置的AI对话: {conversation_store.stats()}")
+
+
 @channel.use(
     ListenerSchema(
         listening_events=[GroupMessage],
@@ -310,6 +324,9 @@ async def init():
                     @ "new_thread",
                     ArgumentMatch("-P", "--pic", action="store_true", optional=True)
                     @ "pic",
+                    # 流式回复，边生成边按段落/代码块分条发送
+                    ArgumentMatch("-s", "--stream", action="store_true", optional=True)
+                    @ "stream",
                     # 新增参数 --no-tool 用于禁用工具
                     ArgumentMatch("--no-tool", action="store_true", optional=True)
                     @ "no_tool",
@@ -361,6 +378,7 @@ async def ai_chat(
     AtResult: ElementResult,
     new_thread: ArgResult,
     pic: ArgResult,
+    stream: ArgResult,
     no_tool: ArgResult,
     preset: ArgResult,
     content: RegexResult,
@@ -420,6 +438,8 @@ async def ai_chat(
                 group, MessageChain("你没有权限执行此操作"), quote=source
             )
         g_config_loader = ConfigLoader()
+        # 内存中的对话使用旧配置创建的提供商，写入磁盘后按新配置恢复
+        await conversation_store.flush()
         g_manager = ConversationManager(provider_factory, plugins_factory)
         return await app.send_group_message(
             group, MessageChain("已重新加载AI对话模块配置"), quote=source
@@ -456,7 +476,7 @@ async def ai_chat(
                 )
 
             # 尝试切换提供商
-            success, message = switch_provider_for_conversation(
+            success, message = await switch_provider_for_conversation(
                 group_id_str, member_id_str, provider_name
             )
 
@@ -495,7 +515,7 @@ async def ai_chat(
             models = get_provider_models(provider_name)
 
             # 获取当前会话的实际模型
-            current_conversation = g_manager.get_conversation(
+            current_conversation = await g_manager.get_conversation(
                 group_id_str, member_id_str
             )
             actual_model = current_conversation.provider.model_name
@@ -525,7 +545,7 @@ async def ai_chat(
                 )
 
             # 切换模型并验证结果
-            success, message = g_manager.switch_conversation_model(
+            success, message = await g_manager.switch_conversation_model(
                 group_id_str, member_id_str, model_name
             )
 
@@ -555,7 +575,7 @@ async def ai_chat(
 
     if show_model_info.matched:
         # 获取当前会话对象
-        conversation = g_manager.get_conversation(group_id_str, member_id_str)
+        conversation = await g_manager.get_conversation(group_id_str, member_id_str)
         provider = conversation.provider
 
         # 收集模型信息
@@ -661,6 +681,7 @@ async def ai_chat(
 ## 会话状态
 - **当前状态**: {conversation_status}
 - **已消耗**: {usage_tokens} tokens
+- **当前上下文**: {conversation.context_tokens} tokens (已压缩{conversation.compactions}次，节省{conversation.tokens_saved} tokens)
 - **对话模式**: 群聊({group_mode}) / 用户({user_mode})
 
 ## 插件信息
@@ -695,7 +716,7 @@ async def ai_chat(
                         MarkdownToImageConverter.generate_html(
                             "# 预设列表\n\n" + "> 请使用标题括号前的文本进行设置\n"
                             "## 当前预设\n\n"
-                            + f"{g_manager.get_preset(group_id_str, member_id_str)}\n\n"
+                            + f"{await g_manager.get_preset(group_id_str, member_id_str)}\n\n"
                             + "## 内置预设：\n\n"
                             + "\n\n".join(
                                 [
@@ -721,7 +742,7 @@ async def ai_chat(
                     MessageChain("当前对话为群共享模式，只有群管理员才能执行这个操作"),
                     quote=source,
                 )
-        g_manager.new(group_id=group_id_str, member_id=member_id_str)
+        await g_manager.new(group_id=group_id_str, member_id=member_id_str)
         await app.send_group_message(
             group, MessageChain("已清除上下文并开始新对话"), quote=source
         )
@@ -729,7 +750,7 @@ async def ai_chat(
     if preset.matched:
         # 群聊预设暂不鉴权
         preset_str = preset.result.display.strip()
-        g_manager.set_preset(
+        await g_manager.set_preset(
             group_id_str,
             member_id_str,
             (
@@ -753,7 +774,7 @@ async def ai_chat(
                     MessageChain("当前对话为群共享模式，只有群管理员才能执行这个操作"),
                     quote=source,
                 )
-        g_manager.clear_memory(group_id_str, member_id_str)
+        await g_manager.clear_memory(group_id_str, member_id_str)
         await app.send_group_message(
             group, MessageChain("已清除对话历史"), quote=source
         )
@@ -772,7 +793,7 @@ async def ai_chat(
                 )
 
         # 尝试重试
-        success, retry_result_or_error = g_manager.can_retry(
+        success, retry_result_or_error = await g_manager.can_retry(
             group_id_str, member_id_str
         )
         if not success:
@@ -817,6 +838,22 @@ async def ai_chat(
         # 反转工具使用逻辑: 默认启用，除非使用 --no-tool 禁用
         use_tool = not no_tool.matched
 
+        # 图片输出需要完整的回复，不使用流式回复
+        if stream.matched and not pic.matched:
+            return await send_stream_reply(
+                app,
+                group,
+                source,
+                g_manager.stream_message(
+                    group_id_str,
+                    member_id_str,
+                    member.name,
+                    user_content,
+                    files=files,
+                    use_tool=use_tool,
+                ),
+            )
+
         response = await g_manager.send_message(
             group_id_str,
             member_id_str,
@@ -846,7 +883,40 @@ async def ai_chat(
         )
 
 
-def switch_provider_for_conversation(
+async def send_stream_reply(
+    app: Ariadne,
+    group: Group,
+    source: Source,
+    chunks: AsyncGenerator[str, None],
+):
+    """把流式回复按段落/代码块切分，达到长度或时间阈值时立即发送，第一条消息引用原消息"""
+    chunker = ReplyChunker()
+    start_time = time.perf_counter()
+    first_message_time = None
+    sent = 0
+
+    async def send(texts: list[str]):
+        nonlocal first_message_time, sent
+        for text in texts:
+            await app.send_group_message(
+                group, MessageChain(text), quote=source if not sent else None
+            )
+            if first_message_time is None:
+                first_message_time = time.perf_counter() - start_time
+            sent += 1
+
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            await send(chunker.feed(chunk))
+    await send(chunker.finish())
+    if first_message_time is not None:
+        logger.info(
+            f"AI流式回复: 首条消息耗时{first_message_time:.2f}s，"
+            f"共{sent}条，总耗时{time.perf_counter() - start_time:.2f}s"
+        )
+
+
+async def switch_provider_for_conversation(
     group_id: str, member_id: str, provider_name: str, model_name: str = None
 ) -> tuple[bool, str]:
     """
@@ -874,7 +944,7 @@ def switch_provider_for_conversation(
 
     try:
         # 尝试获取当前会话
-        current_conversation = g_manager.get_conversation(group_id, member_id)
+        current_conversation = await g_manager.get_conversation(group_id, member_id)
 
         # 如果当前提供商与目标提供商相同，只需返回信息
         if provider_name == g_config_loader.get_user_provider(member_id):
@@ -903,7 +973,7 @@ def switch_provider_for_conversation(
 
         # 创建新会话并保留预设
         preset = current_conversation.preset
-        new_conversation = g_manager.new(group_id, member_id)
+        new_conversation = await g_manager.new(group_id, member_id)
         if preset:
             new_conversation.set_preset(preset)
 
@@ -4,14 +4,16 @@
 
 import asyncio
 import json
-from collections.abc import AsyncGenerator
+import sys
+from collections.abc import AsyncGenerator, Callable
+from contextlib import AbstractContextManager, ExitStack, nullcontext
 from datetime import datetime
 from enum import Enum
 
 from loguru import logger
 
 from ..core.plugin import BasePlugin
-from ..core.provider import BaseAIProvider, FileContent
+from ..core.provider import API_ERROR_PREFIX, BaseAIProvider, FileContent
 
 
 class Conversation:
@@ -19,13 +21,31 @@ class Conversation:
         DEFAULT = "default"
         CUSTOM = "custom"
 
+    # 上下文超过预算的该比例时，在后台把较早的对话合并进总结
+    compact_ratio = 0.6
+    # 保留原文的最近对话轮数，以及最多占预算的比例
+    keep_turns = 4
+    window_ratio = 0.3
+    # 写入历史记录的工具输出最大字符数
+    tool_output_limit = 2000
+
     def __init__(self, provider: BaseAIProvider, plugins: list[BasePlugin]):
         self.provider = provider
         self.plugins = plugins
         self._last_time = None  # 记录上次添加时间信息的时间
         self.history = []
+        # 历史记录的token数，追加消息时增量更新；编码变化(切换模型/提供商)或历史被替换时重新计算
+        # 按消息顺序累加不取整的值，与calculate_tokens对整个历史的结果一致
+        self._history_tokens = 0.0
+        self._tokens_encoding = None
         self.mode = Conversation.Mode.DEFAULT
         self.preset = None  # preset 设定
+        self.summary = None  # 较早对话的总结
+        self.compactions = 0  # 压缩次数
+        self.tokens_saved = 0  # 压缩节省的token数
+        self._compaction_task: asyncio.Task | None = None
+        # 后台压缩期间保持对话不被换出，由ConversationManager设置为存储的hold
+        self.hold: Callable[[], AbstractContextManager] = nullcontext
         self.interrupted = False  # 中断标记
         self._maybe_add_time_message()
 
@@ -58,13 +78,92 @@ class Conversation:
         self.preset = None
 
     def clear_memory(self):
-        """清除所有对话历史，preset单独管理"""
-        self.history = []
+        """清除所有对话历史和总结，preset单独管理"""
+        self._replace_history([])
+        self.summary = None
+
+    @property
+    def history_tokens(self) -> int:
+        """历史记录的token数"""
+        if self._tokens_encoding != self.provider.token_encoding:
+            self._history_tokens = 0.0
+            for message in self.history:
+                self._history_tokens += self.provider.count_message_tokens(message)
+            self._tokens_encoding = self.provider.token_encoding
+        return int(self._history_tokens)
+
+    def _extend_history(self, messages: list[dict]):
+        """追加历史记录，只计算新消息的token数"""
+        self.history.extend(messages)
+        if self._tokens_encoding == self.provider.token_encoding:
+            for message in messages:
+                self._history_tokens += self.provider.count_message_tokens(message)
+
+    def _replace_history(self, history: list[dict]):
+        """替换历史记录，token数在下次使用时重新计算"""
+        self.history = history
+        self._tokens_encoding = None
 
     def interrupt(self):
         """中断当前对话"""
         self.interrupted = True
 
+    def to_state(self) -> dict:
+        """导出对话状态用于写入磁盘，自定义模式的提供商不会保存"""
+        history = []
+        for msg in self.history:
+            if msg.get("tool_calls"):
+                # 工具调用是openai的对象，转换为dict，恢复后可以直接传给API
+                msg = msg.copy()
+                msg["tool_calls"] = [
+                    tool_call.model_dump()
+                    if hasattr(tool_call, "model_dump")
+                    else tool_call
+                    for tool_call in msg["tool_calls"]
+                ]
+            history.append(msg)
+        return {
+            "history": history,
+            "preset": self.preset,
+            "summary": self.summary,
+            "compactions": self.compactions,
+            "tokens_saved": self.tokens_saved,
+            "last_time": self._last_time,
+            "model": self.provider.model_name,
+            "usage": self.provider.get_usage(),
+        }
+
+    @classmethod
+    def from_state(
+        cls, state: dict, provider: BaseAIProvider, plugins: list[BasePlugin]
+    ) -> "Conversation":
+        """从to_state导出的状态恢复对话"""
+        conversation = cls(provider, plugins)
+        conversation._replace_history(state["history"])
+        conversation.preset = state["preset"]
+        conversation.summary = state.get("summary")
+        conversation.compactions = state.get("compactions", 0)
+        conversation.tokens_saved = state.get("tokens_saved", 0)
+        conversation._last_time = state["last_time"]
+        if state["model"] and state["model"] != provider.model_name:
+            try:
+                provider.switch_model(state["model"])
+            except ValueError as e:
+                logger.warning(f"恢复对话模型失败，使用默认模型: {e}")
+        provider.set_usage(state["usage"])
+        return conversation
+
+    def memory_size(self) -> int:
+        """估算历史记录占用的内存(字节)"""
+        return (
+            sys.getsizeof(self.preset)
+            + sys.getsizeof(self.summary)
+            + sum(
+                sys.getsizeof(msg) + sys.getsizeof(msg.get("content") or "")
+                for msg in self.history
+            )
+        )
+
     def _get_time_message(self) -> dict:
         """获取当前时间信息的消息"""
         current_time = datetime.now()
@@ -145,7 +244,7 @@ class Conversation:
                 return "错误：没有找到用户的历史消息。"
 
             # 删除最后一个用户消息之后的所有消息（包括AI回复和工具结果）
-            self.history = self.history[: last_user_index + 1]
+            self._replace_history(self.history[: last_user_index + 1])
 
             # 重置中断标记
             self.interrupted = False
@@ -173,61 +272,154 @@ class Conversation:
         """
         current_hour = datetime.now().strftime("%Y-%m-%d %H")
         if self._last_time is None or current_hour != self._last_time:
-            self.history.append(self._get_time_message())
+            self._extend_history([self._get_time_message()])
             self._last_time = current_hour
 
-    # 让模型总结历史记录
-    async def summarize_history(self) -> str | None:
-        max_token = self.provider.model_config.max_total_tokens
-        current_tokens = self.provider.get_usage().get("prompt_tokens", 0)
-        # 预留0.5k token给总结历史记录
-        if current_tokens + 512 <= max_token:
-            return None
-        logger.info(
-            f"历史记录token数超过限制，当前token数: {current_tokens}, 最大token数: {max_token}，开始总结历史记录"
+    def _context_budget(self) -> int:
+        """上下文中可用于输入的token数，预留单次输出的长度"""
+        model_config = self.provider.model_config
+        return max(
+            model_config.max_total_tokens - model_config.max_tokens,
+            model_config.max_total_tokens // 2,
         )
-        try:
-            response_contents = []
-            response_messages = []
-            origin_tokens_num = self.provider.calculate_tokens(self.history)
-            # 这里仍然添加preset是为了命中缓存
-            preset_messages = (
-                [{"role": "system", "content": self.preset}] if self.preset else []
+
+    def _prefix_messages(self) -> list[dict]:
+        """预设和较早对话的总结，放在消息列表最前面；预设始终是第一条，保持前缀稳定以命中提供商的缓存"""
+        messages = [{"role": "system", "content": self.preset}] if self.preset else []
+        if self.summary:
+            messages.append(
+                {"role": "system", "content": f"之前对话的总结:\n{self.summary}"}
             )
-            summary_instruction = {
-                "role": "system",
-                "content": (
-                    "请按照以下规则总结历史对话：\n"
-                    "1.背景信息：概述对话的起点和核心话题。\n"
-                    "2.用户主要问题：列出用户的关键提问。\n"
-                    "3.模型主要回答：总结你给出的重要回复。\n"
-                    "4.未解决问题（如有）：如果对话中仍有未解答的问题，列出它们。\n"
-                    "请按照规则生成结构化总结。"
-                ),
-            }
-            ask_messages = preset_messages + self.history + [summary_instruction]
-            async for response in self.provider.ask(messages=ask_messages):
-                content = response.content if hasattr(response, "content") else ""
-                if content:
-                    response_contents.append(content)
-            if response_contents:
-                response_messages = [
-                    {"role": "assistant", "content": "".join(response_contents)}
-                ]
-            if response_messages:
-                self.history = response_messages
-                current_tokens_num = self.provider.calculate_tokens(self.history)
-                logger.success(
-                    f"历史记录已被总结，原始token数: {origin_tokens_num}, 当前token数: {current_tokens_num}, "
-                    f"总结内容: {''.join(response_contents)}"
+        return messages
+
+    @property
+    def context_tokens(self) -> int:
+        """预设、总结和历史记录的token数"""
+        return self.provider.calculate_tokens(self._prefix_messages()) + (
+            self.history_tokens
+        )
+
+    def _truncate_tool_outputs(self, messages: list[dict]) -> list[dict]:
+        """截断写入历史记录的工具输出，本轮回复已经使用了完整的输出"""
+        result = []
+        for msg in messages:
+            content = msg.get("content")
+            if (
+                msg.get("role") == "tool"
+                and isinstance(content, str)
+                and len(content) > self.tool_output_limit
+            ):
+                msg = msg.copy()
+                msg["content"] = (
+                    content[: self.tool_output_limit] + "...(工具输出已截断)"
                 )
-                self.provider.reset_usage()
-                self.provider.set_total_tokens(current_tokens_num)
-                return None
-            return None
+            result.append(msg)
+        return result
+
+    def _compaction_cut(self, history: list[dict]) -> int:
+        """返回保留原文的起始位置：最近keep_turns轮以内、且不超过窗口预算，至少保留最后一轮"""
+        starts = [i for i, msg in enumerate(history) if msg.get("role") == "user"]
+        if len(starts) < 2:
+            return 0
+        window_budget = self._context_budget() * self.window_ratio
+        cut = starts[-1]
+        for start in reversed(starts[-self.keep_turns : -1]):
+            if self.provider.calculate_tokens(history[start:]) > window_budget:
+                break
+            cut = start
+        # 最早的一轮之前只有时间信息时没有可以总结的内容
+        return cut if cut > starts[0] else 0
+
+    async def compact(self) -> int:
+        """把保留窗口之前的对话合并进总结，返回节省的token数"""
+        history = self.history
+        cut = self._compaction_cut(history)
+        if not cut:
+            return 0
+        old_messages = history[:cut]
+        summary_messages = self._prefix_messages()[1 if self.preset else 0 :]
+        before_tokens = self.provider.calculate_tokens(summary_messages + old_messages)
+        summary_instruction = {
+            "role": "system",
+            "content": (
+                "请按照以下规则总结以上对话(如有之前的总结，请合并进来)：\n"
+                "1.背景信息：概述对话的起点和核心话题。\n"
+                "2.用户主要问题：列出用户的关键提问。\n"
+                "3.模型主要回答：总结你给出的重要回复。\n"
+                "4.未解决问题（如有）：如果对话中仍有未解答的问题，列出它们。\n"
+                "请按照规则生成结构化总结。"
+            ),
+        }
+        # 这里仍然添加preset是为了命中缓存
+        ask_messages = self._prefix_messages() + old_messages + [summary_instruction]
+        response_contents = []
+        async for response in self.provider.ask(messages=ask_messages):
+            content = response.content if hasattr(response, "content") else ""
+            if content:
+                response_contents.append(content)
+        summary = "".join(response_contents)
+        if not summary or summary.startswith(API_ERROR_PREFIX):
+            logger.warning(f"总结历史记录失败: {summary[:100]}")
+            return 0
+        # 总结期间历史记录被替换(重试/清除/新对话)时放弃本次结果，追加的新消息不受影响
+        if self.history is not history:
+            return 0
+        self.summary = summary
+        self._replace_history(history[cut:])
+        saved = before_tokens - self.provider.calculate_tokens(
+            [{"role": "system", "content": summary}]
+        )
+        self.compactions += 1
+        self.tokens_saved += saved
+        logger.success(
+            f"历史记录已压缩，总结了{cut}条消息，节省token数: {saved}，当前上下文token数: {self.context_tokens}"
+        )
+        return saved
+
+    async def _compact_in_background(self):
+        try:
+            await self.compact()
         except Exception as e:
-            logger.error(f"Error in summarize_history: {e}")
-            return f"Error: {str(e)}"
+            logger.error(f"Error in compact: {e}")
+
+    def _schedule_compaction(self):
+        """上下文超过预算的compact_ratio时，在后台压缩历史记录，不占用回复的时间"""
+        if self._compaction_task and not self._compaction_task.done():
+            return
+        if self.context_tokens > self._context_budget() * self.compact_ratio:
+            # 在创建任务时就开始hold，任务结束(包括被取消)后释放；
+            # 否则压缩期间对话被换出到磁盘，总结只写进已换出的对象而丢失
+            stack = ExitStack()
+            stack.enter_context(self.hold())
+            self._compaction_task = asyncio.create_task(self._compact_in_background())
+            self._compaction_task.add_done_callback(lambda _: stack.close())
+
+    async def _ensure_context_budget(self, input_tokens: int):
+        """发送前确保上下文不超过预算：等待后台压缩，仍然超过时立即压缩，最后丢弃最早的对话"""
+        budget = self._context_budget()
+        if self.context_tokens + input_tokens <= budget:
+            return
+        if self._compaction_task and not self._compaction_task.done():
+            await asyncio.shield(self._compaction_task)
+        if self.context_tokens + input_tokens > budget:
+            logger.info(
+                f"上下文token数超过限制，当前token数: {self.context_tokens + input_tokens}, 预算: {budget}，开始压缩历史记录"
+            )
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"Error in compact: {e}")
+        dropped = 0
+        while self.context_tokens + input_tokens > budget and self.history:
+            starts = [
+                i for i, msg in enumerate(self.history) if msg.get("role") == "user"
+            ]
+            # 按轮丢弃，避免拆开工具调用和结果；只剩一轮时全部丢弃
+            cut = next((i for i in starts if i > 0), len(self.history))
+            dropped += cut
+            self._replace_history(self.history[cut:])
+        if dropped:
+            logger.warning(f"上下文仍超过限制，已丢弃最早的{dropped}条消息")
 
     @staticmethod
     def _deduplicate_tool_calls(tool_calls) -> tuple[list, int, int]:
@@ -270,7 +462,11 @@ class Conversation:
         return unique_tool_calls, skipped_by_id, skipped_by_key
 
     async def process_message(
-        self, user_input: str, files: list[FileContent] = None, use_tool: bool = False
+        self,
+        user_input: str,
+        files: list[FileContent] = None,
+        use_tool: bool = False,
+        stream: bool = False,
     ) -> AsyncGenerator[str, None]:
         """处理用户消息,包括历史记录管理和工具调用
 
@@ -278,6 +474,7 @@ class Conversation:
             user_input: 用户输入文本
             files: 多模态文件列表
             use_tool: 是否启用工具
+            stream: 是否流式输出，启用时逐个输出模型返回的文本片段
         """
         try:
             # 重置中断标记
@@ -287,14 +484,6 @@ class Conversation:
             tools = []
             plugin_map = {}
 
-            # 清理历史记录
-            if await self.summarize_history():
-                yield "服务器忙不过来了哦，稍后再试吧~"
-                return
-
-            # 添加时间信息(如果需要)
-            self._maybe_add_time_message()
-
             # 限制用户输入长度，防止超出API限制
             max_input_length = 32000  # 设置一个合理的最大长度
             if len(user_input) > max_input_length:
@@ -303,10 +492,21 @@ class Conversation:
                 )
                 user_input = user_input[:max_input_length] + "...(内容已截断)"
 
-            # 构造传入 AI 模型的消息列表
-            preset_messages = (
-                [{"role": "system", "content": self.preset}] if self.preset else []
+            # 清理历史记录
+            input_tokens = (
+                self.provider.calculate_tokens(
+                    [{"role": "user", "content": user_input}]
+                )
+                if user_input
+                else 0
             )
+            await self._ensure_context_budget(input_tokens)
+
+            # 添加时间信息(如果需要)
+            self._maybe_add_time_message()
+
+            # 构造传入 AI 模型的消息列表
+            preset_messages = self._prefix_messages()
 
             # 仅当有用户输入时才添加到历史记录
             user_input_messages = []
@@ -415,6 +615,7 @@ class Conversation:
                     messages=ask_messages,
                     files=files,
                     tools=tools if use_tool else None,
+                    stream=stream,
                 ):
                     # 检查是否被中断
                     if self.interrupted:
@@ -499,7 +700,7 @@ class Conversation:
                         final_ask_messages = ask_messages + tool_response_messages
                         try:
                             async for final_chunk in self.provider.ask(
-                                messages=final_ask_messages
+                                messages=final_ask_messages, stream=stream
                             ):
                                 content = (
                                     final_chunk.content
@@ -534,10 +735,12 @@ class Conversation:
 
             # 更新历史记录
             if response_contents:
-                self.history.extend(user_input_messages)
-                if tool_response_messages:
-                    self.history.extend(tool_response_messages)
-                self.history.extend(response_messages)
+                self._extend_history(
+                    user_input_messages
+                    + self._truncate_tool_outputs(tool_response_messages)
+                    + response_messages
+                )
+                self._schedule_compaction()
 
         except Exception as e:
             logger.error(f"Error in process_message: {e}")
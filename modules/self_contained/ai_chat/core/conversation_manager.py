@@ -4,10 +4,14 @@
 
 import asyncio
 import json
+from collections.abc import AsyncGenerator
 from enum import Enum
+from functools import partial
 
 from loguru import logger
 
+from utils.conversation_store import ConversationStore, conversation_store
+
 from ..config import CONFIG_PATH
 from ..core.provider import BaseAIProvider, FileContent
 from .conversation import Conversation
@@ -55,8 +59,14 @@ class ConversationManager:
                 else:
                     return f"{group_id}-{member_id}"
 
-    def __init__(self, provider_factory, plugins_factory):
-        self.conversations: dict[str, Conversation] = {}
+    def __init__(
+        self,
+        provider_factory,
+        plugins_factory,
+        store: ConversationStore = conversation_store,
+    ):
+        # 内存中只保留最近使用的对话，闲置的对话换出到磁盘，下次使用时恢复
+        self.store = store
         self.provider_factory = provider_factory
         self.plugins_factory = plugins_factory
         self._configs = self._load_configs()
@@ -123,6 +133,7 @@ class ConversationManager:
         provider = self.provider_factory(conv_key.key)
         plugins = self.plugins_factory(conv_key.key)
         conversation = Conversation(provider, plugins)
+        conversation.hold = partial(self.store.hold, conv_key.key)
         preset_content = (
             preset_dict[preset]["content"]
             if preset in preset_dict
@@ -131,18 +142,35 @@ class ConversationManager:
         conversation.set_preset(preset_content)
         return conversation
 
-    def get_conversation(self, group_id: str, member_id: str) -> Conversation:
+    async def _find_conversation(
+        self, conv_key: ConversationKey
+    ) -> Conversation | None:
+        """获取已有的对话，不在内存中时从磁盘恢复"""
+
+        def restore(state: dict) -> Conversation:
+            conversation = Conversation.from_state(
+                state,
+                self.provider_factory(conv_key.key),
+                self.plugins_factory(conv_key.key),
+            )
+            conversation.hold = partial(self.store.hold, conv_key.key)
+            return conversation
+
+        return await self.store.get(conv_key.key, restore)
+
+    async def get_conversation(self, group_id: str, member_id: str) -> Conversation:
         """获取会话实例"""
         conv_key = self._get_conversation_key(group_id, member_id)
-        if conv_key.key not in self.conversations:
-            self.conversations[conv_key.key] = self._create_conversation(conv_key)
-        return self.conversations[conv_key.key]
+        conversation = await self._find_conversation(conv_key)
+        if conversation is None:
+            conversation = self._create_conversation(conv_key)
+            self.store.put(conv_key.key, conversation)
+        return conversation
 
     def remove_conversation(self, group_id: str, member_id: str):
         """移除会话实例"""
         conv_key = self._get_conversation_key(group_id, member_id)
-        if conv_key.key in self.conversations:
-            del self.conversations[conv_key.key]
+        if self.store.remove(conv_key.key):
             # 同时清理相关锁
             if conv_key.lock_key in self.locks:
                 del self.locks[conv_key.lock_key]
@@ -150,20 +178,21 @@ class ConversationManager:
                 del self.locks[f"group:{group_id}"]
             logger.info(f"已移除会话: {conv_key.key}")
 
-    def new(self, group_id: str, member_id: str, preset: str = "") -> Conversation:
+    async def new(
+        self, group_id: str, member_id: str, preset: str = ""
+    ) -> Conversation:
         """创建新的会话，如果已存在则中断旧会话并创建新会话"""
         conv_key = self._get_conversation_key(group_id, member_id)
-        # 若对话不存在，则直接创建新对话
-        if conv_key.key not in self.conversations:
+        # 若对话不在内存中(不会正在处理消息)，则直接创建新对话，覆盖磁盘上的旧对话
+        if self.store.peek(conv_key.key) is None:
             conversation = self._create_conversation(conv_key, preset)
-            self.conversations[conv_key.key] = conversation
+            self.store.put(conv_key.key, conversation)
             return conversation
 
         # 仅在对话存在时进行锁检查和中断逻辑
         if conv_key.lock_key in self.locks and self.locks[conv_key.lock_key].locked():
             logger.info("检测到当前会话未结束，打断并覆盖旧会话。")
-            if conv_key.key in self.conversations:
-                old_conversation = self.conversations[conv_key.key]
+            if old_conversation := self.store.peek(conv_key.key):
                 old_conversation.interrupt()  # 中断旧对话
                 self.remove_conversation(group_id, member_id)
             del self.locks[conv_key.lock_key]
@@ -174,8 +203,7 @@ class ConversationManager:
             and self.locks[f"group:{group_id}"].locked()
         ):
             logger.info("检测到群聊对话未结束，打断并覆盖旧群对话。")
-            if conv_key.key in self.conversations:
-                old_conversation = self.conversations[conv_key.key]
+            if old_conversation := self.store.peek(conv_key.key):
                 old_conversation.interrupt()  # 中断旧群对话
                 self.remove_conversation(group_id, member_id)
             del self.locks[f"group:{group_id}"]
@@ -186,86 +214,57 @@ class ConversationManager:
             del self.locks[f"group:{group_id}"]
 
         conversation = self._create_conversation(conv_key, preset)
-        self.conversations[conv_key.key] = conversation
-        self.clear_memory(group_id, member_id)
+        self.store.put(conv_key.key, conversation)
+        await self.clear_memory(group_id, member_id)
         return conversation
 
-    def set_user_custom_mode(
+    async def set_user_custom_mode(
         self, group_id: str, member_id: str, custom_provider: BaseAIProvider
     ):
         """设置用户自定义模式"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         conversation.set_custom_mode(custom_provider)
 
-    def switch_user_provider(
+    async def switch_user_provider(
         self, group_id: str, member_id: str, new_provider: BaseAIProvider
     ):
         """切换用户提供商"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         conversation.switch_provider(new_provider)
 
-    def set_preset(self, group_id: str, member_id: str, preset: str):
+    async def set_preset(self, group_id: str, member_id: str, preset: str):
         """设置会话预设"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         conversation.set_preset(preset)
 
-    def clear_preset(self, group_id: str, member_id: str):
+    async def clear_preset(self, group_id: str, member_id: str):
         """清除会话预设"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         conversation.clear_preset()
 
-    def get_preset(self, group_id: str, member_id: str) -> str:
+    async def get_preset(self, group_id: str, member_id: str) -> str:
         """获取当前会话预设内容"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         return conversation.preset or ""
 
-    def clear_memory(self, group_id: str, member_id: str):
+    async def clear_memory(self, group_id: str, member_id: str):
         """清除会话历史记录"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         conversation.clear_memory()
 
-    def get_total_usage(self, group_id: str, member_id: str) -> int:
+    async def get_total_usage(self, group_id: str, member_id: str) -> int:
         """获取当前对话消耗的总token数"""
         conv_key = self._get_conversation_key(group_id, member_id)
-        if conv_key.key in self.conversations:
-            return (
-                self.conversations[conv_key.key]
-                .provider.get_usage()
-                .get("total_tokens", 0)
-            )
+        if conversation := await self._find_conversation(conv_key):
+            return conversation.provider.get_usage().get("total_tokens", 0)
         return 0
 
-    async def __process_conversation(
-        self,
-        conversation: Conversation,
-        message: str,
-        files: list[FileContent] = None,
-        use_tool: bool = False,
-    ) -> str:
-        """处理会话消息并获取完整响应
-
-        Args:
-            conversation: 会话对象
-            message: 用户消息
-            files: 附加文件
-            use_tool: 是否使用工具
-
-        Returns:
-            str: 完整响应内容
-        """
-        response_chunks = []
-        async for chunk in conversation.process_message(
-            message, files, use_tool=use_tool
-        ):
-            response_chunks.append(chunk)
-        return "".join(response_chunks)
-
-    def get_round(self, group_id: str, member_id: str) -> int:
+    async def get_round(self, group_id: str, member_id: str) -> int:
         """获取当前会话轮数"""
-        conversation = self.get_conversation(group_id, member_id)
+        conversation = await self.get_conversation(group_id, member_id)
         return conversation.get_round()
 
-    def can_retry(self, group_id: str, member_id: str) -> tuple[bool, str]:
+    async def can_retry(self, group_id: str, member_id: str) -> tuple[bool, str]:
         """检查是否可以重试上一次对话
 
         Args:
@@ -276,7 +275,7 @@ class ConversationManager:
             Tuple[bool, str]: (是否可以重试, 成功/失败的原因)
         """
         try:
-            conversation = self.get_conversation(group_id, member_id)
+            conversation = await self.get_conversation(group_id, member_id)
             return conversation.can_retry()
         except Exception as e:
             logger.error(f"检查重试状态时出错: {str(e)}")
@@ -310,7 +309,7 @@ class ConversationManager:
             if not await conv_lock.acquire():
                 return "错误：正在处理上一条消息，请稍后再试。"
 
-            conversation = self.conversations.get(conv_key.key)
+            conversation = await self._find_conversation(conv_key)
             if not conversation:
                 return "错误：未找到有效的对话记录。"
 
@@ -324,11 +323,15 @@ class ConversationManager:
                 if group_lock.locked():
                     return "错误：正在处理群内其他消息，请稍后再试。"
                 async with group_lock:
+                    with self.store.hold(conv_key.key):
+                        return await conversation.retry_last_message(
+                            files, use_tool=use_tool
+                        )
+            else:
+                with self.store.hold(conv_key.key):
                     return await conversation.retry_last_message(
                         files, use_tool=use_tool
                     )
-            else:
-                return await conversation.retry_last_message(files, use_tool=use_tool)
         finally:
             if conv_lock.locked():
                 conv_lock.release()
@@ -355,37 +358,82 @@ class ConversationManager:
         Returns:
             str或None: 响应内容，如果出错则返回错误消息
         """
+        return "".join(
+            [
+                chunk
+                async for chunk in self.stream_message(
+                    group_id,
+                    member_id,
+                    member_name,
+                    message,
+                    files,
+                    use_tool=use_tool,
+                    stream=False,
+                )
+            ]
+        )
+
+    async def stream_message(
+        self,
+        group_id: str,
+        member_id: str,
+        member_name: str,
+        message: str,
+        files: list[FileContent] = None,
+        use_tool: bool = False,
+        stream: bool = True,
+    ) -> AsyncGenerator[str, None]:
+        """发送消息到会话并逐段获取响应，迭代结束前一直持有会话锁
+
+        Args:
+            group_id: 群组ID
+            member_id: 成员ID
+            member_name: 成员名称
+            message: 消息内容
+            files: 附加文件
+            use_tool: 是否使用工具
+            stream: 是否使用流式请求，启用时模型返回的文本片段会立即输出
+
+        Yields:
+            str: 响应内容片段，如果出错则输出错误消息
+        """
         conv_key = self._get_conversation_key(group_id, member_id)
         conv_lock = self.locks.setdefault(conv_key.lock_key, asyncio.Lock())
 
         if conv_lock.locked():
-            return "错误：正在处理上一条消息，请稍后再试。"
+            yield "错误：正在处理上一条消息，请稍后再试。"
+            return
 
         try:
             if not await conv_lock.acquire():
-                return "错误：正在处理上一条消息，请稍后再试。"
+                yield "错误：正在处理上一条消息，请稍后再试。"
+                return
             # 新增: 若首次对话（会话不存在），则通过 new() 创建新会话
-            if conv_key.key not in self.conversations:
-                conversation = self.new(group_id, member_id)
-            else:
-                conversation = self.conversations[conv_key.key]
+            conversation = await self._find_conversation(conv_key) or await self.new(
+                group_id, member_id
+            )
             if conv_key.is_shared:
                 group_lock = self.locks.setdefault(f"group:{group_id}", asyncio.Lock())
                 if group_lock.locked():
-                    return "错误：正在处理群内其他消息，请稍后再试。"
+                    yield "错误：正在处理群内其他消息，请稍后再试。"
+                    return
                 async with group_lock:
-                    return await self.__process_conversation(
-                        conversation, message, files, use_tool=use_tool
-                    )
+                    with self.store.hold(conv_key.key):
+                        async for chunk in conversation.process_message(
+                            message, files, use_tool=use_tool, stream=stream
+                        ):
+                            yield chunk
             else:
-                return await self.__process_conversation(
-                    conversation, message, files, use_tool=use_tool
-                )
+                with self.store.hold(conv_key.key):
+                    async for chunk in conversation.process_message(
+                        message, files, use_tool=use_tool, stream=stream
+                    ):
+                        yield chunk
         finally:
             if conv_lock.locked():
                 conv_lock.release()
 
-    def switch_conversation_model(
+    async def switch_conversation_model(
         self, group_id: str, member_id: str, model_name: str
     ) -> tuple[bool, str]:
         """
@@ -402,10 +450,10 @@ class ConversationManager:
         conv_key = self._get_conversation_key(group_id, member_id)
 
         # 检查会话是否存在
-        if conv_key.key not in self.conversations:
+        conversation = await self._find_conversation(conv_key)
+        if conversation is None:
             return False, "会话不存在，请先开始对话"
 
-        conversation = self.conversations[conv_key.key]
         current_provider = conversation.provider
 
         try:
@@ -434,3 +482,12 @@ class ConversationManager:
             error_msg = f"切换会话模型失败: {str(e)}"
             logger.error(error_msg)
             return False, error_msg
+
+    async def evict_idle(self) -> int:
+        """换出闲置的对话，并清理已不在内存中的对话的锁，返回换出的数量"""
+        evicted = await self.store.evict_idle()
+        for lock_key, lock in list(self.locks.items()):
+            # 锁的键为 user:会话密钥 或 group:群号(即共享会话的密钥)
+            if not lock.locked() and self.store.peek(lock_key.split(":", 1)[1]) is None:
+                del self.locks[lock_key]
+        return evicted
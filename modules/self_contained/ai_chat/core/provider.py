@@ -3,11 +3,22 @@ AI提供商抽象层
 定义统一的接口规范，方便扩展不同AI平台
 """
 
+import hashlib
+import json
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from enum import Enum
 from typing import Any
 from collections.abc import AsyncGenerator
 
+# 图片的token数估算值
+IMAGE_TOKENS = 1000
+# ask请求失败时返回的消息内容前缀
+API_ERROR_PREFIX = "与AI服务通信时发生错误"
+# {(编码, 消息内容哈希): token数}，历史消息每轮都会重新计算，按内容缓存
+_token_cache: OrderedDict[tuple[str, bytes], float] = OrderedDict()
+_TOKEN_CACHE_SIZE = 16384
+
 
 class FileType(Enum):
     """文件类型枚举"""
@@ -122,10 +133,52 @@ class BaseAIProvider(ABC):
     def set_total_tokens(self, total_tokens: int):
         pass
 
+    def set_usage(self, usage: dict):
+        """恢复资源使用情况，用于从磁盘恢复对话"""
+        for key in self.usage:
+            self.usage[key] = usage.get(key, 0)
+
+    @property
+    def token_encoding(self) -> str:
+        """计算token使用的编码，编码相同时token数相同，用作缓存键"""
+        return self.__class__.__name__
+
     @abstractmethod
+    def count_text_tokens(self, text: str) -> float:
+        """计算一段文本的token数"""
+        pass
+
+    def count_message_tokens(self, message: dict[str, Any]) -> float:
+        """计算一条消息的token数，按内容哈希缓存"""
+        content = message.get("content")
+        if not content:
+            return 0
+        if isinstance(content, str):
+            data = content.encode()
+        else:
+            data = json.dumps(content, sort_keys=True, ensure_ascii=False).encode()
+        key = (self.token_encoding, hashlib.blake2b(data, digest_size=16).digest())
+        if (tokens := _token_cache.get(key)) is not None:
+            _token_cache.move_to_end(key)
+            return tokens
+        if isinstance(content, str):
+            tokens = self.count_text_tokens(content)
+        else:  # 多模态内容
+            tokens = 0
+            for item in content:
+                if item.get("type") == "text":
+                    tokens += self.count_text_tokens(item.get("text", ""))
+                elif item.get("type") == "image_url":
+                    # 图片token估算（根据不同模型可能需要调整）
+                    tokens += IMAGE_TOKENS
+        _token_cache[key] = tokens
+        if len(_token_cache) > _TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+        return tokens
+
     def calculate_tokens(self, messages: list[dict[str, Any]]) -> int:
         """计算消息的token数"""
-        pass
+        return int(sum(self.count_message_tokens(message) for message in messages))
 
     def switch_model(self, model_name: str):
         """切换使用的模型"""
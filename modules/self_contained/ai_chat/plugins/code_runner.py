@@ -1,35 +1,21 @@
 import ast
-import asyncio
-import math
+from functools import partial
 from typing import Any
 
 from loguru import logger
 from pydantic import validator
-from RestrictedPython import compile_restricted
-from RestrictedPython.Eval import default_guarded_getitem
-from RestrictedPython.Guards import (
-    full_write_guard,
-    guarded_iter_unpack_sequence,
-    guarded_unpack_sequence,
-    safe_builtins,
-    safer_getattr,
-)
 
-# PrintCollector 用于收集用户代码中 print 的输出
-from RestrictedPython.PrintCollector import PrintCollector
-from RestrictedPython.Utilities import utility_builtins
+from utils.restricted_exec import build_safe_globals, run_restricted
+from utils.sandbox_pool import (
+    SandboxBusy,
+    SandboxCrashed,
+    SandboxTimeout,
+    sandbox_pool,
+)
 
 # 你的基础插件类和配置基类，如果不需要可删除/自行调整
 from ..core.plugin import BasePlugin, PluginConfig, PluginDescription
 
-# 尝试导入resource模块，Windows平台通常不支持
-try:
-    import resource
-
-    RESOURCE_AVAILABLE = True
-except ImportError:
-    RESOURCE_AVAILABLE = False
-
 
 class CodeRunnerConfig(PluginConfig):
     """代码执行插件配置类
@@ -43,8 +29,10 @@ class CodeRunnerConfig(PluginConfig):
     """
 
     # 基本执行限制
-    timeout: int = 5  # 执行超时时间(秒)
+    timeout: int = 5  # 执行超时时间(秒)，同时也是CPU时间上限
     max_code_length: int = 5000  # 最大代码长度(字符)
+    # 单次执行可以新分配的虚拟内存(MB)，numpy等库会预留较多地址空间，不宜过小
+    memory_limit: int = 256
 
     # 允许导入的模块白名单
     allowed_modules: frozenset[str] = frozenset(
@@ -243,87 +231,12 @@ class CodeRunner(BasePlugin):
 
     def __init__(self, config: CodeRunnerConfig):
         super().__init__(config)
-        self._active_tasks = 0
-        self._async_depth = 0
-
-        # 定义安全的导入函数
-        def safe_import(name, *args, **kwargs):
-            if name not in self.config.allowed_modules:
-                root_module = name.split(".")[0]
-                if root_module not in self.config.allowed_modules:
-                    raise ImportError(f"模块 '{name}' 不在允许列表中")
-            return __import__(name, *args, **kwargs)
-
-        # 将安全导入函数加入到内置函数中
-        safe_builtins_with_import = dict(safe_builtins)
-        safe_builtins_with_import["__import__"] = safe_import
-
-        collected_output = []
-
-        class MyPrintCollector(PrintCollector):
-            def __init__(self, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self.printed = collected_output
-
-            def _call_print(self, *values):
-                self.printed.append(" ".join(map(str, values)))
-
-        safe_builtins_with_import["_print_"] = MyPrintCollector
-
-        # 配置安全环境
-        def _inplacevar_(op, x, y):
-            """处理就地运算符，如 +=, -=, *=, /= 等"""
-            if op == "+=":
-                return x + y
-            elif op == "-=":
-                return x - y
-            elif op == "*=":
-                return x * y
-            elif op == "/=":
-                return x / y
-            elif op == "//=":
-                return x // y
-            elif op == "%=":
-                return x % y
-            elif op == "**=":
-                return x**y
-            elif op == "<<=":
-                return x << y
-            elif op == ">>=":
-                return x >> y
-            elif op == "&=":
-                return x & y
-            elif op == "^=":
-                return x ^ y
-            elif op == "|=":
-                return x | y
-            raise NotImplementedError(f"不支持的就地运算符: {op}")
-
-        # 在 globals 中启用 PrintCollector，用于捕获 print 输出
-        self.safe_globals = {
-            "__builtins__": safe_builtins_with_import,  # 使用包含 __import__ 的内置函数
-            "_getattr_": safer_getattr,
-            "_getitem_": default_guarded_getitem,
-            "_iter_unpack_sequence_": guarded_iter_unpack_sequence,
-            "_unpack_sequence_": guarded_unpack_sequence,
-            "_getiter_": iter,  # 基本迭代器控制
-            "_write_": full_write_guard,  # 写入操作控制
-            "_inplacevar_": _inplacevar_,  # 就地运算符支持
-            "math": math,
-            "_print_": PrintCollector,  # 关键：允许 print 收集
-            **utility_builtins,
-        }
 
-        # 预加载允许的模块到安全环境
+        # 移除无法导入的模块，代码在沙箱子进程中执行
         temp_allowed_modules = list(self.config.allowed_modules)
         for mod_name in temp_allowed_modules[:]:
             try:
-                module = __import__(mod_name)
-                # 存储完整模块
-                self.safe_globals[mod_name] = module
-                # 处理常用的模块别名
-                if mod_name == "numpy":
-                    self.safe_globals["np"] = module
+                __import__(mod_name)
             except ImportError:
                 logger.warning(f"模块 '{mod_name}' 无法导入，将从允许列表中移除")
                 temp_allowed_modules.remove(mod_name)
@@ -476,100 +389,43 @@ class CodeRunner(BasePlugin):
                         f"普通函数嵌套深度超过限制({self.config.max_function_depth})"
                     )
 
-    async def _run_with_async_limits(self, coro):
-        """运行异步代码并实施限制。"""
-        if self._active_tasks >= self.config.max_async_tasks:
-            raise RuntimeError(f"并发异步任务数超过限制({self.config.max_async_tasks})")
-
-        self._active_tasks += 1
-        try:
-            return await asyncio.wait_for(coro, timeout=self.config.async_timeout)
-        finally:
-            self._active_tasks -= 1
-
     async def execute(self, parameters: dict[str, Any]) -> str | None:
         """执行Python代码。"""
         code = parameters.get("code", "").strip()
         if not code:
             return "错误：请提供要执行的代码"
 
-        timeout = float(parameters.get("timeout", self.config.timeout))
+        # 超时后会杀死执行的子进程，不允许超过配置的时间
+        timeout = min(
+            float(parameters.get("timeout", self.config.timeout)),
+            self.config.timeout,
+        )
 
         try:
             self._validate_code(code)
 
-            # 创建执行环境（注意：要 copy 一份，避免多次调用间互相影响）
-            env = self.safe_globals.copy()
-
-            # 编译受限字节码
-            compiled_code = compile_restricted(
-                code, filename="<user_code>", mode="exec"
-            )
-
-            # 设置资源限制（仅在支持的平台上生效）
-            if RESOURCE_AVAILABLE:
-                try:
-                    # 限制CPU时间
-                    resource.setrlimit(resource.RLIMIT_CPU, (timeout, timeout))
-                    # 限制内存使用，例如限制为100MB
-                    resource.setrlimit(
-                        resource.RLIMIT_AS, (100 * 1024 * 1024, 100 * 1024 * 1024)
-                    )
-                except Exception:
-                    pass
-            else:
-                # 对于不支持resource的系统（如Windows），可酌情处理
-                pass
-
-            # 添加异步运行需要的安全函数
-            env.update(
-                {
-                    "asyncio": asyncio,
-                    "_run_with_async_limits": self._run_with_async_limits,
-                }
-            )
-
-            # 通过线程池方式执行受限字节码
-            await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(
-                    None, lambda: exec(compiled_code, env)
-                ),
+            # 在沙箱子进程中执行，超时、超出CPU时间或内存限制不会影响bot本身
+            return await sandbox_pool.run(
+                run_restricted,
+                code,
+                frozenset(self.config.allowed_modules),
+                self.config.max_async_tasks,
+                self.config.async_timeout,
                 timeout=timeout,
+                memory=self.config.memory_limit * 1024 * 1024,
             )
 
-            # 获取 MyPrintCollector 输出
-            collector = env.get("_print_")
-            captured_output = (
-                "\n".join(collector.printed)
-                if collector and hasattr(collector, "printed")
-                else ""
-            )
-
-            # 获取最后一个有效变量的值
-            last_value = None
-            # env.keys() 至少包含我们注入的安全环境键
-            # 如果用户代码中有新变量，可以尝试获取
-            if len(env) > 0:
-                last_var = list(env.keys())[-1]
-                last_value = env[last_var]
-
-            # 根据是否有输出、是否有最后值组合返回
-            if captured_output and last_value is not None:
-                return f"{captured_output}\n计算结果: {last_value}"
-            elif captured_output:
-                return captured_output
-            elif last_value is not None:
-                if isinstance(last_value, str):
-                    return f"计算结果: '{last_value}'"
-                elif isinstance(last_value, PrintCollector) and hasattr(
-                    last_value, "txt"
-                ):
-                    return f"输出结果: {''.join(last_value.txt)}"
-                return f"变量结果: {last_value}"
-            else:
-                return "无输出结果"
-
-        except asyncio.TimeoutError:
+        except SandboxBusy:
+            return "错误：当前执行代码的请求过多，请稍后再试"
+        except SandboxTimeout:
             return f"错误：代码执行超时(>{timeout}秒)"
+        except SandboxCrashed as e:
+            return f"错误：代码执行被终止，{e}"
         except Exception as e:
             return f"错误：{str(e)}"
+
+
+# 沙箱子进程启动时预先导入默认允许的模块
+sandbox_pool.add_warm_up(
+    partial(build_safe_globals, frozenset(CodeRunnerConfig().allowed_modules))
+)
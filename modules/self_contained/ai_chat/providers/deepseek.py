@@ -1,5 +1,3 @@
-from typing import Any
-
 from ..core.provider import ModelConfig
 from .openai_compatible import OpenAICompatibleConfig, OpenAICompatibleProvider
 
@@ -67,33 +65,19 @@ class DeepSeekProvider(OpenAICompatibleProvider):
             model_name = config.default_model
         super().__init__(config, model_name)
 
-    def calculate_tokens(self, messages: list[dict[str, Any]]) -> int:
-        """计算消息的token数
+    @property
+    def token_encoding(self) -> str:
+        return "deepseek"
+
+    def count_text_tokens(self, text: str) -> float:
+        """计算文本的token数
         这里只是根据官方文档的提示，简单估算了一下。
         1 个英文字符 ≈ 0.3 个 token。
         1 个中文字符 ≈ 0.6 个 token。
         """
-        total_tokens = 0
-        for message in messages:
-            content = message.get("content", "")
-            if isinstance(content, str):
-                english_chars = sum(bool(char.isascii()) for char in content)
-                chinese_chars = len(content) - english_chars
-                total_tokens += english_chars * 0.3 + chinese_chars * 0.6
-            elif isinstance(content, list):
-                # 处理多模态内容
-                for item in content:
-                    if item.get("type") == "text":
-                        text_content = item.get("text", "")
-                        english_chars = sum(
-                            bool(char.isascii()) for char in text_content
-                        )
-                        chinese_chars = len(text_content) - english_chars
-                        total_tokens += english_chars * 0.3 + chinese_chars * 0.6
-                    # 图片大致估算，每张图片约1000 tokens
-                    elif item.get("type") == "image_url":
-                        total_tokens += 1000
-        return int(total_tokens)
+        english_chars = sum(bool(char.isascii()) for char in text)
+        chinese_chars = len(text) - english_chars
+        return english_chars * 0.3 + chinese_chars * 0.6
 
     def get_available_models(self) -> list[str]:
         """获取DeepSeek可用的模型列表"""
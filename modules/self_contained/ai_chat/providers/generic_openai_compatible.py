@@ -1,5 +1,3 @@
-from typing import Any
-
 from ..core.provider import ModelConfig
 from .openai_compatible import OpenAICompatibleConfig, OpenAICompatibleProvider
 
@@ -45,10 +43,6 @@ class GenericOpenAICompatibleProvider(OpenAICompatibleProvider):
         super().__init__(config, model_name)
         self.config = config  # 使用具体的配置类型
 
-    def calculate_tokens(self, messages: list[dict[str, Any]]) -> int:
-        # 直接使用父类的实现
-        return super().calculate_tokens(messages)
-
     def get_available_models(self) -> list[str]:
         """获取可用的模型列表"""
         return list(self.config.models.keys()) if self.config.models else []
@@ -1,5 +1,3 @@
-from typing import Any
-
 import tiktoken
 
 from ..core.provider import ModelConfig
@@ -97,21 +95,12 @@ class OpenAIProvider(OpenAICompatibleProvider):
         super().switch_model(model_name)
         self._setup_encoder()
 
-    def calculate_tokens(self, messages: list[dict[str, Any]]) -> int:
-        token_count = 0
-        for message in messages:
-            content = message.get("content", "")
-            if isinstance(content, str):
-                token_count += len(self.encoder.encode(content))
-            elif isinstance(content, list):
-                # 处理多模态内容
-                for item in content:
-                    if item.get("type") == "text":
-                        token_count += len(self.encoder.encode(item.get("text", "")))
-                    # 图片大致估算，每张图片约1000 tokens
-                    elif item.get("type") == "image_url":
-                        token_count += 1000
-        return token_count
+    @property
+    def token_encoding(self) -> str:
+        return self.encoder.name
+
+    def count_text_tokens(self, text: str) -> float:
+        return len(self.encoder.encode(text, disallowed_special=()))
 
     def get_available_models(self) -> list[str]:
         """获取OpenAI可用的模型列表"""
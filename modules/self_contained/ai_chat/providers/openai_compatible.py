@@ -1,15 +1,16 @@
 import base64
-from abc import abstractmethod
+from functools import lru_cache
 from typing import Any
 from collections.abc import AsyncGenerator
 
 from loguru import logger
 from openai import AsyncOpenAI
 from openai.types import CompletionUsage
-from openai.types.chat import ChatCompletionMessage
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
 from openai.types.chat.chat_completion_chunk import ChoiceDelta
 
 from ..core.provider import (
+    API_ERROR_PREFIX,
     BaseAIProvider,
     FileContent,
     FileType,
@@ -18,6 +19,18 @@ from ..core.provider import (
 )
 
 
+@lru_cache
+def get_encoding(name: str):
+    """获取tiktoken编码器，每种编码只加载一次，加载失败时返回None"""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"Token编码器{name}加载失败，使用字符长度估算: {str(e)}")
+        return None
+
+
 class OpenAICompatibleConfig(ProviderConfig):
     """OpenAI 接口兼容的配置基类"""
 
@@ -133,42 +146,28 @@ class OpenAICompatibleProvider(BaseAIProvider):
                 mapped_data[key] = response_data[value]
         return mapped_data
 
-    @abstractmethod
-    def calculate_tokens(self, messages: list[dict[str, Any]]) -> int:
-        """使用配置的编码器和乘数因子估算token数量"""
-        try:
-            import tiktoken
-
-            encoding = tiktoken.get_encoding(self.config.token_encoding)
-            total_tokens = 0
-
-            for message in messages:
-                content = message.get("content", "")
-                if isinstance(content, str):
-                    tokens = len(encoding.encode(content))
-                elif isinstance(content, list):  # 多模态内容
-                    for item in content:
-                        if item.get("type") == "text":
-                            tokens = len(encoding.encode(item.get("text", "")))
-                            total_tokens += tokens
-                        elif item.get("type") == "image_url":
-                            # 图片token估算（根据不同模型可能需要调整）
-                            total_tokens += 1000  # 默认估算值
-                else:
-                    continue
-
-                total_tokens += tokens
+    @property
+    def token_encoding(self) -> str:
+        return f"{self.config.token_encoding}*{self.config.token_multiplier}"
 
-            # 应用配置的乘数因子
-            return int(total_tokens * self.config.token_multiplier)
-        except Exception as e:
-            logger.warning(f"Token计算失败，使用字符长度估算: {str(e)}")
+    def count_text_tokens(self, text: str) -> float:
+        """使用配置的编码器和乘数因子估算token数量"""
+        encoding = get_encoding(self.config.token_encoding)
+        if encoding is None:
             # 降级方案：使用字符长度粗略估算
-            return sum(len(str(msg.get("content", ""))) for msg in messages)
+            return len(text)
+        # 用户输入中可能包含特殊token的文本，按普通文本计算
+        tokens = len(encoding.encode(text, disallowed_special=()))
+        return tokens * self.config.token_multiplier
 
     def set_total_tokens(self, total_tokens: int):
         self.usage.total_tokens = total_tokens
 
+    def set_usage(self, usage: dict):
+        self.usage.completion_tokens = usage.get("completion_tokens", 0)
+        self.usage.prompt_tokens = usage.get("prompt_tokens", 0)
+        self.usage.total_tokens = usage.get("total_tokens", 0)
+
     def get_usage(self) -> dict[str, int]:
         return self.usage.dict()
 
@@ -293,34 +292,65 @@ class OpenAICompatibleProvider(BaseAIProvider):
                 tools=tools,
                 max_tokens=self.model_config.max_tokens,
                 temperature=kwargs.get("temperature", 1.3),
-                stream=False if use_tools else stream,
+                stream=stream,
                 response_format=self.config.response_format
                 if self.config.supports_json_mode
                 else None,
             )
+            if stream:
+                # 流式输出默认不返回用量，需要请求在最后一个片段中附带
+                request_params["stream_options"] = {"include_usage": True}
 
             try:
                 # 发送请求
                 response = await self.client.chat.completions.create(**request_params)
 
-                if use_tools:
+                if stream:
+                    # 文本片段直接输出；工具调用分多个片段返回，按index拼接后作为完整消息输出
+                    tool_calls: dict[int, dict] = {}
+                    async for chunk in response:
+                        if chunk.usage:
+                            self.update_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        for tool_call in (delta.tool_calls or []) if use_tools else []:
+                            call = tool_calls.setdefault(
+                                tool_call.index,
+                                {
+                                    "id": "",
+                                    "type": "function",
+                                    "function": {"name": "", "arguments": ""},
+                                },
+                            )
+                            call["id"] = tool_call.id or call["id"]
+                            if tool_call.function:
+                                call["function"]["name"] += (
+                                    tool_call.function.name or ""
+                                )
+                                call["function"]["arguments"] += (
+                                    tool_call.function.arguments or ""
+                                )
+                        if delta.content:
+                            yield delta
+                    if tool_calls:
+                        yield ChatCompletionMessage(
+                            role="assistant",
+                            tool_calls=[
+                                ChatCompletionMessageToolCall(**call)
+                                for _, call in sorted(tool_calls.items())
+                            ],
+                        )
+                else:
                     self.update_usage(response.usage)
                     yield response.choices[0].message
-                else:
-                    if stream:
-                        async for chunk in response:
-                            if chunk.choices[0].delta.content:
-                                yield chunk.choices[0].delta
-                    else:
-                        self.update_usage(response.usage)
-                        yield response.choices[0].message
 
             except Exception as e:
                 error_message = f"{self.__class__.__name__} API error: {str(e)}"
                 logger.error(error_message)
                 yield ChatCompletionMessage(
                     role="assistant",
-                    content=f"与AI服务通信时发生错误: {str(e)}",
+                    content=f"{API_ERROR_PREFIX}: {str(e)}",
                 )
 
         except Exception as e:
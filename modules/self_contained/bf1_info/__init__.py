@@ -59,6 +59,7 @@ from utils.bf1.bf_utils import (
 )
 from utils.bf1.data_handle import ServerData, VehicleData, WeaponData
 from utils.bf1.database import BF1DB
+from utils.bf1.database.sync import SERVER_SYNC, SyncStats
 from utils.bf1.default_account import BF1DA
 from utils.bf1.draw import (
     Exchange,
@@ -69,6 +70,7 @@ from utils.bf1.draw import (
 )
 from utils.bf1.gateway_api import api_instance
 from utils.bf1.map_team_info import MapData
+from utils.render_cache import render_cache
 
 config = create(GlobalConfig)
 core = create(Umaru)
@@ -1746,6 +1748,13 @@ async def detailed_server(
     return await app.send_message(group, MessageChain(result), quote=source)
 
 
+# 清理图片临时文件和过期的渲染缓存，每30分钟执行一次
+@channel.use(SchedulerSchema(timers.every_custom_minutes(30)))
+async def render_temp_clean():
+    removed = await render_cache.clean()
+    logger.debug(f"已清理{removed}个图片临时文件，渲染缓存: {render_cache.stats()}")
+
+
 # 定时服务器详细信息收集，每60分钟执行一次
 @channel.use(SchedulerSchema(timers.every_custom_minutes(60)))
 async def server_info_collect():
@@ -1754,6 +1763,7 @@ async def server_info_collect():
 
 async def update_server_info():
     time_start = time.time()
+    stats = SyncStats()
     filter_dict = {
         "name": "",  # 服务器名
         "serverType": {  # 服务器类型
@@ -1769,7 +1779,8 @@ async def update_server_info():
         for _ in range(50)
     ]
     logger.debug("开始更新私服数据")
-    results = await asyncio.gather(*tasks)
+    with stats.phase("search"):
+        results = await asyncio.gather(*tasks)
     for result in results:
         if isinstance(result, str):
             continue
@@ -1781,46 +1792,29 @@ async def update_server_info():
     logger.success(f"共获取{len(game_id_list)}个私服")
 
     #   获取详细信息
-    #   每250个私服分为一组获取详细信息
-    tasks = []
-    results = []
-    for game_id in game_id_list:
-        tasks.append((await BF1DA.get_api_instance()).getFullServerDetails(game_id))
-        if len(tasks) == 250:
-            logger.debug(f"开始获取私服详细信息，共{len(tasks)}个")
-            temp = await asyncio.gather(*tasks)
-            results.extend(temp)
-            tasks = []
-    if tasks:
-        logger.debug(f"开始获取私服详细信息，共{len(tasks)}个")
-        temp = await asyncio.gather(*tasks)
-        results.extend(temp)
+    #   并发数由bf1_api按网关延迟自适应限制，不再手动分组
+    api = await BF1DA.get_api_instance()
+    logger.debug(f"开始获取私服详细信息，共{len(game_id_list)}个")
+    with stats.phase("details"):
+        results = await asyncio.gather(
+            *[api.getFullServerDetails(game_id) for game_id in game_id_list]
+        )
 
     results = [result for result in results if not isinstance(result, str)]
     logger.success(f"共获取{len(results)}个私服详细信息")
 
     #   整理数据
-    serverId_list = []
-    server_info_list: list[tuple[str, str, str, int, datetime, datetime, datetime]] = []
-    vip_dict = {}
-    ban_dict = {}
-    admin_dict = {}
-    owner_dict = {}
+    servers = []
+    player_records = []
+    lists = {"vip": {}, "ban": {}, "admin": {}, "owner": {}}
+    now = datetime.now()
     for result in results:
         server = result["result"]
         rspInfo = server.get("rspInfo", {})
         Info = server["serverInfo"]
         if not rspInfo:
             continue
-        server_name = Info["name"]
-        server_server_id = rspInfo.get("server", {}).get("serverId")
-        server_guid = Info["guid"]
-        server_game_id = Info["gameId"]
-        serverBookmarkCount = Info["serverBookmarkCount"]
-        playerCurrent = Info["slots"]["Soldier"]["current"]
-        playerMax = Info["slots"]["Soldier"]["max"]
-        playerQueue = Info["slots"]["Queue"]["current"]
-        playerSpectator = Info["slots"]["Spectator"]["current"]
+        server_server_id = int(rspInfo.get("server", {}).get("serverId"))
         # mapName = Info["mapName"]
         # mapNamePretty = Info["mapNamePretty"]
         # mapMode = Info["mapMode"]
@@ -1833,48 +1827,41 @@ async def update_server_info():
         expirationDate = datetime.fromtimestamp(int(expirationDate) / 1000)
         updatedDate = rspInfo.get("server", {}).get("updatedDate")
         updatedDate = datetime.fromtimestamp(int(updatedDate) / 1000)
-        server_info_list.append(
-            (
-                server_name,
-                server_server_id,
-                server_guid,
-                server_game_id,
-                serverBookmarkCount,
-                createdDate,
-                expirationDate,
-                updatedDate,
-                playerCurrent,
-                playerMax,
-                playerQueue,
-                playerSpectator,
-            )
+        servers.append(
+            {
+                "serverName": Info["name"],
+                "serverId": server_server_id,
+                "persistedGameId": Info["guid"],
+                "gameId": Info["gameId"],
+                "createdDate": createdDate,
+                "expirationDate": expirationDate,
+                "updatedDate": updatedDate,
+            }
         )
-        serverId_list.append(server_server_id)
-        vip_dict[server_server_id] = rspInfo.get("vipList", [])
-        ban_dict[server_server_id] = rspInfo.get("bannedList", [])
-        admin_dict[server_server_id] = rspInfo.get("adminList", [])
+        player_records.append(
+            {
+                "serverId": server_server_id,
+                "playerCurrent": Info["slots"]["Soldier"]["current"],
+                "playerMax": Info["slots"]["Soldier"]["max"],
+                "playerQueue": Info["slots"]["Queue"]["current"],
+                "playerSpectator": Info["slots"]["Spectator"]["current"],
+                "time": now,
+                "serverBookmarkCount": Info["serverBookmarkCount"],
+            }
+        )
+        lists["vip"][server_server_id] = rspInfo.get("vipList", [])
+        lists["ban"][server_server_id] = rspInfo.get("bannedList", [])
+        lists["admin"][server_server_id] = rspInfo.get("adminList", [])
         if owner := rspInfo.get("owner"):
-            owner_dict[server_server_id] = [owner]
+            lists["owner"][server_server_id] = [owner]
 
-    #   保存数据
-    start_time = time.time()
-    await BF1DB.server.update_serverInfoList(server_info_list)
-    logger.debug(f"更新服务器信息完成，耗时{round(time.time() - start_time, 2)}秒")
-    start_time = time.time()
-    await BF1DB.server.update_serverVipList(vip_dict)
-    logger.debug(f"更新服务器VIP完成，耗时{round(time.time() - start_time, 2)}秒")
-    start_time = time.time()
-    await BF1DB.server.update_serverBanList(ban_dict)
-    logger.debug(f"更新服务器封禁完成，耗时{round(time.time() - start_time, 2)}秒")
-    await BF1DB.server.update_serverAdminList(admin_dict)
-    start_time = time.time()
-    logger.debug(f"更新服务器管理员完成，耗时{round(time.time() - start_time, 2)}秒")
-    await BF1DB.server.update_serverOwnerList(owner_dict)
-    logger.debug(f"更新服务器所有者完成，耗时{round(time.time() - start_time, 2)}秒")
+    #   保存数据，只写入有变化的部分
+    stats = await SERVER_SYNC.sync(servers, player_records, lists, stats)
     logger.success(
-        f"共更新{len(serverId_list)}个私服详细信息，耗时{round(time.time() - time_start, 2)}秒"
+        f"共更新{stats.servers_fetched}个私服详细信息，其中{stats.servers_unchanged}个无变化，"
+        f"写入{stats.rows_written}行，耗时{round(time.time() - time_start, 2)}秒"
     )
-    return len(serverId_list)
+    return stats.servers_fetched
 
 
 # 手动指令更新
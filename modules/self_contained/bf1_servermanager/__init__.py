@@ -1796,7 +1796,10 @@ async def relogin_blaze(app: Ariadne, group: Group, source: Source):
         )
     # 重新初始化blaze socket
     blaze_socket = await BF1BlazeManager.init_socket(
-        gateway_instance.pid, gateway_instance.remid, gateway_instance.sid
+        gateway_instance.pid,
+        gateway_instance.remid,
+        gateway_instance.sid,
+        relogin=True,
     )
     if not blaze_socket:
         return await app.send_message(
@@ -3475,8 +3478,10 @@ async def kick_all(
         server_info["account"]
     )
 
-    # 获取玩家列表
-    playerlist_data = await BF1BlazeManager.get_player_list(game_ids=server_gameid)
+    # 获取玩家列表，清服需要最新的列表，不使用缓存
+    playerlist_data = await BF1BlazeManager.get_player_list(
+        game_ids=server_gameid, use_cache=False
+    )
     if playerlist_data is None:
         return await app.send_message(
             group, MessageChain("Blaze后端查询出错!"), quote=source
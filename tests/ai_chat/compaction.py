@@ -0,0 +1,264 @@
+"""
+AI对话上下文压缩测试：用假的提供商驱动process_message，检查
+- 上下文超过预算的compact_ratio后在后台压缩，之后的请求带上总结，预设始终是第一条
+- 保留窗口的选择：最多keep_turns轮、不超过窗口预算、至少保留最后一轮，只有一轮时不压缩
+- 压缩期间对话不会被换出，总结随对话写入磁盘
+- 总结失败时按轮丢弃最早的对话，不拆开工具调用和结果
+- 写入历史记录的工具输出被截断，本轮回复使用完整输出
+
+在项目根目录下运行:
+    python tests/ai_chat/compaction.py
+"""
+
+import asyncio
+import sys
+import tempfile
+import types
+from functools import partial
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# ai_chat包的__init__需要在bot中加载，这里只导入core
+for _name in ("modules", "modules.self_contained", "modules.self_contained.ai_chat"):
+    _package = types.ModuleType(_name)
+    _package.__path__ = [str(ROOT.joinpath(*_name.split(".")))]
+    sys.modules[_name] = _package
+
+from loguru import logger  # noqa: E402
+from openai.types.chat import (  # noqa: E402
+    ChatCompletionMessage,
+    ChatCompletionMessageToolCall,
+)
+
+from modules.self_contained.ai_chat.core.conversation import Conversation  # noqa: E402
+from modules.self_contained.ai_chat.core.plugin import (  # noqa: E402
+    BasePlugin,
+    PluginConfig,
+    PluginDescription,
+)
+from modules.self_contained.ai_chat.core.provider import (  # noqa: E402
+    API_ERROR_PREFIX,
+    BaseAIProvider,
+    ModelConfig,
+    ProviderConfig,
+)
+from utils.conversation_store import ConversationStore  # noqa: E402
+
+SUMMARY_MARK = "请按照以下规则总结"
+
+
+class FakeProvider(BaseAIProvider):
+    """每个字符算一个token；回复固定长度的文本，总结请求返回summary"""
+
+    def __init__(self, config: ProviderConfig, summary: str = "SUMMARY"):
+        super().__init__(config)
+        self.summary = summary
+        self.summary_delay = 0.0
+        self.requests: list[list[dict]] = []
+        self.tool_calls: list | None = None
+
+    async def ask(self, messages, files=None, tools=None, **kwargs):
+        self.requests.append(messages)
+        if SUMMARY_MARK in str(messages[-1].get("content")):
+            await asyncio.sleep(self.summary_delay)
+            yield ChatCompletionMessage(role="assistant", content=self.summary)
+        elif tools and self.tool_calls:
+            tool_calls, self.tool_calls = self.tool_calls, None
+            yield ChatCompletionMessage(
+                role="assistant", content="", tool_calls=tool_calls
+            )
+        else:
+            yield ChatCompletionMessage(role="assistant", content="r" * 100)
+
+    def get_usage(self) -> dict:
+        return self.usage
+
+    def reset_usage(self):
+        pass
+
+    def set_total_tokens(self, total_tokens: int):
+        pass
+
+    def count_text_tokens(self, text: str) -> float:
+        return len(text)
+
+    def get_available_models(self) -> list[str]:
+        return [self.model_name]
+
+
+class EchoConfig(PluginConfig):
+    @property
+    def required_fields(self) -> set[str]:
+        return set()
+
+
+class EchoPlugin(BasePlugin):
+    @property
+    def description(self) -> PluginDescription:
+        return PluginDescription(
+            name="echo", description="返回很长的文本", parameters={}, example=""
+        )
+
+    async def execute(self, parameters: dict) -> str:
+        return "t" * 5000
+
+
+def make_provider(summary: str = "SUMMARY", max_total: int = 2000) -> FakeProvider:
+    config = ProviderConfig(
+        default_model="m",
+        models={
+            "m": ModelConfig(
+                name="m",
+                max_total_tokens=max_total,
+                max_tokens=500,
+                supports_tool_calls=True,
+            )
+        },
+    )
+    return FakeProvider(config, summary)
+
+
+def make_conversation(provider: FakeProvider, plugins=()) -> Conversation:
+    return Conversation(provider, list(plugins))
+
+
+def turn(text: str, size: int) -> list[dict]:
+    return [
+        {"role": "user", "content": text * size},
+        {"role": "assistant", "content": text.upper() * size},
+    ]
+
+
+async def ask(conversation: Conversation, text: str, use_tool: bool = False) -> str:
+    return "".join(
+        [chunk async for chunk in conversation.process_message(text, use_tool=use_tool)]
+    )
+
+
+async def check_background_compaction():
+    provider = make_provider()
+    conversation = make_conversation(provider)
+    conversation.set_preset("PRESET")
+    for i in range(8):
+        assert await ask(conversation, f"q{i}" + "x" * 98) == "r" * 100
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    assert conversation.compactions >= 1 and conversation.summary == "SUMMARY"
+    assert conversation.tokens_saved > 0
+    assert conversation.context_tokens <= conversation._context_budget()
+    assert all(request[0]["content"] == "PRESET" for request in provider.requests)
+    replies = [r for r in provider.requests if SUMMARY_MARK not in r[-1]["content"]]
+    assert replies[-1][1]["content"].startswith("之前对话的总结")
+    # 增量的token数与重新计算一致
+    assert conversation.history_tokens == provider.calculate_tokens(
+        conversation.history
+    )
+
+
+def check_cut_selection():
+    conversation = make_conversation(make_provider())
+    # 窗口预算 = (2000 - 500) * 0.3 = 450
+    # 默认保留最近4轮
+    assert conversation._compaction_cut(turn("a", 10) * 6) == 4
+    conversation.keep_turns = 2
+    assert conversation._compaction_cut(turn("a", 10) * 6) == 8
+    conversation.keep_turns = 4
+    # 较长的轮次超出窗口预算，只保留能放下的最近几轮
+    history = turn("a", 10) * 2 + turn("b", 100) + turn("c", 150)
+    assert conversation._compaction_cut(history) == 6
+    # 最后一轮本身超出窗口时也保留
+    history = turn("a", 10) + turn("b", 500)
+    assert conversation._compaction_cut(history) == 2
+    # 只有一轮，或者最早的一轮之前只有时间信息时不压缩
+    assert conversation._compaction_cut(turn("a", 10)) == 0
+    time_message = {"role": "system", "content": "time"}
+    assert conversation._compaction_cut([time_message] + turn("a", 10)) == 0
+
+
+async def check_hold_during_compaction():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = ConversationStore(Path(temp_dir) / "c.db", max_hot=1)
+        await store.open()
+        provider = make_provider()
+        provider.summary_delay = 0.1
+        conversation = make_conversation(provider)
+        conversation.hold = partial(store.hold, "a")
+        store.put("a", conversation)
+        # 超过compact_ratio但不超过预算，只在回复后触发后台压缩
+        conversation._extend_history(turn("u", 150) * 4)
+        await ask(conversation, "q")
+        assert conversation._compaction_task is not None
+        # 压缩期间放入新对话，被压缩的对话不会被换出
+        store.put("b", make_conversation(make_provider()))
+        assert store.peek("a") is conversation
+        await conversation._compaction_task
+        assert conversation.summary == "SUMMARY" and not store.holding
+        await store.flush()
+        restored = await store.get(
+            "a", lambda state: Conversation.from_state(state, make_provider(), [])
+        )
+        assert restored.summary == "SUMMARY" and restored.compactions == 1
+        store.close()
+
+
+async def check_drop_turns():
+    # 总结失败时按轮丢弃，工具调用和结果一起丢弃
+    provider = make_provider(summary=f"{API_ERROR_PREFIX}: timeout")
+    conversation = make_conversation(provider)
+    tool_turn = [
+        {"role": "user", "content": "u" * 300},
+        {"role": "assistant", "content": "", "tool_calls": []},
+        {"role": "tool", "content": "t" * 300, "tool_call_id": "1"},
+        {"role": "assistant", "content": "a" * 300},
+    ]
+    conversation._extend_history(tool_turn + turn("v", 300))
+    await conversation._ensure_context_budget(700)
+    assert conversation.summary is None
+    assert conversation.history == turn("v", 300)
+    assert conversation.context_tokens + 700 <= conversation._context_budget()
+    # 只剩一轮也放不下时全部丢弃
+    await conversation._ensure_context_budget(1400)
+    assert conversation.history == []
+
+
+async def check_tool_output_truncation():
+    provider = make_provider()
+    provider.tool_calls = [
+        ChatCompletionMessageToolCall(
+            id="call_1", type="function", function={"name": "echo", "arguments": "{}"}
+        )
+    ]
+    conversation = make_conversation(provider, [EchoPlugin(EchoConfig())])
+    assert await ask(conversation, "q", use_tool=True) == "r" * 100
+    # 本轮回复使用完整的工具输出
+    assert provider.requests[-1][-1]["content"] == "t" * 5000
+    # 跳过新的小时添加的时间信息
+    history = [msg for msg in conversation.history if msg["role"] != "system"]
+    assert [msg["role"] for msg in history] == [
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+    ]
+    tool_output = history[2]["content"]
+    assert tool_output.startswith("t" * conversation.tool_output_limit)
+    assert len(tool_output) < conversation.tool_output_limit + 20
+    assert conversation.history_tokens == provider.calculate_tokens(
+        conversation.history
+    )
+
+
+async def main() -> None:
+    logger.remove()
+    await check_background_compaction()
+    check_cut_selection()
+    await check_hold_during_compaction()
+    await check_drop_turns()
+    await check_tool_output_truncation()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
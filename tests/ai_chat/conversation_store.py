@@ -0,0 +1,112 @@
+"""
+AI对话存储测试：在临时目录中检查
+- 超过内存上限时换出最久未使用的对话，再次获取时从换出的状态恢复
+- 正在处理消息(hold中)的对话不会被换出
+- 闲置的对话写入磁盘，重启(新实例)后可以恢复
+- 删除和新建对话会覆盖磁盘上的旧对话，过旧的记录被删除
+
+在项目根目录下运行:
+    python tests/ai_chat/conversation_store.py
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from utils.conversation_store import ConversationStore  # noqa: E402
+
+
+class FakeConversation:
+    """只有历史记录的对话"""
+
+    def __init__(self, history: list[dict]):
+        self.history = history
+
+    def to_state(self) -> dict:
+        return {"history": self.history}
+
+    def memory_size(self) -> int:
+        return sum(sys.getsizeof(msg["content"]) for msg in self.history)
+
+
+def restore(state: dict) -> FakeConversation:
+    return FakeConversation(state["history"])
+
+
+def make(text: str) -> FakeConversation:
+    return FakeConversation([{"role": "user", "content": text}])
+
+
+async def main() -> None:
+    logger.remove()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "conversations.db"
+        store = ConversationStore(path, max_hot=2, idle_ttl=0.1)
+        await store.open()
+
+        assert await store.get("a", restore) is None
+        store.put("a", make("a"))
+        store.put("b", make("b"))
+        assert store.stats()["stored"] == 0
+        assert (await store.get("a", restore)).history[0]["content"] == "a"
+
+        # 超过上限时换出最久未使用的b，再次获取时恢复，此时a被换出
+        store.put("c", make("c"))
+        assert store.peek("b") is None and store.evictions == 1
+        b = await store.get("b", restore)
+        assert b.history == [{"role": "user", "content": "b"}]
+        assert store.peek("a") is None and store.rehydrations == 1
+
+        # hold中的对话不会被换出，超出的部分在hold结束后的下次插入时换出
+        with store.hold("b"), store.hold("c"):
+            store.put("d", make("d"))
+            assert store.peek("b") is b and store.peek("c") is not None
+            assert len(store.hot) == 3
+            await asyncio.sleep(0.15)
+            assert await store.evict_idle() == 1 and store.peek("d") is None
+        b.history.append({"role": "assistant", "content": "b2"})
+
+        # 闲置的对话写入磁盘，新实例可以恢复
+        await asyncio.sleep(0.15)
+        assert await store.evict_idle() == 2 and not store.hot and not store.pending
+        assert store.stats()["stored"] == 4
+        # 内存中的记录大小与磁盘上一致
+        assert store.stats()["stored_bytes"] == sum(store._read_sizes().values())
+        store.close()
+        store = ConversationStore(path, max_hot=2)
+        await store.open()
+        assert store.stats()["stored"] == 4
+        # 两个协程同时从磁盘恢复同一个对话时得到同一个对象
+        d1, d2 = await asyncio.gather(store.get("d", restore), store.get("d", restore))
+        assert d1 is d2 and store.rehydrations == 1
+        assert (await store.get("b", restore)).history[-1]["content"] == "b2"
+        assert store.stats()["memory"] > 0
+
+        # 删除的对话和新建的对话覆盖磁盘上的旧对话
+        store.remove("a")
+        store.put("c", make("c2"))
+        await store.flush()
+        store.close()
+        store = ConversationStore(path, max_hot=2, max_age=0.1)
+        await store.open()
+        assert await store.get("a", restore) is None
+        assert (await store.get("c", restore)).history[0]["content"] == "c2"
+        assert store.stats()["stored"] == 3
+
+        # 过旧的记录被删除
+        time.sleep(0.15)
+        await store.evict_idle()
+        assert store.stats()["stored"] == 0 and store.stats()["stored_bytes"] == 0
+        print(store.stats())
+        store.close()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+流式回复切分测试：检查
+- 段落累计达到字数后在空行处切分，未达到时继续累积
+- 代码块单独成为一条消息，代码块中的空行不切分
+- 距上次发出超过时间阈值时，段落结束即发出
+- 超过单条上限时在换行处强制切分，切分结果拼接后与原文一致
+- 在代码块中强制切分时关闭代码块，下一条消息用相同的语言重新打开
+
+在项目根目录下运行:
+    python tests/ai_chat/reply_chunker.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.reply_chunker import ReplyChunker  # noqa: E402
+
+
+def feed_all(chunker: ReplyChunker, text: str, seed: int = 0) -> list[str]:
+    """按随机长度的片段输入，模拟模型的流式输出"""
+    rng = random.Random(seed)
+    messages = []
+    index = 0
+    while index < len(text):
+        size = rng.randint(1, 8)
+        messages += chunker.feed(text[index : index + size])
+        index += size
+    return messages + chunker.finish()
+
+
+def is_balanced(message: str) -> bool:
+    """代码块的开始和结束成对出现"""
+    fences = [line for line in message.split("\n") if line.startswith("```")]
+    return len(fences) % 2 == 0
+
+
+def strip_fences(text: str) -> str:
+    """去掉代码块标记和换行，只比较内容"""
+    lines = text.split("\n")
+    return "".join(line for line in lines if not line.startswith("```"))
+
+
+def main() -> None:
+    short = "第一段。\n\n第二段。\n\n"
+    long = "a" * 30 + "\n\n" + "b" * 30 + "\n\n" + "c" * 5
+    code = "介绍如下：\n\n```python\ndef f():\n\n    return 1\n```\n说明。"
+
+    # 未达到字数时不切分
+    chunker = ReplyChunker(min_chars=100, interval=60)
+    assert feed_all(chunker, short) == ["第一段。\n\n第二段。"]
+
+    # 达到字数后在空行处切分
+    chunker = ReplyChunker(min_chars=20, interval=60)
+    assert feed_all(chunker, long) == ["a" * 30, "b" * 30, "c" * 5]
+
+    # 代码块单独成为一条消息，代码块中的空行不切分
+    chunker = ReplyChunker(min_chars=1, interval=60)
+    assert feed_all(chunker, code) == [
+        "介绍如下：",
+        "```python\ndef f():\n\n    return 1\n```",
+        "说明。",
+    ]
+
+    # 超过时间阈值时段落结束即发出
+    chunker = ReplyChunker(min_chars=100, interval=0.05)
+    assert chunker.feed("第一段。\n") == []
+    time.sleep(0.06)
+    assert chunker.feed("\n第二段") == ["第一段。"]
+    assert chunker.finish() == ["第二段"]
+
+    # 超过单条上限时在换行处切分，内容不丢失
+    text = "".join(f"第{i}行内容\n" for i in range(200)) + "```\n" + "x" * 500
+    chunker = ReplyChunker(min_chars=10**6, max_chars=300, interval=60)
+    messages = feed_all(chunker, text, seed=1)
+    assert all(len(message) <= 300 for message in messages)
+    assert all(is_balanced(message) for message in messages)
+    assert strip_fences("\n".join(messages)) == strip_fences(text)
+    print(f"切分为{len(messages)}条")
+
+    # 代码块中切分时每条消息都是完整的代码块
+    text = (
+        "代码：\n\n```python\n" + "".join(f"print({i})\n" for i in range(40)) + "```\n"
+    )
+    chunker = ReplyChunker(min_chars=1, max_chars=80, interval=60)
+    messages = feed_all(chunker, text, seed=2)
+    assert messages[0] == "代码：" and len(messages) > 3
+    for message in messages[1:]:
+        assert len(message) <= 80, message
+        assert message.startswith("```python\n") and message.endswith("\n```")
+        assert is_balanced(message)
+    assert strip_fences("\n".join(messages)) == strip_fences(text)
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+沙箱进程池测试(tests/ai_chat/sandbox_pool.py)在子进程中执行的函数
+
+沙箱子进程不导入__main__，所以这些函数放在单独的可导入模块中。
+"""
+
+import os
+import sys
+import time
+
+
+def square(x: int) -> tuple[int, int]:
+    return os.getpid(), x * x
+
+
+def fail():
+    raise ValueError("出错了")
+
+
+def exit_now():
+    sys.exit(1)
+
+
+def spin():
+    while True:
+        pass
+
+
+def allocate(size: int) -> int:
+    return len(bytearray(size))
+
+
+def sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def fd_open(fd: int) -> bool:
+    """文件描述符在子进程中是否存在"""
+    try:
+        os.fstat(fd)
+    except OSError:
+        return False
+    return True
+
+
+def main_defines(name: str) -> bool:
+    """子进程的__main__中是否定义了name"""
+    return hasattr(sys.modules["__main__"], name)
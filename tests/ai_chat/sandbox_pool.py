@@ -0,0 +1,110 @@
+"""
+沙箱进程池测试：检查
+- 任务在子进程中执行，返回结果和异常，统计CPU时间和内存峰值
+- 超时的任务被强制杀死，子进程被替换后可以继续执行
+- 超出CPU时间的任务被终止，超出内存限制时抛出MemoryError，bot进程本身不受限制
+- 执行一定数量的任务后替换子进程
+- 排队的任务已满时直接拒绝
+- 子进程不继承bot进程的文件描述符，也不导入bot的__main__
+
+在项目根目录下运行:
+    python tests/ai_chat/sandbox_pool.py
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+from sandbox_jobs import (  # noqa: E402
+    allocate,
+    exit_now,
+    fail,
+    fd_open,
+    main_defines,
+    sleep,
+    spin,
+    square,
+)
+
+from utils.sandbox_pool import (  # noqa: E402
+    SandboxBusy,
+    SandboxCrashed,
+    SandboxError,
+    SandboxPool,
+    SandboxTimeout,
+)
+
+
+async def expect(exception: type[Exception], coro):
+    try:
+        await coro
+    except exception as e:
+        return e
+    raise AssertionError(f"没有抛出{exception.__name__}")
+
+
+async def main() -> None:
+    logger.remove()
+    pool = SandboxPool(workers=1, max_queue=1, max_jobs=3)
+    # 模拟bot进程中已经打开的连接
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    await pool.start()
+    try:
+        pid, result = await pool.run(square, 7, timeout=5)
+        assert result == 49 and pid != os.getpid()
+        await expect(ValueError, pool.run(fail, timeout=5))
+        await expect(SandboxError, pool.run(exit_now, timeout=5))
+
+        # 执行3个任务后替换子进程
+        new_pid, _ = await pool.run(square, 1, timeout=5)
+        assert new_pid != pid and pool.recycles == 1
+
+        # 超时的任务被杀死，之后可以继续执行
+        start = time.perf_counter()
+        await expect(SandboxTimeout, pool.run(spin, timeout=0.5, cpu_time=10))
+        assert time.perf_counter() - start < 2
+        assert (await pool.run(square, 3, timeout=5))[1] == 9
+
+        if sys.platform == "linux":
+            # 超出CPU时间限制的任务被终止
+            error = await expect(SandboxCrashed, pool.run(spin, timeout=10, cpu_time=1))
+            assert "CPU" in str(error)
+            # 超出内存限制时分配失败，限制之内正常执行
+            size = 64 * 1024 * 1024
+            await expect(
+                MemoryError, pool.run(allocate, size * 4, timeout=5, memory=size)
+            )
+            assert await pool.run(allocate, size, timeout=5, memory=size * 2) == size
+            assert pool.max_rss >= size
+            # bot进程本身不受限制
+            assert len(bytearray(size * 4)) == size * 4
+
+        # 一个任务执行、一个任务排队时，第三个任务被拒绝
+        tasks = [asyncio.create_task(pool.run(sleep, 0.3, timeout=5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        await expect(SandboxBusy, pool.run(sleep, 0.3, timeout=5))
+        assert await asyncio.gather(*tasks) == [0.3, 0.3]
+
+        # 子进程不继承bot进程的连接，也没有重新导入这个脚本
+        if sys.platform != "win32":
+            assert not await pool.run(fd_open, listener.fileno(), timeout=5)
+        assert not await pool.run(main_defines, "expect", timeout=5)
+
+        stats = pool.stats()
+        print(stats)
+        assert stats["alive"] == 1 and stats["rejected"] == 1 and stats["timeouts"] == 1
+    finally:
+        await pool.close()
+        listener.close()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
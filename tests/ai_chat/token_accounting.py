@@ -0,0 +1,160 @@
+"""
+AI对话token计数测试：增量维护的历史记录token数在以下操作后与完整重新计算的结果一致
+- 通过process_message追加对话，以及重复内容命中token缓存
+- 按轮丢弃最早的对话(截断)
+- 压缩历史记录
+- 切换编码(模型/提供商)后重新计算
+token数带小数(乘数因子)时，逐条取整与整体取整的差异也会被发现
+
+在项目根目录下运行:
+    python tests/ai_chat/token_accounting.py
+"""
+
+import asyncio
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# ai_chat包的__init__需要在bot中加载，这里只导入core
+for _name in ("modules", "modules.self_contained", "modules.self_contained.ai_chat"):
+    _package = types.ModuleType(_name)
+    _package.__path__ = [str(ROOT.joinpath(*_name.split(".")))]
+    sys.modules[_name] = _package
+
+from loguru import logger  # noqa: E402
+from openai.types.chat import ChatCompletionMessage  # noqa: E402
+
+from modules.self_contained.ai_chat.core import provider as provider_module  # noqa: E402
+from modules.self_contained.ai_chat.core.conversation import Conversation  # noqa: E402
+from modules.self_contained.ai_chat.core.provider import (  # noqa: E402
+    API_ERROR_PREFIX,
+    BaseAIProvider,
+    ModelConfig,
+    ProviderConfig,
+)
+
+
+class FakeProvider(BaseAIProvider):
+    """每个字符算multiplier个token；总结请求返回固定的总结，其他请求回复固定长度的文本"""
+
+    def __init__(self, config: ProviderConfig, multiplier: float = 0.7):
+        super().__init__(config)
+        self.multiplier = multiplier
+        self.counted = 0
+        self.summary_error = False
+
+    @property
+    def token_encoding(self) -> str:
+        return f"fake*{self.multiplier}"
+
+    async def ask(self, messages, files=None, tools=None, **kwargs):
+        if "请按照以下规则总结" in str(messages[-1].get("content")):
+            summary = f"{API_ERROR_PREFIX}: 超时" if self.summary_error else "SUMMARY"
+            yield ChatCompletionMessage(role="assistant", content=summary)
+        else:
+            yield ChatCompletionMessage(role="assistant", content="回复" * 37)
+
+    def get_usage(self) -> dict:
+        return self.usage
+
+    def reset_usage(self):
+        pass
+
+    def set_total_tokens(self, total_tokens: int):
+        pass
+
+    def count_text_tokens(self, text: str) -> float:
+        self.counted += 1
+        return len(text) * self.multiplier
+
+    def get_available_models(self) -> list[str]:
+        return [self.model_name]
+
+
+def recount(conversation: Conversation) -> int:
+    """不使用缓存，完整重新计算历史记录的token数"""
+    provider_module._token_cache.clear()
+    return conversation.provider.calculate_tokens(conversation.history)
+
+
+def check(conversation: Conversation, step: str):
+    tokens = conversation.history_tokens
+    expected = recount(conversation)
+    assert tokens == expected, f"{step}: 增量{tokens} != 重新计算{expected}"
+
+
+async def ask(conversation: Conversation, text: str):
+    async for _ in conversation.process_message(text):
+        pass
+
+
+async def main() -> None:
+    logger.remove()
+    config = ProviderConfig(
+        default_model="m",
+        models={"m": ModelConfig(name="m", max_total_tokens=2000, max_tokens=500)},
+    )
+    provider = FakeProvider(config)
+    conversation = Conversation(provider, [])
+    conversation.set_preset("PRESET")
+
+    # 追加对话，长度为奇数的消息使每条的token数都带小数
+    for i in range(5):
+        await ask(conversation, f"问题{i}" + "x" * (2 * i + 1))
+        check(conversation, f"第{i + 1}轮")
+    # 重复的内容命中缓存，不重新计算
+    counted = provider.counted
+    conversation._extend_history([dict(conversation.history[-1])])
+    assert provider.counted == counted
+    check(conversation, "重复内容")
+    # 多模态内容
+    conversation._extend_history(
+        [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "看图" * 5},
+                    {"type": "image_url", "image_url": {"url": "data:,"}},
+                ],
+            }
+        ]
+    )
+    check(conversation, "多模态")
+
+    # 总结失败时按轮丢弃最早的对话
+    provider.summary_error = True
+    turns = len([msg for msg in conversation.history if msg["role"] == "user"])
+    await conversation._ensure_context_budget(
+        conversation._context_budget() - conversation.history_tokens // 2
+    )
+    assert conversation.summary is None
+    assert len([msg for msg in conversation.history if msg["role"] == "user"]) < turns
+    check(conversation, "截断")
+    provider.summary_error = False
+
+    # 压缩后只保留最近keep_turns轮
+    for i in range(6):
+        conversation._extend_history(
+            [
+                {"role": "user", "content": f"长问题{i}" * 20},
+                {"role": "assistant", "content": f"长回答{i}" * 20},
+            ]
+        )
+    assert await conversation.compact() > 0 and conversation.summary == "SUMMARY"
+    check(conversation, "压缩")
+    await ask(conversation, "压缩之后")
+    check(conversation, "压缩后追加")
+
+    # 切换编码后重新计算，之后继续增量计算
+    provider.multiplier = 1.3
+    check(conversation, "切换编码")
+    await ask(conversation, "切换之后" + "y" * 7)
+    check(conversation, "切换后追加")
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
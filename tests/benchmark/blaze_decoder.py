@@ -0,0 +1,58 @@
+"""
+Blaze解码器性能测试：对比 Blaze.decode 与 BlazeDecoder.decode 解码
+getGameDataFromId(1个/4个64人服)回复的耗时和内存分配
+
+在项目根目录下运行(需先生成语料 tests/blaze/make_corpus.py):
+    python tests/benchmark/blaze_decoder.py
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.bf1.blaze.Blaze import Blaze  # noqa: E402
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder  # noqa: E402
+
+CORPUS_DIR = Path(__file__).resolve().parents[1] / "blaze" / "corpus"
+ROUNDS = 200
+
+DECODERS = {
+    "Blaze.decode": lambda packet: Blaze(packet).decode(True),
+    "BlazeDecoder": lambda packet: BlazeDecoder.decode(packet, readable=True),
+    "BlazeDecoder(compact)": lambda packet: BlazeDecoder.decode(packet, compact=True),
+}
+
+
+def measure(decode, packet: bytes) -> tuple[float, int]:
+    """返回单次解码耗时(毫秒)和单次解码的内存分配峰值(字节)"""
+    decode(packet)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        decode(packet)
+    elapsed = (time.perf_counter() - start) / ROUNDS * 1000
+    tracemalloc.start()
+    decode(packet)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    for name in ("game_data_1x64", "game_data_4x64"):
+        packet = (CORPUS_DIR / f"{name}.bin").read_bytes()
+        print(f"{name} ({len(packet)} bytes):")
+        baseline = None
+        for decoder_name, decode in DECODERS.items():
+            elapsed, peak = measure(decode, packet)
+            baseline = baseline or elapsed
+            print(
+                f"  {decoder_name:<22} {elapsed:7.3f} ms  "
+                f"x{baseline / elapsed:4.1f}  峰值内存 {peak / 1024:7.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
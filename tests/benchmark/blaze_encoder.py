@@ -0,0 +1,77 @@
+"""
+Blaze编码器性能测试：对比 Blaze.encode 与 BlazeEncoder.encode 的吞吐量
+- 不同数量gameId的 getGameDataFromId 玩家列表查询
+- 64人服的 getGameDataFromId 回复(结构体较多)
+
+在项目根目录下运行(需先生成语料 tests/blaze/make_corpus.py):
+    python tests/benchmark/blaze_encoder.py
+"""
+
+import ast
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.bf1.blaze.Blaze import Blaze  # noqa: E402
+from utils.bf1.blaze.BlazeEncoder import BlazeEncoder  # noqa: E402
+
+CORPUS_DIR = Path(__file__).resolve().parents[1] / "blaze" / "corpus"
+
+
+def player_list_query(count: int) -> dict:
+    return {
+        "method": "GameManager.getGameDataFromId",
+        "type": "Command",
+        "id": 1,
+        "data": {
+            "DNAM 1": "csFullGameList",
+            "GLST 40": [7_000_000_000_000 + i for i in range(count)],
+        },
+    }
+
+
+def drop_float(data: dict) -> dict:
+    """原编码器不支持Float(类型10)，去掉这类字段"""
+    result = {}
+    for key, value in data.items():
+        if key[5:] == "10":
+            continue
+        if key[5:7] == "43":
+            value = [drop_float(item) for item in value]
+        result[key] = value
+    return result
+
+
+def throughput(encode, packet: dict, seconds: float = 0.5) -> tuple[float, float]:
+    """返回每秒编码次数和每秒编码字节数(MB)"""
+    size = len(encode(packet))
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        encode(packet)
+        count += 1
+    return count / elapsed, count * size / elapsed / 1e6
+
+
+def main() -> None:
+    encoder = BlazeEncoder()
+    packets = {
+        f"GLST x{count}": player_list_query(count) for count in (1, 10, 100, 1000)
+    }
+    golden = (CORPUS_DIR / "game_data_4x64.txt").read_text("utf-8")
+    packet = ast.literal_eval(golden)["raw"]
+    packets["GDAT 4x64"] = {**packet, "data": drop_float(packet["data"])}
+    for name, packet in packets.items():
+        assert encoder.encode(packet) == Blaze(packet).encode()
+        legacy, _ = throughput(lambda p: Blaze(p).encode(), packet)
+        ops, mbps = throughput(encoder.encode, packet)
+        print(
+            f"{name:<12} Blaze.encode {legacy:9.0f}/s  "
+            f"BlazeEncoder {ops:9.0f}/s ({mbps:6.1f} MB/s)  x{ops / legacy:4.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+批量写入性能测试：对比原生upsert与逐条查询后插入/更新的VIP列表写入耗时
+
+在项目根目录下运行(需要 config/config.yaml):
+    python tests/benchmark/bulk_upsert.py
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import (  # noqa: E402
+    BIGINT,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    UniqueConstraint,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.orm import declarative_base  # noqa: E402
+
+from core.orm import AsyncORM  # noqa: E402
+
+Base = declarative_base()
+
+
+class BenchServerVip(Base):
+    """与Bf1ServerVip字段相同，额外带有 (serverId, personaId) 唯一约束"""
+
+    __tablename__ = "bench_server_vip"
+    __table_args__ = (UniqueConstraint("serverId", "personaId"),)
+
+    id = Column(Integer, primary_key=True)
+    serverId = Column(BIGINT)
+    personaId = Column(BIGINT)
+    displayName = Column(String)
+    expire_time = Column(DateTime)
+    valid = Column(Integer)
+    time = Column(DateTime)
+
+
+def build_rows(server_count: int, vip_count: int) -> tuple[list, list]:
+    """构造合成的VIP数据"""
+    now = time.time()
+    data_list, conditions_list = [], []
+    for server_index in range(server_count):
+        server_id = 10000000 + server_index
+        for vip_index in range(vip_count):
+            persona_id = 1000000000 + vip_index
+            data_list.append(
+                {
+                    "displayName": f"player{vip_index}",
+                    "expire_time": None,
+                    "valid": random.randint(0, 1),
+                    "time": None,
+                }
+            )
+            conditions_list.append(
+                (
+                    BenchServerVip.serverId == server_id,
+                    BenchServerVip.personaId == persona_id,
+                )
+            )
+    print(f"构造{len(data_list)}条数据耗时{time.time() - now:.3f}秒")
+    return data_list, conditions_list
+
+
+async def legacy_upsert(orm: AsyncORM, data_list, conditions_list):
+    """旧的逐条查询后插入或更新"""
+    stmts = []
+    for data, condition in zip(data_list, conditions_list):
+        exist = (await orm.execute(select(BenchServerVip).where(*condition))).all()
+        if exist:
+            stmts.append(update(BenchServerVip).where(*condition).values(**data))
+        else:
+            values = {
+                **data,
+                **{clause.left.key: clause.right.value for clause in condition},
+            }
+            stmts.append(insert(BenchServerVip).values(**values))
+    await orm.execute_all(stmts)
+
+
+async def timed(name: str, orm: AsyncORM, coro) -> float:
+    start = time.perf_counter()
+    await coro
+    cost = time.perf_counter() - start
+    count = (await orm.fetch_one(select(func.count()).select_from(BenchServerVip)))[0]
+    print(f"{name}: 耗时{cost:.3f}秒, 表内{count}条")
+    return cost
+
+
+async def performance_test(
+    server_count: int = 100, vip_count: int = 500, legacy_count: int = 5000
+) -> None:
+    temp_dir = tempfile.TemporaryDirectory()
+    orm = AsyncORM(f"sqlite+aiosqlite:///{temp_dir.name}/bench.db")
+    async with orm.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    orm.start_writer()
+    data_list, conditions_list = build_rows(server_count, vip_count)
+
+    # 原生upsert：首次全部插入，再次全部更新
+    insert_cost = await timed(
+        "原生upsert(插入)",
+        orm,
+        orm.insert_or_update_batch(BenchServerVip, data_list, conditions_list),
+    )
+    update_cost = await timed(
+        "原生upsert(更新)",
+        orm,
+        orm.insert_or_update_batch(BenchServerVip, data_list, conditions_list),
+    )
+
+    # 旧逻辑耗时较长，只取部分数据后按比例估算
+    await orm.execute(delete(BenchServerVip))
+    legacy_data, legacy_conditions = (
+        data_list[:legacy_count],
+        conditions_list[:legacy_count],
+    )
+    legacy_insert = await timed(
+        f"逐条写入(插入{legacy_count}条)",
+        orm,
+        legacy_upsert(orm, legacy_data, legacy_conditions),
+    )
+    legacy_update = await timed(
+        f"逐条写入(更新{legacy_count}条)",
+        orm,
+        legacy_upsert(orm, legacy_data, legacy_conditions),
+    )
+    scale = len(data_list) / legacy_count
+    print(f"插入加速比(估算): {legacy_insert * scale / insert_cost:.1f}x")
+    print(f"更新加速比(估算): {legacy_update * scale / update_cost:.1f}x")
+    print(f"写队列统计: {orm.stats()}")
+    await orm.close()
+    temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(performance_test())
@@ -0,0 +1,94 @@
+"""
+战绩/武器/载具图的单张渲染耗时：对比每次渲染前清空字体、模板和图片缓存(相当于没有缓存时)
+与缓存已预热时的平均耗时，数据与 render_stall.py 相同
+
+在项目根目录下运行(需要完整的 data/battlefield 模板和字体):
+    python tests/benchmark/card_render.py
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from tests.benchmark.render_stall import make_card, start_server  # noqa: E402
+from utils.bf1.draw import (  # noqa: E402
+    PlayerVehiclePic,
+    PlayerWeaponPic,
+    _load_font,
+)
+from utils.bf1.draw.asset_cache import _decode_template, image_cache  # noqa: E402
+from utils.http_session import shared_http_session  # noqa: E402
+
+ROUNDS = 10
+
+
+def clear_caches():
+    _load_font.cache_clear()
+    _decode_template.cache_clear()
+    image_cache.clear()
+
+
+def measure(card, cold: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        if cold:
+            clear_caches()
+        card.render()
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def main() -> None:
+    logger.remove()
+    runner, base_url = await start_server()
+    stat_card = make_card(0, base_url)
+    weapon_card = PlayerWeaponPic(
+        player_name=stat_card.player_name,
+        player_pid=stat_card.player_pid,
+        personas=stat_card.personas,
+        stat=stat_card.stat,
+        weapons=stat_card.weapons["result"][0]["weapons"],
+        server_playing_info=stat_card.server_playing_info,
+        skin_info=stat_card.skin_info,
+        gt_id_info=None,
+    )
+    vehicle_card = PlayerVehiclePic(
+        player_name=stat_card.player_name,
+        player_pid=stat_card.player_pid,
+        personas=stat_card.personas,
+        stat=stat_card.stat,
+        vehicles=[
+            dict(vehicle, sortOrder="12")
+            for vehicle in stat_card.vehicles["result"][0]["vehicles"]
+        ],
+        server_playing_info=stat_card.server_playing_info,
+        skin_info=stat_card.skin_info,
+        gt_id_info=None,
+    )
+    await stat_card.prefetch()
+    await weapon_card.prefetch(2, 6)
+    await vehicle_card.prefetch(2, 6)
+    await runner.cleanup()
+    await shared_http_session.close()
+
+    for name, card in (
+        ("战绩", stat_card),
+        ("武器", weapon_card),
+        ("载具", vehicle_card),
+    ):
+        cold = measure(card, cold=True)
+        card.render()
+        warm = measure(card, cold=False)
+        print(
+            f"{name}: 无缓存 {cold * 1000:.1f}ms, 有缓存 {warm * 1000:.1f}ms, "
+            f"减少 {(1 - warm / cold) * 100:.0f}%"
+        )
+    print(image_cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
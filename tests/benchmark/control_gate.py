@@ -0,0 +1,156 @@
+"""
+判断链性能测试：对比逐个Depend的判断链与Gate组合判断的单条消息开销
+
+在项目根目录下运行(需要 config/config.yaml):
+    python tests/benchmark/control_gate.py
+"""
+
+import asyncio
+import contextlib
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from creart import create  # noqa: E402
+
+from core.config import GlobalConfig  # noqa: E402
+
+# 使用临时数据库，避免污染正式数据
+_temp_dir = tempfile.TemporaryDirectory()
+create(GlobalConfig).db_link = f"sqlite+aiosqlite:///{_temp_dir.name}/bench.db"
+
+from graia.ariadne.event.message import GroupMessage  # noqa: E402
+from graia.ariadne.message.chain import MessageChain  # noqa: E402
+from graia.ariadne.message.element import Source  # noqa: E402
+from graia.ariadne.model import Group, Member, MemberPerm  # noqa: E402
+from graia.broadcast import ExecutionStop  # noqa: E402
+from graia.saya import Channel, Saya  # noqa: E402
+
+from core.control import (  # noqa: E402
+    FrequencyLimitation,
+    Function,
+    Gate,
+    Permission,
+)
+from core.models import saya_model  # noqa: E402
+from core.orm import orm  # noqa: E402
+
+MODULE_NAME = "modules.required.status"
+
+
+class FakeApp:
+    """只记录发送次数的假bot"""
+
+    account = 0
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, *args, **kwargs):
+        self.sent += 1
+
+
+def build_events(group_count: int, member_count: int) -> list[GroupMessage]:
+    """构造合成的群消息事件"""
+    events = []
+    for group_index in range(group_count):
+        group = Group(
+            id=10000 + group_index,
+            name=f"测试群{group_index}",
+            permission=MemberPerm.Member,
+        )
+        for member_index in range(member_count):
+            member = Member(
+                id=20000 + member_index,
+                memberName=f"成员{member_index}",
+                permission=MemberPerm.Member,
+                group=group,
+            )
+            events.append(
+                GroupMessage(
+                    messageChain=MessageChain(
+                        Source(id=member_index, time=datetime.now()), "-bot"
+                    ),
+                    sender=member,
+                )
+            )
+    return events
+
+
+async def legacy_chain(app, event: GroupMessage):
+    """与逐个Depend相同的判断顺序，每一步独立获取数据"""
+    source = event.message_chain.get_first(Source)
+    await Function.check(app, event.sender.group, source, MODULE_NAME, True)
+    await FrequencyLimitation.check(
+        app, event, source, MODULE_NAME, 0, 12, Permission.GroupAdmin
+    )
+    await Permission.group_check(app, event, source, Permission.ActiveGroup, False)
+    await Permission.user_check(app, event, source, Permission.User, True)
+
+
+async def gate_chain(app, event: GroupMessage, module_meta):
+    source = event.message_chain.get_first(Source)
+    await Gate.check(
+        app,
+        event,
+        source,
+        MODULE_NAME,
+        module_meta,
+        Permission.ActiveGroup,
+        Permission.User,
+        distribute=False,
+        weight=0,
+    )
+
+
+async def run(name: str, chain, events, iterations: int) -> float:
+    stopped = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for event in events:
+            try:
+                await chain(event)
+            except ExecutionStop:
+                stopped += 1
+    cost = time.perf_counter() - start
+    count = len(events) * iterations
+    print(
+        f"{name}: {count}条消息, 总耗时{cost:.3f}秒, "
+        f"平均{cost / count * 1e6:.1f}微秒/条, 被拦截{stopped}条"
+    )
+    return cost
+
+
+async def performance_test(
+    group_count: int = 20, member_count: int = 50, iterations: int = 5
+) -> None:
+    await orm.create_all()
+    # 注册一个假的插件频道，使Function判断认为插件已安装
+    saya = create(Saya)
+    saya.channels[MODULE_NAME] = Channel(MODULE_NAME)
+    module_controller = saya_model.get_module_controller()
+    # 不保存插件开关数据，避免写入合成的群
+    module_controller.save = lambda *args, **kwargs: None
+    module_meta = module_controller.get_metadata_from_module_name(MODULE_NAME)
+    app = FakeApp()
+    events = build_events(group_count, member_count)
+
+    # 预热：写入初始权限、加载缓存
+    for event in events:
+        with contextlib.suppress(ExecutionStop):
+            await legacy_chain(app, event)
+
+    legacy = await run("逐个判断", lambda e: legacy_chain(app, e), events, iterations)
+    gate = await run(
+        "组合判断", lambda e: gate_chain(app, e, module_meta), events, iterations
+    )
+    print(f"加速比: {legacy / gate:.2f}x")
+    saya.channels.pop(MODULE_NAME, None)
+
+
+if __name__ == "__main__":
+    asyncio.run(performance_test())
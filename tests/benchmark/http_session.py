@@ -0,0 +1,116 @@
+"""
+连接池性能测试：对比每个账号各自创建session与所有账号共用连接池时，
+10个账号轮流发出100次顺序请求的TLS握手次数和延迟
+
+在项目根目录下运行(需要 openssl 命令):
+    python tests/benchmark/http_session.py
+"""
+
+import asyncio
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from utils.http_session import SharedHttpSession  # noqa: E402
+
+
+def make_ssl_context(temp_dir: str) -> ssl.SSLContext:
+    """生成自签名证书"""
+    cert, key = f"{temp_dir}/cert.pem", f"{temp_dir}/key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-keyout",
+            key,
+            "-out",
+            cert,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def start_server(context: ssl.SSLContext) -> tuple[web.AppRunner, str]:
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": {}})
+
+    app = web.Application()
+    app.router.add_post("/jsonrpc/pc/api", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"https://127.0.0.1:{port}/jsonrpc/pc/api"
+
+
+async def run(name: str, sessions: list[aiohttp.ClientSession], url: str, calls: int):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(calls):
+        session = sessions[i % len(sessions)]
+        begin = time.perf_counter()
+        async with session.post(
+            url, json={"jsonrpc": "2.0", "id": i, "method": "test"}, ssl=False
+        ) as response:
+            await response.json()
+        latencies.append(time.perf_counter() - begin)
+    cost = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{name}: 总耗时{cost * 1000:.1f}ms, "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms, "
+        f"最大 {latencies[-1] * 1000:.2f}ms"
+    )
+    return cost
+
+
+async def performance_test(accounts: int = 10, calls: int = 100) -> None:
+    temp_dir = tempfile.TemporaryDirectory()
+    runner, url = await start_server(make_ssl_context(temp_dir.name))
+
+    # 旧方式: 每个账号一个session
+    legacy_stats = SharedHttpSession()
+    trace_config = legacy_stats.trace_config()
+    legacy_sessions = [
+        aiohttp.ClientSession(trace_configs=[trace_config]) for _ in range(accounts)
+    ]
+    legacy = await run("每账号独立session", legacy_sessions, url, calls)
+    print(f"  新建连接(TLS握手){legacy_stats.connections_created}次")
+    for session in legacy_sessions:
+        await session.close()
+
+    # 新方式: 所有账号共用连接池
+    shared = SharedHttpSession()
+    shared_cost = await run("共用连接池", [shared.get()] * accounts, url, calls)
+    print(f"  新建连接(TLS握手){shared.connections_created}次, 统计{shared.stats()}")
+    print(f"加速比: {legacy / shared_cost:.2f}x")
+    await shared.close()
+    await runner.cleanup()
+    temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(performance_test())
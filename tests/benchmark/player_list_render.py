@@ -0,0 +1,116 @@
+"""
+64人满员服务器的玩家列表图渲染耗时，分别测量
+- 无缓存: 每次渲染前清空底图、文字遮罩和字体缓存
+- 换一批玩家: 同一服务器，玩家名和战绩全部变化，文字遮罩都需要重新生成
+- 再次查询: 同一服务器、同一批玩家，只有延迟变化
+- 数据相同: 缓存已预热，数据完全相同
+
+在项目根目录下运行(需要 data/battlefield 下的队伍图标、延迟图标、字体和游戏模式数据，缺少地图时会下载):
+    python tests/benchmark/player_list_render.py
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from utils.bf1.draw import PlayerListPic, _load_font  # noqa: E402
+from utils.bf1.draw.asset_cache import image_cache, text_mask  # noqa: E402
+from utils.bf1.map_team_info import MapData  # noqa: E402
+
+ROUNDS = 10
+MAP_NAME = "MP_Amiens"
+
+
+def make_data(map_pic: str, seed: int, latency_seed: int = 0) -> dict:
+    """与PlayerListPic.draw整理出的数据格式相同，玩家名和战绩随seed变化，延迟随latency_seed变化"""
+    rng = random.Random(seed)
+    latency_rng = random.Random(latency_seed)
+    teams = []
+    for team_id in (0, 1):
+        rows = []
+        for index in range(32):
+            name = f"Player{seed}{team_id}{index:02d}_{'x' * (index % 8)}"
+            if index % 3 == 0:
+                name = f"[TAG{index % 5}]{name}"
+            rows.append(
+                (
+                    rng.choice((150, rng.randint(0, 149))),
+                    name,
+                    PlayerListPic.admin_color if index == 0 else (255, 255, 255),
+                    latency_rng.randint(10, 300),
+                    rng.choice(("zh-CN", "en-US", "ja-JP")),
+                    (
+                        rng.randint(30, 80),
+                        round(rng.uniform(0.3, 4), 2),
+                        round(rng.uniform(0.2, 3), 2),
+                        f"{rng.uniform(10, 2000):.1f}",
+                    ),
+                )
+            )
+        rows.sort(key=lambda row: row[0], reverse=True)
+        teams.append(rows)
+    return {
+        "map_pic": map_pic,
+        "team_names": (
+            MapData.MapTeamDict[MAP_NAME]["Team1"],
+            MapData.MapTeamDict[MAP_NAME]["Team2"],
+        ),
+        "server_name": "[BFCN] 测试服务器 | 全图 | 欢迎新人",
+        "update_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "server_info_text": "服务器状态:征服-亚眠  在线人数:64/64[3](0)  收藏:1234",
+        "description": "禁止使用炸药、迫击炮，禁止刷分，违规者将被踢出，欢迎加入QQ群123456789"
+        * 2,
+        "slots": 64,
+        "teams": teams,
+        "counters": [1, 2, 3, sum(row[0] == 150 for rows in teams for row in rows)],
+    }
+
+
+def clear_caches():
+    _load_font.cache_clear()
+    text_mask.cache_clear()
+    image_cache.clear()
+
+
+def measure(datas: list[dict], cold: bool) -> float:
+    start = time.perf_counter()
+    for data in datas:
+        if cold:
+            clear_caches()
+        PlayerListPic.render(data)
+    return (time.perf_counter() - start) / len(datas)
+
+
+async def main() -> None:
+    logger.remove()
+    map_pic = await PlayerListPic.get_server_map_pic(MAP_NAME)
+    assert map_pic, "获取地图图片失败"
+
+    same = make_data(map_pic, 0)
+    cold = measure([same] * ROUNDS, cold=True)
+    others = measure(
+        [make_data(map_pic, seed) for seed in range(1, ROUNDS + 1)], cold=False
+    )
+    requery = measure(
+        [make_data(map_pic, 0, seed) for seed in range(1, ROUNDS + 1)], cold=False
+    )
+    warm = measure([same] * ROUNDS, cold=False)
+    for name, elapsed in (
+        ("无缓存", cold),
+        ("换一批玩家", others),
+        ("再次查询", requery),
+        ("数据相同", warm),
+    ):
+        print(f"{name}: {elapsed * 1000:.1f}ms")
+    print(f"图片大小: {len(PlayerListPic.render(same)) / 1024:.0f}KiB")
+    print(image_cache.stats(), text_mask.cache_info())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
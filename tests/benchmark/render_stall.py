@@ -0,0 +1,172 @@
+"""
+战绩图渲染测试：20个并发的-stat请求，对比在事件循环中直接绘制与在渲染进程池中绘制时，
+事件循环的最大卡顿时间和总卡顿时间(心跳协程每5ms醒来一次，超出5ms的部分记为卡顿)
+同时检查渲染进程池由forkserver(或spawn)启动后可以正常渲染
+
+武器/载具图片由本地HTTP服务器提供，其余数据为构造的玩家数据。
+在项目根目录下运行(需要完整的 data/battlefield 模板和字体):
+    python tests/benchmark/render_stall.py
+"""
+
+import asyncio
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from aiohttp import web  # noqa: E402
+from loguru import logger  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from utils.bf1.draw import PlayerStatPic  # noqa: E402
+from utils.http_session import shared_http_session  # noqa: E402
+from utils.render_pool import render_pool  # noqa: E402
+
+REQUESTS = 20
+TICK = 0.005
+
+
+async def start_server() -> tuple[web.AppRunner, str]:
+    image = BytesIO()
+    Image.new("RGBA", (1024, 256), (120, 120, 120, 255)).save(image, format="PNG")
+
+    async def handle(_request: web.Request) -> web.Response:
+        return web.Response(body=image.getvalue(), content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def make_card(index: int, base_url: str) -> PlayerStatPic:
+    pid = str(1_000_000_000 + index)
+    weapons = [
+        {
+            "name": f"武器{i}",
+            "guid": f"weapon-{i}",
+            "category": "步槍",
+            "imageUrl": f"{base_url}/weapon_{i}.png",
+            "stats": {
+                "values": {
+                    "kills": 12000 - i * 2000,
+                    "seconds": 36000,
+                    "hits": 5000,
+                    "shots": 20000,
+                    "headshots": 800,
+                }
+            },
+        }
+        for i in range(6)
+    ]
+    vehicles = [
+        {
+            "name": f"载具{i}",
+            "guid": f"vehicle-{i}",
+            "imageUrl": f"{base_url}/vehicle_{i}.png",
+            "stats": {
+                "values": {"kills": 8000 - i * 1000, "seconds": 7200, "destroyed": 50}
+            },
+        }
+        for i in range(6)
+    ]
+    stat = {
+        "result": {
+            "basicStats": {
+                "rank": 150,
+                "timePlayed": 1_000_000,
+                "kills": 50000,
+                "deaths": 20000,
+                "wins": 1500,
+                "losses": 1000,
+                "kpm": 1.5,
+                "spm": 900.0,
+                "skill": 300.0,
+            },
+            "vehicleStats": [{"killsAs": 10000}],
+            "favoriteClass": "Assault",
+            "longestHeadShot": 500.0,
+            "killAssists": 8000,
+            "highestKillStreak": 40,
+            "revives": 3000,
+            "heals": 2000,
+            "repairs": 1000,
+            "dogtagsTaken": 300,
+        }
+    }
+    return PlayerStatPic(
+        player_name=f"player{index}",
+        player_pid=pid,
+        personas={"result": {}},
+        stat=stat,
+        weapons={"result": [{"categoryId": "0", "weapons": weapons}]},
+        vehicles={
+            "result": [{"name": "巡航坦克", "sortOrder": 4, "vehicles": vehicles}]
+        },
+        bfeac_info={"stat": "无"},
+        bfban_info={"stat": "无"},
+        server_playing_info={"result": {pid: ""}},
+        platoon_info={"result": {}},
+        skin_info={"result": {"weapons": {}, "kits": {}}},
+        gt_id_info=None,
+    )
+
+
+async def measure(name: str, cards: list[PlayerStatPic], render) -> None:
+    stalls = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            stalls.append(max(0.0, time.perf_counter() - start - TICK))
+
+    async def stat_request(card: PlayerStatPic):
+        await card.prefetch()
+        data = await render(card)
+        assert data[:2] == b"\xff\xd8"
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(stat_request(card) for card in cards))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker_task
+    print(
+        f"{name}: 总耗时 {elapsed * 1000:.0f}ms, "
+        f"最大卡顿 {max(stalls) * 1000:.1f}ms, 总卡顿 {sum(stalls) * 1000:.0f}ms"
+    )
+
+
+async def main() -> None:
+    logger.remove()
+    runner, base_url = await start_server()
+    cards = [make_card(i, base_url) for i in range(REQUESTS)]
+
+    async def inline(card: PlayerStatPic) -> bytes:
+        return card.render()
+
+    async def pooled(card: PlayerStatPic) -> bytes:
+        return await render_pool.run(card.render)
+
+    await render_pool.start()
+    assert render_pool.start_method in ("forkserver", "spawn"), render_pool.start_method
+    await measure("事件循环中绘制", cards, inline)
+    await measure(f"渲染进程池({render_pool.workers}进程)", cards, pooled)
+    stats = render_pool.stats()
+    print(stats)
+    assert stats["renders"] == REQUESTS and stats["restarts"] == 0
+    await render_pool.close()
+    await runner.cleanup()
+    await shared_http_session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
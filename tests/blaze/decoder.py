@@ -0,0 +1,68 @@
+"""
+Blaze解码器测试：检查语料中每个包的解码结果与黄金输出一致，
+并检查负整数、非法UTF-8字符串、memoryview/bytearray输入
+
+在项目根目录下运行:
+    python tests/blaze/decoder.py
+"""
+
+import ast
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.bf1.blaze.Blaze import Blaze  # noqa: E402
+from utils.bf1.blaze.BlazeDecoder import (  # noqa: E402
+    BlazeDecoder,
+    parse_integer,
+    parse_string,
+)
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def check_corpus() -> None:
+    packets = sorted(CORPUS_DIR.glob("*.bin"))
+    assert packets, "语料为空，先运行 tests/blaze/make_corpus.py"
+    for path in packets:
+        packet = path.read_bytes()
+        expected = ast.literal_eval(path.with_suffix(".txt").read_text("utf-8"))
+        for data in (packet, bytearray(packet), memoryview(packet)):
+            assert BlazeDecoder.decode(data) == expected["raw"], path.name
+            assert BlazeDecoder.decode(data, readable=True) == expected["readable"], (
+                path.name
+            )
+            assert BlazeDecoder.decode(data, compact=True) == expected["compact"], (
+                path.name
+            )
+        # 原始键的输出可以直接交给编码器重新编码
+        raw = expected["raw"]
+        if raw["type"] == "Command":
+            assert Blaze(raw).encode() == packet, path.name
+        print(f"{path.stem}: ok")
+
+
+def check_integers() -> None:
+    for value in (0, 1, 63, 64, 127, 128, 8191, 2**31, 2**53 + 1, 2**63 - 1):
+        for n in (value, -value):
+            data = bytes.fromhex(Blaze.write_integer(n))
+            assert parse_integer(memoryview(data), 0) == (n, len(data)), n
+
+
+def check_invalid_utf8() -> None:
+    # 长度6(含结尾\0)，第4个字节非法，保留合法前缀
+    data = memoryview(b"\x06abc\xffd\x00")
+    assert parse_string(data, 0) == ("abc", 7)
+    assert parse_string(memoryview(b"\x00"), 0) == ("", 1)
+
+
+def main() -> None:
+    check_corpus()
+    check_integers()
+    check_invalid_utf8()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Blaze编码器随机测试：随机生成各种类型组合的包，检查
+1. BlazeEncoder 与 Blaze.encode 的输出逐字节相同
+2. 编码 -> BlazeDecoder(原始键)解码 -> 再编码 的结果不变(不含Blob，原解码器会丢掉Blob的最后一个字节)
+
+在项目根目录下运行:
+    python tests/blaze/encoder.py [次数]
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.bf1.blaze.Blaze import Blaze  # noqa: E402
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder  # noqa: E402
+from utils.bf1.blaze.BlazeEncoder import BlazeEncoder  # noqa: E402
+from utils.bf1.blaze.Method import Methods  # noqa: E402
+
+TAG_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+METHODS = list(Methods)
+# 列表元素和Map键值可用的类型(原编码器不支持嵌套列表/Map中的列表)
+ITEM_TYPES = "01237"
+MAP_KEY_TYPES = "01"
+MAP_VALUE_TYPES = "012378"
+
+
+def random_tag(rng: random.Random) -> str:
+    return "".join(rng.choice(TAG_CHARS) for _ in range(rng.randint(2, 4))).ljust(4)
+
+
+def random_integer(rng: random.Random) -> int:
+    bits = rng.choice([5, 6, 7, 13, 20, 32, 40, 53, 63])
+    value = rng.getrandbits(bits)
+    return -value if rng.random() < 0.2 else value
+
+
+def random_string(rng: random.Random) -> str:
+    alphabet = "abcXYZ019 _-中文测试ä"
+    return "".join(rng.choice(alphabet) for _ in range(rng.choice([0, 1, 5, 40, 80])))
+
+
+def random_value(rng: random.Random, type_: str, depth: int, blob: bool):
+    if type_ == "0":
+        return random_integer(rng)
+    if type_ == "1":
+        return random_string(rng)
+    if type_ == "2":
+        return rng.randbytes(rng.randint(1, 20)).hex()
+    if type_ == "3":
+        return random_struct(rng, depth + 1, blob)
+    if type_ == "7":
+        return [random_integer(rng) for _ in range(rng.randint(0, 5))]
+    if type_ == "8":
+        return ("GameManager", rng.choice(["Integer", "String", "Struct"]))
+    if type_ == "9":
+        return ("UserSessions", "Integer", rng.getrandbits(40))
+    raise ValueError(type_)
+
+
+def random_struct(rng: random.Random, depth: int = 0, blob: bool = True) -> dict:
+    fields = {}
+    types = "0123456789" if depth < 3 else "0127"
+    if not blob:
+        types = types.replace("2", "")
+    for _ in range(rng.randint(0, 6 if depth else 12)):
+        type_ = rng.choice(types)
+        tag = random_tag(rng)
+        if type_ == "4":
+            item_type = rng.choice(ITEM_TYPES if blob else ITEM_TYPES.replace("2", ""))
+            fields[f"{tag} 4{item_type}"] = [
+                random_value(rng, item_type, depth, blob)
+                for _ in range(rng.randint(0, 6))
+            ]
+        elif type_ == "5":
+            key_type = rng.choice(MAP_KEY_TYPES)
+            val_type = rng.choice(
+                MAP_VALUE_TYPES if blob else MAP_VALUE_TYPES.replace("2", "")
+            )
+            fields[f"{tag} 5{key_type}{val_type}"] = {
+                random_value(rng, key_type, depth, blob): random_value(
+                    rng, val_type, depth, blob
+                )
+                for _ in range(rng.randint(0, 4))
+            }
+        elif type_ == "6":
+            member_type = rng.choice("0137")
+            fields[f"{tag} 6{rng.randint(0, 9)}"] = {
+                f"{random_tag(rng)} {member_type}": random_value(
+                    rng, member_type, depth, blob
+                )
+            }
+        else:
+            fields[f"{tag} {type_}"] = random_value(rng, type_, depth, blob)
+    return fields
+
+
+def random_packet(rng: random.Random, blob: bool = True) -> dict:
+    return {
+        "method": rng.choice(METHODS),
+        "type": "Command",
+        # 解码器只读取ID的低2字节
+        "id": rng.randrange(1 << 24 if blob else 1 << 16),
+        "data": random_struct(rng, blob=blob),
+    }
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(12)
+    encoder = BlazeEncoder()
+    for i in range(rounds):
+        packet = random_packet(rng)
+        assert encoder.encode(packet) == Blaze(packet).encode(), (i, packet)
+
+        packet = random_packet(rng, blob=False)
+        data = encoder.encode(packet)
+        decoded = BlazeDecoder.decode(data)
+        # 未注册的组件/命令在解码后是数字形式的方法名
+        decoded["method"] = packet["method"]
+        assert encoder.encode(decoded) == data, (i, packet, decoded)
+    # 同一个编码器复用缓冲区
+    big = {"method": "GameManager.getGameDataFromId", "data": {"GLST 40": [1] * 70000}}
+    assert encoder.encode(big) == Blaze(big).encode()
+    assert encoder.encode(packet) == Blaze(packet).encode()
+    print(f"{rounds}次随机测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Blaze分包测试：把语料中的包随机排列拼成一个字节流，按随机边界切块(包括切开包头、
+一块包含多个包)喂给StreamReader，检查 BlazeSocket.receive_data 收到的每个包都完整且顺序不变；
+另外检查解码失败、连接中途关闭、超时后迟到的响应
+
+在项目根目录下运行:
+    python tests/blaze/framer.py [轮数]
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from utils.bf1.blaze import BlazeSocket as blaze_socket_module  # noqa: E402
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder  # noqa: E402
+from utils.bf1.blaze.BlazeSocket import BlazeSocket  # noqa: E402
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def with_id(packet: bytes, id_: int) -> bytes:
+    data = bytearray(packet)
+    data[11:13] = id_.to_bytes(2, "big")
+    return bytes(data)
+
+
+def make_socket(received: list) -> BlazeSocket:
+    socket = BlazeSocket("127.0.0.1", 0, callback=received.append)
+    socket.reader = asyncio.StreamReader()
+    socket.connect = True
+    return socket
+
+
+async def feed(reader: asyncio.StreamReader, stream: bytes, rng: random.Random):
+    offset = 0
+    while offset < len(stream):
+        size = rng.choice([1, 3, 15, 16, 17, 100, 4096, 65565, 200000])
+        reader.feed_data(stream[offset : offset + size])
+        offset += size
+        if rng.random() < 0.5:
+            await asyncio.sleep(0)
+    reader.feed_eof()
+
+
+async def check_fuzz(rounds: int) -> None:
+    corpus = [path.read_bytes() for path in sorted(CORPUS_DIR.glob("*.bin"))]
+    rng = random.Random(13)
+    for _ in range(rounds):
+        packets = [
+            with_id(rng.choice(corpus), i) for i in range(1, rng.randint(1, 60) + 1)
+        ]
+        stream = b"".join(packets)
+        received = []
+        socket = make_socket(received)
+        await asyncio.gather(socket.receive_data(), feed(socket.reader, stream, rng))
+        assert [packet["id"] for packet in received] == list(range(1, len(packets) + 1))
+        for packet, data in zip(received, packets):
+            assert packet == BlazeDecoder.decode(data, readable=True)
+        assert socket.frames == len(packets)
+        assert socket.bytes_received == len(stream)
+        assert not socket.connect
+    print(f"{rounds}轮随机分块: ok")
+
+
+async def check_large_frame() -> None:
+    """大包在线程中解码"""
+    packet = (CORPUS_DIR / "game_data_4x64.bin").read_bytes()
+    blaze_socket_module.LARGE_FRAME_SIZE = 1024
+    try:
+        received = []
+        socket = make_socket(received)
+        socket.reader.feed_data(packet * 3)
+        socket.reader.feed_eof()
+        await socket.receive_data()
+        assert len(received) == 3 and socket.large_frames == 3
+    finally:
+        blaze_socket_module.LARGE_FRAME_SIZE = 64 * 1024
+    print("大包解码: ok")
+
+
+async def check_errors() -> None:
+    packet = (CORPUS_DIR / "login_result.bin").read_bytes()
+    received = []
+    socket = make_socket(received)
+    loop = asyncio.get_running_loop()
+    # 1号请求的响应数据损坏，2号请求等待中连接断开
+    broken, waiting = loop.create_future(), loop.create_future()
+    socket.map = {1: broken, 2: waiting}
+    corrupt = bytearray(with_id(packet, 1))
+    corrupt[19] = 0xFF
+    socket.reader.feed_data(bytes(corrupt) + with_id(packet, 3))
+    socket.reader.feed_data(with_id(packet, 2)[:30])
+    socket.reader.feed_eof()
+    await socket.receive_data()
+    assert isinstance(broken.exception(), TypeError)
+    assert isinstance(waiting.exception(), ConnectionError)
+    assert [packet["id"] for packet in received] == [3]
+    assert socket.decode_errors == 1 and socket.unmatched == 0
+    print("解码失败/中途断开: ok")
+
+
+async def check_late_response() -> None:
+    packet = (CORPUS_DIR / "login_result.bin").read_bytes()
+    received = []
+    socket = make_socket(received)
+    socket.writer = type("Writer", (), {"write": lambda self, data: None})()
+    socket.id = 7
+    try:
+        await socket.send({"method": "Util.ping", "data": {}}, timeout=0.01)
+    except TimeoutError:
+        pass
+    socket.reader.feed_data(with_id(packet, 7))
+    socket.reader.feed_eof()
+    await socket.receive_data()
+    assert socket.timeouts == 1 and socket.late_responses == 1
+    print("超时后迟到的响应: ok")
+
+
+async def main() -> None:
+    logger.remove()
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    await check_fuzz(rounds)
+    await check_large_frame()
+    await check_errors()
+    await check_late_response()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+生成Blaze解码器的黄金输出语料：corpus/<name>.bin 为包数据，corpus/<name>.txt 为
+raw/readable/compact 三种模式的解码结果(repr)。
+包结构按照抓取到的 Authentication.login、GameManager.getGameDataFromId(64人服)、
+错误回复和Pong 构造，结构体列表带有服务端返回的0x02标记。
+生成时会检查新解码器与 Blaze.decode 的输出一致。
+
+在项目根目录下运行:
+    python tests/blaze/make_corpus.py
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.bf1.blaze.Blaze import QType, Blaze  # noqa: E402
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder  # noqa: E402
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def write_fields(fields: dict) -> str:
+    """与Blaze.write_struct相同，另外支持0x02标记的结构体列表("TAG 432")、Float("TAG 10")和空联合体("TAG 6")"""
+    hex_str = ""
+    for key, value in fields.items():
+        hex_str += f"{Blaze.encode_tag(key[:4])}0{key[5]}"
+        if key[5:] == "10":
+            hex_str = hex_str[:-2] + "0a" + Blaze.write_float(value)
+        elif key[5:] == "432":
+            hex_str += "03" + Blaze.write_integer(len(value)) + "02"
+            hex_str += "".join(write_fields(item) + "00" for item in value)
+        elif key[5:] == "6":
+            hex_str += "7f"
+        elif key[5] == "3":
+            hex_str += write_fields(value) + "00"
+        else:
+            hex_str += Blaze.write_block(key[5], value, key)
+    return hex_str
+
+
+def make_packet(method: str, q_type: str, id_: int, data: dict) -> bytes:
+    body = write_fields(data)
+    packet = bytearray(Blaze({"method": method, "id": id_, "data": {}}).encode())
+    packet[:4] = (len(body) // 2).to_bytes(4, "big")
+    packet[13] = QType[q_type]
+    return bytes(packet) + bytes.fromhex(body)
+
+
+def player(rng: random.Random, index: int) -> dict:
+    return {
+        "EXID 0": 1_000_000_000_000 + rng.randrange(10**9),
+        "JGTS 0": 1_700_000_000_000_000 + rng.randrange(10**12),
+        "LOC  0": int.from_bytes(rng.choice([b"zhCN", b"enUS", b"deDE"]), "big"),
+        "NAME 1": f"Player_{index:02d}_{'中文' if index % 7 == 0 else 'x'}",
+        "PATT 511": {
+            "latency": str(rng.randrange(10, 300)),
+            "rank": str(rng.randrange(0, 151)),
+            "squad": str(rng.randrange(0, 8)),
+        },
+        "PID  0": 1_000_000_000 + rng.randrange(10**9),
+        "ROLE 1": rng.choice(["", "soldier", "soldier", "soldier"]),
+        "STAT 0": rng.randrange(0, 5),
+        "TIDX 0": 65535 if index >= 62 else index % 2,
+    }
+
+
+def game(rng: random.Random, game_id: int, players: int) -> dict:
+    return {
+        "ATTR 511": {
+            "mapname": "MP_Amiens",
+            "operationindex": "3",
+            "operationstate": "1",
+            "progress": "42",
+            "region": "Asia",
+        },
+        "CAP  40": [64, 0, 4, 0],
+        "GID  0": game_id,
+        "GNAM 1": f"[BFCN] 测试服务器 #{game_id % 100}",
+        "GSET 0": 0x1F0400,
+        "HOST 9": ("GameManager", "ObjectId", game_id),
+        "PCNT 40": [players - 2, 0, 1, 0],
+        "QCNT 0": 1,
+        "ROST 432": [player(rng, i) for i in range(players)],
+        "TICK 10": 0.0166,
+        "TOKN 2": "00112233445566778899aabbccddeeff00",
+        "UNIO 60": {"VALU 0": 4},
+        "EMPT 6": {},
+        "SLOT 7": [1, 2, 300, 70000],
+    }
+
+
+def build_corpus() -> dict[str, bytes]:
+    rng = random.Random(20240601)
+    return {
+        "login_result": make_packet(
+            "Authentication.login",
+            "Result",
+            1,
+            {
+                "CGID 9": ("Authentication", "Integer", 1_003_118_773_678),
+                "DSNM 1": "BlazeTester",
+                "PID  0": 1_003_118_773_678,
+                "UID  0": 1_003_517_171_678,
+                "SKEY 1": "f" * 64,
+            },
+        ),
+        "game_data_1x64": make_packet(
+            "GameManager.getGameDataFromId",
+            "Result",
+            2,
+            {"GDAT 432": [game(rng, 7_000_000_000_001, 64)]},
+        ),
+        "game_data_4x64": make_packet(
+            "GameManager.getGameDataFromId",
+            "Result",
+            3,
+            {"GDAT 432": [game(rng, 7_000_000_000_010 + i, 64) for i in range(4)]},
+        ),
+        "game_data_request": make_packet(
+            "GameManager.getGameDataFromId",
+            "Command",
+            4,
+            {"DNAM 1": "csFullGameList", "GLST 40": [7_000_000_000_001, 42]},
+        ),
+        "error_result": make_packet(
+            "GameManager.getGameDataFromId", "Error", 5, {"ERRC 0": 0x40004}
+        ),
+        "pong": make_packet("Util.ping", "Pong", 6, {}),
+    }
+
+
+def golden(packet: bytes) -> dict:
+    return {
+        "raw": BlazeDecoder.decode(packet),
+        "readable": BlazeDecoder.decode(packet, readable=True),
+        "compact": BlazeDecoder.decode(packet, compact=True),
+    }
+
+
+def main() -> None:
+    CORPUS_DIR.mkdir(exist_ok=True)
+    for name, packet in build_corpus().items():
+        result = golden(packet)
+        assert result["raw"] == Blaze(packet).decode(), name
+        assert result["readable"] == Blaze(packet).decode(True), name
+        (CORPUS_DIR / f"{name}.bin").write_bytes(packet)
+        (CORPUS_DIR / f"{name}.txt").write_text(f"{result!r}\n", encoding="utf-8")
+        print(f"{name}: {len(packet)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+玩家列表服务测试：用语料中的4个服务器模拟GLST响应，检查
+- 并发查询不同gameId合并为一个请求，相同gameId等待同一个结果
+- 缓存时间内直接返回快照，调用者修改结果不影响快照
+- 不存在的服务器不在结果中，出错时返回错误信息且不缓存
+- 查询被取消时等待的调用者收到错误信息，不会留下一直等待的查询
+
+在项目根目录下运行(需先生成语料 tests/blaze/make_corpus.py):
+    python tests/blaze/player_list.py
+"""
+
+import asyncio
+import copy
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder  # noqa: E402
+from utils.bf1.player_list import PlayerListService  # noqa: E402
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+GAME_DATA = BlazeDecoder.decode(
+    (CORPUS_DIR / "game_data_4x64.bin").read_bytes(), readable=True
+)
+GAME_IDS = [server["GID"] for server in GAME_DATA["data"]["GDAT"]]
+
+
+class StubBlaze:
+    def __init__(self):
+        self.requests: list[list[int]] = []
+        self.error = None
+        self.cancel = False
+
+    async def fetch(self, game_ids: list[int]) -> dict | str:
+        self.requests.append(game_ids)
+        await asyncio.sleep(0.02)
+        if self.cancel:
+            raise asyncio.CancelledError
+        if self.error:
+            return self.error
+        response = copy.deepcopy(GAME_DATA)
+        response["data"]["GDAT"] = [
+            server for server in response["data"]["GDAT"] if server["GID"] in game_ids
+        ]
+        return response
+
+
+async def check_cancel(stub: StubBlaze):
+    # Blaze请求在底层被取消
+    service = PlayerListService()
+    stub.cancel = True
+    result = await asyncio.wait_for(service.get(GAME_IDS, stub.fetch), 1)
+    assert isinstance(result, str) and not service.in_flight
+    stub.cancel = False
+    assert len(await asyncio.wait_for(service.get(GAME_IDS, stub.fetch), 1)) == 4
+
+    # 合并请求的任务在开始执行前和请求进行中被取消
+    for delay in (0, 0.01):
+        service = PlayerListService(batch_delay=0.005)
+        getter = asyncio.create_task(service.get(GAME_IDS, stub.fetch))
+        await asyncio.sleep(0)
+        flush_task = service._flush_task
+        await asyncio.sleep(delay)
+        flush_task.cancel()
+        result = await asyncio.wait_for(getter, 1)
+        assert isinstance(result, str) and not service.in_flight
+        assert service._flush_task is None
+        assert len(await asyncio.wait_for(service.get(GAME_IDS, stub.fetch), 1)) == 4
+
+
+async def main() -> None:
+    logger.remove()
+    stub = StubBlaze()
+    service = PlayerListService(ttl=0.2)
+
+    # 4个不同的gameId和重复的查询合并为一个请求
+    results = await asyncio.gather(
+        *(service.get([game_id], stub.fetch) for game_id in GAME_IDS * 3)
+    )
+    assert len(stub.requests) == 1 and sorted(stub.requests[0]) == GAME_IDS
+    for game_id, result in zip(GAME_IDS * 3, results):
+        assert list(result) == [game_id] and len(result[game_id]["players"]) > 0
+    assert service.misses == 4 and service.coalesced == 8
+
+    # 缓存时间内命中，修改结果不影响快照
+    results[0][GAME_IDS[0]]["players"].clear()
+    result = await service.get(GAME_IDS, stub.fetch)
+    assert len(stub.requests) == 1 and len(result) == 4
+    assert result[GAME_IDS[0]]["players"]
+    assert service.hits == 4
+
+    # 不存在的服务器只查询一次
+    assert await service.get([1], stub.fetch) == {}
+    assert await service.get([1], stub.fetch) == {}
+    assert len(stub.requests) == 2
+
+    # use_cache=False时重新查询
+    await service.get([GAME_IDS[0]], stub.fetch, use_cache=False)
+    assert len(stub.requests) == 3
+
+    # 过期后重新查询；出错时返回错误信息，不缓存
+    await asyncio.sleep(0.25)
+    stub.error = "Blaze后端超时!"
+    assert await service.get(GAME_IDS, stub.fetch) == "Blaze后端超时!"
+    stub.error = None
+    assert len(await service.get(GAME_IDS, stub.fetch)) == 4
+    assert len(stub.requests) == 5
+
+    # 超过单个请求的gameId上限时拆分
+    service = PlayerListService(max_batch=3)
+    await service.get(GAME_IDS, stub.fetch)
+    assert [len(request) for request in stub.requests[5:]] == [3, 1]
+    print(service.stats())
+
+    await check_cancel(stub)
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,247 @@
+"""
+Blaze连接池测试：本地启动一个模拟的Blaze服务器(明文TCP)，回复登录、玩家列表查询和Ping，检查
+- 连接数和每个连接同时处理的请求数不超过上限，重定向地址只获取一次
+- 不回复Pong的连接被心跳断开，之后的请求使用新连接
+- 单个请求超时不关闭连接，同一连接上的其他请求正常完成，迟到的响应被丢弃
+- 收到登录失效的错误或通知时在后台重新登录，请求重试一次后成功
+- 无法建立连接时请求立即失败，重定向地址失效
+
+在项目根目录下运行(需先生成语料 tests/blaze/make_corpus.py):
+    python tests/blaze/pool.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from utils.bf1.blaze import BlazeSocket as blaze_socket_module  # noqa: E402
+from utils.bf1.blaze.BlazeClient import (  # noqa: E402
+    AUTH_ERRORS,
+    BlazeConnectionPool,
+    RedirectorCache,
+)
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder  # noqa: E402
+from utils.bf1.blaze.BlazeEncoder import blaze_encoder  # noqa: E402
+from utils.bf1.blaze.BlazeSocket import read_frame  # noqa: E402
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+LOGIN_RESULT = (CORPUS_DIR / "login_result.bin").read_bytes()
+GAME_DATA = (CORPUS_DIR / "game_data_1x64.bin").read_bytes()
+PONG = (CORPUS_DIR / "pong.bin").read_bytes()
+GLST_QUERY = {
+    "method": "GameManager.getGameDataFromId",
+    "type": "Command",
+    "data": {"DNAM 1": "csFullGameList", "GLST 40": [7_000_000_000_000]},
+}
+
+
+def with_id(packet: bytes, id_: int) -> bytes:
+    data = bytearray(packet)
+    data[11:13] = id_.to_bytes(2, "big")
+    return bytes(data)
+
+
+def make_packet(method: str, q_type: int, id_: int = 0, data: dict = None) -> bytes:
+    packet = bytearray(
+        blaze_encoder.encode({"method": method, "id": id_, "data": data or {}})
+    )
+    packet[13] = q_type
+    return bytes(packet)
+
+
+class FakeBlazeServer:
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.drop_pongs = False
+        # 接下来的几个查询回复登录失效
+        self.auth_errors = 0
+        self.logins = 0
+        self.connections = []
+        self.max_in_flight = 0
+        self.server = None
+        self.port = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for writer in self.connections:
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections.append(writer)
+        in_flight = [0]
+        try:
+            while True:
+                frame = await read_frame(reader)
+                header = BlazeDecoder.decode_header(frame)
+                if header["type"] == "Ping":
+                    if not self.drop_pongs:
+                        writer.write(PONG)
+                elif header["method"] == "Authentication.login":
+                    self.logins += 1
+                    writer.write(with_id(LOGIN_RESULT, header["id"]))
+                else:
+                    asyncio.create_task(self.reply(writer, header["id"], in_flight))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def reply(self, writer: asyncio.StreamWriter, id_: int, in_flight: list):
+        in_flight[0] += 1
+        self.max_in_flight = max(self.max_in_flight, in_flight[0])
+        await asyncio.sleep(self.delay)
+        in_flight[0] -= 1
+        if self.auth_errors:
+            self.auth_errors -= 1
+            errc = next(iter(AUTH_ERRORS))
+            writer.write(
+                make_packet("GameManager.getGameDataFromId", 96, id_, {"ERRC 0": errc})
+            )
+        else:
+            writer.write(with_id(GAME_DATA, id_))
+
+    def push_expired(self, index: int = -1):
+        """推送登录过期通知"""
+        self.connections[index].write(make_packet("UserSessions.getPermissions", 64))
+
+
+async def authenticate(socket) -> bool:
+    response = await socket.send(
+        {
+            "method": "Authentication.login",
+            "type": "Command",
+            "id": 0,
+            "data": {"AUTH 1": "code", "EXTB 2": "", "EXTI 0": 0},
+        }
+    )
+    return "DSNM" in response["data"]
+
+
+def make_pool(server: FakeBlazeServer, **kwargs) -> tuple[BlazeConnectionPool, list]:
+    resolves = []
+
+    async def resolver():
+        resolves.append(server.port)
+        return "127.0.0.1", server.port
+
+    pool = BlazeConnectionPool(
+        1003118773678, authenticate, RedirectorCache(resolver=resolver), **kwargs
+    )
+    return pool, resolves
+
+
+async def check_limits() -> None:
+    server = FakeBlazeServer()
+    await server.start()
+    pool, resolves = make_pool(server, size=2, max_in_flight=3)
+    responses = await asyncio.gather(*(pool.send(GLST_QUERY) for _ in range(30)))
+    assert all(response["type"] == "Result" for response in responses)
+    assert len({response["id"] for response in responses}) > 1
+    assert len(server.connections) == 2 and server.logins == 2
+    assert server.max_in_flight <= 3
+    assert len(resolves) == 1
+    stats = pool.stats()
+    assert stats["requests"] == 30 and stats["in_flight"] == 0 and stats["waits"] > 0
+    await pool.close()
+    await server.stop()
+    print(f"连接数/并发上限: ok {stats}")
+
+
+async def check_liveness() -> None:
+    server = FakeBlazeServer()
+    await server.start()
+    pool, _ = make_pool(server, size=1, ping_interval=0.05, ping_timeout=0.05)
+    await pool.send(GLST_QUERY)
+    server.drop_pongs = True
+    await asyncio.sleep(0.2)
+    server.drop_pongs = False
+    response = await pool.send(GLST_QUERY)
+    assert response["type"] == "Result"
+    stats = pool.stats()
+    assert len(server.connections) == 2
+    assert stats["ping_failures"] >= 1 and stats["closed_sockets"] == 1
+    await pool.close()
+    await server.stop()
+    print("心跳断开后重连: ok")
+
+
+async def check_timeout() -> None:
+    server = FakeBlazeServer(delay=0.2)
+    await server.start()
+    pool, _ = make_pool(server, size=1)
+    await pool.send(GLST_QUERY)
+    results = await asyncio.gather(
+        pool.send(GLST_QUERY, timeout=0.05),
+        pool.send(GLST_QUERY, timeout=1),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], TimeoutError)
+    assert results[1]["type"] == "Result"
+    socket = pool.sockets[0]
+    assert socket.connect and socket.late_responses == 1 and not socket.map
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["closed_sockets"] == 0
+    assert len(server.connections) == 1
+    assert (await pool.send(GLST_QUERY))["type"] == "Result"
+    await pool.close()
+    await server.stop()
+    print("请求超时不关闭连接: ok")
+
+
+async def check_relogin() -> None:
+    server = FakeBlazeServer()
+    await server.start()
+    pool, _ = make_pool(server, size=1)
+    await pool.send(GLST_QUERY)
+    # 请求收到登录失效的错误
+    server.auth_errors = 1
+    response = await pool.send(GLST_QUERY)
+    assert response["type"] == "Result"
+    assert pool.relogins == 1 and pool.retries == 1 and server.logins == 2
+    # 服务器推送登录过期通知
+    server.push_expired()
+    await asyncio.sleep(0.1)
+    assert pool.relogins == 2 and server.logins == 3
+    assert (await pool.send(GLST_QUERY))["type"] == "Result"
+    assert pool.stats()["sockets"] == 1
+    await pool.close()
+    await server.stop()
+    print("登录失效后重新登录: ok")
+
+
+async def check_connect_error() -> None:
+    server = FakeBlazeServer()
+    await server.start()
+    await server.stop()
+    pool, _ = make_pool(server, size=2)
+    try:
+        await pool.send(GLST_QUERY)
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("应当抛出ConnectionError")
+    assert pool.redirector.address is None and pool.connect_errors >= 1
+    print("无法建立连接: ok")
+
+
+async def main() -> None:
+    logger.remove()
+    # 模拟服务器不使用TLS
+    blaze_socket_module.context = None
+    await check_limits()
+    await check_liveness()
+    await check_timeout()
+    await check_relogin()
+    await check_connect_error()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+查询计划测试：检查BF1服务器成员表、人数记录表、服管日志表的常用查询是否使用索引，
+并检查迁移能对旧数据去重后补建索引
+
+在项目根目录下运行(需要 config/config.yaml, 仅支持sqlite):
+    python tests/database/query_plan.py
+"""
+
+import asyncio
+import datetime
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from creart import create  # noqa: E402
+
+from core.config import GlobalConfig  # noqa: E402
+
+# 使用临时数据库，避免污染正式数据
+_temp_dir = tempfile.TemporaryDirectory()
+create(GlobalConfig).db_link = f"sqlite+aiosqlite:///{_temp_dir.name}/query_plan.db"
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+from sqlalchemy.dialects import sqlite  # noqa: E402
+
+from core.orm import orm  # noqa: E402
+from utils.bf1.database.migrations import INDEXED_TABLES  # noqa: E402
+from utils.bf1.database.tables import (  # noqa: E402
+    Bf1ManagerLog,
+    Bf1ServerAdmin,
+    Bf1ServerBan,
+    Bf1ServerOwner,
+    Bf1ServerPlayerCount,
+    Bf1ServerVip,
+)
+
+MEMBER_TABLES = (Bf1ServerVip, Bf1ServerBan, Bf1ServerAdmin, Bf1ServerOwner)
+
+
+def hot_queries() -> dict:
+    now = datetime.datetime.now()
+    queries = {}
+    for table in MEMBER_TABLES:
+        name = table.__tablename__
+        queries[f"{name}: 按personaId查询"] = select(table.serverId).where(
+            table.personaId == 1
+        )
+        queries[f"{name}: 按(serverId, personaId)查询"] = select(table).where(
+            table.serverId == 1, table.personaId == 1
+        )
+        queries[f"{name}: 按serverId列表查询"] = select(
+            table.serverId, table.personaId, table.displayName
+        ).where(table.serverId.in_([1, 2, 3]))
+    queries["bf1_server_player_count: 最新时间"] = select(
+        func.max(Bf1ServerPlayerCount.time)
+    )
+    queries["bf1_server_player_count: 按时间查询"] = select(
+        Bf1ServerPlayerCount.serverId, Bf1ServerPlayerCount.serverBookmarkCount
+    ).where(Bf1ServerPlayerCount.time >= now)
+    queries["bf1_manager_log: 按serverId列表查询并按时间排序"] = (
+        select(Bf1ManagerLog)
+        .where(Bf1ManagerLog.serverId.in_([1, 2, 3]))
+        .order_by(-Bf1ManagerLog.time)
+    )
+    return queries
+
+
+async def drop_indexes() -> None:
+    """删除新增的索引，模拟旧版本数据库"""
+    async with orm.engine.begin() as conn:
+        for table in INDEXED_TABLES:
+            for index in table.__table__.indexes:
+                await conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+
+
+async def check_migration() -> None:
+    await drop_indexes()
+    now = datetime.datetime.now()
+    for table in MEMBER_TABLES:
+        rows = [
+            {"serverId": 1, "personaId": 1, "displayName": f"old{i}", "time": now}
+            for i in range(3)
+        ] + [{"serverId": 1, "personaId": 2, "displayName": "other", "time": now}]
+        await orm.execute(insert(table.__table__), rows)
+    await orm.run_migrations()
+    for table in MEMBER_TABLES:
+        result = await orm.fetch_all(
+            select(table.personaId, table.displayName).order_by(table.personaId)
+        )
+        assert result == [(1, "old2"), (2, "other")], (table.__tablename__, result)
+    # 重复执行不应出错
+    await orm.run_migrations()
+    print("迁移检查通过: 重复记录已去重, 保留最新一条")
+
+
+async def check_query_plan() -> None:
+    failed = 0
+    async with orm.engine.connect() as conn:
+        for name, query in hot_queries().items():
+            sql = str(
+                query.compile(
+                    dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}
+                )
+            )
+            plan = [
+                row[-1]
+                for row in (await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()
+            ]
+            # 全表扫描在sqlite中表现为不带索引的 SCAN <表名>
+            ok = all("INDEX" in step for step in plan if step.startswith("SCAN"))
+            ok = ok and any("INDEX" in step for step in plan)
+            failed += not ok
+            print(f"{'通过' if ok else '失败'} {name}: {' | '.join(plan)}")
+    assert not failed, f"{failed}条查询未使用索引"
+
+
+async def main() -> None:
+    await orm.create_all()
+    await check_migration()
+    await check_query_plan()
+    await orm.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+私服增量同步测试：检查
+- 首次同步写入服务器信息和列表
+- 列表中未变化的行不写入，改名的行更新，移除的行删除，新增的行插入
+- 内容未变化时按摘要跳过，不查询也不写入
+- 服务器基础信息变化时只写入变化的服务器
+
+在项目根目录下运行(需要 config/config.yaml, 仅支持sqlite):
+    python tests/database/server_sync.py
+"""
+
+import asyncio
+import datetime
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from creart import create  # noqa: E402
+
+from core.config import GlobalConfig  # noqa: E402
+
+# 使用临时数据库，避免污染正式数据
+_temp_dir = tempfile.TemporaryDirectory()
+create(GlobalConfig).db_link = f"sqlite+aiosqlite:///{_temp_dir.name}/sync.db"
+
+from loguru import logger  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from core.orm import orm  # noqa: E402
+from utils.bf1.database.sync import ServerSync  # noqa: E402
+from utils.bf1.database.tables import Bf1Server, Bf1ServerVip  # noqa: E402
+
+DATE = datetime.datetime(2024, 1, 1)
+
+
+def make_server(server_id: int, name: str) -> dict:
+    return {
+        "serverName": name,
+        "serverId": server_id,
+        "persistedGameId": f"guid-{server_id}",
+        "gameId": server_id * 10,
+        "createdDate": DATE,
+        "expirationDate": DATE,
+        "updatedDate": DATE,
+    }
+
+
+def make_list(*players: tuple[int, str]) -> list[dict]:
+    return [{"personaId": pid, "displayName": name} for pid, name in players]
+
+
+async def fetch_vips() -> dict[tuple[int, int], tuple[str, datetime.datetime]]:
+    rows = await orm.fetch_all(
+        select(
+            Bf1ServerVip.serverId,
+            Bf1ServerVip.personaId,
+            Bf1ServerVip.displayName,
+            Bf1ServerVip.time,
+        )
+    )
+    return {(row[0], row[1]): (row[2], row[3]) for row in rows}
+
+
+async def fetch_server_names() -> dict[int, str]:
+    rows = await orm.fetch_all(select(Bf1Server.serverId, Bf1Server.serverName))
+    return dict(rows)
+
+
+async def main() -> None:
+    logger.remove()
+    await orm.create_all()
+    server_sync = ServerSync()
+    servers = [make_server(1, "a"), make_server(2, "b")]
+
+    # 首次同步
+    lists = {
+        "vip": {
+            1: make_list((101, "p101"), (102, "p102"), (103, "p103")),
+            2: make_list((201, "p201")),
+        }
+    }
+    stats = await server_sync.sync(servers, [], lists)
+    assert stats.servers_written == 2 and stats.lists_changed == 2
+    assert stats.rows_upserted == 4 and stats.rows_deleted == 0
+    assert await fetch_server_names() == {1: "a", 2: "b"}
+    first = await fetch_vips()
+    assert {key: name for key, (name, _) in first.items()} == {
+        (1, 101): "p101",
+        (1, 102): "p102",
+        (1, 103): "p103",
+        (2, 201): "p201",
+    }
+
+    # 服务器1: 101未变化，102改名，103移除，104新增；服务器2未变化
+    lists = {
+        "vip": {
+            1: make_list((101, "p101"), (102, "renamed"), (104, "p104")),
+            2: make_list((201, "p201")),
+        }
+    }
+    stats = await server_sync.sync(servers, [], lists)
+    assert stats.servers_written == 0 and stats.servers_unchanged == 1
+    assert stats.lists_changed == 1 and stats.lists_unchanged == 1
+    assert stats.rows_upserted == 2 and stats.rows_deleted == 1
+    second = await fetch_vips()
+    assert {key: name for key, (name, _) in second.items()} == {
+        (1, 101): "p101",
+        (1, 102): "renamed",
+        (1, 104): "p104",
+        (2, 201): "p201",
+    }
+    # 未变化的行没有重新写入
+    assert second[(1, 101)] == first[(1, 101)]
+    assert second[(2, 201)] == first[(2, 201)]
+
+    # 内容完全没有变化时按摘要跳过，不查询数据库
+    fetch_all = orm.fetch_all
+
+    async def no_fetch(*args, **kwargs):
+        raise AssertionError("摘要未变化时不应查询数据库")
+
+    orm.fetch_all = no_fetch
+    try:
+        stats = await server_sync.sync(servers, [], lists)
+    finally:
+        orm.fetch_all = fetch_all
+    assert stats.servers_written == 0 and stats.servers_unchanged == 2
+    assert stats.lists_changed == 0 and stats.lists_unchanged == 2
+    assert stats.rows_written == 0
+    assert await fetch_vips() == second
+
+    # 只有服务器2的基础信息变化
+    servers[1] = make_server(2, "b2")
+    stats = await server_sync.sync(servers, [], lists)
+    assert stats.servers_written == 1 and stats.servers_unchanged == 1
+    assert await fetch_server_names() == {1: "a", 2: "b2"}
+
+    # 重启后摘要丢失，与数据库完整比较一次，没有需要写入的行
+    stats = await ServerSync().sync(servers, [], lists)
+    assert stats.lists_changed == 2 and stats.rows_written == 0
+    await orm.close()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
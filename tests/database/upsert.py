@@ -0,0 +1,73 @@
+"""
+插入或更新测试：检查
+- 数据包含所有必填列时使用原生upsert，插入和更新都正确
+- 只更新部分字段(不含必填列)时回退到查询后更新，已有记录的其他字段保持不变
+- 部分字段的insert_or_ignore在记录已存在时跳过
+
+在项目根目录下运行(需要 config/config.yaml, 仅支持sqlite):
+    python tests/database/upsert.py
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from creart import create  # noqa: E402
+
+from core.config import GlobalConfig  # noqa: E402
+
+# 使用临时数据库，避免污染正式数据
+_temp_dir = tempfile.TemporaryDirectory()
+create(GlobalConfig).db_link = f"sqlite+aiosqlite:///{_temp_dir.name}/upsert.db"
+
+from sqlalchemy import select  # noqa: E402
+
+from core.orm import get_required_columns, orm  # noqa: E402
+from core.orm.tables import GroupPerm  # noqa: E402
+
+
+async def fetch(group_id: int):
+    return await orm.fetch_one(
+        select(GroupPerm.group_name, GroupPerm.perm).where(
+            GroupPerm.group_id == group_id
+        )
+    )
+
+
+async def main() -> None:
+    await orm.create_all()
+    assert "group_name" in get_required_columns(GroupPerm)
+    condition = [GroupPerm.group_id == 1]
+    assert orm.get_upsert_keys(GroupPerm, [{"perm": 2}], [condition]) is None
+    assert orm.get_upsert_keys(
+        GroupPerm, [{"group_name": "a", "perm": 1}], [condition]
+    ) == ["group_id"]
+
+    # 完整数据：原生upsert插入和更新
+    await orm.insert_or_update(GroupPerm, {"group_name": "a", "perm": 1}, condition)
+    assert await fetch(1) == ("a", 1)
+    await orm.insert_or_update(GroupPerm, {"group_name": "b", "perm": 1}, condition)
+    assert await fetch(1) == ("b", 1)
+
+    # 只更新部分字段，其他字段保持不变
+    await orm.insert_or_update(GroupPerm, {"perm": 2}, condition)
+    assert await fetch(1) == ("b", 2)
+    await orm.insert_or_update_batch(
+        GroupPerm,
+        [{"perm": 3}, {"group_name": "c", "perm": 1}],
+        [condition, [GroupPerm.group_id == 2]],
+    )
+    assert await fetch(1) == ("b", 3) and await fetch(2) == ("c", 1)
+
+    # 已存在的记录跳过
+    await orm.insert_or_ignore(GroupPerm, {"perm": 0}, condition)
+    assert await fetch(1) == ("b", 3)
+    await orm.close()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+JSON-RPC批量请求测试：启动本地的假网关，检查并发请求被合并、结果正确分发，
+批量请求的延迟和结果记到其中的每个方法上，以及网关拒绝批量请求时回退为逐个请求
+
+在项目根目录下运行(需要 config/config.yaml):
+    python tests/gateway/batching.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from aiohttp import web  # noqa: E402
+
+from utils.bf1.gateway_api import RSP  # noqa: E402
+from utils.bf1.gateway_cache import gateway_cache  # noqa: E402
+from utils.bf1.gateway_limiter import gateway_limiter  # noqa: E402
+from utils.http_session import shared_http_session  # noqa: E402
+
+
+class StubGateway:
+    """只实现RSP.getPersonasByIds和RSP.kickPlayer的假网关"""
+
+    def __init__(self, accept_batch: bool):
+        self.accept_batch = accept_batch
+        self.posts = 0
+        self.batch_posts = 0
+
+    @staticmethod
+    def handle_one(body: dict) -> dict:
+        if body["method"] == "RSP.kickPlayer":
+            return {"jsonrpc": "2.0", "id": body["id"], "result": "success"}
+        pid = str(body["params"]["personaIds"][0])
+        return {
+            "jsonrpc": "2.0",
+            "id": body["id"],
+            "result": {pid: {"personaId": pid, "displayName": f"player{pid}"}},
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.posts += 1
+        body = await request.json()
+        if isinstance(body, list):
+            self.batch_posts += 1
+            if not self.accept_batch:
+                return web.Response(status=400, text="batch not supported")
+            # 打乱顺序，调用方需要按id对应
+            return web.json_response([self.handle_one(item) for item in body[::-1]])
+        return web.json_response(self.handle_one(body))
+
+
+async def run_case(accept_batch: bool, calls: int = 45) -> None:
+    stub = StubGateway(accept_batch)
+    app = web.Application()
+    app.router.add_post("/jsonrpc/pc/api", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    api = RSP(pid=0, session="stub-session")
+    api.api_url = f"http://127.0.0.1:{port}/jsonrpc/pc/api"
+    pids = list(range(1000, 1000 + calls))
+    results = await asyncio.gather(*[api.getPersonasByIds([pid]) for pid in pids])
+    for pid, result in zip(pids, results):
+        assert result["result"][str(pid)]["displayName"] == f"player{pid}", result
+    posts_before_write = stub.posts
+    # 写方法不参与合并
+    kick = await api.kickPlayer(1, 1000, "test")
+    assert kick["result"] == "success", kick
+    assert stub.posts == posts_before_write + 1
+
+    batch_size = api.rpc_batcher.max_batch_size
+    if accept_batch:
+        assert stub.posts - 1 == -(-calls // batch_size), stub.posts
+        assert api.rpc_batcher.batched_calls == calls
+        # 批量请求按其中的方法统计，不出现"batch"
+        stats = gateway_limiter.stats()
+        assert "batch" not in stats, stats
+        method_stats = stats["RSP.getPersonasByIds"]
+        assert method_stats["requests"] == stub.posts - 1, method_stats
+        assert method_stats["in_flight"] == 0 and method_stats["p95"] > 0
+    else:
+        assert not api.rpc_batcher.supported
+        # 被拒绝的批次逐个重发，之后不再合并
+        batch_posts = stub.batch_posts
+        results = await asyncio.gather(*[api.getPersonasByIds([pid]) for pid in pids])
+        assert all(isinstance(result, dict) for result in results)
+        assert stub.batch_posts == batch_posts, stub.batch_posts
+    print(
+        f"{'接受' if accept_batch else '拒绝'}批量: POST {stub.posts}次"
+        f"(其中批量{stub.batch_posts}次), 统计{api.rpc_batcher.stats()}"
+    )
+    await shared_http_session.close()
+    await runner.cleanup()
+
+
+async def main() -> None:
+    # 关闭响应缓存，只测试批量合并
+    gateway_cache.ttls = {}
+    await run_case(accept_batch=True)
+    await run_case(accept_batch=False)
+    print("测试通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
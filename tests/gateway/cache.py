@@ -0,0 +1,85 @@
+"""
+网关响应缓存测试：启动本地的假网关，检查缓存命中、相同请求合并、写方法绕过缓存
+
+在项目根目录下运行(需要 config/config.yaml):
+    python tests/gateway/cache.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from aiohttp import web  # noqa: E402
+
+from utils.bf1.gateway_api import api_instance  # noqa: E402
+from utils.bf1.gateway_cache import gateway_cache  # noqa: E402
+from utils.http_session import shared_http_session  # noqa: E402
+
+
+class StubGateway:
+    """按请求返回固定数据的假网关，记录收到的方法"""
+
+    def __init__(self):
+        self.methods: list[str] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        items = body if isinstance(body, list) else [body]
+        result = []
+        for item in items:
+            self.methods.append(item["method"])
+            # 模拟网关延迟，使并发的相同请求能够合并
+            await asyncio.sleep(0.05)
+            result.append({"jsonrpc": "2.0", "id": item["id"], "result": {"ok": True}})
+        return web.json_response(result if isinstance(body, list) else result[0])
+
+
+async def main() -> None:
+    stub = StubGateway()
+    app = web.Application()
+    app.router.add_post("/jsonrpc/pc/api", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    api = api_instance.get_api_instance(0, session="stub-session")
+    api.api_url = f"http://127.0.0.1:{port}/jsonrpc/pc/api"
+
+    # 并发的相同请求只发出一次
+    results = await asyncio.gather(
+        *[api.detailedStatsByPersonaId(1) for _ in range(10)]
+    )
+    assert all(result["result"]["ok"] for result in results)
+    assert stub.methods.count("Stats.detailedStatsByPersonaId") == 1, stub.methods
+    # 缓存时间内再次请求直接命中
+    await api.detailedStatsByPersonaId(1)
+    assert stub.methods.count("Stats.detailedStatsByPersonaId") == 1, stub.methods
+    # 调用者修改返回结果不影响缓存
+    results[0]["result"]["ok"] = False
+    assert (await api.detailedStatsByPersonaId(1))["result"]["ok"]
+    # 不同参数不共用缓存
+    await api.detailedStatsByPersonaId(2)
+    assert stub.methods.count("Stats.detailedStatsByPersonaId") == 2, stub.methods
+    # 写方法每次都发出，并使服务器详情缓存失效
+    await api.getFullServerDetails(1)
+    await api.kickPlayer(1, 1, "test")
+    await api.kickPlayer(1, 1, "test")
+    assert stub.methods.count("RSP.kickPlayer") == 2, stub.methods
+    await api.getFullServerDetails(1)
+    assert stub.methods.count("GameServer.getFullServerDetails") == 2, stub.methods
+    stats = gateway_cache.stats()
+    print(
+        f"命中{stats['hits']}次, 未命中{stats['misses']}次, 合并{stats['coalesced']}次, "
+        f"命中率{stats['hit_rate']:.0%}"
+    )
+    print("测试通过")
+    await shared_http_session.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
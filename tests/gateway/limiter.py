@@ -0,0 +1,104 @@
+"""
+网关自适应并发限制测试：检查
+- 超过并发上限的请求按顺序排队，归还名额后唤醒
+- 排队中被取消的请求离开队列，拿到名额后才被取消的请求归还名额
+- 排队的请求被取消后、恢复执行前名额被归还时，调用者只收到CancelledError
+- 成功时加法增大上限，过载时乘法减小，冷却时间内只减小一次
+
+在项目根目录下运行:
+    python tests/gateway/limiter.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from utils.bf1.gateway_limiter import AdaptiveLimiter  # noqa: E402
+
+
+async def check_queue_order():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    order = []
+
+    async def worker(name: str):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(worker(name) for name in "abc"))
+    assert order == ["a", "b", "c"]
+    assert limiter.in_flight == 0 and limiter.queued == 0
+
+
+async def check_cancel_queued():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert waiter.cancelled() and limiter.queued == 0
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+async def check_cancel_after_wake():
+    # release已经把名额交给排队的请求，请求恢复执行前被取消，需要归还名额
+    limiter = AdaptiveLimiter(initial_limit=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release()
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert waiter.cancelled()
+    assert limiter.in_flight == 0 and limiter.queued == 0
+
+
+async def check_cancel_then_release():
+    # 同一轮事件循环中先取消排队的请求再归还名额：
+    # release从队列中取出已取消的future并跳过，请求恢复执行时future已经不在队列中
+    limiter = AdaptiveLimiter(initial_limit=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    other = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 2
+    waiter.cancel()
+    limiter.release()
+    results = await asyncio.gather(waiter, other, return_exceptions=True)
+    assert waiter.cancelled(), results
+    assert results[1] is None
+    # 名额交给了下一个排队的请求
+    assert limiter.in_flight == 1 and limiter.queued == 0
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+def check_aimd():
+    limiter = AdaptiveLimiter(initial_limit=4, slow_threshold=1.0, cooldown=60)
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 4.9 < limiter.limit < 5
+    limiter.on_overload()
+    limiter.on_overload()
+    assert 2.4 < limiter.limit < 2.5
+    # 延迟超过阈值视为过载，冷却时间内不再减小
+    limiter.on_success(2.0)
+    assert 2.4 < limiter.limit < 2.5
+
+
+async def main() -> None:
+    await check_queue_order()
+    await check_cancel_queued()
+    await check_cancel_after_wake()
+    await check_cancel_then_release()
+    check_aimd()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
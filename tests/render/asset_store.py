@@ -0,0 +1,132 @@
+"""
+素材下载缓存测试：启动本地的图片服务器，在临时目录中检查
+- 同一文件的并发请求只下载一次，之后读取本地文件
+- 404的地址在一段时间内不再请求
+- 过期后重新下载，下载失败时使用过期的文件
+- 总大小超过上限时删除最久未使用的文件，不删除pattern之外的文件
+- 预下载跳过已有的文件，后台预下载任务的异常被记录到日志
+
+在项目根目录下运行(需要 config/config.yaml):
+    python tests/render/asset_store.py
+"""
+
+import asyncio
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from aiohttp import web  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from utils.asset_store import AssetStore, _log_prefetch_error  # noqa: E402
+from utils.http_session import shared_http_session  # noqa: E402
+
+
+class StubServer:
+    """/ok/<name> 返回100字节，/missing/<name> 返回404，/fail/<name> 返回500"""
+
+    def __init__(self):
+        self.requests: Counter[str] = Counter()
+        self.available = True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        # 模拟下载耗时，使并发请求能够合并
+        await asyncio.sleep(0.05)
+        kind, name = request.path.strip("/").split("/")
+        if kind == "missing":
+            return web.Response(status=404)
+        if kind == "fail" or not self.available:
+            return web.Response(status=500)
+        return web.Response(body=name[0].encode() * 100)
+
+
+async def main() -> None:
+    logger.remove()
+    stub = StubServer()
+    app = web.Application()
+    app.router.add_get("/{kind}/{name}", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        (root / "default.jpg").write_bytes(b"d" * 1000)
+        store = AssetStore(
+            root, max_bytes=250, max_age=0.3, pattern="[a-z].jpg", retries=2
+        )
+
+        # 并发请求只下载一次
+        results = await asyncio.gather(
+            *(store.get(f"{base_url}/ok/a.jpg") for _ in range(10))
+        )
+        assert results == [b"a" * 100] * 10
+        assert stub.requests["/ok/a.jpg"] == 1 and store.joined == 9
+        assert (root / "a.jpg").read_bytes() == b"a" * 100
+        assert await store.get(f"{base_url}/ok/a.jpg") == b"a" * 100
+        assert stub.requests["/ok/a.jpg"] == 1 and store.hits == 1
+        path = await store.get_path(f"{base_url}/ok/a.jpg")
+        assert path == root / "a.jpg"
+
+        # 404不再请求，500重试后放弃
+        for _ in range(3):
+            assert await store.get(f"{base_url}/missing/m.jpg") is None
+        assert stub.requests["/missing/m.jpg"] == 1 and store.negative_hits == 2
+        assert await store.get_path(f"{base_url}/fail/f.jpg") is None
+        assert stub.requests["/fail/f.jpg"] == 2
+
+        # 过期后重新下载，服务器出错时使用过期的文件
+        await asyncio.sleep(0.35)
+        assert await store.get(f"{base_url}/ok/a.jpg") == b"a" * 100
+        assert stub.requests["/ok/a.jpg"] == 2
+        await asyncio.sleep(0.35)
+        stub.available = False
+        assert await store.get(f"{base_url}/ok/a.jpg") == b"a" * 100
+        assert stub.requests["/ok/a.jpg"] == 4
+        stub.available = True
+
+        # 超过250字节时删除最久未使用的文件，default.jpg不受影响
+        await store.get(f"{base_url}/ok/b.jpg")
+        await store.get(f"{base_url}/ok/a.jpg")
+        await store.get(f"{base_url}/ok/c.jpg")
+        assert not (root / "b.jpg").exists() and store.evictions == 1
+        assert (root / "default.jpg").exists()
+        assert store.stats()["used"] == 200
+
+        # 新实例读取已有的文件，预下载只下载缺少的
+        store = AssetStore(root, pattern="[a-z].jpg")
+        assert store.stats()["files"] == 0
+        downloaded = await store.prefetch(
+            f"{base_url}/ok/{name}.jpg" for name in "acde"
+        )
+        assert downloaded == 2 and store.stats()["files"] == 4
+        assert stub.requests["/ok/c.jpg"] == 1
+        print(store.stats())
+
+    # 后台预下载任务的异常不会被忽略
+    errors = []
+    handler = logger.add(errors.append, level="ERROR")
+
+    async def broken_prefetch():
+        raise RuntimeError("prefetch")
+
+    task = asyncio.create_task(broken_prefetch())
+    task.add_done_callback(_log_prefetch_error)
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+    logger.remove(handler)
+    assert len(errors) == 1 and "RuntimeError('prefetch')" in errors[0]
+
+    await shared_http_session.close()
+    await runner.cleanup()
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+渲染缓存测试：在临时目录中检查
+- 相同输入命中缓存，每次返回新的临时文件，删除后不影响缓存
+- 总大小超过上限时淘汰最久未使用的图片，过期的缓存不再命中
+- 重启(新实例)后读取已有的缓存文件
+- 清理时删除超过保留时间的临时文件
+
+在项目根目录下运行:
+    python tests/render/cache.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+
+from utils.render_cache import RenderCache  # noqa: E402
+
+
+async def main() -> None:
+    logger.remove()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_root = Path(temp_dir)
+        cache = RenderCache(temp_root, max_bytes=250)
+
+        # 键只取决于数据内容，和dict顺序无关
+        key1 = cache.key("stat", {"kills": 1, "deaths": 2}, None)
+        assert key1 == cache.key("stat", {"deaths": 2, "kills": 1}, None)
+        key2 = cache.key("stat", {"kills": 2, "deaths": 2}, None)
+        assert key1 != key2
+
+        assert await cache.get(key1) is None
+        path = await cache.put(key1, b"1" * 100)
+        assert path.read_bytes() == b"1" * 100
+        path.unlink()
+        hit = await cache.get(key1)
+        assert hit and hit != path and hit.read_bytes() == b"1" * 100
+        hit.unlink()
+
+        # 超过250字节时淘汰最久未使用的key2
+        (await cache.put(key2, b"2" * 100)).unlink()
+        (await cache.get(key1)).unlink()
+        key3 = cache.key("stat", 3)
+        (await cache.put(key3, b"3" * 100)).unlink()
+        assert await cache.get(key2) is None
+        assert cache.stats()["used"] == 200 and cache.evictions == 1
+
+        # 新实例读取已有的缓存
+        cache = RenderCache(temp_root, max_bytes=250, max_age=0.2)
+        (await cache.get(key3)).unlink()
+        assert cache.stats()["entries"] == 2
+
+        # 过期后不再命中，清理时删除旧的临时文件
+        await asyncio.sleep(0.25)
+        assert await cache.get(key3) is None
+        old_file = temp_root / "old.png"
+        old_file.write_bytes(b"")
+        os.utime(old_file, (time.time() - 7200, time.time() - 7200))
+        new_file = temp_root / "new.png"
+        new_file.write_bytes(b"")
+        assert await cache.clean() == 1
+        assert not old_file.exists() and new_file.exists()
+        assert cache.stats()["entries"] == 0 and cache.stats()["used"] == 0
+        assert not list((temp_root / "cache").iterdir())
+        print(cache.stats())
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+玩家列表图测试：用固定的玩家列表检查
+- 获取到生涯战绩的玩家按战绩重新计算等级，获取失败的玩家保留游戏内等级
+- 整体获取超时(没有任何战绩)时所有玩家都保留游戏内等级
+- 队伍按等级排序，行数据、满级数量与玩家对应
+- 渲染结果为1920x1080的图片，相同数据的渲染结果相同，等级不同时结果不同
+
+在项目根目录下运行(需要 data/battlefield 下的队伍图标、延迟图标、字体和游戏模式数据，缺少地图时会下载):
+    python tests/render/player_list.py
+"""
+
+import asyncio
+import copy
+import sys
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from loguru import logger  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from utils.bf1.draw import PlayerListPic  # noqa: E402
+
+MAP_NAME = "MP_Amiens"
+
+
+def make_player(pid: int, name: str, team: int, rank: int) -> dict:
+    """与BlazeData.player_list_handle整理出的玩家格式相同"""
+    return {
+        "display_name": name,
+        "pid": pid,
+        "uid": pid,
+        "role": "soldier",
+        "rank": rank,
+        "latency": 30 + pid,
+        "team": team,
+        "join_time": 0,
+        "platoon": {"tag": "TAG"} if pid == 1 else None,
+        "language": "zh-CN",
+    }
+
+
+def make_stats(time_played: int, spm: float) -> dict:
+    return {
+        "result": {
+            "basicStats": {
+                "timePlayed": time_played,
+                "spm": spm,
+                "wins": 60,
+                "losses": 40,
+                "kpm": 1.23,
+            },
+            "kdr": 2.5,
+        }
+    }
+
+
+def make_server_info() -> dict:
+    return {
+        "serverInfo": {
+            "mapName": MAP_NAME,
+            "name": "测试服务器",
+            "description": "测试简介",
+            "mapModePretty": "征服",
+            "mapNamePretty": "亚眠",
+            "serverBookmarkCount": 1,
+            "slots": {
+                "Soldier": {"current": 5, "max": 64},
+                "Queue": {"current": 0},
+                "Spectator": {"current": 0},
+            },
+        },
+        "rspInfo": {"adminList": [{"personaId": 2}], "vipList": []},
+    }
+
+
+def make_playerlist() -> dict:
+    return {
+        "time": 0,
+        "players": [
+            make_player(1, "Alpha", 0, 50),
+            make_player(2, "Bravo", 0, 120),
+            make_player(3, "Charlie", 0, 10),
+            make_player(4, "Delta", 1, 80),
+            make_player(5, "Echo", 1, 150),
+        ],
+    }
+
+
+def team_ranks(playerlist_data: dict) -> list[list[tuple[str, int]]]:
+    return [
+        [(p["display_name"], p["rank"]) for p in playerlist_data["teams"][team_id]]
+        for team_id in (0, 1)
+    ]
+
+
+def build(map_pic: str, results: list) -> tuple[dict, dict]:
+    playerlist_data = make_playerlist()
+    stat_dict = PlayerListPic.apply_stats(playerlist_data["players"], results)
+    data = PlayerListPic.build_data(
+        playerlist_data, make_server_info(), {"CHARLIE"}, map_pic, stat_dict
+    )
+    return playerlist_data, data
+
+
+async def main() -> None:
+    logger.remove()
+    map_pic = await PlayerListPic.get_server_map_pic(MAP_NAME)
+    assert map_pic, "获取地图图片失败"
+
+    # Alpha满级，Bravo和Delta获取失败，Charlie经验很少，Echo返回了非dict
+    results = [make_stats(10**7, 1000), None, make_stats(60, 1), "", None]
+    playerlist_data, data = build(map_pic, results)
+    assert team_ranks(playerlist_data) == [
+        [("Alpha", 150), ("Bravo", 120), ("Charlie", 0)],
+        [("Echo", 150), ("Delta", 80)],
+    ]
+    rows = data["teams"][0]
+    assert [row[1] for row in rows] == ["[TAG]Alpha", "Bravo", "Charlie"]
+    assert rows[0][5] == (60, 2.5, 1.23, "2777.8") and rows[1][5] is None
+    assert rows[1][2] == PlayerListPic.admin_color
+    assert rows[2][2] == PlayerListPic.bind_color
+    # 在线管理、VIP、群友、150数量
+    assert data["counters"] == [1, 0, 1, 2]
+
+    # 整体超时，保留所有游戏内等级
+    timeout_data, _ = build(map_pic, [])
+    assert team_ranks(timeout_data) == [
+        [("Bravo", 120), ("Alpha", 50), ("Charlie", 10)],
+        [("Echo", 150), ("Delta", 80)],
+    ]
+
+    image_bytes = PlayerListPic.render(data)
+    image = Image.open(BytesIO(image_bytes))
+    assert image.format == "JPEG" and image.size == (1920, 1080)
+    assert PlayerListPic.render(copy.deepcopy(data)) == image_bytes
+    changed = copy.deepcopy(data)
+    changed["teams"][0][1] = (0, *changed["teams"][0][1][1:])
+    assert PlayerListPic.render(changed) != image_bytes
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,13 +16,20 @@ class AlembicService(Launchable):
 
     @property
     def stages(self):
-        return {"preparing"}
+        return {"preparing", "blocking", "cleanup"}
 
     async def launch(self, _mgr: Launart):
         async with self.stage("preparing"):
             try:
                 _ = await orm.init_check()
+                await orm.run_migrations()
                 core = create(Umaru)
                 _ = await core.alembic()
             except (AttributeError, InternalError, ProgrammingError):
                 _ = await orm.create_all()
+                await orm.run_migrations()
+        async with self.stage("blocking"):
+            await _mgr.status.wait_for_sigexit()
+        async with self.stage("cleanup"):
+            # 退出前写完写队列中剩余的数据
+            await orm.stop_writer()
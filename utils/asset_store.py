@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from pathlib import Path
+
+import aiohttp
+from creart import create
+from launart import Launart, Launchable
+from loguru import logger
+
+from core.config import GlobalConfig
+from utils.disk_lru import DiskLRU
+from utils.http_session import get_http_session
+
+config = create(GlobalConfig)
+proxy = config.proxy if config.proxy != "proxy" else ""
+
+
+class AssetStore:
+    """图片素材的下载和磁盘缓存
+
+    - 同一文件同时只下载一次，并发请求等待同一个下载任务
+    - 使用共用的HTTP连接池，下载失败时重试
+    - 先写入临时文件再替换，不会读到写了一半的文件；总大小超过上限时按LRU删除
+    - 404等不存在的地址在一段时间内不再请求
+    - 设置了有效时间时，过期的文件会重新下载，下载失败时仍使用过期的文件
+    """
+
+    # 这些状态码表示资源不存在，重试也没有意义
+    missing_status = (403, 404, 410)
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int | None = None,
+        max_age: float | None = None,
+        pattern: str = "*",
+        negative_ttl: float = 600,
+        retries: int = 3,
+        timeout: float = 10,
+    ):
+        """
+        :param root: 保存目录
+        :param max_bytes: 文件总大小上限(字节)，None为不限制
+        :param max_age: 文件有效时间(秒)，None为永久有效
+        :param pattern: 由这个store管理的文件名，目录中的其他文件不会被删除
+        :param negative_ttl: 不存在的地址在多长时间(秒)内不再请求
+        :param retries: 下载失败时的尝试次数
+        :param timeout: 单次下载的超时时间(秒)
+        """
+        self.root = root
+        self.files = DiskLRU(root, max_bytes, pattern=pattern)
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # {文件名: 下载任务}
+        self.downloading: dict[str, asyncio.Task] = {}
+        # {url: 不再请求的截止时间}
+        self.missing: dict[str, float] = {}
+        # 统计
+        self.hits = 0
+        self.downloads = 0
+        self.joined = 0
+        self.failures = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def name_of(url: str) -> str:
+        """默认的文件名: url的最后一段，没有扩展名时使用url的哈希"""
+        name = url.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+        if "." in name:
+            return name
+        return AssetStore.hashed_name(url)
+
+    @staticmethod
+    def hashed_name(url: str, suffix: str = "") -> str:
+        """以url的哈希作为文件名，用于最后一段会重复的url"""
+        return hashlib.sha256(url.encode()).hexdigest()[:32] + suffix
+
+    def _fresh(self, name: str) -> bool:
+        entry = self.files.get(name)
+        return bool(entry) and (
+            self.max_age is None or entry[1] + self.max_age > time.time()
+        )
+
+    async def get(self, url: str, name: str | None = None) -> bytes | None:
+        """
+        获取url对应的文件内容，本地没有或已过期时下载
+        :param name: 保存的文件名，默认为url的最后一段
+        :return: 下载失败且本地没有文件时返回None
+        """
+        name = name or self.name_of(url)
+        data = await self._fetch(url, name)
+        if data is not None:
+            return data
+        return await self.read(name)
+
+    async def get_path(self, url: str, name: str | None = None) -> Path | None:
+        """与get相同，返回文件路径"""
+        name = name or self.name_of(url)
+        await self._fetch(url, name)
+        return self.files.path(name) if self.files.get(name) else None
+
+    async def read(self, name: str) -> bytes | None:
+        """读取本地的文件，不下载，过期的文件也会返回"""
+        if not self.files.get(name):
+            return None
+        try:
+            data = await asyncio.to_thread(self.files.path(name).read_bytes)
+        except OSError as e:
+            logger.warning(f"读取素材{name}失败: {e!r}")
+            self.files.remove(name)
+            return None
+        self.files.touch(name)
+        return data
+
+    async def _fetch(self, url: str, name: str) -> bytes | None:
+        """本地文件有效时读取，否则下载；同一文件的并发请求共用一个下载任务"""
+        if self._fresh(name) and (data := await self.read(name)) is not None:
+            self.hits += 1
+            return data
+        if self.missing.get(url, 0) > time.time():
+            self.negative_hits += 1
+            return None
+        if task := self.downloading.get(name):
+            self.joined += 1
+        else:
+            task = asyncio.create_task(self._download(url, name))
+            self.downloading[name] = task
+            task.add_done_callback(lambda _: self.downloading.pop(name, None))
+        # 调用者被取消时不影响其他等待同一下载的请求
+        return await asyncio.shield(task)
+
+    async def _download(self, url: str, name: str) -> bytes | None:
+        for attempt in range(self.retries):
+            try:
+                async with get_http_session().get(
+                    url, timeout=self.timeout, proxy=proxy or None
+                ) as resp:
+                    if resp.status in self.missing_status:
+                        logger.warning(f"素材不存在({resp.status}): {url}")
+                        self.missing[url] = time.time() + self.negative_ttl
+                        self.failures += 1
+                        return None
+                    resp.raise_for_status()
+                    data = await resp.read()
+                break
+            except (aiohttp.ClientError, TimeoutError) as e:
+                logger.warning(
+                    f"下载素材失败({attempt + 1}/{self.retries}): {url} {e!r}"
+                )
+                if attempt + 1 < self.retries:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+        else:
+            self.failures += 1
+            return None
+        self.downloads += 1
+        try:
+            await asyncio.to_thread(self.files.write, name, data)
+        except OSError as e:
+            logger.warning(f"保存素材{name}失败: {e!r}")
+            return data
+        self.evictions += len(self.files.add(name, len(data)))
+        return data
+
+    async def prefetch(self, urls: Iterable[str], concurrency: int = 4) -> int:
+        """下载本地没有的文件，返回成功下载的数量"""
+        semaphore = asyncio.Semaphore(concurrency)
+        downloads = self.downloads
+
+        async def fetch(url: str):
+            async with semaphore:
+                await self._fetch(url, self.name_of(url))
+
+        await asyncio.gather(
+            *(fetch(url) for url in urls if not self._fresh(self.name_of(url)))
+        )
+        return self.downloads - downloads
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.files.entries or ()),
+            "used": self.files.used,
+            "max_bytes": self.files.max_bytes,
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "joined": self.joined,
+            "failures": self.failures,
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+        }
+
+
+# BF1的素材
+map_store = AssetStore(Path("./data/battlefield/pic/map/"))
+skin_store = AssetStore(
+    Path("./data/battlefield/pic/skins/"), max_bytes=512 * 1024 * 1024
+)
+# 头像以pid命名，一天后重新下载；目录中的默认头像不由这里管理
+avatar_store = AssetStore(
+    Path("./data/battlefield/pic/avatar/"),
+    max_bytes=256 * 1024 * 1024,
+    max_age=86400,
+    pattern="[0-9]*.jpg",
+)
+emblem_store = AssetStore(
+    Path("./data/battlefield/pic/emblem/"), max_bytes=128 * 1024 * 1024
+)
+
+# 启动后在后台执行的预下载
+_prefetches: list[Callable[[], Awaitable]] = []
+
+
+def add_prefetch(func: Callable[[], Awaitable]):
+    """添加启动后在后台执行的预下载"""
+    _prefetches.append(func)
+
+
+def _log_prefetch_error(task: asyncio.Task):
+    if not task.cancelled() and (e := task.exception()):
+        logger.opt(exception=e).error(f"素材预下载失败: {e!r}")
+
+
+class AssetStoreService(Launchable):
+    id = "umaru.core.asset_store"
+
+    @property
+    def required(self):
+        return {"umaru.core.http_session"}
+
+    @property
+    def stages(self):
+        return {"blocking", "cleanup"}
+
+    async def launch(self, _mgr: Launart):
+        async with self.stage("blocking"):
+            tasks = [asyncio.create_task(func()) for func in _prefetches]
+            for task in tasks:
+                task.add_done_callback(_log_prefetch_error)
+            await _mgr.status.wait_for_sigexit()
+        async with self.stage("cleanup"):
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for name, store in (
+                ("地图", map_store),
+                ("皮肤", skin_store),
+                ("头像", avatar_store),
+                ("战队徽章", emblem_store),
+            ):
+                logger.success(f"{name}素材: {store.stats()}")
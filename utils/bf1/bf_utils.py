@@ -22,13 +22,17 @@ from revChatGPT.V3 import Chatbot
 
 from core.config import GlobalConfig
 from core.control import Permission
-from utils.bf1.blaze.BlazeClient import BlazeClientManagerInstance
+from utils.asset_store import skin_store
+from utils.bf1.blaze.BlazeClient import (
+    BlazeClientManagerInstance,
+    BlazeConnectionPool,
+)
 from utils.bf1.blaze.BlazeSocket import BlazeSocket
-from utils.bf1.data_handle import BlazeData
 from utils.bf1.database import BF1DB
 from utils.bf1.default_account import BF1DA
 from utils.bf1.gateway_api import api_instance
 from utils.bf1.map_team_info import MapData
+from utils.bf1.player_list import player_list_service
 
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -414,30 +418,8 @@ async def record_api(player_pid) -> dict | None:
 
 # 下载交换皮肤
 async def download_skin(url):
-    file_name = "./data/battlefield/pic/skins/" + url[url.rfind("/") + 1 :]
-    # noinspection PyBroadException
-    try:
-        fp = open(file_name, "rb")
-        fp.close()
-        return file_name
-    except Exception as e:
-        logger.warning(e)
-        i = 0
-        while i < 3:
-            async with aiohttp.ClientSession() as session:
-                # noinspection PyBroadException
-                try:
-                    async with session.get(
-                        url, timeout=5, verify_ssl=False, proxy=proxy
-                    ) as resp:
-                        pic = await resp.read()
-                        with open(file_name, "wb") as fp:
-                            fp.write(pic)
-                        return file_name
-                except Exception as e:
-                    logger.error(e)
-                    i += 1
-        return None
+    path = await skin_store.get_path(url)
+    return str(path) if path else None
 
 
 # 通过接口获取玩家列表
@@ -1403,62 +1385,94 @@ class BF1ServerVipManager:
 
 class BF1BlazeManager:
     @staticmethod
-    async def init_socket(pid: str | int, remid: str, sid: str) -> BlazeSocket | None:
+    def get_pool(pid: str | int, remid: str, sid: str) -> BlazeConnectionPool:
+        """获取账号的Blaze连接池，连接由连接池按需建立并登录"""
         pid = int(pid)
-        if pid in BlazeClientManagerInstance.clients_by_pid:
-            blaze_socket = BlazeClientManagerInstance.clients_by_pid[pid]
-            if blaze_socket.authenticated:
-                return await BlazeClientManagerInstance.get_socket_for_pid(pid)
-            else:
-                await BlazeClientManagerInstance.remove_client(pid)
-        # 连接blaze
-        blaze_socket = await BlazeClientManagerInstance.get_socket_for_pid(pid)
-        if not blaze_socket:
-            logger.error("无法获取到BlazeSocket")
-            return None
-        # 1.获取账号实例
-        bf1_account = api_instance.get_api_instance(pid=pid, remid=remid, sid=sid)
-        # 2.获取BlazeAuthcode
-        auth_code = await bf1_account.getBlazeAuthcode()
-        logger.success(f"获取到Blaze AuthCode: {auth_code}")
-        # 3.Blaze登录
-        login_packet = {
-            "method": "Authentication.login",
-            "type": "Command",
-            "id": 0,
-            "length": 28,
-            "data": {"AUTH 1": auth_code, "EXTB 2": "", "EXTI 0": 0},
-        }
-        response = await blaze_socket.send(login_packet)
+
+        async def authenticate(blaze_socket: BlazeSocket) -> bool:
+            # 1.获取账号实例
+            bf1_account = api_instance.get_api_instance(pid=pid, remid=remid, sid=sid)
+            # 2.获取BlazeAuthcode
+            auth_code = await bf1_account.getBlazeAuthcode()
+            logger.success(f"获取到Blaze AuthCode: {auth_code}")
+            # 3.Blaze登录
+            login_packet = {
+                "method": "Authentication.login",
+                "type": "Command",
+                "id": 0,
+                "length": 28,
+                "data": {"AUTH 1": auth_code, "EXTB 2": "", "EXTI 0": 0},
+            }
+            response = await blaze_socket.send(login_packet)
+            try:
+                name = response["data"]["DSNM"]
+                uid = response["data"]["UID"]
+                CGID = response["data"]["CGID"][2]
+                logger.success(
+                    f"Blaze登录成功: Name:{name} Pid:{response['data']['PID']} Uid:{uid} CGID:{CGID}"
+                )
+                return True
+            except Exception as e:
+                logger.error(f"Blaze登录失败: {response}, {e}")
+                return False
+
+        bf1_config = config.functions.get("bf1", {})
+        return BlazeClientManagerInstance.get_pool(
+            pid,
+            authenticate,
+            size=bf1_config.get("blaze_sockets", 2),
+            max_in_flight=bf1_config.get("blaze_max_in_flight", 8),
+        )
+
+    @staticmethod
+    async def init_socket(
+        pid: str | int, remid: str, sid: str, relogin: bool = False
+    ) -> BlazeSocket | None:
+        """确保账号至少有一个已登录的连接，relogin为True时关闭现有连接后重新登录"""
+        if relogin:
+            await BlazeClientManagerInstance.remove_client(int(pid))
+        pool = BF1BlazeManager.get_pool(pid, remid, sid)
         try:
-            name = response["data"]["DSNM"]
-            pid = response["data"]["PID"]
-            uid = response["data"]["UID"]
-            CGID = response["data"]["CGID"][2]
-            logger.success(
-                f"Blaze登录成功: Name:{name} Pid:{pid} Uid:{uid} CGID:{CGID}"
-            )
-            blaze_socket.authenticated = True
-            BlazeClientManagerInstance.clients_by_pid[pid] = blaze_socket
-            return blaze_socket
-        except Exception as e:
-            logger.error(f"Blaze登录失败: {response}, {e}")
+            blaze_socket = await pool.acquire()
+        except ConnectionError as e:
+            logger.error(f"无法获取到BlazeSocket: {e}")
             return None
+        await pool.release(blaze_socket)
+        return blaze_socket
 
     @staticmethod
     async def get_player_list(
-        game_ids: list[int], origin: bool = False, platoon: bool = False
+        game_ids: list[int],
+        origin: bool = False,
+        platoon: bool = False,
+        use_cache: bool = True,
     ) -> dict | None | str:
-        """获取玩家列表"""
+        """
+        获取玩家列表
+        并发的查询合并为一个GLST请求，结果按gameId缓存几秒，见 PlayerListService
+        :param origin: 返回原始的Blaze响应(不经过缓存)
+        :param platoon: 附带玩家的战排信息
+        :param use_cache: 为False时不使用缓存的玩家列表，例如踢人后确认结果
+        """
         # 检查game_ids类型
         if not isinstance(game_ids, list):
             game_ids = [game_ids]
         game_ids = [int(game_id) for game_id in game_ids]
-        blaze_socket = await BF1BlazeManager.init_socket(
-            BF1DA.pid, BF1DA.remid, BF1DA.sid
+        if origin:
+            return await BF1BlazeManager.fetch_game_data(game_ids)
+        response = await player_list_service.get(
+            game_ids, BF1BlazeManager.fetch_game_data, use_cache
         )
-        if not blaze_socket:
-            return "BlazeClient初始化出错!"
+        if not isinstance(response, dict):
+            return response
+        if platoon:
+            await BF1BlazeManager.attach_platoons(response)
+        return response
+
+    @staticmethod
+    async def fetch_game_data(game_ids: list[int]) -> dict | str:
+        """发送GLST请求，出错时返回错误信息"""
+        pool = BF1BlazeManager.get_pool(BF1DA.pid, BF1DA.remid, BF1DA.sid)
         packet = {
             "method": "GameManager.getGameDataFromId",
             "type": "Command",
@@ -1468,48 +1482,47 @@ class BF1BlazeManager:
             },
         }
         try:
-            response = await blaze_socket.send(packet)
+            # 超时的连接由连接池关闭，登录失效时连接池重新登录并重试一次
+            return await pool.send(packet)
         except TimeoutError:
-            try:
-                await blaze_socket.close()
-            except Exception as e:
-                logger.error(f"关闭连接时出错: {e}")
             logger.error("Blaze后端超时!")
             return "Blaze后端超时!"
-        if origin:
-            return response
-        response = BlazeData.player_list_handle(response)
-        if not isinstance(response, dict):
-            blaze_socket.authenticated = False
-            return response
-        if platoon:
-            bf1_account = await BF1DA.get_api_instance()
-            for game_id in game_ids:
-                if game_id in response:
-                    pid_list = [
-                        player["pid"] for player in response[game_id]["players"]
-                    ]
-                    platoon_task = [
-                        bf1_account.getActivePlatoon(pid) for pid in pid_list
-                    ]
-                    try:
-                        platoon_list = await asyncio.gather(*platoon_task)
-                    except Exception as e:
-                        logger.error(f"获取玩家战排信息失败: {e}")
-                        platoon_list = []
-                    platoons = []
-                    for i, platoon in enumerate(platoon_list):
-                        if isinstance(platoon, dict):
-                            platoon = platoon["result"]
-                            if not platoon:
-                                continue
-                            if platoon not in platoons:
-                                platoons.append(platoon)
-                            response[game_id]["players"][i]["platoon"] = platoon
-                        else:
-                            response[game_id]["players"][i]["platoon"] = {}
-                    response[game_id]["platoons"] = platoons
-        return response
+        except ConnectionError as e:
+            logger.error(f"BlazeClient初始化出错: {e}")
+            return "BlazeClient初始化出错!"
+
+    @staticmethod
+    async def attach_platoons(player_list: dict):
+        """
+        为玩家列表附带战排信息
+        所有服务器中的玩家去重后每人只查询一次，战排信息由网关响应缓存按pid缓存
+        """
+        pids = list(
+            dict.fromkeys(
+                player["pid"]
+                for server in player_list.values()
+                for player in server["players"]
+            )
+        )
+        bf1_account = await BF1DA.get_api_instance()
+        results = await asyncio.gather(
+            *(bf1_account.getActivePlatoon(pid) for pid in pids),
+            return_exceptions=True,
+        )
+        platoon_by_pid = {}
+        for pid, result in zip(pids, results):
+            if isinstance(result, dict) and result.get("result"):
+                platoon_by_pid[pid] = result["result"]
+            elif isinstance(result, Exception):
+                logger.error(f"获取玩家{pid}战排信息失败: {result!r}")
+        for server in player_list.values():
+            platoons = []
+            for player in server["players"]:
+                platoon = platoon_by_pid.get(player["pid"], {})
+                player["platoon"] = platoon
+                if platoon and platoon not in platoons:
+                    platoons.append(platoon)
+            server["platoons"] = platoons
 
 
 async def perm_judge(bf_group_name: str, group: Group, sender: Member) -> bool:
@@ -1,80 +1,330 @@
-import random
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
 
 from utils.bf1.blaze.BlazeSocket import BlazeServerREQ, BlazeSocket
 
 
-class BlazeClient:
-    def __init__(self):
-        self.socket: BlazeSocket = None
+def error_code(component: int, code: int) -> int:
+    """Blaze错误码(ERRC)，高16位为错误号，低16位为组件ID"""
+    return (code << 16) | component
 
-    async def connect(
-        self, host: str = "diceprodblapp-08.ea.com", port: int = 10539, callback=None
-    ) -> BlazeSocket:
-        if not self.socket:
-            self.socket = await BlazeSocket.create(host, port, callback)
-        return self.socket
 
-    async def close(self):
-        if self.socket:
-            await self.socket.close()
-            self.socket = None
+# 表示登录已失效的错误码
+AUTH_ERRORS = frozenset(
+    {
+        error_code(0, 4),  # ERR_AUTHENTICATION_REQUIRED
+        error_code(0, 8),  # ERR_AUTHORIZATION_REQUIRED
+        error_code(1, 14),  # AUTH_ERR_EXPIRED_TOKEN
+    }
+)
 
 
-class BlazeClientManager:
-    def __init__(self):
-        self.clients_by_pid = {}
-
-    async def get_socket_for_pid(self, pid=None) -> BlazeSocket | None:
-        if not pid:
-            connected_clients = [
-                client for client in self.clients_by_pid.values() if client.connect
-            ]
+def is_auth_error(response: dict) -> bool:
+    if response.get("type") != "Error":
+        return False
+    data = response.get("data") or {}
+    return (data.get("ERRC") or data.get("ERRC 0")) in AUTH_ERRORS
+
+
+class RedirectorCache:
+    """缓存重定向服务返回的Blaze服务器地址，连接失败时失效"""
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        resolver: Callable[[], Awaitable[tuple[str, int]]] = None,
+    ):
+        self.ttl = ttl
+        self.resolver = resolver or BlazeServerREQ.get_server_address
+        self.address: tuple[str, int] | None = None
+        self.expire_time = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self) -> tuple[str, int]:
+        async with self._lock:
+            if self.address and self.expire_time > time.monotonic():
+                self.hits += 1
+                return self.address
+            self.misses += 1
+            self.address = await self.resolver()
+            self.expire_time = time.monotonic() + self.ttl
+            return self.address
+
+    def invalidate(self):
+        self.address = None
+
+
+class BlazeConnectionPool:
+    """单个账号的Blaze连接池
+
+    每个账号最多保持size个已登录的连接，请求发往正在处理的请求最少的连接，
+    每个连接同时处理的请求不超过max_in_flight，全部占满时排队等待。
+    连接由BlazeSocket的心跳检测存活，断开的连接会被移出连接池，需要时重新建立；
+    收到登录失效的响应或通知时，在后台用新连接重新登录并重试一次请求。
+    """
+
+    def __init__(
+        self,
+        pid: int,
+        authenticate: Callable[[BlazeSocket], Awaitable[bool]],
+        redirector: RedirectorCache,
+        size: int = 2,
+        max_in_flight: int = 8,
+        ping_interval: float = 60,
+        ping_timeout: float = 10,
+    ):
+        """
+        :param pid: 账号pid
+        :param authenticate: 在新连接上完成Authentication.login的协程函数，成功返回True
+        :param redirector: 共用的重定向地址缓存
+        :param size: 连接数
+        :param max_in_flight: 每个连接同时处理的请求上限
+        """
+        self.pid = pid
+        self.authenticate = authenticate
+        self.redirector = redirector
+        self.size = size
+        self.max_in_flight = max_in_flight
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.sockets: list[BlazeSocket] = []
+        self.in_flight: dict[BlazeSocket, int] = {}
+        self.opening = 0
+        self._changed = asyncio.Condition()
+        self._tasks: set[asyncio.Task] = set()
+        # 正在重新登录的连接
+        self._retiring: set[BlazeSocket] = set()
+        # 统计
+        self.requests = 0
+        self.waits = 0
+        self.connects = 0
+        self.connect_errors = 0
+        self.relogins = 0
+        self.retries = 0
+        self.closed_sockets = 0
+        self.ping_failures = 0
+        self.timeouts = 0
+
+    async def acquire(self) -> BlazeSocket:
+        """
+        获取一个已登录且未占满的连接，占用一个请求名额
+        :raise ConnectionError: 没有可用连接且新连接建立失败
+        """
+        waited = False
+        errors = self.connect_errors
+        async with self._changed:
+            while True:
+                self._prune()
+                ready = [
+                    socket
+                    for socket in self.sockets
+                    if socket.authenticated
+                    and self.in_flight[socket] < self.max_in_flight
+                ]
+                if ready:
+                    socket = min(ready, key=self.in_flight.__getitem__)
+                    if self.in_flight[socket]:
+                        # 已有连接都在处理请求时，后台补足连接数
+                        self._fill()
+                    self.in_flight[socket] += 1
+                    self.requests += 1
+                    return socket
+                if (
+                    not self.sockets
+                    and not self.opening
+                    and self.connect_errors > errors
+                ):
+                    raise ConnectionError(f"Blaze账号{self.pid}无法建立连接")
+                self._fill()
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                await self._changed.wait()
+
+    async def release(self, socket: BlazeSocket):
+        async with self._changed:
+            if socket in self.in_flight:
+                self.in_flight[socket] -= 1
+            self._changed.notify_all()
+
+    async def send(self, packet: dict, timeout: float = 60, readable: bool = True):
+        """
+        通过连接池发送请求
+        :raise TimeoutError: 请求超时，只放弃这个请求，迟到的响应会被丢弃；
+            连接上还有其他请求，是否存活由心跳判断
+        :raise ConnectionError: 无法建立或登录连接
+        """
+        for attempt in range(2):
+            socket = await self.acquire()
             try:
-                return random.choice(connected_clients)
-            except IndexError:
-                return None
-
-        if pid in self.clients_by_pid:
-            client = self.clients_by_pid[pid]
-            if client.connect:
-                return client
+                response = await socket.send(dict(packet), timeout, readable)
+            except ConnectionError:
+                self._spawn(self.discard(socket))
+                if attempt:
+                    raise
+                self.retries += 1
+                continue
+            finally:
+                await self.release(socket)
+            if attempt or not is_auth_error(response):
+                return response
+            logger.warning(f"Blaze账号{self.pid}登录已失效，重新登录后重试")
+            self.retries += 1
+            self.relogin(socket)
+        return response
+
+    def relogin(self, socket: BlazeSocket):
+        """在后台用新连接替换登录失效的连接"""
+        if socket not in self.in_flight or socket in self._retiring:
+            return
+        socket.authenticated = False
+        self._retiring.add(socket)
+        self.relogins += 1
+        self._spawn(self.discard(socket, replace=True))
+
+    async def discard(self, socket: BlazeSocket, replace: bool = False):
+        """移出并关闭连接，replace为True时立即建立新连接补足"""
+        async with self._changed:
+            if socket in self.in_flight:
+                self._forget(socket)
+            self._retiring.discard(socket)
+            if replace:
+                self._fill()
+            self._changed.notify_all()
+        if socket.connect:
+            await socket.close()
+
+    def _fill(self):
+        """连接数不足时在后台建立新连接，需持有self._changed"""
+        if len(self.sockets) + self.opening < self.size:
+            self.opening += 1
+            self._spawn(self._open())
+
+    async def _open(self):
+        socket = None
+        try:
+            host, port = await self.redirector.get()
             try:
-                await client.close()
-            except Exception as e:
-                from loguru import logger
+                socket = await BlazeSocket.create(
+                    host,
+                    port,
+                    ping_interval=self.ping_interval,
+                    ping_timeout=self.ping_timeout,
+                )
+            except OSError:
+                # 地址可能已失效，下次重新获取
+                self.redirector.invalidate()
+                raise
+            if not await self.authenticate(socket):
+                raise ConnectionError(f"Blaze账号{self.pid}登录失败")
+            socket.authenticated = True
+            socket.on_auth_expired = self.relogin
+            self.connects += 1
+        except Exception as e:
+            self.connect_errors += 1
+            logger.error(f"Blaze账号{self.pid}建立连接失败: {e!r}")
+            if socket:
+                await socket.close()
+            socket = None
+        finally:
+            async with self._changed:
+                self.opening -= 1
+                if socket:
+                    self.sockets.append(socket)
+                    self.in_flight[socket] = 0
+                self._changed.notify_all()
 
-                logger.error(f"关闭客户端连接时出错: {e}")
-            del self.clients_by_pid[pid]
+    def _prune(self):
+        """移出已断开(心跳失败/服务器关闭)的连接"""
+        for socket in [socket for socket in self.sockets if not socket.connect]:
+            self._forget(socket)
 
-        new_client = BlazeClient()
-        host, port = await BlazeServerREQ.get_server_address()
-        await new_client.connect(host, port, callback=None)
-        if new_client.socket and new_client.socket.connect:
-            self.clients_by_pid[pid] = new_client.socket
-            return self.clients_by_pid[pid]
-        else:
-            return None
+    def _forget(self, socket: BlazeSocket):
+        self.sockets.remove(socket)
+        del self.in_flight[socket]
+        self.closed_sockets += 1
+        # 保留已关闭连接的统计
+        self.ping_failures += socket.ping_failures
+        self.timeouts += socket.timeouts
 
-    async def close_all(self):
-        from loguru import logger
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
-        for client in self.clients_by_pid.values():
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        sockets, self.sockets = self.sockets, []
+        self.in_flight.clear()
+        for socket in sockets:
             try:
-                await client.close()
+                await socket.close()
             except Exception as e:
                 logger.error(f"关闭客户端连接时出错: {e}")
-        self.clients_by_pid.clear()
 
-    async def remove_client(self, pid: str):
-        if pid in self.clients_by_pid:
-            client = self.clients_by_pid[pid]
-            try:
-                await client.close()
-            except Exception as e:
-                from loguru import logger
+    def stats(self) -> dict:
+        return {
+            "sockets": len(self.sockets),
+            "authenticated": sum(socket.authenticated for socket in self.sockets),
+            "opening": self.opening,
+            "in_flight": sum(self.in_flight.values()),
+            "requests": self.requests,
+            "waits": self.waits,
+            "connects": self.connects,
+            "connect_errors": self.connect_errors,
+            "relogins": self.relogins,
+            "retries": self.retries,
+            "closed_sockets": self.closed_sockets,
+            "ping_failures": self.ping_failures
+            + sum(socket.ping_failures for socket in self.sockets),
+            "timeouts": self.timeouts + sum(socket.timeouts for socket in self.sockets),
+        }
 
-                logger.error(f"关闭客户端连接时出错: {e}")
-            del self.clients_by_pid[pid]
+
+class BlazeClientManager:
+    """按账号管理Blaze连接池，所有账号共用重定向地址缓存"""
+
+    def __init__(self, redirector: RedirectorCache = None):
+        self.redirector = redirector or RedirectorCache()
+        self.pools: dict[int, BlazeConnectionPool] = {}
+
+    def get_pool(
+        self,
+        pid: int,
+        authenticate: Callable[[BlazeSocket], Awaitable[bool]],
+        **kwargs,
+    ) -> BlazeConnectionPool:
+        """获取账号的连接池，不存在时创建；已存在时更新登录函数(账号的remid/sid可能已变化)"""
+        if pool := self.pools.get(pid):
+            pool.authenticate = authenticate
+            return pool
+        pool = BlazeConnectionPool(pid, authenticate, self.redirector, **kwargs)
+        self.pools[pid] = pool
+        return pool
+
+    async def close_all(self):
+        for pool in self.pools.values():
+            await pool.close()
+        self.pools.clear()
+
+    async def remove_client(self, pid: int):
+        if pool := self.pools.pop(pid, None):
+            await pool.close()
+
+    def stats(self) -> dict:
+        return {
+            "redirector": {
+                "hits": self.redirector.hits,
+                "misses": self.redirector.misses,
+            },
+            "pools": {pid: pool.stats() for pid, pool in self.pools.items()},
+        }
 
 
 BlazeClientManagerInstance = BlazeClientManager()
@@ -0,0 +1,322 @@
+import struct
+
+from utils.bf1.blaze.Blaze import QType, TYPE
+from utils.bf1.blaze.Method import Commands, Components
+
+# 包头: 长度(4) 扩展长度(2) 组件(2) 命令(2) 保留(1) ID(2) 类型(1) 保留(2)
+_HEADER = struct.Struct(">IHHHxHB2x")
+# 字段头: 3字节标签 + 1字节类型，作为一个uint32读取
+_FIELD = struct.Struct(">I")
+_unpack_header = _HEADER.unpack_from
+_unpack_field = _FIELD.unpack_from
+_unpack_float = struct.Struct(">f").unpack_from
+
+QTYPE_NAMES = {int(k): v for k, v in QType.items() if k.isdigit()}
+TYPE_NAMES = [TYPE[str(i)] for i in range(len(TYPE))]
+
+# 解码模式
+RAW = 0  # 键为 "TAG  类型"，可直接交给编码器
+READABLE = 1  # 键为去掉空格的标签
+COMPACT = 2  # 结构体/Map解码为 ((键, 值), ...) 元组
+
+# 常见标签，启动时预先计算
+KNOWN_TAGS = (
+    "ATTR", "AUTH", "CAP", "CGID", "DNAM", "DSNM", "ERRC", "EXID", "EXTB",
+    "EXTI", "GDAT", "GID", "GLST", "GNAM", "JGTS", "LOC", "NAME", "PATT",
+    "PCNT", "PID", "QCNT", "ROLE", "ROST", "TIDX", "UID",
+)  # fmt: skip
+# {3字节标签整数: 4字符标签}
+TAG_TABLE: dict[int, str] = {}
+# {字段头整数: (可读键, 原始键前缀, 类型)}
+_FIELD_TABLE: dict[int, tuple[str, str, int]] = {}
+# 字段头由数据决定，异常数据不应让缓存无限增长
+_FIELD_TABLE_LIMIT = 65536
+# {(组件, 命令): 方法名}
+_METHOD_NAMES: dict[tuple[int, int], str] = {}
+
+
+def encode_tag_int(tag: str) -> int:
+    return sum((ord(c) - 32) << (18 - 6 * i) for i, c in enumerate(tag.ljust(4)))
+
+
+def decode_tag(tag_int: int) -> str:
+    if tag := TAG_TABLE.get(tag_int):
+        return tag
+    tag = "".join(chr(((tag_int >> shift) & 63) + 32) for shift in (18, 12, 6, 0))
+    TAG_TABLE[tag_int] = tag
+    return tag
+
+
+for _tag in KNOWN_TAGS:
+    decode_tag(encode_tag_int(_tag))
+
+
+def _field_info(header: int) -> tuple[str, str, int]:
+    tag = decode_tag(header >> 8)
+    type_ = header & 0xFF
+    info = (tag.strip(), f"{tag} {type_}", type_)
+    if len(_FIELD_TABLE) < _FIELD_TABLE_LIMIT:
+        _FIELD_TABLE[header] = info
+    return info
+
+
+def method_name(component: int, command: int) -> str:
+    key = (component, command)
+    if name := _METHOD_NAMES.get(key):
+        return name
+    # 与原解码器一致，所有类型的包都按Command表取名
+    component_name = Components.get(component)
+    command_name = (
+        Commands.get(component_name, {}).get("Command", {}).get(str(command))
+    ) or str(command)
+    name = f"{component_name or component}.{command_name}"
+    _METHOD_NAMES[key] = name
+    return name
+
+
+def parse_integer(mv: memoryview, offset: int, _mode: int = RAW):
+    """Integer 不定长整数
+    首字节低6位为数值，0x40为符号位，0x80表示继续读取；之后每个字节的低7位依次拼接在高位。
+    """
+    byte = mv[offset]
+    offset += 1
+    value = byte & 0x3F
+    if byte & 0x80:
+        shift = 6
+        while True:
+            next_byte = mv[offset]
+            offset += 1
+            value |= (next_byte & 0x7F) << shift
+            if next_byte < 0x80:
+                break
+            shift += 7
+    return (-value if byte & 0x40 else value), offset
+
+
+def parse_string(mv: memoryview, offset: int, _mode: int = RAW):
+    """String 字符串，长度包含结尾的\\0"""
+    length = mv[offset]
+    if length < 0x40:
+        offset += 1
+    else:
+        length, offset = parse_integer(mv, offset)
+    start = offset
+    offset += length
+    try:
+        return str(mv[start : offset - 1], "utf-8"), offset
+    except UnicodeDecodeError as e:
+        # 与原解码器一致，保留最长的合法前缀
+        return str(mv[start : start + e.start], "utf-8"), offset
+
+
+def parse_blob(mv: memoryview, offset: int, _mode: int = RAW):
+    """Blob 二进制，返回hex字符串"""
+    length, offset = parse_integer(mv, offset)
+    return mv[offset : offset + length - 1].hex(), offset + length
+
+
+def parse_struct(mv: memoryview, offset: int, mode: int = RAW):
+    """Struct 结构体，以\\0结尾"""
+    items = {} if mode != COMPACT else []
+    end = len(mv)
+    while offset < end and mv[offset]:
+        header = _unpack_field(mv, offset)[0]
+        offset += 4
+        name, raw_key, type_ = _FIELD_TABLE.get(header) or _field_info(header)
+        if mode == RAW and 4 <= type_ <= 6:
+            raw_key += _type_suffix(mv, offset, type_)
+        if type_ == 0:
+            # 整数最常见，直接在这里解析，省去一次函数调用
+            byte = mv[offset]
+            offset += 1
+            value = byte & 0x3F
+            if byte & 0x80:
+                shift = 6
+                while True:
+                    next_byte = mv[offset]
+                    offset += 1
+                    value |= (next_byte & 0x7F) << shift
+                    if next_byte < 0x80:
+                        break
+                    shift += 7
+            if byte & 0x40:
+                value = -value
+        elif type_ < 11:
+            value, offset = PARSERS[type_](mv, offset, mode)
+        else:
+            raise TypeError("未知类型")
+        if mode == RAW:
+            items[raw_key] = value
+        elif mode == READABLE:
+            items[name] = value
+        else:
+            items.append((name, value))
+    offset += 1
+    return (items if mode != COMPACT else tuple(items)), offset
+
+
+def _type_suffix(mv: memoryview, offset: int, type_: int) -> str:
+    """List/Map/Union在原始键中附带的子类型"""
+    if type_ == 5:
+        return f"{mv[offset]}{mv[offset + 1]}"
+    if type_ == 6:
+        return str(mv[offset])
+    item_type = mv[offset]
+    if item_type == 3:
+        _, offset = parse_integer(mv, offset + 1)
+        if offset < len(mv) and mv[offset] == 2:
+            return "32"
+    return str(item_type)
+
+
+def parse_list(mv: memoryview, offset: int, mode: int = RAW):
+    """List 列表，类型(1) + 数量(Integer) + 数据项，结构体列表在数量后可能有一个0x02"""
+    item_type = mv[offset]
+    size, offset = parse_integer(mv, offset + 1)
+    if item_type == 3 and offset < len(mv) and mv[offset] == 2:
+        offset += 1
+    if item_type >= 11:
+        raise TypeError("未知类型")
+    parser = PARSERS[item_type]
+    data = []
+    append = data.append
+    for _ in range(size):
+        value, offset = parser(mv, offset, mode)
+        append(value)
+    return data, offset
+
+
+def parse_map(mv: memoryview, offset: int, mode: int = RAW):
+    """Map 键值对，键类型(1) + 值类型(1) + 数量(Integer) + 键值交替排列"""
+    key_type = mv[offset]
+    val_type = mv[offset + 1]
+    size, offset = parse_integer(mv, offset + 2)
+    if key_type >= 11 or val_type >= 11:
+        raise TypeError("未知类型")
+    key_parser = PARSERS[key_type]
+    val_parser = PARSERS[val_type]
+    data = {} if mode != COMPACT else []
+    if key_type == val_type == 1 and mode != COMPACT:
+        # 属性表(ATTR/PATT)都是字符串到字符串
+        for _ in range(size):
+            key, offset = parse_string(mv, offset)
+            data[key], offset = parse_string(mv, offset)
+        return data, offset
+    for _ in range(size):
+        key, offset = key_parser(mv, offset, mode)
+        value, offset = val_parser(mv, offset, mode)
+        if mode == COMPACT:
+            data.append((key, value))
+        else:
+            data[key] = value
+    return (data if mode != COMPACT else tuple(data)), offset
+
+
+def parse_union(mv: memoryview, offset: int, mode: int = RAW):
+    """Union 联合体，类型(1)为0x7f时为空，否则跟一个字段"""
+    union_type = mv[offset]
+    offset += 1
+    if union_type == 127:
+        return ({} if mode != COMPACT else ()), offset
+    header = _unpack_field(mv, offset)[0]
+    offset += 4
+    name, raw_key, type_ = _FIELD_TABLE.get(header) or _field_info(header)
+    # 与原解码器一致，联合体的键总是带类型
+    if 4 <= type_ <= 6:
+        raw_key += _type_suffix(mv, offset, type_)
+    if type_ >= 11:
+        raise TypeError("未知类型")
+    value, offset = PARSERS[type_](mv, offset, mode)
+    return ({raw_key: value} if mode != COMPACT else ((name, value),)), offset
+
+
+def parse_int_list(mv: memoryview, offset: int, _mode: int = RAW):
+    """IntList 整数列表，数量(Integer) + 整数"""
+    size, offset = parse_integer(mv, offset)
+    data = []
+    for _ in range(size):
+        value, offset = parse_integer(mv, offset)
+        data.append(value)
+    return data, offset
+
+
+def parse_object_type(mv: memoryview, offset: int, _mode: int = RAW):
+    """ObjectType 组件ID + 类型ID"""
+    component_id, offset = parse_integer(mv, offset)
+    type_id, offset = parse_integer(mv, offset)
+    return (Components.get(component_id), TYPE_NAMES[type_id]), offset
+
+
+def parse_object_id(mv: memoryview, offset: int, _mode: int = RAW):
+    """ObjectId 组件ID + 类型ID + 实体ID"""
+    component_id, offset = parse_integer(mv, offset)
+    type_id, offset = parse_integer(mv, offset)
+    entity_id, offset = parse_integer(mv, offset)
+    return (Components.get(component_id), TYPE_NAMES[type_id], entity_id), offset
+
+
+def parse_float(mv: memoryview, offset: int, _mode: int = RAW):
+    return _unpack_float(mv, offset)[0], offset + 4
+
+
+# 按类型码分发，与Blaze.TYPE对应
+PARSERS = (
+    parse_integer,
+    parse_string,
+    parse_blob,
+    parse_struct,
+    parse_list,
+    parse_map,
+    parse_union,
+    parse_int_list,
+    parse_object_type,
+    parse_object_id,
+    parse_float,
+)
+
+
+class BlazeDecoder:
+    """基于memoryview的Blaze包解码器
+
+    用整数偏移遍历memoryview，不再经过hex字符串转换；标签、字段键和方法名查表得到，
+    类型按类型码查分发表。输出与Blaze.decode相同，另外可选compact模式，
+    把结构体和Map解码为 ((键, 值), ...) 元组以减少内存占用。
+    与Blaze.decode的区别: 负整数按符号位正确解码，未知组件/命令不再抛出KeyError。
+    """
+
+    @staticmethod
+    def decode_header(data: bytes | bytearray | memoryview) -> dict:
+        length, ext_length, component, command, id_, q_type = _unpack_header(data)
+        type_ = QTYPE_NAMES.get(q_type, q_type)
+        return {
+            "method": (
+                type_
+                if type_ in ("KeepAlive", "Ping", "Pong")
+                else method_name(component, command)
+            ),
+            "type": type_,
+            "id": id_,
+            "length": length + ext_length,
+        }
+
+    @staticmethod
+    def decode(
+        data: bytes | bytearray | memoryview,
+        readable: bool = False,
+        compact: bool = False,
+    ) -> dict:
+        """
+        解码一个完整的包
+        :param data: 包含16字节包头的数据
+        :param readable: 键只保留标签
+        :param compact: 结构体和Map解码为元组，键只保留标签
+        :return: {"method", "type", "id", "length", "data"}
+        """
+        mv = data if isinstance(data, memoryview) else memoryview(data)
+        packet = BlazeDecoder.decode_header(mv)
+        mode = COMPACT if compact else READABLE if readable else RAW
+        if len(mv) > 16:
+            packet["data"] = parse_struct(mv, 16, mode)[0]
+        else:
+            packet["data"] = () if compact else {}
+        return packet
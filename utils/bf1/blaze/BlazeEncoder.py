@@ -0,0 +1,216 @@
+import struct
+
+from utils.bf1.blaze.Blaze import TYPE, TYPE2INT, Blaze
+from utils.bf1.blaze.Method import Components2Int, Methods
+
+# 包头: 长度(4) 扩展长度(2) 组件(2) 命令(2) ID(3字节，拆为1+2) 保留(3)
+_HEADER = struct.Struct(">IHHHBH3x")
+_pack_header = _HEADER.pack_into
+_pack_float = struct.Struct(">f").pack
+
+# {4字符标签: 3字节标签}
+TAG_BYTES: dict[str, bytes] = {}
+# {字段键: (字段头, 类型名)}
+FIELD_HEADERS: dict[str, tuple[bytes, str]] = {}
+
+
+def tag_bytes(tag: str) -> bytes:
+    if (data := TAG_BYTES.get(tag)) is not None:
+        return data
+    # 与Blaze.encode_tag的结果保持一致
+    data = bytes.fromhex(Blaze.encode_tag(tag))
+    TAG_BYTES[tag] = data
+    return data
+
+
+def write_integer(buf: bytearray, n, _key=None):
+    """Integer 不定长整数，首字节低6位为数值，0x40为符号位，0x80表示继续"""
+    n = int(n)
+    if 0 <= n < 0x40:
+        buf.append(n)
+        return
+    sign = 0
+    if n < 0:
+        sign = 0x40
+        n = -n
+    first = (n & 0x3F) | sign
+    n >>= 6
+    if not n:
+        buf.append(first)
+        return
+    buf.append(first | 0x80)
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def write_string(buf: bytearray, text, _key=None):
+    """String 字符串，长度包含结尾的\\0，空字符串只写长度0"""
+    if not text:
+        buf.append(0)
+        return
+    data = text.encode()
+    write_integer(buf, len(data) + 1)
+    buf += data
+    buf.append(0)
+
+
+def write_blob(buf: bytearray, blob_hex: str, _key=None):
+    data = bytes.fromhex(blob_hex)
+    write_integer(buf, len(data))
+    buf += data
+
+
+def field_header(key: str) -> tuple[bytes, str]:
+    """字段头(3字节标签 + 1字节类型)和类型名"""
+    if (info := FIELD_HEADERS.get(key)) is not None:
+        return info
+    type_str = key[5]
+    info = (tag_bytes(key[:4]) + bytes((int(type_str, 16),)), TYPE[type_str])
+    FIELD_HEADERS[key] = info
+    return info
+
+
+def write_fields(buf: bytearray, object_: dict):
+    """逐个写入结构体的字段，键为 "TAG  类型[子类型]" """
+    for key, value in object_.items():
+        header, type_name = FIELD_HEADERS.get(key) or field_header(key)
+        buf += header
+        if type_name == "Integer":
+            write_integer(buf, value)
+        else:
+            WRITERS[type_name](buf, value, key)
+
+
+def write_struct(buf: bytearray, object_: dict, _key=None):
+    write_fields(buf, object_)
+    buf.append(0)
+
+
+def write_list(buf: bytearray, lst, key: str):
+    type_str = key[6]
+    buf.append(int(type_str, 16))
+    write_integer(buf, len(lst))
+    if type_str == "0":
+        # gameId/personaId列表，直接在这里编码
+        append = buf.append
+        for n in lst:
+            n = int(n)
+            if n < 0x40:
+                if n >= 0:
+                    append(n)
+                    continue
+                write_integer(buf, n)
+                continue
+            append((n & 0x3F) | 0x80)
+            n >>= 6
+            while n >= 0x80:
+                append((n & 0x7F) | 0x80)
+                n >>= 7
+            append(n)
+        return
+    writer = WRITERS[TYPE[type_str]]
+    for item in lst:
+        writer(buf, item, key)
+
+
+def write_map(buf: bytearray, map_data: dict, key: str):
+    key_type, val_type = key[6], key[7]
+    buf.append(int(key_type, 16))
+    buf.append(int(val_type, 16))
+    write_integer(buf, len(map_data))
+    key_writer = WRITERS[TYPE[key_type]]
+    val_writer = WRITERS[TYPE[val_type]]
+    for k, v in map_data.items():
+        key_writer(buf, k, None)
+        val_writer(buf, v, None)
+
+
+def write_union(buf: bytearray, data: dict, key: str):
+    if key[6]:
+        buf.append(int(key[6], 16))
+        write_fields(buf, data)
+    else:
+        buf.append(0x7F)
+
+
+def write_int_list(buf: bytearray, values, _key=None):
+    write_integer(buf, len(values))
+    for value in values:
+        write_integer(buf, value)
+
+
+def write_object_type(buf: bytearray, values, _key=None):
+    write_integer(buf, Components2Int[values[0]])
+    write_integer(buf, TYPE2INT[values[1]])
+
+
+def write_object_id(buf: bytearray, values, _key=None):
+    write_integer(buf, Components2Int[values[0]])
+    write_integer(buf, TYPE2INT[values[1]])
+    write_integer(buf, values[2])
+
+
+def write_float(buf: bytearray, value, _key=None):
+    buf += _pack_float(value)
+
+
+# 按类型名分发，与Blaze.write_block对应
+WRITERS = {
+    "Integer": write_integer,
+    "String": write_string,
+    "Blob": write_blob,
+    "Struct": write_struct,
+    "List": write_list,
+    "Map": write_map,
+    "Union": write_union,
+    "IntList": write_int_list,
+    "ObjectType": write_object_type,
+    "ObjectId": write_object_id,
+    "Float": write_float,
+}
+
+
+class BlazeEncoder:
+    """直接写入bytearray的Blaze包编码器
+
+    每个实例复用一个bytearray，字段按顺序追加，整数在原地做不定长编码，
+    包头在写完数据后用struct填入预留的16字节。输出与Blaze.encode逐字节相同。
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def encode(self, packet: dict) -> bytes:
+        """
+        编码一个包
+        :param packet: {"method", "id", "data"}，data的键为 "TAG  类型[子类型]"
+        :return: 包含16字节包头的数据
+        """
+        buf = self.buffer
+        buf.clear()
+        buf += bytes(16)
+        write_fields(buf, packet.get("data"))
+        length = len(buf) - 16
+        if length > 0xFFFFFFFF:
+            length, ext_length = 0xFFFFFFFF, length - 0xFFFFFFFF
+        else:
+            ext_length = 0
+        method = packet.get("method")
+        if ids := Methods.get(method):
+            component, command = ids
+        else:
+            component, command = (int(i) for i in method.split("."))
+        id_ = packet.get("id", 0)
+        _pack_header(
+            buf, 0, length, ext_length, component, command, id_ >> 16, id_ & 0xFFFF
+        )
+        data = bytes(buf)
+        # 不保留大包占用的内存
+        if len(buf) > 65536:
+            self.buffer = bytearray()
+        return data
+
+
+blaze_encoder = BlazeEncoder()
@@ -1,11 +1,14 @@
 import asyncio
 import ssl
+import time
 from typing import Union
 
 import httpx
 from loguru import logger
 
-from utils.bf1.blaze.Blaze import Blaze, keepalive
+from utils.bf1.blaze.Blaze import keepalive
+from utils.bf1.blaze.BlazeDecoder import BlazeDecoder
+from utils.bf1.blaze.BlazeEncoder import blaze_encoder
 
 context = ssl.create_default_context()
 context.check_hostname = False
@@ -68,21 +71,70 @@ class BlazeServerREQ:
             return host, port
 
 
+HEADER_SIZE = 16
+# 超过此大小的包在线程中解码，避免阻塞事件循环
+LARGE_FRAME_SIZE = 64 * 1024
+# 包长度上限，超过时视为数据错乱并断开连接
+MAX_FRAME_SIZE = 32 * 1024 * 1024
+
+
+class FrameError(Exception):
+    """包头中的长度不合法"""
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """
+    读取一个完整的包(16字节包头 + 数据)
+    一次read可能包含多个包，也可能只包含半个包头，readexactly按包头中的长度读取，不受分块影响
+    :raise asyncio.IncompleteReadError: 连接在包中途关闭
+    :raise FrameError: 包长度超过上限
+    """
+    header = await reader.readexactly(HEADER_SIZE)
+    length = int.from_bytes(header[:4], "big") + int.from_bytes(header[4:6], "big")
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"包长度异常: {length}")
+    if not length:
+        return header
+    return header + await reader.readexactly(length)
+
+
 class BlazeSocket:
     readable = True
 
-    def __init__(self, host: str, port: int, callback=None):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        callback=None,
+        ping_interval: float = 60,
+        ping_timeout: float = 10,
+    ):
         self.callback = callback
         self.connect = False
-        self.finish = True
         self.authenticated = False
         self.map = {}
         self.id = 1
-        self.temp = {}
-        self.ssl_context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-        self.ssl_context.check_hostname = False
-        self.ssl_context.verify_mode = ssl.CERT_NONE
-        self.ssl_context.set_ciphers("ALL")
+        # 登录过期时的回调，未设置时直接断开连接
+        self.on_auth_expired = None
+        # 心跳间隔和等待Pong的时间(秒)
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.last_pong = 0.0
+        self._pong_waiters: list[asyncio.Future] = []
+        self._tasks: set[asyncio.Task] = set()
+        # 超时后仍可能到达的响应ID
+        self.timed_out: set[int] = set()
+        # 统计
+        self.frames = 0
+        self.bytes_received = 0
+        self.large_frames = 0
+        self.decode_errors = 0
+        self.late_responses = 0
+        self.unmatched = 0
+        self.timeouts = 0
+        self.ping_failures = 0
+        # 创建SSL上下文需要加载系统证书，所有连接共用模块级的上下文
+        self.ssl_context = context
         self.host = host
         self.port = port
         self.reader: asyncio.StreamReader = None
@@ -90,21 +142,34 @@ class BlazeSocket:
 
     @classmethod
     async def create(
-        cls, host: str = "diceprodblapp-08.ea.com", port: int = 10539, callback=None
+        cls,
+        host: str = "diceprodblapp-08.ea.com",
+        port: int = 10539,
+        callback=None,
+        ping_interval: float = 60,
+        ping_timeout: float = 10,
     ):
-        self = BlazeSocket(host, port, callback)
+        self = BlazeSocket(host, port, callback, ping_interval, ping_timeout)
         await self.connect_to_server()
-        _ = asyncio.create_task(self.keepalive())
+        self.create_task(self.keepalive())
         return self
 
+    def create_task(self, coro) -> asyncio.Task:
+        # 保留任务引用，避免后台任务被回收
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
     async def connect_to_server(self):
         # 异步连接到服务器
         self.reader, self.writer = await asyncio.open_connection(
             self.host, self.port, ssl=self.ssl_context
         )
         self.connect = True
+        self.last_pong = time.monotonic()
         logger.success(f"已连接到Blaze服务器 {self.host}:{self.port}")
-        _ = asyncio.create_task(self.receive_data())
+        self.create_task(self.receive_data())
 
     async def close(self):
         # 关闭连接
@@ -121,10 +186,34 @@ class BlazeSocket:
         logger.success(f"已断开与Blaze服务器 {self.host}:{self.port} 的连接")
 
     async def keepalive(self):
+        # 定时发送Ping，超时未收到Pong时认为连接已失效并断开
         while self.connect:
-            await asyncio.sleep(60)
-            if self.writer:
-                self.writer.write(keepalive)
+            await asyncio.sleep(self.ping_interval)
+            if not self.connect:
+                break
+            if not await self.ping(self.ping_timeout):
+                self.ping_failures += 1
+                logger.warning(
+                    f"Blaze连接 {self.host}:{self.port} {self.ping_timeout}秒内未响应Pong，断开连接"
+                )
+                await self.close()
+                break
+
+    async def ping(self, timeout: float = 10) -> bool:
+        """发送Ping并等待Pong"""
+        if not self.connect or not self.writer:
+            return False
+        future = asyncio.get_running_loop().create_future()
+        self._pong_waiters.append(future)
+        try:
+            self.writer.write(keepalive)
+            await asyncio.wait_for(future, timeout)
+            return True
+        except (asyncio.TimeoutError, ConnectionError):
+            return False
+        finally:
+            if future in self._pong_waiters:
+                self._pong_waiters.remove(future)
 
     async def send(self, packet, timeout=60, readable: bool = True):
         BlazeSocket.readable = readable
@@ -134,9 +223,9 @@ class BlazeSocket:
         if self.id > 65535:
             self.id = 1
         if isinstance(packet, bytes):
-            packet = Blaze(packet).decode()
+            packet = BlazeDecoder.decode(packet)
 
-        future = asyncio.Future()
+        future = asyncio.get_running_loop().create_future()
         if "id" not in packet:
             packet["id"] = self.id
             self.id += 1
@@ -144,12 +233,15 @@ class BlazeSocket:
             packet["id"] = self.id
             self.id += 1
         self.map[packet["id"]] = future
+        self.timed_out.discard(packet["id"])
         self.id += 1
         await self.request(packet)
         try:
             return await asyncio.wait_for(future, timeout)
         except asyncio.TimeoutError as e:
-            del self.map[packet["id"]]
+            self.map.pop(packet["id"], None)
+            self.timed_out.add(packet["id"])
+            self.timeouts += 1
             raise TimeoutError(
                 f"Timeout waiting for response to packet ID: {packet['id']}"
             ) from e
@@ -159,72 +251,103 @@ class BlazeSocket:
         if not self.connect:
             raise ConnectionError("连接已关闭")
         if isinstance(packet, dict):
-            self.writer.write(Blaze(packet).encode())
+            self.writer.write(blaze_encoder.encode(packet))
         elif isinstance(packet, bytes):
             self.writer.write(packet)
         else:
             raise TypeError("packet must be dict or bytes")
 
     async def receive_data(self):
-        # 接收数据
+        # 接收数据，按包头中的长度逐个读取完整的包
         while self.connect:
             try:
-                data = await self.reader.read(65565)
-            except ConnectionResetError:
-                self.connect = False
+                frame = await read_frame(self.reader)
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    logger.warning(f"Blaze连接在包中途关闭，丢弃{len(e.partial)}字节")
                 break
-            if not data:
-                self.connect = False
+            except (ConnectionError, ssl.SSLError, FrameError) as e:
+                logger.error(f"Blaze连接接收出错: {e!r}")
                 break
-            await self.concat(data)
-
-    async def concat(self, buffer):
-        if self.finish:
-            header = Blaze(buffer[:16]).decode()
-            # logger.debug(f"Header received: {header}")
-            if len(buffer) - 16 < header["length"]:
-                self.temp["data"] = bytearray(header["length"] + 16)
-                self.temp["length"] = len(buffer)
-                self.temp["origin"] = header["length"] + 16
-                self.finish = False
-                self.temp["data"][: len(buffer)] = buffer
-            else:
-                await self.response(Blaze(buffer).decode(BlazeSocket.readable))
-                self.temp = {}
-        elif self.temp["length"] >= self.temp["origin"]:
-            # 超长了
-            self.finish = True
-            self.temp = {}
-        else:
-            self.temp["data"][
-                self.temp["length"] : self.temp["length"] + len(buffer)
-            ] = buffer
-            self.temp["length"] += len(buffer)
-            if self.temp["length"] >= self.temp["origin"]:
-                self.finish = True
-                await self.response(
-                    Blaze(self.temp["data"]).decode(BlazeSocket.readable)
-                )
-                self.temp = {}
+            self.frames += 1
+            self.bytes_received += len(frame)
+            try:
+                if len(frame) > LARGE_FRAME_SIZE:
+                    self.large_frames += 1
+                    packet = await asyncio.to_thread(
+                        BlazeDecoder.decode, frame, BlazeSocket.readable
+                    )
+                else:
+                    packet = BlazeDecoder.decode(frame, BlazeSocket.readable)
+            except Exception as e:
+                # 包边界由包头确定，单个包解码失败不影响后续的包
+                self.decode_errors += 1
+                logger.error(f"Blaze包解码失败({len(frame)}字节): {e!r}")
+                self.fail_request(frame, e)
+                continue
+            await self.response(packet)
+        self.connect = False
+        # 连接已断开，等待中的请求不必等到超时
+        for future in self.map.values():
+            if not future.done():
+                future.set_exception(ConnectionError("连接已关闭"))
+        self.map.clear()
+
+    def fail_request(self, frame: bytes, error: Exception):
+        """解码失败时让对应的请求立即失败"""
+        try:
+            id_ = BlazeDecoder.decode_header(frame)["id"]
+        except Exception:
+            return
+        if (future := self.map.pop(id_, None)) and not future.done():
+            future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "bytes": self.bytes_received,
+            "large_frames": self.large_frames,
+            "decode_errors": self.decode_errors,
+            "late_responses": self.late_responses,
+            "unmatched": self.unmatched,
+            "timeouts": self.timeouts,
+            "ping_failures": self.ping_failures,
+            "pending": len(self.map),
+        }
 
     async def response(self, packet):
         # 处理接收到的数据包
         if packet["method"] == "KeepAlive":
             return
-        if packet["id"] in self.map:
+        if packet["type"] == "Pong":
+            # 先于ID匹配处理，避免ID为0的Pong被当作登录请求的响应
+            self.last_pong = time.monotonic()
+            for future in self._pong_waiters:
+                if not future.done():
+                    future.set_result(None)
+        elif packet["id"] in self.map:
             # logger.debug(f"Response received for packet ID: {packet['id']}")
-            future = self.map[packet["id"]]
-            future.set_result(packet)
-            del self.map[packet["id"]]
+            future = self.map.pop(packet["id"])
+            if not future.done():
+                future.set_result(packet)
+        elif packet["id"] in self.timed_out and packet["type"] in ["Result", "Error"]:
+            self.timed_out.discard(packet["id"])
+            self.late_responses += 1
+            logger.warning(
+                f"收到已超时请求的响应: {packet['method']} ID:{packet['id']}"
+            )
         elif packet["method"] == "UserSessions.getPermissions":
-            logger.error(f"用户登录信息已过期，请重新登录/连接！\n{packet}")
-            await self.close()
+            self.authenticated = False
+            if self.on_auth_expired:
+                logger.warning(f"Blaze登录信息已过期，重新登录\n{packet}")
+                self.on_auth_expired(self)
+            else:
+                logger.error(f"用户登录信息已过期，请重新登录/连接！\n{packet}")
+                await self.close()
         elif packet["type"] in ["Message", "Result"]:
             logger.info(f"Message received:\n{packet}")
-        elif packet["type"] == "Pong":
-            # logger.debug("BlazeSocket working normally")
-            pass
         else:
+            self.unmatched += 1
             logger.warning(
                 f"No matching request found for packet ID: {packet['id']}\n{packet}"
             )
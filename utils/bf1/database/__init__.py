@@ -23,6 +23,7 @@ from utils.bf1.database.tables import (
     Bf1ServerVip,
     orm,
 )
+from utils.bf1.database import migrations  # noqa: F401
 
 
 class bf1_db:
@@ -421,8 +422,8 @@ class bf1_db:
                 table=Bf1ServerVip,
                 data={
                     "serverId": serverId,
-                    "persona_id": persona_id,
-                    "display_name": display_name,
+                    "personaId": persona_id,
+                    "displayName": display_name,
                     "time": datetime.datetime.now(),
                 },
                 condition=[
@@ -598,8 +599,8 @@ class bf1_db:
                 table=Bf1ServerBan,
                 data={
                     "serverId": serverId,
-                    "persona_id": persona_id,
-                    "display_name": display_name,
+                    "personaId": persona_id,
+                    "displayName": display_name,
                     "time": datetime.datetime.now(),
                 },
                 condition=[
@@ -762,8 +763,8 @@ class bf1_db:
                 table=Bf1ServerAdmin,
                 data={
                     "serverId": serverId,
-                    "persona_id": persona_id,
-                    "display_name": display_name,
+                    "personaId": persona_id,
+                    "displayName": display_name,
                     "time": datetime.datetime.now(),
                 },
                 condition=[
@@ -930,8 +931,8 @@ class bf1_db:
                 table=Bf1ServerOwner,
                 data={
                     "serverId": serverId,
-                    "persona_id": persona_id,
-                    "display_name": display_name,
+                    "personaId": persona_id,
+                    "displayName": display_name,
                     "time": datetime.datetime.now(),
                 },
                 condition=[
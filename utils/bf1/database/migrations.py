@@ -0,0 +1,66 @@
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from loguru import logger
+from sqlalchemy import delete, func, inspect, select
+
+from utils.bf1.database.tables import (
+    Bf1ManagerLog,
+    Bf1ServerAdmin,
+    Bf1ServerBan,
+    Bf1ServerOwner,
+    Bf1ServerPlayerCount,
+    Bf1ServerVip,
+    orm,
+)
+
+# 需要补充索引的表
+INDEXED_TABLES = (
+    Bf1ServerVip,
+    Bf1ServerBan,
+    Bf1ServerAdmin,
+    Bf1ServerOwner,
+    Bf1ServerPlayerCount,
+    Bf1ManagerLog,
+)
+
+
+def deduplicate(conn, table, columns: list[str]) -> int:
+    """
+    删除唯一索引列上的重复记录，每组只保留id最大(最新写入)的一条
+    :return: 删除的行数
+    """
+    table = table.__table__
+    # 派生表包一层，mysql不允许在删除语句的子查询中直接引用被删除的表
+    keep = (
+        select(func.max(table.c.id).label("id"))
+        .group_by(*[table.c[column] for column in columns])
+        .subquery()
+    )
+    result = conn.execute(delete(table).where(table.c.id.not_in(select(keep.c.id))))
+    return result.rowcount
+
+
+@orm.migration
+def add_bf1_indexes(conn):
+    """
+    为服务器VIP/Ban/管理员/服主表添加 (serverId, personaId) 唯一索引和 personaId 索引，
+    为人数记录表和服管日志表添加时间索引，
+    已有的重复数据在建立唯一索引前去重
+    """
+    inspector = inspect(conn)
+    table_names = set(inspector.get_table_names())
+    op = Operations(MigrationContext.configure(conn))
+    for table in INDEXED_TABLES:
+        if table.__tablename__ not in table_names:
+            continue
+        exists = {index["name"] for index in inspector.get_indexes(table.__tablename__)}
+        for index in sorted(table.__table__.indexes, key=lambda x: x.name):
+            if index.name in exists:
+                continue
+            columns = [column.name for column in index.columns]
+            if index.unique and (count := deduplicate(conn, table, columns)):
+                logger.warning(f"{table.__tablename__} 删除了{count}条重复记录")
+            op.create_index(
+                index.name, table.__tablename__, columns, unique=index.unique
+            )
+            logger.success(f"已为 {table.__tablename__} 创建索引 {index.name}")
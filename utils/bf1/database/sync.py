@@ -0,0 +1,222 @@
+import datetime
+import hashlib
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+from sqlalchemy import select
+
+from utils.bf1.database.tables import (
+    Bf1Server,
+    Bf1ServerAdmin,
+    Bf1ServerBan,
+    Bf1ServerOwner,
+    Bf1ServerPlayerCount,
+    Bf1ServerVip,
+    orm,
+)
+
+# 列表类型对应的表
+LIST_TABLES = {
+    "vip": Bf1ServerVip,
+    "ban": Bf1ServerBan,
+    "admin": Bf1ServerAdmin,
+    "owner": Bf1ServerOwner,
+}
+# Bf1Server中参与比较的字段，record_time每次都会变化不参与比较
+SERVER_FIELDS = (
+    "serverName",
+    "serverId",
+    "persistedGameId",
+    "gameId",
+    "createdDate",
+    "expirationDate",
+    "updatedDate",
+)
+
+
+def content_hash(items) -> bytes:
+    """对可排序的内容计算摘要"""
+    return hashlib.blake2b(repr(sorted(items)).encode(), digest_size=16).digest()
+
+
+class SyncStats:
+    """单次同步统计"""
+
+    def __init__(self):
+        self.servers_fetched = 0
+        self.servers_unchanged = 0
+        self.servers_written = 0
+        self.lists_changed = 0
+        self.lists_unchanged = 0
+        self.rows_upserted = 0
+        self.rows_deleted = 0
+        self.player_records = 0
+        # {阶段名: 耗时(秒)}
+        self.phases: dict[str, float] = {}
+
+    @property
+    def rows_written(self) -> int:
+        return self.rows_upserted + self.rows_deleted
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def __str__(self):
+        phases = ", ".join(f"{k}:{v:.2f}s" for k, v in self.phases.items())
+        return (
+            f"获取{self.servers_fetched}个服务器, 未变化{self.servers_unchanged}个, "
+            f"写入服务器信息{self.servers_written}条, "
+            f"列表变化{self.lists_changed}/未变化{self.lists_unchanged}, "
+            f"写入{self.rows_written}行(更新{self.rows_upserted}, 删除{self.rows_deleted}), "
+            f"人数记录{self.player_records}条, 耗时[{phases}]"
+        )
+
+
+class ServerSync:
+    """私服信息增量同步
+
+    为每个服务器的基础信息和每个VIP/Ban/管理员/服主列表保存内容摘要，
+    摘要未变化的直接跳过；变化的列表与数据库中的记录按
+    (serverId, personaId, displayName) 元组做集合差，只写入新增/改名和删除的行。
+    摘要只保存在内存中，重启后第一次同步会与数据库完整比较一次。
+    """
+
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+        # {serverId: 摘要}
+        self.server_hashes: dict[int, bytes] = {}
+        # {(列表类型, serverId): 摘要}
+        self.list_hashes: dict[tuple[str, int], bytes] = {}
+        self.last_stats: SyncStats | None = None
+
+    async def sync(
+        self,
+        servers: list[dict],
+        player_records: list[dict],
+        lists: dict[str, dict[int, list[dict]]],
+        stats: SyncStats | None = None,
+    ) -> SyncStats:
+        """
+        同步一次私服数据
+        :param servers: Bf1Server记录列表
+        :param player_records: Bf1ServerPlayerCount记录列表，每次都会写入
+        :param lists: {列表类型: {serverId: [{"personaId": pid, "displayName": name}]}}
+        :param stats: 已记录获取阶段耗时的统计，为None时新建
+        :return: 本次同步统计
+        """
+        stats = stats or SyncStats()
+        stats.servers_fetched = len(servers)
+        changed_servers = set()
+        with stats.phase("server_info"):
+            changed_servers.update(await self.sync_servers(servers, stats))
+        with stats.phase("player_count"):
+            await orm.add_batch(table=Bf1ServerPlayerCount, data_list=player_records)
+            stats.player_records = len(player_records)
+        for kind, server_lists in lists.items():
+            with stats.phase(kind):
+                changed_servers.update(await self.sync_list(kind, server_lists, stats))
+        stats.servers_unchanged = len(
+            {server["serverId"] for server in servers} - changed_servers
+        )
+        self.last_stats = stats
+        logger.debug(f"私服同步完成: {stats}")
+        return stats
+
+    async def sync_servers(self, servers: list[dict], stats: SyncStats) -> set[int]:
+        """写入基础信息变化的服务器，返回变化的serverId"""
+        changed = {}
+        for server in servers:
+            digest = content_hash((key, server[key]) for key in SERVER_FIELDS)
+            if self.server_hashes.get(server["serverId"]) != digest:
+                changed[server["serverId"]] = (server, digest)
+        if changed:
+            now = datetime.datetime.now()
+            records = [{**server, "record_time": now} for server, _ in changed.values()]
+            await orm.insert_or_update_batch(
+                table=Bf1Server,
+                data_list=records,
+                conditions_list=[
+                    (Bf1Server.serverId == record["serverId"],) for record in records
+                ],
+            )
+            # 写入成功后再记录摘要，失败时下次重试
+            for server_id, (_, digest) in changed.items():
+                self.server_hashes[server_id] = digest
+        stats.servers_written = len(changed)
+        return set(changed)
+
+    async def sync_list(
+        self, kind: str, server_lists: dict[int, list[dict]], stats: SyncStats
+    ) -> set[int]:
+        """同步一种列表，返回变化的serverId"""
+        table = LIST_TABLES[kind]
+        now_rows: set[tuple[int, int, str]] = set()
+        changed = {}
+        for server_id, records in server_lists.items():
+            rows = {
+                (server_id, int(record["personaId"]), record["displayName"])
+                for record in records
+            }
+            digest = content_hash(rows)
+            if self.list_hashes.get((kind, server_id)) == digest:
+                stats.lists_unchanged += 1
+                continue
+            changed[server_id] = digest
+            now_rows |= rows
+        if not changed:
+            return set()
+        stats.lists_changed += len(changed)
+
+        # 只查询变化的服务器在数据库中的记录
+        db_rows: set[tuple[int, int, str]] = set()
+        server_ids = list(changed)
+        for i in range(0, len(server_ids), self.chunk_size):
+            db_rows.update(
+                tuple(row)
+                for row in await orm.fetch_all(
+                    select(table.serverId, table.personaId, table.displayName).where(
+                        table.serverId.in_(server_ids[i : i + self.chunk_size])
+                    )
+                )
+            )
+
+        # 新增或改名的行
+        upsert_rows = now_rows - db_rows
+        # 数据库中存在但现在不存在的行
+        delete_keys = {row[:2] for row in db_rows} - {row[:2] for row in now_rows}
+        if upsert_rows:
+            now = datetime.datetime.now()
+            await orm.insert_or_update_batch(
+                table=table,
+                data_list=[
+                    {"displayName": display_name, "time": now}
+                    for _, _, display_name in upsert_rows
+                ],
+                conditions_list=[
+                    (table.serverId == server_id, table.personaId == persona_id)
+                    for server_id, persona_id, _ in upsert_rows
+                ],
+            )
+        if delete_keys:
+            await orm.delete_batch(
+                table=table,
+                conditions_list=[
+                    (table.serverId == server_id, table.personaId == persona_id)
+                    for server_id, persona_id in delete_keys
+                ],
+            )
+        stats.rows_upserted += len(upsert_rows)
+        stats.rows_deleted += len(delete_keys)
+        self.list_hashes.update(
+            {(kind, server_id): digest for server_id, digest in changed.items()}
+        )
+        return set(changed)
+
+
+SERVER_SYNC = ServerSync()
@@ -7,6 +7,7 @@ from sqlalchemy import (
     ForeignKey,
     JSON,
     Boolean,
+    Index,
 )
 from sqlalchemy.orm import Mapped
 from core.orm import orm
@@ -109,7 +110,7 @@ class Bf1ServerPlayerCount(orm.Base):
     playerMax: Mapped[int] = Column(Integer, nullable=False)
     playerQueue: Mapped[int] = Column(Integer, nullable=False)
     playerSpectator: Mapped[int] = Column(Integer, nullable=False)
-    time: Mapped[DateTime] = Column(DateTime, nullable=False)
+    time: Mapped[DateTime] = Column(DateTime, nullable=False, index=True)
     # 收藏
     serverBookmarkCount: Mapped[int] = Column(BIGINT, default=0)
 
@@ -119,13 +120,19 @@ class Bf1ServerVip(orm.Base):
     """VIP表"""
 
     __tablename__ = "bf1_server_vip"
+    __table_args__ = (
+        # 同一服务器内每个玩家只有一条记录
+        Index(
+            "ix_bf1_server_vip_serverId_personaId", "serverId", "personaId", unique=True
+        ),
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True)
     serverId: Mapped[int] = Column(
         BIGINT, ForeignKey("bf1_server.serverId"), nullable=False
     )
     personaId: Mapped[int] = Column(
-        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False
+        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False, index=True
     )
     displayName: Mapped[str] = Column(String, nullable=False)
     expire_time: Mapped[DateTime | None] = Column(DateTime, default=None)
@@ -137,13 +144,18 @@ class Bf1ServerBan(orm.Base):
     """Ban表"""
 
     __tablename__ = "bf1_server_ban"
+    __table_args__ = (
+        Index(
+            "ix_bf1_server_ban_serverId_personaId", "serverId", "personaId", unique=True
+        ),
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True)
     serverId: Mapped[int] = Column(
         BIGINT, ForeignKey("bf1_server.serverId"), nullable=False
     )
     personaId: Mapped[int] = Column(
-        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False
+        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False, index=True
     )
     displayName: Mapped[str] = Column(String, nullable=False)
     expire_time: Mapped[DateTime | None] = Column(DateTime, default=None)
@@ -155,13 +167,21 @@ class Bf1ServerAdmin(orm.Base):
     """管理员表"""
 
     __tablename__ = "bf1_server_admin"
+    __table_args__ = (
+        Index(
+            "ix_bf1_server_admin_serverId_personaId",
+            "serverId",
+            "personaId",
+            unique=True,
+        ),
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True)
     serverId: Mapped[int] = Column(
         BIGINT, ForeignKey("bf1_server.serverId"), nullable=False
     )
     personaId: Mapped[int] = Column(
-        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False
+        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False, index=True
     )
     displayName: Mapped[str] = Column(String, nullable=False)
     time: Mapped[DateTime] = Column(DateTime)
@@ -172,13 +192,21 @@ class Bf1ServerOwner(orm.Base):
     """服主表"""
 
     __tablename__ = "bf1_server_owner"
+    __table_args__ = (
+        Index(
+            "ix_bf1_server_owner_serverId_personaId",
+            "serverId",
+            "personaId",
+            unique=True,
+        ),
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True)
     serverId: Mapped[int] = Column(
         BIGINT, ForeignKey("bf1_server.serverId"), nullable=False
     )
     personaId: Mapped[int] = Column(
-        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False
+        BIGINT, ForeignKey("bf1_account.persona_id"), nullable=False, index=True
     )
     displayName: Mapped[str] = Column(String, nullable=False)
     time: Mapped[DateTime] = Column(DateTime)
@@ -189,6 +217,10 @@ class Bf1ManagerLog(orm.Base):
     """服务器管理日志"""
 
     __tablename__ = "bf1_manager_log"
+    __table_args__ = (
+        # 按服务器查询日志并按时间排序
+        Index("ix_bf1_manager_log_serverId_time", "serverId", "time"),
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True)
     # 操作者的qq
@@ -206,7 +238,7 @@ class Bf1ManagerLog(orm.Base):
     # 信息
     info: Mapped[str | None] = Column(String)
     # 时间
-    time: Mapped[DateTime] = Column(DateTime)
+    time: Mapped[DateTime] = Column(DateTime, index=True)
 
 
 # 对局缓存
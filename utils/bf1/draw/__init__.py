@@ -4,7 +4,9 @@ import json
 import os
 import random
 import time
-from datetime import datetime, timedelta
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 
@@ -19,11 +21,28 @@ from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont
 from zhconv import zhconv
 
 from core.config import GlobalConfig
+from utils.asset_store import (
+    AssetStore,
+    add_prefetch,
+    avatar_store,
+    emblem_store,
+    map_store,
+    skin_store,
+)
 from utils.bf1.bf_utils import download_skin
 from utils.bf1.data_handle import VehicleData, WeaponData
 from utils.bf1.default_account import BF1DA
+from utils.bf1.draw.asset_cache import (
+    image_cache,
+    open_template,
+    paste_text,
+    text_mask,
+)
 from utils.bf1.draw.choose_bg_pic import bg_pic
 from utils.bf1.map_team_info import MapData
+from utils.http_session import get_http_session
+from utils.render_cache import render_cache
+from utils.render_pool import render_pool
 
 config = create(GlobalConfig)
 proxy = config.proxy if config.proxy != "proxy" else ""
@@ -68,7 +87,6 @@ PlatoonImgNone = (
 # 战绩信息框模板
 StatImg = Path("./data/battlefield/pic/src/template/stat.png").open("rb").read()
 # 武器/载具框模板
-SkinRootPath = Path("./data/battlefield/pic/skins/")
 WeaponGoldImg = (
     Path("./data/battlefield/pic/src/template/weapon_gold.png").open("rb").read()
 )
@@ -81,6 +99,26 @@ WeaponWhiteImg = (
 BlackTrapezoidImg = (
     Path("./data/battlefield/pic/src/template/black_trapezoid.png").open("rb").read()
 )
+# 渲染进程预先解码的模板
+Templates = (
+    AssaultImg,
+    CavalryImg,
+    MedicImg,
+    PilotImg,
+    ScoutImg,
+    SupportImg,
+    TankerImg,
+    AvatarOnlineImg,
+    AvatarOfflineImg,
+    BanImg,
+    PlatoonImg,
+    PlatoonImgNone,
+    StatImg,
+    WeaponGoldImg,
+    WeaponBlueImg,
+    WeaponWhiteImg,
+    BlackTrapezoidImg,
+)
 # 交换
 ExchangePricePath = Path("./statics/Battlefield/exchange/price.png")
 # 字体
@@ -146,6 +184,8 @@ class PilImageUtils:
         (262141, 2),
         (1114109, 1),
     ]
+    # 各区间的上界，用于二分查找
+    width_bounds = [num for num, _ in widths]
 
     @staticmethod
     def draw_centered_text(
@@ -390,26 +430,124 @@ class PilImageUtils:
     @staticmethod
     async def read_img_by_url(url: str) -> bytes | None:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, proxy=proxy) as resp:
-                    if resp.status == 200:
-                        return await resp.read()
-                    logger.warning(f"读取图片失败，url: {url}")
-                    return None
-        except TimeoutError:
+            async with get_http_session().get(url, proxy=proxy or None) as resp:
+                if resp.status == 200:
+                    return await resp.read()
+                logger.warning(f"读取图片失败，url: {url}")
+                return None
+        except (aiohttp.ClientError, TimeoutError):
             logger.warning(f"读取图片失败，url: {url}")
             return None
 
-    def get_width(self, o):
+    @staticmethod
+    def get_width(o):
         """Return the screen column width for unicode ordinal o."""
         if o == 0xE or o == 0xF:
             return 0
-        for num, wid in self.widths:
-            if o <= num:
-                return wid
+        index = bisect_left(PilImageUtils.width_bounds, o)
+        if index < len(PilImageUtils.widths):
+            return PilImageUtils.widths[index][1]
         return 1
 
 
+@lru_cache(maxsize=64)
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+def get_font(size: int, path: str | Path = GlobalFontPath) -> ImageFont.FreeTypeFont:
+    """同一字体文件的同一字号只加载一次，绘制文字不会修改字体对象，可以直接共用"""
+    return _load_font(str(path), size)
+
+
+def warm_up():
+    """渲染进程启动时预先加载字体和解码模板，避免首次渲染变慢"""
+    # 战绩图和玩家列表用到的字号
+    for size in (NormalFontSize, StatFontSize, SkinFontSize, 15, 22, 40):
+        get_font(size)
+    for template in Templates:
+        open_template(template)
+
+
+render_pool.add_warm_up(warm_up)
+
+# 绘制代码或模板改动后加一，使旧的渲染缓存失效
+RenderVersion = 1
+
+# 发送到渲染进程前去掉的原始接口数据
+RawDataKeys = (
+    "personas",
+    "stat",
+    "weapons",
+    "vehicles",
+    "skin_info",
+    "gt_id_info",
+    "server_playing_info",
+)
+
+
+def background_fingerprint(player_background_path: Path | None) -> tuple | None:
+    """自定义背景的路径和修改时间，用于渲染缓存的键"""
+    if player_background_path and player_background_path.exists():
+        return str(player_background_path), player_background_path.stat().st_mtime
+    return None
+
+
+def choose_background(pid: str | int, player_background_path: Path | None) -> bytes:
+    """优先使用玩家的自定义背景，其次随机选择pid目录下的一张图，都没有时随机选择默认背景"""
+    if player_background_path:
+        return player_background_path.read_bytes()
+    background_path = BackgroundPathRoot / f"{pid}"
+    if background_path.exists() and (backgrounds := list(background_path.iterdir())):
+        return random.choice(backgrounds).read_bytes()
+    return random.choice(list(DefaultBackgroundPath.iterdir())).read_bytes()
+
+
+def random_tip() -> str:
+    """没有战队时随机展示的小标语"""
+    file_path = "./data/battlefield/小标语/data.json"
+    with open(file_path, encoding="utf-8") as file1:
+        data = json.load(file1)["result"]
+    data.append({"name": "你知道吗,小埋BOT最初的灵感来自于胡桃-by水神"})
+    data.append({"name": "当武器击杀达到60⭐时为蓝光,当达到100⭐之后会发出耀眼的金光~"})
+    return zhconv.convert(random.choice(data)["name"], "zh-cn")
+
+
+@lru_cache(maxsize=1)
+def load_skin_all() -> dict:
+    return json.loads(SkinAllPathRoot.read_text(encoding="utf-8"))
+
+
+def vehicle_skin_guids(skin_info: dict, vehicle: dict) -> dict | None:
+    skin_guids = skin_info["result"]["kits"].get(f"{vehicle['sortOrder']}")
+    return skin_guids[0] if skin_guids else None
+
+
+async def load_item_image(
+    image_url: str, skin_guids: dict | None, skin_all: dict
+) -> tuple[bytes | None, str | None, str | None]:
+    """
+    下载/获取武器或载具的皮肤图片，没有皮肤或皮肤下载失败时使用原图
+    :return: (图片, 皮肤名, 皮肤品质)
+    """
+    skin_level = skin_name = None
+    for skin_guid in (skin_guids or {}).values():
+        if not skin_all.get(skin_guid):
+            continue
+        skin_url = skin_all[skin_guid]["images"]["Png1024xANY"].replace(
+            "[BB_PREFIX]", BB_PREFIX
+        )
+        skin_name = zhconv.convert(skin_all[skin_guid]["name"], "zh-hans")
+        # Superior/Enhanced/Standard
+        skin_level = skin_all[skin_guid]["rarenessLevel"]["name"]
+        if skin_img := await skin_store.get(skin_url):
+            return skin_img, skin_name, skin_level
+        logger.warning(f"下载皮肤失败，url: {skin_url}")
+    # 武器/载具原图和皮肤一样不会变化，保存在同一目录
+    pic_url = image_url.replace("[BB_PREFIX]", BB_PREFIX)
+    return await skin_store.get(pic_url), skin_name, skin_level
+
+
 class PlayerStatPic:
     def __init__(
         self,
@@ -661,34 +799,17 @@ class PlayerStatPic:
         # 如果 URL 为空，直接返回默认头像
         if not url:
             return DefaultAvatarImg
-        avatar_path = AvatarPathRoot / f"{pid}.jpg"
-        # 如果头像文件存在且最后修改时间距现在不足一天，则直接读取
-        if avatar_path.is_file() and avatar_path.stat().st_mtime + 86400 > time.time():
-            return avatar_path.read_bytes()
-        # 读取头像
-        avatar = await PilImageUtils.read_img_by_url(url)
-        if avatar:
-            avatar_path.write_bytes(avatar)
-            return avatar
-        elif avatar_path.is_file():
-            return avatar_path.read_bytes()
-        # 如果下载失败，返回默认头像
-        return DefaultAvatarImg
-
-    async def get_background(self, pid: str | int) -> Image:
-        """根据pid查找路径是否存在，如果存在尝试随机选择一张图"""
-        background_path = BackgroundPathRoot / f"{pid}"
-        player_background_path = self.player_background_path
-        if (
-            not player_background_path
-            and background_path.exists()
-            or player_background_path
-        ):
-            background = player_background_path.open("rb").read()
-        else:
-            background = (
-                random.choice(list(DefaultBackgroundPath.iterdir())).open("rb").read()
-            )
+        # 头像一天内有效，下载失败时使用过期的头像，都没有时返回默认头像
+        return await avatar_store.get(url, f"{pid}.jpg") or DefaultAvatarImg
+
+    def get_background(self) -> Image:
+        # 同一张背景图的缩放、模糊结果是固定的，缓存合成好的背景
+        return image_cache.cached(
+            (self.background, StatImageWidth, StatImageHeight), self.compose_background
+        )
+
+    def compose_background(self) -> Image:
+        background = self.background
         # if not player_background_path:  # 如果没有背景图，就用默认的，且放大
         #     # 将图片调整为2000*1550，如果图片任意一边小于2000则放大，否则缩小，然后将图片居中的部分裁剪出来
         #     background_img = ImageUtils.resize_and_crop_to_center(background, StatImageWidth, StatImageHeight)
@@ -710,38 +831,27 @@ class PlayerStatPic:
         background_img = PilImageUtils.paste_center(background_img, background_img_top)
         return background_img
 
-    async def avatar_template_handle(self) -> Image:
-        avatar_img_data = None
-        local_avatar_path = AvatarPathRoot / f"{self.player_pid}.jpg"
-
-        # 检查本地路径是否存在，如果存在就判断时间是否超过一天，没超过就直接读取头像
-        if local_avatar_path.is_file() and (
-            datetime.now() - datetime.fromtimestamp(local_avatar_path.stat().st_mtime)
-        ) < timedelta(days=1):
-            avatar_img_data = local_avatar_path.read_bytes()
-        else:
-            # 本地路径不存在，从 self.personas["result"] 或 self.gt_id_info 获取头像链接
-            avatar_url = None
-            if self.player_pid in self.personas["result"]:
-                avatar_url = self.personas["result"][self.player_pid].get("avatar")
-            elif isinstance(self.gt_id_info, dict):
-                avatar_url = self.gt_id_info.get("avatar")
-
-            if avatar_url:
-                avatar_img_data = await self.get_avatar(avatar_url, self.player_pid)
-            elif local_avatar_path.is_file():
-                avatar_img_data = local_avatar_path.read_bytes()
-            else:
-                # 链接也获取失败，使用默认头像
-                avatar_img_data = DefaultAvatarImg
-        avatar_img = Image.open(BytesIO(avatar_img_data))
+    async def load_avatar(self) -> bytes:
+        # 从 self.personas["result"] 或 self.gt_id_info 获取头像链接，本地头像未过期时不会下载
+        avatar_url = None
+        if self.player_pid in self.personas["result"]:
+            avatar_url = self.personas["result"][self.player_pid].get("avatar")
+        elif isinstance(self.gt_id_info, dict):
+            avatar_url = self.gt_id_info.get("avatar")
+        if avatar_url:
+            return await self.get_avatar(avatar_url, self.player_pid)
+        # 链接也获取失败，使用本地的头像(可能已过期)或默认头像
+        return await avatar_store.read(f"{self.player_pid}.jpg") or DefaultAvatarImg
+
+    def avatar_template_handle(self) -> Image:
+        avatar_img = image_cache.get(self.avatar, (79 * 2, 79 * 2))
         # 裁剪为圆形
         avatar_img = PilImageUtils.crop_circle(avatar_img, 79)
         # 根据是否在线选择头像框
-        if not self.server_playing_info["result"][self.player_pid]:
-            avatar_template = Image.open(BytesIO(AvatarOfflineImg)).convert("RGBA")
+        if not self.online:
+            avatar_template = open_template(AvatarOfflineImg)
         else:
-            avatar_template = Image.open(BytesIO(AvatarOnlineImg)).convert("RGBA")
+            avatar_template = open_template(AvatarOnlineImg)
         # 将头像放入头像框,在320,90的位置
         avatar_template.paste(avatar_img, (420, 117), avatar_img)
         # 粘贴名字、PID、时长、等级
@@ -751,21 +861,21 @@ class PlayerStatPic:
             (80, 110),
             f"名字: {self.player_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # PID
         avatar_template_draw.text(
             (80, 160),
             f"PID : {self.player_pid}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 时长
         avatar_template_draw.text(
             (80, 210),
             f"时长: {self.time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 等级
         text_position = (80, 260)
@@ -773,7 +883,7 @@ class PlayerStatPic:
         text_bbox = avatar_template_draw.textbbox(
             text_position,
             "等级: ",
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # text_bbox是一个四元组(left, top, right, bottom)，我们可以通过right - left来获取文本的宽度
         text_width = text_bbox[2] - text_bbox[0]
@@ -783,7 +893,7 @@ class PlayerStatPic:
             text_position,
             "等级: ",
             fill=ColorWhite,  # 假设等级之前的文字是白色
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         avatar_template_draw.text(
             (rank_position_x, text_position[1]),
@@ -793,13 +903,13 @@ class PlayerStatPic:
             else ColorBlueAndGray
             if self.rank >= 100
             else ColorWhiteAndGray,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         return avatar_template
 
-    async def ban_template_handle(self) -> Image:
+    def ban_template_handle(self) -> Image:
         # 粘贴BFBAN和BFEAC的信息
-        ban_template = Image.open(BytesIO(BanImg)).convert("RGBA")
+        ban_template = open_template(BanImg)
         ban_template_draw = ImageDraw.Draw(ban_template)
         # BFBAN
         PilImageUtils.draw_centered_text(
@@ -807,7 +917,7 @@ class PlayerStatPic:
             self.bfban_info["stat"] if self.bfban_info["stat"] else "无信息",
             (180, 57),
             fill=ColorRed if self.bfban_info["stat"] == "实锤" else ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # BFEAC
         PilImageUtils.draw_centered_text(
@@ -815,12 +925,12 @@ class PlayerStatPic:
             self.bfeac_info["stat"] if self.bfeac_info["stat"] else "无信息",
             (490, 57),
             fill=ColorRed if self.bfeac_info["stat"] == "已封禁" else ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         return ban_template
 
-    async def stat_template_handle(self) -> Image:
-        stat_template = Image.open(BytesIO(StatImg)).convert("RGBA")
+    def stat_template_handle(self) -> Image:
+        stat_template = open_template(StatImg)
         stat_template_draw = ImageDraw.Draw(stat_template)
         # 前三列: 击杀、死亡、kd，胜局、败局、胜率，kpm、spm、技巧值
         # 后两行：步战击杀、载具击杀、最远爆头距离
@@ -834,105 +944,105 @@ class PlayerStatPic:
             (col1_x, start_row + row_diff_distance * 0),
             f"击杀: {self.kills}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col1_x, start_row + row_diff_distance),
             f"死亡: {self.deaths}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col1_x, start_row + row_diff_distance * 2),
             f"KD: {self.kd}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         # 胜局、败局、胜率
         stat_template_draw.text(
             (col2_x, start_row + row_diff_distance * 0),
             f"胜局: {self.wins}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col2_x, start_row + row_diff_distance * 1),
             f"败局: {self.losses}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col2_x, start_row + row_diff_distance * 2),
             f"胜率: {self.win_rate}%",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         # kpm、spm、技巧值
         stat_template_draw.text(
             (col3_x, start_row + row_diff_distance * 0),
             f"KPM: {self.kpm}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col3_x, start_row + row_diff_distance * 1),
             f"SPM: {self.spm}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col3_x, start_row + row_diff_distance * 2),
             f"技巧值: {self.skill}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         # 步战击杀、载具击杀、最远爆头距离
         stat_template_draw.text(
             (col1_x, start_row + row_diff_distance * 3),
             f"步战击杀: {self.infantry_kill}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col2_x + 100, start_row + row_diff_distance * 3),
             f"载具击杀: {self.vehicle_kill}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         stat_template_draw.text(
             (col1_x, start_row + row_diff_distance * 4),
             f"最远爆头距离: {self.longest_headshot}米",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         return stat_template
 
-    async def soldier_template_handle(self) -> Image:
-        favoriteClass = self.stat["result"]["favoriteClass"]
+    def soldier_template_handle(self) -> Image:
+        favoriteClass = self.favorite_class
         match favoriteClass:
             case "Assault":
-                soldier_img = Image.open(BytesIO(AssaultImg)).convert("RGBA")
+                soldier_img = open_template(AssaultImg)
                 favoriteClass = "突击兵"
             case "Cavalry":
-                soldier_img = Image.open(BytesIO(CavalryImg)).convert("RGBA")
+                soldier_img = open_template(CavalryImg)
                 favoriteClass = "骑兵"
             case "Medic":
-                soldier_img = Image.open(BytesIO(MedicImg)).convert("RGBA")
+                soldier_img = open_template(MedicImg)
                 favoriteClass = "医疗兵"
             case "Pilot":
-                soldier_img = Image.open(BytesIO(PilotImg)).convert("RGBA")
+                soldier_img = open_template(PilotImg)
                 favoriteClass = "飞行员"
             case "Scout":
-                soldier_img = Image.open(BytesIO(ScoutImg)).convert("RGBA")
+                soldier_img = open_template(ScoutImg)
                 favoriteClass = "侦察兵"
             case "Support":
-                soldier_img = Image.open(BytesIO(SupportImg)).convert("RGBA")
+                soldier_img = open_template(SupportImg)
                 favoriteClass = "支援兵"
             case "Tanker":
-                soldier_img = Image.open(BytesIO(TankerImg)).convert("RGBA")
+                soldier_img = open_template(TankerImg)
                 favoriteClass = "坦克手"
             case _:
-                soldier_img = Image.open(BytesIO(AssaultImg)).convert("RGBA")
+                soldier_img = open_template(AssaultImg)
                 favoriteClass = "突击兵"
         soldier_template_draw = ImageDraw.Draw(soldier_img)
         # 最佳兵种名字、协助击杀、最高连杀、复活数、修理数、狗牌数
@@ -945,125 +1055,111 @@ class PlayerStatPic:
             (300, 120),
             f"最佳兵种: {favoriteClass}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         soldier_template_draw.text(
             (col1_x, start_row + row_diff_distance * 0),
             f"协助击杀: {self.killAssists}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         soldier_template_draw.text(
             (col1_x, start_row + row_diff_distance * 1),
             f"复活数: {self.revives}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         soldier_template_draw.text(
             (col1_x, start_row + row_diff_distance * 2),
             f"修理数: {self.repairs}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         soldier_template_draw.text(
             (col2_x, start_row + row_diff_distance * 0),
             f"最高连杀: {self.highestKillStreak}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         soldier_template_draw.text(
             (col2_x, start_row + row_diff_distance * 1),
             f"治疗数: {self.heals}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         soldier_template_draw.text(
             (col2_x, start_row + row_diff_distance * 2),
             f"狗牌数: {self.dogtagsTaken}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
 
         return soldier_img
 
-    async def platoon_template_handle(self) -> Image:
+    def platoon_template_handle(self) -> Image:
         row_diff_distance = 30
         start_row = 20
         col1_x = 35
         if self.platoon_info["result"]:
-            platoon_template = Image.open(BytesIO(PlatoonImg)).convert("RGBA")
+            platoon_template = open_template(PlatoonImg)
             platoon_template_draw = ImageDraw.Draw(platoon_template)
-            if self.platoon_info["result"]["emblem"]:
-                emblem = (
-                    self.platoon_info["result"]["emblem"]
-                    .replace("[SIZE]", "256")
-                    .replace("[FORMAT]", "png")
+            if self.emblem:
+                # 重置为170*170
+                emblem_img = image_cache.get(self.emblem, (170, 170))
+                # 单独将图章做一个放大填充的高斯模糊背景
+                emblem_img_background = PilImageUtils.resize_and_crop_to_center(
+                    emblem_img, platoon_template.width, platoon_template.height
                 )
-                emblem_img = await PilImageUtils.read_img_by_url(emblem)
-                if emblem_img:
-                    emblem_img = Image.open(BytesIO(emblem_img)).convert("RGBA")
-                    # 重置为170*170
-                    emblem_img = emblem_img.resize((170, 170), Image.Resampling.LANCZOS)
-                    # 单独将图章做一个放大填充的高斯模糊背景
-                    emblem_img_background = PilImageUtils.resize_and_crop_to_center(
-                        emblem_img, platoon_template.width, platoon_template.height
-                    )
-                    emblem_img_background = emblem_img_background.filter(
-                        ImageFilter.GaussianBlur(radius=10)
-                    )
-                    # 将emblem_img_background粘贴到platoon_template上
-                    platoon_template = PilImageUtils.paste_center(
-                        emblem_img_background, platoon_template
-                    )
-                    platoon_template.paste(emblem_img, (422, 22), emblem_img)
-                    platoon_template_draw = ImageDraw.Draw(platoon_template)
-                else:
-                    logger.warning(f"下载战队徽章失败，url: {emblem}")
+                emblem_img_background = emblem_img_background.filter(
+                    ImageFilter.GaussianBlur(radius=10)
+                )
+                # 将emblem_img_background粘贴到platoon_template上
+                platoon_template = PilImageUtils.paste_center(
+                    emblem_img_background, platoon_template
+                )
+                platoon_template.paste(emblem_img, (422, 22), emblem_img)
+                platoon_template_draw = ImageDraw.Draw(platoon_template)
             # 战队名字、人数、描述
             platoon_template_draw.text(
                 (col1_x, start_row + row_diff_distance * 0),
                 f"[{self.platoon_info['result']['tag']}]{self.platoon_info['result']['name']}",
                 fill=ColorWhite,
-                font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+                font=get_font(StatFontSize),
             )
             platoon_template_draw.text(
                 (col1_x, start_row + row_diff_distance * 1),
                 f"人数: {self.platoon_info['result']['size']}",
                 fill=ColorWhite,
-                font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+                font=get_font(StatFontSize),
             )
             PilImageUtils.draw_multiline_text(
                 platoon_template_draw,
                 f"描述: {self.platoon_info['result']['description']}",
                 (col1_x, start_row + row_diff_distance * 2),
-                ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+                get_font(StatFontSize),
                 ColorWhite,
                 StatFontSize * 15,
             )
         else:
-            platoon_template = Image.open(BytesIO(PlatoonImgNone)).convert("RGBA")
+            platoon_template = open_template(PlatoonImgNone)
             platoon_template_draw = ImageDraw.Draw(platoon_template)
-            file_path = "./data/battlefield/小标语/data.json"
-            with open(file_path, encoding="utf-8") as file1:
-                data = json.load(file1)["result"]
-                data.append({"name": "你知道吗,小埋BOT最初的灵感来自于胡桃-by水神"})
-                data.append(
-                    {
-                        "name": "当武器击杀达到60⭐时为蓝光,当达到100⭐之后会发出耀眼的金光~"
-                    }
-                )
-                tip = zhconv.convert(random.choice(data)["name"], "zh-cn")
             PilImageUtils.draw_multiline_text(
                 platoon_template_draw,
-                tip,
+                self.tip,
                 (col1_x, start_row + row_diff_distance * 0),
-                ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+                get_font(StatFontSize),
                 ColorWhite,
                 StatFontSize * 22,
             )
         return platoon_template
 
-    async def weapon_template_handle(self, weapon: dict) -> Image:
+    def weapon_template_handle(
+        self,
+        weapon: dict,
+        weapon_img: bytes | None,
+        skin_name: str | None,
+        skin_level: str | None,
+    ) -> Image:
         weapon_name = zhconv.convert(weapon.get("name"), "zh-hans")
         kills = int(weapon["stats"]["values"]["kills"])
         # 星数是kills/100向下取整
@@ -1106,55 +1202,18 @@ class PlayerStatPic:
             )
 
         if kills >= 10000:
-            weapon_template = Image.open(BytesIO(WeaponGoldImg)).convert("RGBA")
+            weapon_template = open_template(WeaponGoldImg)
         elif kills >= 6000:
-            weapon_template = Image.open(BytesIO(WeaponBlueImg)).convert("RGBA")
+            weapon_template = open_template(WeaponBlueImg)
         else:
-            weapon_template = Image.open(BytesIO(WeaponWhiteImg)).convert("RGBA")
+            weapon_template = open_template(WeaponWhiteImg)
         weapon_template_draw = ImageDraw.Draw(weapon_template)
         # 粘贴武器图片/皮肤图片
-        weapon_guid = weapon["guid"]
-        skin_guids = self.skin_info["result"]["weapons"].get(weapon_guid)
-        weapon_img = None
-        skin_level = skin_name = None
-        # 下载/获取对应武器的皮肤图片
-        if skin_guids:
-            for k in skin_guids.keys():
-                skin_guid = skin_guids[k]
-                skin_all_info = json.loads(
-                    open(SkinAllPathRoot, encoding="utf-8").read()
-                )
-                if skin_all_info.get(skin_guid):
-                    skin_url = skin_all_info[skin_guid]["images"][
-                        "Png1024xANY"
-                    ].replace("[BB_PREFIX]", BB_PREFIX)
-                    skin_name = zhconv.convert(
-                        skin_all_info[skin_guid]["name"], "zh-hans"
-                    )
-                    skin_level = skin_all_info[skin_guid]["rarenessLevel"][
-                        "name"
-                    ]  # Superior/Enhanced/Standard
-                    skin_file_name = skin_url.split("/")[-1]
-                    skin_file_path = SkinRootPath / skin_file_name
-                    if skin_file_path.exists():
-                        weapon_img = Image.open(skin_file_path).convert("RGBA")
-                        break
-                    else:
-                        weapon_img = await PilImageUtils.read_img_by_url(skin_url)
-                        if weapon_img:
-                            weapon_img = Image.open(BytesIO(weapon_img)).convert("RGBA")
-                            weapon_img.save(skin_file_path)
-                            break
-                        else:
-                            logger.warning(f"下载武器皮肤失败，url: {skin_url}")
-        if not weapon_img:
-            pic_url = weapon["imageUrl"].replace("[BB_PREFIX]", BB_PREFIX)
-            weapon_img = await PilImageUtils.read_img_by_url(pic_url)
-            weapon_img = Image.open(BytesIO(weapon_img)).convert("RGBA")
-        # 武器的长宽比1024/256 = 4,等比缩放为384*96
-        weapon_img = weapon_img.resize((384, 96), Image.Resampling.LANCZOS)
-        # 粘贴到144,20
-        weapon_template.paste(weapon_img, (144, 20), weapon_img)
+        if weapon_img:
+            # 武器的长宽比1024/256 = 4,等比缩放为384*96
+            weapon_img = image_cache.get(weapon_img, (384, 96))
+            # 粘贴到144,20
+            weapon_template.paste(weapon_img, (144, 20), weapon_img)
         # 武器星星数
         weapon_template_draw.text(
             (54, 97),
@@ -1164,7 +1223,7 @@ class PlayerStatPic:
             else ColorBlue
             if stars >= 60
             else ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 武器名字 55 160  列1:击杀、命中率、效率 列2:爆头率、kpm、时长
         start_row = 150
@@ -1175,7 +1234,7 @@ class PlayerStatPic:
             (col1_x, start_row + row_diff_distance * 0),
             f"{weapon_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         if skin_name:
             weapon_template_draw.text(
@@ -1186,47 +1245,53 @@ class PlayerStatPic:
                 else ColorBlueAndGray
                 if skin_level == "Enhanced"
                 else ColorWhiteAndGray,
-                font=ImageFont.truetype(str(GlobalFontPath), SkinFontSize),
+                font=get_font(SkinFontSize),
             )
         weapon_template_draw.text(
             (col1_x, start_row + row_diff_distance * 1),
             f"击杀: {kills}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col1_x, start_row + row_diff_distance * 2),
             f"命中率: {acc}%",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col1_x, start_row + row_diff_distance * 3),
             f"效率: {eff}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col2_x, start_row + row_diff_distance * 1),
             f"KPM: {kpm}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col2_x, start_row + row_diff_distance * 2),
             f"爆头率: {hs}%",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col2_x, start_row + row_diff_distance * 3),
             f"时长: {time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         return weapon_template
 
-    async def vehicle_template_handle(self, vehicle: dict) -> Image:
+    def vehicle_template_handle(
+        self,
+        vehicle: dict,
+        vehicle_img: bytes | None,
+        skin_name: str | None,
+        skin_level: str | None,
+    ) -> Image:
         vehicle_name = zhconv.convert(vehicle.get("name"), "zh-hans")
         kills = int(vehicle["stats"]["values"]["kills"])
         stars = kills // 100
@@ -1240,57 +1305,18 @@ class PlayerStatPic:
                 f"{round(seconds // 3600)}小时{round(seconds % 3600 // 60)}分钟"
             )
         if kills >= 10000:
-            vehicle_template = Image.open(BytesIO(WeaponGoldImg)).convert("RGBA")
+            vehicle_template = open_template(WeaponGoldImg)
         elif kills >= 6000:
-            vehicle_template = Image.open(BytesIO(WeaponBlueImg)).convert("RGBA")
+            vehicle_template = open_template(WeaponBlueImg)
         else:
-            vehicle_template = Image.open(BytesIO(WeaponWhiteImg)).convert("RGBA")
+            vehicle_template = open_template(WeaponWhiteImg)
         vehicle_template_draw = ImageDraw.Draw(vehicle_template)
         # 粘贴载具图片/皮肤图片
-        # vehicle_guid = vehicle["guid"]
-        skin_guids = self.skin_info["result"]["kits"].get(f"{vehicle['sortOrder']}")
-        if skin_guids:
-            skin_guids = skin_guids[0]
-        vehicle_img = None
-        skin_level = skin_name = None
-        # 下载/获取对应载具的皮肤图片
-        if skin_guids:
-            for k in skin_guids.keys():
-                skin_guid = skin_guids[k]
-                skin_all_info = json.loads(
-                    open(SkinAllPathRoot, encoding="utf-8").read()
-                )
-                if skin_all_info.get(skin_guid):
-                    skin_url = skin_all_info[skin_guid]["images"][
-                        "Png1024xANY"
-                    ].replace("[BB_PREFIX]", BB_PREFIX)
-                    skin_name = zhconv.convert(
-                        skin_all_info[skin_guid]["name"], "zh-hans"
-                    )
-                    skin_level = skin_all_info[skin_guid]["rarenessLevel"]["name"]
-                    skin_file_name = skin_url.split("/")[-1]
-                    skin_file_path = SkinRootPath / skin_file_name
-                    if skin_file_path.exists():
-                        vehicle_img = Image.open(skin_file_path).convert("RGBA")
-                        break
-                    else:
-                        vehicle_img = await PilImageUtils.read_img_by_url(skin_url)
-                        if vehicle_img:
-                            vehicle_img = Image.open(BytesIO(vehicle_img)).convert(
-                                "RGBA"
-                            )
-                            vehicle_img.save(skin_file_path)
-                            break
-                        else:
-                            logger.warning(f"下载载具皮肤失败，url: {skin_url}")
-        if not vehicle_img:
-            pic_url = vehicle["imageUrl"].replace("[BB_PREFIX]", BB_PREFIX)
-            vehicle_img = await PilImageUtils.read_img_by_url(pic_url)
-            vehicle_img = Image.open(BytesIO(vehicle_img)).convert("RGBA")
-        # 载具的长宽比1024/256 = 4,等比缩放为384*96
-        vehicle_img = vehicle_img.resize((384, 96), Image.Resampling.LANCZOS)
-        # 粘贴到144,20
-        vehicle_template.paste(vehicle_img, (144, 20), vehicle_img)
+        if vehicle_img:
+            # 载具的长宽比1024/256 = 4,等比缩放为384*96
+            vehicle_img = image_cache.get(vehicle_img, (384, 96))
+            # 粘贴到144,20
+            vehicle_template.paste(vehicle_img, (144, 20), vehicle_img)
         # 载具星星数
         vehicle_template_draw.text(
             (54, 97),
@@ -1300,7 +1326,7 @@ class PlayerStatPic:
             else ColorBlue
             if stars >= 60
             else ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 载具名字 55 160  列1:击杀、摧毁 列2:kpm、时长
         start_row = 150
@@ -1311,7 +1337,7 @@ class PlayerStatPic:
             (col1_x, start_row + row_diff_distance * 0),
             f"{vehicle_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         if skin_name:
             vehicle_template_draw.text(
@@ -1322,38 +1348,38 @@ class PlayerStatPic:
                 else ColorBlueAndGray
                 if skin_level == "Enhanced"
                 else ColorWhiteAndGray,
-                font=ImageFont.truetype(str(GlobalFontPath), SkinFontSize),
+                font=get_font(SkinFontSize),
             )
         vehicle_template_draw.text(
             (col1_x, start_row + row_diff_distance * 1),
             f"击杀: {kills}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         vehicle_template_draw.text(
             (col1_x, start_row + row_diff_distance * 2),
             f"摧毁: {destroyed}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         vehicle_template_draw.text(
             (col2_x, start_row + row_diff_distance * 1),
             f"KPM: {kpm}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         vehicle_template_draw.text(
             (col2_x, start_row + row_diff_distance * 2),
             f"时长: {time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         return vehicle_template
 
     @staticmethod
-    async def best_text_trapezoid(text) -> Image:
+    def best_text_trapezoid(text) -> Image:
         # 打开BlackTrapezoidImg图片 228*44 ，并将其转换为RGBA模式，写入text
-        best_text_trapezoid = Image.open(BytesIO(BlackTrapezoidImg)).convert("RGBA")
+        best_text_trapezoid = open_template(BlackTrapezoidImg)
         best_text_trapezoid_draw = ImageDraw.Draw(best_text_trapezoid)
         # 写入text
         PilImageUtils.draw_centered_text(
@@ -1361,43 +1387,101 @@ class PlayerStatPic:
             text,
             (72, 22),
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         return best_text_trapezoid
 
-    async def draw(self) -> bytes | Path:
+    async def prefetch(self):
+        """准备绘制需要的背景、头像、战队徽章和武器/载具图片，绘制时不再有网络/磁盘IO"""
+        self.favorite_class = self.stat["result"]["favoriteClass"]
+        self.online = bool(self.server_playing_info["result"][self.player_pid])
+        self.emblem = self.tip = None
+        if platoon := self.platoon_info["result"]:
+            if platoon["emblem"]:
+                emblem = (
+                    platoon["emblem"]
+                    .replace("[SIZE]", "256")
+                    .replace("[FORMAT]", "png")
+                )
+                # 不同战队徽章的url最后一段相同(256.png)，以url的哈希命名
+                self.emblem = await emblem_store.get(
+                    emblem, AssetStore.hashed_name(emblem, ".png")
+                )
+                if not self.emblem:
+                    logger.warning(f"下载战队徽章失败，url: {emblem}")
+        else:
+            self.tip = random_tip()
+        # 武器/载具信息,前4个
+        weapons = [
+            weapon
+            for weapon in WeaponData(self.weapons).filter()[:4]
+            if weapon.get("stats").get("values")
+        ]
+        vehicles = [
+            vehicle
+            for vehicle in VehicleData(self.vehicles).filter()[:4]
+            if vehicle.get("stats").get("values")
+        ]
+        skin_all = await asyncio.to_thread(load_skin_all)
+        self.background, self.avatar, *items = await asyncio.gather(
+            asyncio.to_thread(
+                choose_background, self.player_pid, self.player_background_path
+            ),
+            self.load_avatar(),
+            *(
+                load_item_image(
+                    weapon["imageUrl"],
+                    self.skin_info["result"]["weapons"].get(weapon["guid"]),
+                    skin_all,
+                )
+                for weapon in weapons
+            ),
+            *(
+                load_item_image(
+                    vehicle["imageUrl"],
+                    vehicle_skin_guids(self.skin_info, vehicle),
+                    skin_all,
+                )
+                for vehicle in vehicles
+            ),
+        )
+        self.weapon_items = [
+            (weapon, *item) for weapon, item in zip(weapons, items[: len(weapons)])
+        ]
+        self.vehicle_items = [
+            (vehicle, *item) for vehicle, item in zip(vehicles, items[len(weapons) :])
+        ]
+
+    def render(self) -> bytes:
+        """绘制图片并编码为jpeg，只使用prefetch准备好的数据，在渲染进程中执行"""
         # 图的大小: 2000*1550
         # 画布
         output_img = Image.new("RGB", (StatImageWidth, StatImageHeight), ColorWhite)
 
         # 粘贴背景
-        background_img = await self.get_background(self.player_pid)
+        background_img = self.get_background()
         output_img = PilImageUtils.paste_center(output_img, background_img)
 
         # 粘贴头像框
-        avatar_template = await self.avatar_template_handle()
+        avatar_template = self.avatar_template_handle()
         output_img.paste(avatar_template, (58, 60), avatar_template)
 
         # 粘贴战绩信息
-        stat_template = await self.stat_template_handle()
+        stat_template = self.stat_template_handle()
         output_img.paste(stat_template, (56, 579), stat_template)
 
         # 粘贴兵种信息
-        soldier_template = await self.soldier_template_handle()
+        soldier_template = self.soldier_template_handle()
         output_img.paste(soldier_template, (8, 800), soldier_template)
 
         # 粘贴战排信息
-        platoon_template = await self.platoon_template_handle()
+        platoon_template = self.platoon_template_handle()
         output_img.paste(platoon_template, (58, 1256), platoon_template)
 
         # 粘贴武器信息
-        player_weapon: list = WeaponData(self.weapons).filter()
-        weapon_templates = []
-        for weapon in player_weapon[:4]:
-            if not weapon.get("stats").get("values"):
-                continue
-            weapon_template = await self.weapon_template_handle(weapon)
-            weapon_templates.append(weapon_template)
+        weapon_templates = [
+            self.weapon_template_handle(*weapon) for weapon in self.weapon_items
+        ]
         # 粘贴武器信息,前4个
         weapon_col = 750
         weapon_start_row = 124
@@ -1409,17 +1493,13 @@ class PlayerStatPic:
                 weapon_template,
             )
         # 粘贴最佳武器信息 761, 88
-        best_weapon_template = await self.best_text_trapezoid("最佳武器")
+        best_weapon_template = self.best_text_trapezoid("最佳武器")
         output_img.paste(best_weapon_template, (761, 88), best_weapon_template)
 
         # 粘贴载具信息
-        player_vehicle: list = VehicleData(self.vehicles).filter()
-        vehicle_templates = []
-        for vehicle in player_vehicle[:4]:
-            if not vehicle.get("stats").get("values"):
-                continue
-            vehicle_template = await self.vehicle_template_handle(vehicle)
-            vehicle_templates.append(vehicle_template)
+        vehicle_templates = [
+            self.vehicle_template_handle(*vehicle) for vehicle in self.vehicle_items
+        ]
         # 粘贴载具信息,前4个
         vehicle_col = 1363
         vehicle_start_row = 124
@@ -1431,7 +1511,7 @@ class PlayerStatPic:
                 vehicle_template,
             )
         # 粘贴最佳载具信息 1374, 88
-        best_vehicle_template = await self.best_text_trapezoid("最佳载具")
+        best_vehicle_template = self.best_text_trapezoid("最佳载具")
         output_img.paste(best_vehicle_template, (1374, 88), best_vehicle_template)
 
         # 水印和时间
@@ -1443,7 +1523,7 @@ class PlayerStatPic:
             + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
             (StatImageWidth // 2, StatImageHeight - 30),
             fill=(253, 245, 242),
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
 
         # 如果bfeac信息为已封禁，或者bfban信息为实锤，则将整张图片置黑白
@@ -1451,20 +1531,48 @@ class PlayerStatPic:
             output_img = output_img.convert("L").convert("RGB")
 
         # 粘贴封禁框
-        ban_template = await self.ban_template_handle()
+        ban_template = self.ban_template_handle()
         output_img.paste(ban_template, (91, 440), ban_template)
 
-        # 存为bytes
-        # img_bytes = BytesIO()
-        # output_img.save(img_bytes, format="PNG")
-        # return img_bytes.getvalue()
+        img_bytes = BytesIO()
+        output_img.save(img_bytes, format="JPEG", quality=95)
+        return img_bytes.getvalue()
+
+    def cache_key(self) -> str:
+        """绘制结果只取决于这些数据，数据没有变化时直接使用缓存的图片"""
+        return render_cache.key(
+            RenderVersion,
+            "stat",
+            self.player_name,
+            self.player_pid,
+            self.personas["result"].get(self.player_pid),
+            self.stat,
+            self.weapons,
+            self.vehicles,
+            self.bfeac_info,
+            self.bfban_info,
+            bool(self.server_playing_info["result"][self.player_pid]),
+            self.platoon_info,
+            self.skin_info,
+            self.gt_id_info,
+            background_fingerprint(self.player_background_path),
+        )
 
-        # 存为 FileTempSaveRoot / 时间戳.png
-        file_path = FileTempSaveRoot / f"{round(time.time() * 1000)}.png"
-        # output_img.save(file_path, format="PNG")
-        # 存为jpeg
-        output_img.save(file_path, format="JPEG", quality=95)
-        return file_path
+    async def draw(self) -> bytes | Path:
+        key = await asyncio.to_thread(self.cache_key)
+        if file_path := await render_cache.get(key):
+            return file_path
+        await self.prefetch()
+        img = await render_pool.run(self.render)
+        # 存为 FileTempSaveRoot / 时间戳.png，同时保存到缓存
+        return await render_cache.put(key, img)
+
+    def __getstate__(self) -> dict:
+        # 发送到渲染进程时去掉原始的接口数据，需要的部分已在prefetch中整理好
+        state = self.__dict__.copy()
+        for key in RawDataKeys:
+            state.pop(key, None)
+        return state
 
 
 class PlayerWeaponPic:
@@ -1722,52 +1830,30 @@ class PlayerWeaponPic:
         # 如果 URL 为空，直接返回默认头像
         if not url:
             return DefaultAvatarImg
-        avatar_path = AvatarPathRoot / f"{pid}.jpg"
-        # 如果头像文件存在且最后修改时间距现在不足一天，则直接读取
-        if avatar_path.is_file() and avatar_path.stat().st_mtime + 86400 > time.time():
-            return avatar_path.read_bytes()
-        # 尝试下载头像
-        avatar = await PilImageUtils.read_img_by_url(url)
-        if avatar:
-            avatar_path.write_bytes(avatar)
-            return avatar
-        elif avatar_path.is_file():
-            return avatar_path.read_bytes()
-        # 如果下载失败，返回默认头像
-        return DefaultAvatarImg
-
-    async def avatar_template_handle(self) -> Image:
-        avatar_img_data = None
-        local_avatar_path = AvatarPathRoot / f"{self.player_pid}.jpg"
-
-        # 检查本地路径是否存在，如果存在就判断时间是否超过一天，没超过就直接读取头像
-        if local_avatar_path.is_file() and (
-            datetime.now() - datetime.fromtimestamp(local_avatar_path.stat().st_mtime)
-        ) < timedelta(days=1):
-            avatar_img_data = local_avatar_path.read_bytes()
-        else:
-            # 本地路径不存在，从 self.personas["result"] 或 self.gt_id_info 获取头像链接
-            avatar_url = None
-            if self.player_pid in self.personas["result"]:
-                avatar_url = self.personas["result"][self.player_pid].get("avatar")
-            elif isinstance(self.gt_id_info, dict):
-                avatar_url = self.gt_id_info.get("avatar")
-
-            if avatar_url:
-                avatar_img_data = await self.get_avatar(avatar_url, self.player_pid)
-            elif local_avatar_path.is_file():
-                avatar_img_data = local_avatar_path.read_bytes()
-            else:
-                # 链接也获取失败，使用默认头像
-                avatar_img_data = DefaultAvatarImg
-        avatar_img = Image.open(BytesIO(avatar_img_data))
+        # 头像一天内有效，下载失败时使用过期的头像，都没有时返回默认头像
+        return await avatar_store.get(url, f"{pid}.jpg") or DefaultAvatarImg
+
+    async def load_avatar(self) -> bytes:
+        # 从 self.personas["result"] 或 self.gt_id_info 获取头像链接，本地头像未过期时不会下载
+        avatar_url = None
+        if self.player_pid in self.personas["result"]:
+            avatar_url = self.personas["result"][self.player_pid].get("avatar")
+        elif isinstance(self.gt_id_info, dict):
+            avatar_url = self.gt_id_info.get("avatar")
+        if avatar_url:
+            return await self.get_avatar(avatar_url, self.player_pid)
+        # 链接也获取失败，使用本地的头像(可能已过期)或默认头像
+        return await avatar_store.read(f"{self.player_pid}.jpg") or DefaultAvatarImg
+
+    def avatar_template_handle(self) -> Image:
+        avatar_img = image_cache.get(self.avatar, (79 * 2, 79 * 2))
         # 裁剪为圆形
         avatar_img = PilImageUtils.crop_circle(avatar_img, 79)
         # 根据是否在线选择头像框
-        if not self.server_playing_info["result"][self.player_pid]:
-            avatar_template = Image.open(BytesIO(AvatarOfflineImg)).convert("RGBA")
+        if not self.online:
+            avatar_template = open_template(AvatarOfflineImg)
         else:
-            avatar_template = Image.open(BytesIO(AvatarOnlineImg)).convert("RGBA")
+            avatar_template = open_template(AvatarOnlineImg)
         # 将头像放入头像框,在320,90的位置
         avatar_template.paste(avatar_img, (420, 117), avatar_img)
         # 粘贴名字、PID、时长、等级
@@ -1777,21 +1863,21 @@ class PlayerWeaponPic:
             (80, 110),
             f"名字: {self.player_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # PID
         avatar_template_draw.text(
             (80, 160),
             f"PID : {self.player_pid}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 时长
         avatar_template_draw.text(
             (80, 210),
             f"时长: {self.time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 等级
         text_position = (80, 260)
@@ -1799,7 +1885,7 @@ class PlayerWeaponPic:
         text_bbox = avatar_template_draw.textbbox(
             text_position,
             "等级: ",
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # text_bbox是一个四元组(left, top, right, bottom)，我们可以通过right - left来获取文本的宽度
         text_width = text_bbox[2] - text_bbox[0]
@@ -1809,7 +1895,7 @@ class PlayerWeaponPic:
             text_position,
             "等级: ",
             fill=ColorWhite,  # 假设等级之前的文字是白色
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         avatar_template_draw.text(
             (rank_position_x, text_position[1]),
@@ -1819,26 +1905,25 @@ class PlayerWeaponPic:
             else ColorBlueAndGray
             if self.rank >= 100
             else ColorWhiteAndGray,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         return avatar_template
 
-    async def get_background(
-        self, pid: str | int, target_width, target_height
-    ) -> Image:
-        """根据pid查找路径是否存在，如果存在尝试随机选择一张图"""
-        background_path = BackgroundPathRoot / f"{pid}"
+    def get_background(self, target_width, target_height) -> Image:
+        # 同一张背景图的缩放、模糊结果是固定的，缓存合成好的背景
+        return image_cache.cached(
+            (
+                self.background,
+                target_width,
+                target_height,
+                bool(self.player_background_path),
+            ),
+            lambda: self.compose_background(target_width, target_height),
+        )
+
+    def compose_background(self, target_width, target_height) -> Image:
+        background = self.background
         player_background_path = self.player_background_path
-        if player_background_path:
-            background = player_background_path.open("rb").read()
-        elif background_path.exists():
-            background = (
-                random.choice(list(background_path.iterdir())).open("rb").read()
-            )
-        else:
-            background = (
-                random.choice(list(DefaultBackgroundPath.iterdir())).open("rb").read()
-            )
         # 默认背景，直接放大填充
         if not player_background_path:
             background_img = PilImageUtils.resize_and_crop_to_center(
@@ -1861,7 +1946,13 @@ class PlayerWeaponPic:
             )
         return background_img
 
-    async def weapon_template_handle(self, weapon: dict) -> Image:
+    def weapon_template_handle(
+        self,
+        weapon: dict,
+        weapon_img: bytes | None,
+        skin_name: str | None,
+        skin_level: str | None,
+    ) -> Image:
         weapon_name = zhconv.convert(weapon.get("name"), "zh-hans")
         kills = int(weapon["stats"]["values"]["kills"])
         # 星数是kills/100向下取整
@@ -1904,55 +1995,18 @@ class PlayerWeaponPic:
             )
 
         if kills >= 10000:
-            weapon_template = Image.open(BytesIO(WeaponGoldImg)).convert("RGBA")
+            weapon_template = open_template(WeaponGoldImg)
         elif kills >= 6000:
-            weapon_template = Image.open(BytesIO(WeaponBlueImg)).convert("RGBA")
+            weapon_template = open_template(WeaponBlueImg)
         else:
-            weapon_template = Image.open(BytesIO(WeaponWhiteImg)).convert("RGBA")
+            weapon_template = open_template(WeaponWhiteImg)
         weapon_template_draw = ImageDraw.Draw(weapon_template)
         # 粘贴武器图片/皮肤图片
-        weapon_guid = weapon["guid"]
-        skin_guids = self.skin_info["result"]["weapons"].get(weapon_guid)
-        weapon_img = None
-        skin_level = skin_name = None
-        # 下载/获取对应武器的皮肤图片
-        if skin_guids:
-            for k in skin_guids.keys():
-                skin_guid = skin_guids[k]
-                skin_all_info = json.loads(
-                    open(SkinAllPathRoot, encoding="utf-8").read()
-                )
-                if skin_all_info.get(skin_guid):
-                    skin_url = skin_all_info[skin_guid]["images"][
-                        "Png1024xANY"
-                    ].replace("[BB_PREFIX]", BB_PREFIX)
-                    skin_name = zhconv.convert(
-                        skin_all_info[skin_guid]["name"], "zh-hans"
-                    )
-                    skin_level = skin_all_info[skin_guid]["rarenessLevel"][
-                        "name"
-                    ]  # Superior/Enhanced/Standard
-                    skin_file_name = skin_url.split("/")[-1]
-                    skin_file_path = SkinRootPath / skin_file_name
-                    if skin_file_path.exists():
-                        weapon_img = Image.open(skin_file_path).convert("RGBA")
-                        break
-                    else:
-                        weapon_img = await PilImageUtils.read_img_by_url(skin_url)
-                        if weapon_img:
-                            weapon_img = Image.open(BytesIO(weapon_img)).convert("RGBA")
-                            weapon_img.save(skin_file_path)
-                            break
-                        else:
-                            logger.warning(f"下载武器皮肤失败，url: {skin_url}")
-        if not weapon_img:
-            pic_url = weapon["imageUrl"].replace("[BB_PREFIX]", BB_PREFIX)
-            weapon_img = await PilImageUtils.read_img_by_url(pic_url)
-            weapon_img = Image.open(BytesIO(weapon_img)).convert("RGBA")
-        # 武器的长宽比1024/256 = 4,等比缩放为384*96
-        weapon_img = weapon_img.resize((384, 96), Image.Resampling.LANCZOS)
-        # 粘贴到144,20
-        weapon_template.paste(weapon_img, (144, 20), weapon_img)
+        if weapon_img:
+            # 武器的长宽比1024/256 = 4,等比缩放为384*96
+            weapon_img = image_cache.get(weapon_img, (384, 96))
+            # 粘贴到144,20
+            weapon_template.paste(weapon_img, (144, 20), weapon_img)
         # 武器星星数
         weapon_template_draw.text(
             (54, 97),
@@ -1962,7 +2016,7 @@ class PlayerWeaponPic:
             else ColorBlue
             if stars >= 60
             else ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 武器名字 55 160  列1:击杀、命中率、效率 列2:爆头率、kpm、时长
         start_row = 150
@@ -1973,7 +2027,7 @@ class PlayerWeaponPic:
             (col1_x, start_row + row_diff_distance * 0),
             f"{weapon_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         if skin_name:
             weapon_template_draw.text(
@@ -1984,76 +2038,82 @@ class PlayerWeaponPic:
                 else ColorBlueAndGray
                 if skin_level == "Enhanced"
                 else ColorWhiteAndGray,
-                font=ImageFont.truetype(str(GlobalFontPath), SkinFontSize),
+                font=get_font(SkinFontSize),
             )
         weapon_template_draw.text(
             (col1_x, start_row + row_diff_distance * 1),
             f"击杀: {kills}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col1_x, start_row + row_diff_distance * 2),
             f"命中率: {acc}%",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col1_x, start_row + row_diff_distance * 3),
             f"效率: {eff}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col2_x, start_row + row_diff_distance * 1),
             f"KPM: {kpm}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col2_x, start_row + row_diff_distance * 2),
             f"爆头率: {hs}%",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         weapon_template_draw.text(
             (col2_x, start_row + row_diff_distance * 3),
             f"时长: {time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         return weapon_template
 
-    async def draw(
-        self,
-        col: int = 2,
-        row: int = 6,
-    ) -> bytes | Path | None:
-        """绘制武器数据图片
-        与生涯不同，武器只绘制头像框+武器数据，默认为两列四行
-        这里是动态计算,每个武器框距离左边边界间距:90,列间距:43,行间距:25,右边边界间距:90，
-        获取weapons的长度，图片一行最多允许8列，每8个武器换一行，行数最多为10行，所以最多80个武器，
-        图片总宽度为90 + 武器框宽度 * 列数 + 列间距 * (列数 - 1) + 90
-        图片总高度为60 + 头像框高度 + 武器框高度 * 行数 + 行间距 * (行数 - 1) + 60
-        武器框: 570x320
-        头像框: 631x349
-        """
-        weapons = []
-        if not self.weapons:
-            return None
-        else:
-            for weapon in self.weapons:
-                if not weapon.get("stats").get("values"):
-                    continue
-                weapons.append(weapon)
+    async def prefetch(self, col: int, row: int):
+        """整理武器数据并准备背景、头像和武器图片，绘制时不再有网络/磁盘IO"""
+        self.online = bool(self.server_playing_info["result"][self.player_pid])
+        weapons = [
+            weapon for weapon in self.weapons if weapon.get("stats").get("values")
+        ]
         # 整理成col列row行的列表
         if col > 8:
             col = 8
         if row > 10:
             row = 10
-        weapon_data = [weapons[i * col : (i + 1) * col] for i in range(row)]
-        col_origin = col
-        row_origin = row
+        weapons = weapons[: col * row]
+        skin_all = await asyncio.to_thread(load_skin_all)
+        self.background, self.avatar, *items = await asyncio.gather(
+            asyncio.to_thread(
+                choose_background, self.player_pid, self.player_background_path
+            ),
+            self.load_avatar(),
+            *(
+                load_item_image(
+                    weapon["imageUrl"],
+                    self.skin_info["result"]["weapons"].get(weapon["guid"]),
+                    skin_all,
+                )
+                for weapon in weapons
+            ),
+        )
+        items = [(weapon, *item) for weapon, item in zip(weapons, items)]
+        self.col = col
+        self.weapon_data = [items[i * col : (i + 1) * col] for i in range(row)]
+
+    def render(self) -> bytes:
+        """绘制图片并编码为jpeg，只使用prefetch准备好的数据，在渲染进程中执行"""
+        weapon_data = self.weapon_data
+        col_origin = self.col
+        row_origin = len(weapon_data)
         col = len(weapon_data[0])
         row = len(weapon_data)
         weapon_template_num = col * row
@@ -2067,21 +2127,19 @@ class PlayerWeaponPic:
         output_img = Image.new("RGB", (image_width, image_height), ColorWhite)
 
         # 粘贴背景
-        background_img = await self.get_background(
-            self.player_pid, image_width, image_height
-        )
+        background_img = self.get_background(image_width, image_height)
         output_img = PilImageUtils.paste_center(output_img, background_img)
 
         # 粘贴头像框
-        avatar_template = await self.avatar_template_handle()
+        avatar_template = self.avatar_template_handle()
         output_img.paste(avatar_template, (58, 60), avatar_template)
 
         # 粘贴武器信息
-        weapon_templates = []
-        for weapon in weapon_data[:weapon_template_num]:
-            for item in weapon:
-                weapon_template = await self.weapon_template_handle(item)
-                weapon_templates.append(weapon_template)
+        weapon_templates = [
+            self.weapon_template_handle(*item)
+            for items in weapon_data[:weapon_template_num]
+            for item in items
+        ]
         # 整理成col_origin列row_origin行的列表
         weapon_templates = [
             weapon_templates[i * col_origin : (i + 1) * col_origin]
@@ -2109,15 +2167,61 @@ class PlayerWeaponPic:
             + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
             (image_width // 2, image_height - 20),
             fill=(253, 245, 242),
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
+        )
+
+        img_bytes = BytesIO()
+        output_img.save(img_bytes, format="JPEG", quality=95)
+        return img_bytes.getvalue()
+
+    def cache_key(self, col: int, row: int) -> str:
+        """绘制结果只取决于这些数据，数据没有变化时直接使用缓存的图片"""
+        return render_cache.key(
+            RenderVersion,
+            "weapon",
+            col,
+            row,
+            self.player_name,
+            self.player_pid,
+            self.personas["result"].get(self.player_pid),
+            self.stat,
+            self.weapons,
+            bool(self.server_playing_info["result"][self.player_pid]),
+            self.skin_info,
+            self.gt_id_info,
+            background_fingerprint(self.player_background_path),
         )
 
-        # 存为 FileTempSaveRoot / 时间戳.png
-        file_path = FileTempSaveRoot / f"{round(time.time() * 1000)}.png"
-        # output_img.save(file_path, format="PNG")
-        # 存为jpeg
-        output_img.save(file_path, format="JPEG", quality=95)
-        return file_path
+    async def draw(
+        self,
+        col: int = 2,
+        row: int = 6,
+    ) -> bytes | Path | None:
+        """绘制武器数据图片
+        与生涯不同，武器只绘制头像框+武器数据，默认为两列四行
+        这里是动态计算,每个武器框距离左边边界间距:90,列间距:43,行间距:25,右边边界间距:90，
+        获取weapons的长度，图片一行最多允许8列，每8个武器换一行，行数最多为10行，所以最多80个武器，
+        图片总宽度为90 + 武器框宽度 * 列数 + 列间距 * (列数 - 1) + 90
+        图片总高度为60 + 头像框高度 + 武器框高度 * 行数 + 行间距 * (行数 - 1) + 60
+        武器框: 570x320
+        头像框: 631x349
+        """
+        if not self.weapons:
+            return None
+        key = await asyncio.to_thread(self.cache_key, col, row)
+        if file_path := await render_cache.get(key):
+            return file_path
+        await self.prefetch(col, row)
+        img = await render_pool.run(self.render)
+        # 存为 FileTempSaveRoot / 时间戳.png，同时保存到缓存
+        return await render_cache.put(key, img)
+
+    def __getstate__(self) -> dict:
+        # 发送到渲染进程时去掉原始的接口数据，需要的部分已在prefetch中整理好
+        state = self.__dict__.copy()
+        for key in RawDataKeys:
+            state.pop(key, None)
+        return state
 
 
 class PlayerVehiclePic:
@@ -2375,52 +2479,30 @@ class PlayerVehiclePic:
         # 如果 URL 为空，直接返回默认头像
         if not url:
             return DefaultAvatarImg
-        avatar_path = AvatarPathRoot / f"{pid}.jpg"
-        # 如果头像文件存在且最后修改时间距现在不足一天，则直接读取
-        if avatar_path.is_file() and avatar_path.stat().st_mtime + 86400 > time.time():
-            return avatar_path.read_bytes()
-        # 尝试下载头像
-        avatar = await PilImageUtils.read_img_by_url(url)
-        if avatar:
-            avatar_path.write_bytes(avatar)
-            return avatar
-        elif avatar_path.is_file():
-            return avatar_path.read_bytes()
-        # 如果下载失败，返回默认头像
-        return DefaultAvatarImg
-
-    async def avatar_template_handle(self) -> Image:
-        avatar_img_data = None
-        local_avatar_path = AvatarPathRoot / f"{self.player_pid}.jpg"
-
-        # 检查本地路径是否存在，如果存在就判断时间是否超过一天，没超过就直接读取头像
-        if local_avatar_path.is_file() and (
-            datetime.now() - datetime.fromtimestamp(local_avatar_path.stat().st_mtime)
-        ) < timedelta(days=1):
-            avatar_img_data = local_avatar_path.read_bytes()
-        else:
-            # 本地路径不存在，从 self.personas["result"] 或 self.gt_id_info 获取头像链接
-            avatar_url = None
-            if self.player_pid in self.personas["result"]:
-                avatar_url = self.personas["result"][self.player_pid].get("avatar")
-            elif isinstance(self.gt_id_info, dict):
-                avatar_url = self.gt_id_info.get("avatar")
-
-            if avatar_url:
-                avatar_img_data = await self.get_avatar(avatar_url, self.player_pid)
-            elif local_avatar_path.is_file():
-                avatar_img_data = local_avatar_path.read_bytes()
-            else:
-                # 链接也获取失败，使用默认头像
-                avatar_img_data = DefaultAvatarImg
-        avatar_img = Image.open(BytesIO(avatar_img_data))
+        # 头像一天内有效，下载失败时使用过期的头像，都没有时返回默认头像
+        return await avatar_store.get(url, f"{pid}.jpg") or DefaultAvatarImg
+
+    async def load_avatar(self) -> bytes:
+        # 从 self.personas["result"] 或 self.gt_id_info 获取头像链接，本地头像未过期时不会下载
+        avatar_url = None
+        if self.player_pid in self.personas["result"]:
+            avatar_url = self.personas["result"][self.player_pid].get("avatar")
+        elif isinstance(self.gt_id_info, dict):
+            avatar_url = self.gt_id_info.get("avatar")
+        if avatar_url:
+            return await self.get_avatar(avatar_url, self.player_pid)
+        # 链接也获取失败，使用本地的头像(可能已过期)或默认头像
+        return await avatar_store.read(f"{self.player_pid}.jpg") or DefaultAvatarImg
+
+    def avatar_template_handle(self) -> Image:
+        avatar_img = image_cache.get(self.avatar, (79 * 2, 79 * 2))
         # 裁剪为圆形
         avatar_img = PilImageUtils.crop_circle(avatar_img, 79)
         # 根据是否在线选择头像框
-        if not self.server_playing_info["result"][self.player_pid]:
-            avatar_template = Image.open(BytesIO(AvatarOfflineImg)).convert("RGBA")
+        if not self.online:
+            avatar_template = open_template(AvatarOfflineImg)
         else:
-            avatar_template = Image.open(BytesIO(AvatarOnlineImg)).convert("RGBA")
+            avatar_template = open_template(AvatarOnlineImg)
         # 将头像放入头像框,在320,90的位置
         avatar_template.paste(avatar_img, (420, 117), avatar_img)
         # 粘贴名字、PID、时长、等级
@@ -2430,21 +2512,21 @@ class PlayerVehiclePic:
             (80, 110),
             f"名字: {self.player_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # PID
         avatar_template_draw.text(
             (80, 160),
             f"PID : {self.player_pid}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 时长
         avatar_template_draw.text(
             (80, 210),
             f"时长: {self.time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 等级
         text_position = (80, 260)
@@ -2452,7 +2534,7 @@ class PlayerVehiclePic:
         text_bbox = avatar_template_draw.textbbox(
             text_position,
             "等级: ",
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # text_bbox是一个四元组(left, top, right, bottom)，我们可以通过right - left来获取文本的宽度
         text_width = text_bbox[2] - text_bbox[0]
@@ -2462,7 +2544,7 @@ class PlayerVehiclePic:
             text_position,
             "等级: ",
             fill=ColorWhite,  # 假设等级之前的文字是白色
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         avatar_template_draw.text(
             (rank_position_x, text_position[1]),
@@ -2472,29 +2554,25 @@ class PlayerVehiclePic:
             else ColorBlueAndGray
             if self.rank >= 100
             else ColorWhiteAndGray,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         return avatar_template
 
-    async def get_background(
-        self, pid: str | int, target_width, target_height
-    ) -> Image:
-        """根据pid查找路径是否存在，如果存在尝试随机选择一张图"""
-        background_path = BackgroundPathRoot / f"{pid}"
+    def get_background(self, target_width, target_height) -> Image:
+        # 同一张背景图的缩放、模糊结果是固定的，缓存合成好的背景
+        return image_cache.cached(
+            (
+                self.background,
+                target_width,
+                target_height,
+                bool(self.player_background_path),
+            ),
+            lambda: self.compose_background(target_width, target_height),
+        )
+
+    def compose_background(self, target_width, target_height) -> Image:
+        background = self.background
         player_background_path = self.player_background_path
-        if not player_background_path:
-            if background_path.exists():
-                background = (
-                    random.choice(list(background_path.iterdir())).open("rb").read()
-                )
-            else:
-                background = (
-                    random.choice(list(DefaultBackgroundPath.iterdir()))
-                    .open("rb")
-                    .read()
-                )
-        else:
-            background = player_background_path.open("rb").read()
         # 默认背景，直接放大填充
         if not player_background_path:
             background_img = PilImageUtils.resize_and_crop_to_center(
@@ -2517,7 +2595,13 @@ class PlayerVehiclePic:
             )
         return background_img
 
-    async def vehicle_template_handle(self, vehicle: dict) -> Image:
+    def vehicle_template_handle(
+        self,
+        vehicle: dict,
+        vehicle_img: bytes | None,
+        skin_name: str | None,
+        skin_level: str | None,
+    ) -> Image:
         vehicle_name = zhconv.convert(vehicle.get("name"), "zh-hans")
         kills = int(vehicle["stats"]["values"]["kills"])
         stars = kills // 100
@@ -2531,57 +2615,18 @@ class PlayerVehiclePic:
                 f"{round(seconds // 3600)}小时{round(seconds % 3600 // 60)}分钟"
             )
         if kills >= 10000:
-            vehicle_template = Image.open(BytesIO(WeaponGoldImg)).convert("RGBA")
+            vehicle_template = open_template(WeaponGoldImg)
         elif kills >= 6000:
-            vehicle_template = Image.open(BytesIO(WeaponBlueImg)).convert("RGBA")
+            vehicle_template = open_template(WeaponBlueImg)
         else:
-            vehicle_template = Image.open(BytesIO(WeaponWhiteImg)).convert("RGBA")
+            vehicle_template = open_template(WeaponWhiteImg)
         vehicle_template_draw = ImageDraw.Draw(vehicle_template)
         # 粘贴载具图片/皮肤图片
-        # vehicle_guid = vehicle["guid"]
-        skin_guids = self.skin_info["result"]["kits"].get(f"{vehicle['sortOrder']}")
-        if skin_guids:
-            skin_guids = skin_guids[0]
-        vehicle_img = None
-        skin_level = skin_name = None
-        # 下载/获取对应载具的皮肤图片
-        if skin_guids:
-            for k in skin_guids.keys():
-                skin_guid = skin_guids[k]
-                skin_all_info = json.loads(
-                    open(SkinAllPathRoot, encoding="utf-8").read()
-                )
-                if skin_all_info.get(skin_guid):
-                    skin_url = skin_all_info[skin_guid]["images"][
-                        "Png1024xANY"
-                    ].replace("[BB_PREFIX]", BB_PREFIX)
-                    skin_name = zhconv.convert(
-                        skin_all_info[skin_guid]["name"], "zh-hans"
-                    )
-                    skin_level = skin_all_info[skin_guid]["rarenessLevel"]["name"]
-                    skin_file_name = skin_url.split("/")[-1]
-                    skin_file_path = SkinRootPath / skin_file_name
-                    if skin_file_path.exists():
-                        vehicle_img = Image.open(skin_file_path).convert("RGBA")
-                        break
-                    else:
-                        vehicle_img = await PilImageUtils.read_img_by_url(skin_url)
-                        if vehicle_img:
-                            vehicle_img = Image.open(BytesIO(vehicle_img)).convert(
-                                "RGBA"
-                            )
-                            vehicle_img.save(skin_file_path)
-                            break
-                        else:
-                            logger.warning(f"下载载具皮肤失败，url: {skin_url}")
-        if not vehicle_img:
-            pic_url = vehicle["imageUrl"].replace("[BB_PREFIX]", BB_PREFIX)
-            vehicle_img = await PilImageUtils.read_img_by_url(pic_url)
-            vehicle_img = Image.open(BytesIO(vehicle_img)).convert("RGBA")
-        # 载具的长宽比1024/256 = 4,等比缩放为384*96
-        vehicle_img = vehicle_img.resize((384, 96), Image.Resampling.LANCZOS)
-        # 粘贴到144,20
-        vehicle_template.paste(vehicle_img, (144, 20), vehicle_img)
+        if vehicle_img:
+            # 载具的长宽比1024/256 = 4,等比缩放为384*96
+            vehicle_img = image_cache.get(vehicle_img, (384, 96))
+            # 粘贴到144,20
+            vehicle_template.paste(vehicle_img, (144, 20), vehicle_img)
         # 载具星星数
         vehicle_template_draw.text(
             (54, 97),
@@ -2591,7 +2636,7 @@ class PlayerVehiclePic:
             else ColorBlue
             if stars >= 60
             else ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), NormalFontSize),
+            font=get_font(NormalFontSize),
         )
         # 载具名字 55 160  列1:击杀、摧毁 列2:kpm、时长
         start_row = 150
@@ -2602,7 +2647,7 @@ class PlayerVehiclePic:
             (col1_x, start_row + row_diff_distance * 0),
             f"{vehicle_name}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         if skin_name:
             vehicle_template_draw.text(
@@ -2613,64 +2658,70 @@ class PlayerVehiclePic:
                 else ColorBlueAndGray
                 if skin_level == "Enhanced"
                 else ColorWhiteAndGray,
-                font=ImageFont.truetype(str(GlobalFontPath), SkinFontSize),
+                font=get_font(SkinFontSize),
             )
         vehicle_template_draw.text(
             (col1_x, start_row + row_diff_distance * 1),
             f"击杀: {kills}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         vehicle_template_draw.text(
             (col1_x, start_row + row_diff_distance * 2),
             f"摧毁: {destroyed}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         vehicle_template_draw.text(
             (col2_x, start_row + row_diff_distance * 1),
             f"KPM: {kpm}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         vehicle_template_draw.text(
             (col2_x, start_row + row_diff_distance * 2),
             f"时长: {time_played}",
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
         return vehicle_template
 
-    async def draw(
-        self,
-        col: int = 2,
-        row: int = 6,
-    ) -> bytes | Path | None:
-        """绘制载具数据图片
-        与生涯不同，载具只绘制头像框+载具数据，默认为两列四行
-        这里是动态计算,每个载具框距离左边边界间距:90,列间距:43,行间距:25,右边边界间距:90，
-        获取vehicles的长度，图片一行最多允许8列，每8个载具换一行，行数最多为10行，所以最多80个载具，
-        图片总宽度为90 + 载具框宽度 * 列数 + 列间距 * (列数 - 1) + 90
-        图片总高度为60 + 头像框高度 + 载具框高度 * 行数 + 行间距 * (行数 - 1) + 60
-        载具框: 570x320
-        头像框: 631x349
-        """
-        vehicles = []
-        if not self.vehicles:
-            return None
-        else:
-            for vehicle in self.vehicles:
-                if not vehicle.get("stats").get("values"):
-                    continue
-                vehicles.append(vehicle)
+    async def prefetch(self, col: int, row: int):
+        """整理载具数据并准备背景、头像和载具图片，绘制时不再有网络/磁盘IO"""
+        self.online = bool(self.server_playing_info["result"][self.player_pid])
+        vehicles = [
+            vehicle for vehicle in self.vehicles if vehicle.get("stats").get("values")
+        ]
         # 整理成col列row行的列表
         if col > 8:
             col = 8
         if row > 10:
             row = 10
-        vehicle_data = [vehicles[i * col : (i + 1) * col] for i in range(row)]
-        col_origin = col
-        row_origin = row
+        vehicles = vehicles[: col * row]
+        skin_all = await asyncio.to_thread(load_skin_all)
+        self.background, self.avatar, *items = await asyncio.gather(
+            asyncio.to_thread(
+                choose_background, self.player_pid, self.player_background_path
+            ),
+            self.load_avatar(),
+            *(
+                load_item_image(
+                    vehicle["imageUrl"],
+                    vehicle_skin_guids(self.skin_info, vehicle),
+                    skin_all,
+                )
+                for vehicle in vehicles
+            ),
+        )
+        items = [(vehicle, *item) for vehicle, item in zip(vehicles, items)]
+        self.col = col
+        self.vehicle_data = [items[i * col : (i + 1) * col] for i in range(row)]
+
+    def render(self) -> bytes:
+        """绘制图片并编码为jpeg，只使用prefetch准备好的数据，在渲染进程中执行"""
+        vehicle_data = self.vehicle_data
+        col_origin = self.col
+        row_origin = len(vehicle_data)
         col = len(vehicle_data[0])
         row = len(vehicle_data)
         vehicle_template_num = col * row
@@ -2684,21 +2735,19 @@ class PlayerVehiclePic:
         output_img = Image.new("RGB", (image_width, image_height), ColorWhite)
 
         # 粘贴背景
-        background_img = await self.get_background(
-            self.player_pid, image_width, image_height
-        )
+        background_img = self.get_background(image_width, image_height)
         output_img = PilImageUtils.paste_center(output_img, background_img)
 
         # 粘贴头像框
-        avatar_template = await self.avatar_template_handle()
+        avatar_template = self.avatar_template_handle()
         output_img.paste(avatar_template, (58, 60), avatar_template)
 
         # 粘贴载具信息
-        vehicle_templates = []
-        for vehicle in vehicle_data[:vehicle_template_num]:
-            for item in vehicle:
-                vehicle_template = await self.vehicle_template_handle(item)
-                vehicle_templates.append(vehicle_template)
+        vehicle_templates = [
+            self.vehicle_template_handle(*item)
+            for items in vehicle_data[:vehicle_template_num]
+            for item in items
+        ]
         # 整理成col_origin列row_origin行的列表
         vehicle_templates = [
             vehicle_templates[i * col_origin : (i + 1) * col_origin]
@@ -2726,15 +2775,61 @@ class PlayerVehiclePic:
             + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
             (image_width // 2, image_height - 20),
             fill=(253, 245, 242),
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
+        )
+
+        img_bytes = BytesIO()
+        output_img.save(img_bytes, format="JPEG", quality=95)
+        return img_bytes.getvalue()
+
+    def cache_key(self, col: int, row: int) -> str:
+        """绘制结果只取决于这些数据，数据没有变化时直接使用缓存的图片"""
+        return render_cache.key(
+            RenderVersion,
+            "vehicle",
+            col,
+            row,
+            self.player_name,
+            self.player_pid,
+            self.personas["result"].get(self.player_pid),
+            self.stat,
+            self.vehicles,
+            bool(self.server_playing_info["result"][self.player_pid]),
+            self.skin_info,
+            self.gt_id_info,
+            background_fingerprint(self.player_background_path),
         )
 
-        # 存为 FileTempSaveRoot / 时间戳.png
-        file_path = FileTempSaveRoot / f"{round(time.time() * 1000)}.png"
-        # output_img.save(file_path, format="PNG")
-        # 存为jpeg
-        output_img.save(file_path, format="JPEG", quality=95)
-        return file_path
+    async def draw(
+        self,
+        col: int = 2,
+        row: int = 6,
+    ) -> bytes | Path | None:
+        """绘制载具数据图片
+        与生涯不同，载具只绘制头像框+载具数据，默认为两列四行
+        这里是动态计算,每个载具框距离左边边界间距:90,列间距:43,行间距:25,右边边界间距:90，
+        获取vehicles的长度，图片一行最多允许8列，每8个载具换一行，行数最多为10行，所以最多80个载具，
+        图片总宽度为90 + 载具框宽度 * 列数 + 列间距 * (列数 - 1) + 90
+        图片总高度为60 + 头像框高度 + 载具框高度 * 行数 + 行间距 * (行数 - 1) + 60
+        载具框: 570x320
+        头像框: 631x349
+        """
+        if not self.vehicles:
+            return None
+        key = await asyncio.to_thread(self.cache_key, col, row)
+        if file_path := await render_cache.get(key):
+            return file_path
+        await self.prefetch(col, row)
+        img = await render_pool.run(self.render)
+        # 存为 FileTempSaveRoot / 时间戳.png，同时保存到缓存
+        return await render_cache.put(key, img)
+
+    def __getstate__(self) -> dict:
+        # 发送到渲染进程时去掉原始的接口数据，需要的部分已在prefetch中整理好
+        state = self.__dict__.copy()
+        for key in RawDataKeys:
+            state.pop(key, None)
+        return state
 
 
 class Exchange:
@@ -2884,14 +2979,14 @@ class Exchange:
             (19, 167),
             item_name,
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), ExchangeNameFontSize),
+            font=get_font(ExchangeNameFontSize),
         )
         # 皮肤名字, 115 +79
         output_img_draw.text(
             (19, 194),
             item_skin_name,
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), ExchangeSkinNameFontSize),
+            font=get_font(ExchangeSkinNameFontSize),
         )
         # 品质, 115 + 110
         if item_rareness == "传奇":
@@ -2900,21 +2995,21 @@ class Exchange:
                     (19, 225),
                     f"{item_rareness}(限定)",
                     fill=ColorGold,
-                    font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+                    font=get_font(ExchangePriceFontSize),
                 )
             elif item_skin_name in self.XD_skin_list:
                 output_img_draw.text(
                     (19, 225),
                     f"{item_rareness}(限定)",
                     fill=ColorGold,
-                    font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+                    font=get_font(ExchangePriceFontSize),
                 )
             else:
                 output_img_draw.text(
                     (19, 225),
                     item_rareness,
                     fill=ColorGold,
-                    font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+                    font=get_font(ExchangePriceFontSize),
                 )
             tx_png = Image.open("./data/battlefield/pic/tx/1.png").convert("RGBA")
         elif item_skin_name in self.XD_skin_list:
@@ -2922,7 +3017,7 @@ class Exchange:
                 (19, 225),
                 f"{item_rareness}(限定)",
                 fill=ColorGold,
-                font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+                font=get_font(ExchangePriceFontSize),
             )
             tx_png = Image.open("./data/battlefield/pic/tx/2.png").convert("RGBA")
         elif item_rareness == "精英":
@@ -2930,7 +3025,7 @@ class Exchange:
                 (19, 225),
                 item_rareness,
                 fill=ColorBlue,
-                font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+                font=get_font(ExchangePriceFontSize),
             )
             tx_png = Image.open("./data/battlefield/pic/tx/2.png").convert("RGBA")
         else:
@@ -2938,7 +3033,7 @@ class Exchange:
                 (19, 225),
                 item_rareness,
                 fill=ColorWhite,
-                font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+                font=get_font(ExchangePriceFontSize),
             )
             tx_png = Image.open("./data/battlefield/pic/tx/3.png").convert("RGBA")
         # 特效图片拉伸
@@ -2950,7 +3045,7 @@ class Exchange:
             (43, 249),
             str(item_price),
             fill=ColorWhite,
-            font=ImageFont.truetype(str(GlobalFontPath), ExchangePriceFontSize),
+            font=get_font(ExchangePriceFontSize),
         )
         # 价格的图片
         price_img = Image.open(ExchangePricePath).convert("RGBA")
@@ -2994,7 +3089,7 @@ class Exchange:
             + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
             (total_width // 2, total_height - 20),
             fill=(253, 245, 242),
-            font=ImageFont.truetype(str(GlobalFontPath), StatFontSize),
+            font=get_font(StatFontSize),
         )
 
         # 交换更新频率比较低，所以直接存png原图
@@ -3007,52 +3102,196 @@ class Exchange:
         return output_buffer.getvalue()
 
 
+# 等级对应的经验
+RankExpList = (
+    0,
+    1000,
+    5000,
+    15000,
+    25000,
+    40000,
+    55000,
+    75000,
+    95000,
+    120000,
+    145000,
+    175000,
+    205000,
+    235000,
+    265000,
+    295000,
+    325000,
+    355000,
+    395000,
+    435000,
+    475000,
+    515000,
+    555000,
+    595000,
+    635000,
+    675000,
+    715000,
+    755000,
+    795000,
+    845000,
+    895000,
+    945000,
+    995000,
+    1045000,
+    1095000,
+    1145000,
+    1195000,
+    1245000,
+    1295000,
+    1345000,
+    1405000,
+    1465000,
+    1525000,
+    1585000,
+    1645000,
+    1705000,
+    1765000,
+    1825000,
+    1885000,
+    1945000,
+    2015000,
+    2085000,
+    2155000,
+    2225000,
+    2295000,
+    2365000,
+    2435000,
+    2505000,
+    2575000,
+    2645000,
+    2745000,
+    2845000,
+    2945000,
+    3045000,
+    3145000,
+    3245000,
+    3345000,
+    3445000,
+    3545000,
+    3645000,
+    3750000,
+    3870000,
+    4000000,
+    4140000,
+    4290000,
+    4450000,
+    4630000,
+    4830000,
+    5040000,
+    5260000,
+    5510000,
+    5780000,
+    6070000,
+    6390000,
+    6730000,
+    7110000,
+    7510000,
+    7960000,
+    8430000,
+    8960000,
+    9520000,
+    10130000,
+    10800000,
+    11530000,
+    12310000,
+    13170000,
+    14090000,
+    15100000,
+    16190000,
+    17380000,
+    20000000,
+    20500000,
+    21000000,
+    21500000,
+    22000000,
+    22500000,
+    23000000,
+    23500000,
+    24000000,
+    24500000,
+    25000000,
+    25500000,
+    26000000,
+    26500000,
+    27000000,
+    27500000,
+    28000000,
+    28500000,
+    29000000,
+    29500000,
+    30000000,
+    30500000,
+    31000000,
+    31500000,
+    32000000,
+    32500000,
+    33000000,
+    33500000,
+    34000000,
+    34500000,
+    35000000,
+    35500000,
+    36000000,
+    36500000,
+    37000000,
+    37500000,
+    38000000,
+    38500000,
+    39000000,
+    39500000,
+    40000000,
+    41000000,
+    42000000,
+    43000000,
+    44000000,
+    45000000,
+    46000000,
+    47000000,
+    48000000,
+    49000000,
+    50000000,
+)
+
+
 class PlayerListPic:
-    @staticmethod
-    async def download_serverMap_pic(url: str) -> str | None:
-        file_name = "./data/battlefield/pic/map/" + url[url.rfind("/") + 1 :]
-        # noinspection PyBroadException
-        try:
-            fp = open(file_name, "rb")
-            fp.close()
-            return file_name
-        except Exception as e:
-            logger.warning(e)
-            i = 0
-            while i < 3:
-                async with aiohttp.ClientSession() as session:
-                    # noinspection PyBroadException
-                    try:
-                        async with session.get(
-                            url, timeout=5, verify_ssl=False, proxy=proxy
-                        ) as resp:
-                            pic = await resp.read()
-                            with open(file_name, "wb") as fp:
-                                fp.write(pic)
-                            return file_name
-                    except Exception as e:
-                        logger.error(e)
-                        i += 1
-            return None
+    # 管理、VIP、群友、满级的颜色标识
+    admin_color = (0, 255, 127)
+    vip_color = (255, 99, 71)
+    bind_color = (179, 244, 255)
+    max_level_color = (255, 132, 0)
+    avg_color = (250, 183, 39)
+    line_color = (114, 114, 114)
+    # 队伍2相对队伍1的横向偏移
+    team_offsets = (0, 860)
 
     @staticmethod
-    async def get_server_map_pic(map_name: str) -> str | None:
+    @lru_cache(maxsize=1)
+    def load_map_urls() -> dict[str, str]:
+        """地图assetName到图片地址"""
         file_path = "./data/battlefield/游戏模式/data.json"
         with open(file_path, encoding="utf-8") as file1:
             data = json.load(file1)["result"]["maps"]
-        for item in data:
-            if item["assetName"] == map_name:
-                try:
-                    return await PlayerListPic.download_serverMap_pic(
-                        item["images"]["JpgAny"].replace(
-                            "[BB_PREFIX]",
-                            "https://eaassets-a.akamaihd.net/battlelog/battlebinary",
-                        )
-                    )
-                except Exception:
-                    return None
+        return {
+            item["assetName"]: item["images"]["JpgAny"].replace(
+                "[BB_PREFIX]", BB_PREFIX
+            )
+            for item in data
+        }
 
     @staticmethod
+    async def get_server_map_pic(map_name: str) -> str | None:
+        if url := PlayerListPic.load_map_urls().get(map_name):
+            if path := await map_store.get_path(url):
+                return str(path)
+        return None
+
+    @staticmethod
+    @lru_cache(maxsize=32)
     def get_team_pic(team_name: str) -> str:
         team_pic_list = os.listdir("./data/battlefield/pic/team/")
         for item in team_pic_list:
@@ -3060,886 +3299,415 @@ class PlayerListPic:
                 return f"./data/battlefield/pic/team/{item}"
 
     @staticmethod
-    def get_width(o):
-        """Return the screen column width for unicode ordinal o."""
-        if o in [0xE, 0xF]:
+    @lru_cache(maxsize=1)
+    def load_ping_icons() -> tuple[Image.Image, ...]:
+        """延迟图标，依次对应 <=50 <=100 <=150 >150"""
+        icons = []
+        for level in (4, 3, 2, 1):
+            icon = Image.open(f"./data/battlefield/pic/ping/{level}.png").convert(
+                "RGBA"
+            )
+            icons.append(
+                icon.resize(
+                    (int(icon.size[0] * 0.04), int(icon.size[1] * 0.04)),
+                    Image.Resampling.BILINEAR,
+                )
+            )
+        return tuple(icons)
+
+    @staticmethod
+    def get_rank(basic_stats: dict) -> int:
+        """根据游戏时长和spm重新计算等级"""
+        exp = basic_stats.get("spm") * basic_stats.get("timePlayed") / 60
+        if exp <= RankExpList[1]:
             return 0
-        widths = [
-            (126, 1),
-            (159, 0),
-            (687, 1),
-            (710, 0),
-            (711, 1),
-            (727, 0),
-            (733, 1),
-            (879, 0),
-            (1154, 1),
-            (1161, 0),
-            (4347, 1),
-            (4447, 2),
-            (7467, 1),
-            (7521, 0),
-            (8369, 1),
-            (8426, 0),
-            (9000, 1),
-            (9002, 2),
-            (11021, 1),
-            (12350, 2),
-            (12351, 1),
-            (12438, 2),
-            (12442, 0),
-            (19893, 2),
-            (19967, 1),
-            (55203, 2),
-            (63743, 1),
-            (64106, 2),
-            (65039, 1),
-            (65059, 0),
-            (65131, 2),
-            (65279, 1),
-            (65376, 2),
-            (65500, 1),
-            (65510, 2),
-            (120831, 1),
-            (262141, 2),
-            (1114109, 1),
-        ]
-        return next((wid for num, wid in widths if o <= num), 1)
+        if exp >= RankExpList[-1]:
+            return 150
+        return bisect_left(RankExpList, exp) - 1
 
     @staticmethod
-    async def draw(playerlist_data, server_info, bind_pid_list) -> bytes | None | str:
-        admin_pid_list = [
-            str(item["personaId"]) for item in server_info["rspInfo"]["adminList"]
-        ]
-        admin_counter = 0
-        admin_color = (0, 255, 127)
-        vip_pid_list = [
-            str(item["personaId"]) for item in server_info["rspInfo"]["vipList"]
-        ]
-        vip_counter = 0
-        vip_color = (255, 99, 71)
-        bind_color = (179, 244, 255)
-        bind_counter = 0
-        max_level_counter = 0
+    def row_stats(player_stat_data: dict | None) -> tuple | None:
+        """生涯数据(胜率, KD, KPM, 时长)"""
+        if not player_stat_data:
+            return None
+        try:
+            basic_stats = player_stat_data["basicStats"]
+            win_p = int(
+                basic_stats["wins"]
+                / (basic_stats["losses"] + basic_stats["wins"])
+                * 100
+            )
+            time_played = "{:.1f}".format(basic_stats["timePlayed"] / 3600)
+            return win_p, player_stat_data["kdr"], basic_stats["kpm"], time_played
+        except Exception as e:
+            logger.warning(f"Error drawing player data: {e}")
+            return None
 
-        rank_list = [
-            0,
-            1000,
-            5000,
-            15000,
-            25000,
-            40000,
-            55000,
-            75000,
-            95000,
-            120000,
-            145000,
-            175000,
-            205000,
-            235000,
-            265000,
-            295000,
-            325000,
-            355000,
-            395000,
-            435000,
-            475000,
-            515000,
-            555000,
-            595000,
-            635000,
-            675000,
-            715000,
-            755000,
-            795000,
-            845000,
-            895000,
-            945000,
-            995000,
-            1045000,
-            1095000,
-            1145000,
-            1195000,
-            1245000,
-            1295000,
-            1345000,
-            1405000,
-            1465000,
-            1525000,
-            1585000,
-            1645000,
-            1705000,
-            1765000,
-            1825000,
-            1885000,
-            1945000,
-            2015000,
-            2085000,
-            2155000,
-            2225000,
-            2295000,
-            2365000,
-            2435000,
-            2505000,
-            2575000,
-            2645000,
-            2745000,
-            2845000,
-            2945000,
-            3045000,
-            3145000,
-            3245000,
-            3345000,
-            3445000,
-            3545000,
-            3645000,
-            3750000,
-            3870000,
-            4000000,
-            4140000,
-            4290000,
-            4450000,
-            4630000,
-            4830000,
-            5040000,
-            5260000,
-            5510000,
-            5780000,
-            6070000,
-            6390000,
-            6730000,
-            7110000,
-            7510000,
-            7960000,
-            8430000,
-            8960000,
-            9520000,
-            10130000,
-            10800000,
-            11530000,
-            12310000,
-            13170000,
-            14090000,
-            15100000,
-            16190000,
-            17380000,
-            20000000,
-            20500000,
-            21000000,
-            21500000,
-            22000000,
-            22500000,
-            23000000,
-            23500000,
-            24000000,
-            24500000,
-            25000000,
-            25500000,
-            26000000,
-            26500000,
-            27000000,
-            27500000,
-            28000000,
-            28500000,
-            29000000,
-            29500000,
-            30000000,
-            30500000,
-            31000000,
-            31500000,
-            32000000,
-            32500000,
-            33000000,
-            33500000,
-            34000000,
-            34500000,
-            35000000,
-            35500000,
-            36000000,
-            36500000,
-            37000000,
-            37500000,
-            38000000,
-            38500000,
-            39000000,
-            39500000,
-            40000000,
-            41000000,
-            42000000,
-            43000000,
-            44000000,
-            45000000,
-            46000000,
-            47000000,
-            48000000,
-            49000000,
-            50000000,
-        ]
-
-        playerlist_data["teams"] = {
-            0: [item for item in playerlist_data["players"] if item["team"] == 0],
-            1: [item for item in playerlist_data["players"] if item["team"] == 1],
-        }
-
-        # 战绩信息dict
-        stat_dict = {}
-
-        # 获取玩家生涯战绩
-        # 队伍1
-        scrape_index_tasks_t1 = [
-            asyncio.ensure_future(
-                (await BF1DA.get_api_instance()).detailedStatsByPersonaId(
-                    player_item["pid"]
-                )
-            )
-            for player_item in playerlist_data["teams"][0]
-        ]
-        tasks = asyncio.gather(*scrape_index_tasks_t1)
-        try:
-            await tasks
-            for i in range(len(playerlist_data["teams"][0])):
-                if scrape_index_tasks_t1[i].result():
-                    if not isinstance(scrape_index_tasks_t1[i].result(), dict):
-                        continue
-                    player_stat_data = scrape_index_tasks_t1[i].result()["result"]
-                    # 重新计算等级
-                    time_seconds = player_stat_data.get("basicStats").get("timePlayed")
-                    spm = player_stat_data.get("basicStats").get("spm")
-                    exp = spm * time_seconds / 60
-                    rank = 0
-                    for _ in range(len(rank_list)):
-                        if exp <= rank_list[1]:
-                            rank = 0
-                            break
-                        if exp >= rank_list[-1]:
-                            rank = 150
-                            break
-                        if exp <= rank_list[_]:
-                            rank = _ - 1
-                            break
-                    playerlist_data["teams"][0][i]["rank"] = rank
-                    stat_dict[playerlist_data["teams"][0][i]["pid"]] = player_stat_data
-        except asyncio.TimeoutError:
-            pass
-
-        # 队伍2
-        scrape_index_tasks_t2 = [
-            asyncio.ensure_future(
-                (await BF1DA.get_api_instance()).detailedStatsByPersonaId(
-                    player_item["pid"]
-                )
-            )
-            for player_item in playerlist_data["teams"][1]
-        ]
-        tasks = asyncio.gather(*scrape_index_tasks_t2)
-        try:
-            await tasks
-            for i in range(len(playerlist_data["teams"][1])):
-                if scrape_index_tasks_t2[i].result():
-                    if not isinstance(scrape_index_tasks_t2[i].result(), dict):
-                        continue
-                    player_stat_data = scrape_index_tasks_t2[i].result()["result"]
-                    # 重新计算等级
-                    time_seconds = player_stat_data.get("basicStats").get("timePlayed")
-                    spm = player_stat_data.get("basicStats").get("spm")
-                    exp = spm * time_seconds / 60
-                    rank = 0
-                    for _ in range(len(rank_list)):
-                        if exp <= rank_list[1]:
-                            rank = 0
-                            break
-                        if exp >= rank_list[-1]:
-                            rank = 150
-                            break
-                        if exp <= rank_list[_]:
-                            rank = _ - 1
-                            break
-                    playerlist_data["teams"][1][i]["rank"] = rank
-                    stat_dict[playerlist_data["teams"][1][i]["pid"]] = player_stat_data
-        except asyncio.TimeoutError:
-            pass
-
-        # 按等级排序
-        playerlist_data["teams"][0].sort(key=lambda x: x["rank"], reverse=True)
-        playerlist_data["teams"][1].sort(key=lambda x: x["rank"], reverse=True)
-        update_time = time.strftime(
-            "%Y-%m-%d %H:%M:%S", time.localtime(playerlist_data["time"])
+    @staticmethod
+    def base_layer(map_pic: str, team1_name: str, team2_name: str) -> Image.Image:
+        """不随玩家变化的图层，同一地图和队伍只绘制一次"""
+        return image_cache.cached(
+            ("playerlist", map_pic, team1_name, team2_name),
+            lambda: PlayerListPic.draw_base_layer(map_pic, team1_name, team2_name),
         )
 
-        # 服务器名
-        server_name = server_info["serverInfo"]["name"]
-        # MP_xxx
-        server_mapName = server_info["serverInfo"]["mapName"]
-
-        team1_name = MapData.MapTeamDict[server_info["serverInfo"]["mapName"]]["Team1"]
-        team1_pic = PlayerListPic.get_team_pic(team1_name)
-        team1_pic = Image.open(team1_pic).convert("RGBA")
-        team1_pic = team1_pic.resize((40, 40), Image.Resampling.BILINEAR)
-        team2_name = MapData.MapTeamDict[server_info["serverInfo"]["mapName"]]["Team2"]
-        team2_pic = PlayerListPic.get_team_pic(team2_name)
-        team2_pic = Image.open(team2_pic).convert("RGBA")
-        team2_pic = team2_pic.resize((40, 40), Image.Resampling.BILINEAR)
-
-        # 地图路径
-        server_map_pic = await PlayerListPic.get_server_map_pic(server_mapName)
+    @staticmethod
+    def draw_base_layer(map_pic: str, team1_name: str, team2_name: str) -> Image.Image:
+        """地图背景、队伍图标和名字、表头、分割线、颜色标识和水印"""
         # 地图作为画布底图并且高斯模糊化
-        if server_map_pic is None:
-            logger.warning(f"获取地图{server_mapName}图片出错")
-            return "网络出错，请稍后再试!"
-        IMG = Image.open(server_map_pic)
-        # 高斯模糊
-        IMG = IMG.filter(ImageFilter.GaussianBlur(radius=12))
+        img = Image.open(map_pic).convert("RGB")
+        img = img.filter(ImageFilter.GaussianBlur(radius=12))
         # 调低亮度
-        IMG = ImageEnhance.Brightness(IMG).enhance(0.7)
+        img = ImageEnhance.Brightness(img).enhance(0.7)
         # 裁剪至1920x1080
-        box = (
-            0,
-            70,
-            1920,
-            1150,
-        )  # 将要裁剪的图片块距原图左边界距左边距离，上边界距上边距离，右边界距左边距离，下边界距上边的距离。
-        IMG = IMG.crop(box)
-
-        # 延迟 5:小于50 4:50< <100 3: 150< < 100 2: 150<  <200 1: 250< <300 0:300+
-        Ping1 = Image.open("./data/battlefield/pic/ping/4.png").convert("RGBA")
-        Ping1 = Ping1.resize(
-            (int(Ping1.size[0] * 0.04), int(Ping1.size[1] * 0.04)),
-            Image.Resampling.BILINEAR,
-        )
-        Ping2 = Image.open("./data/battlefield/pic/ping/3.png").convert("RGBA")
-        Ping2 = Ping2.resize(
-            (int(Ping2.size[0] * 0.04), int(Ping2.size[1] * 0.04)),
-            Image.Resampling.BILINEAR,
-        )
-        Ping3 = Image.open("./data/battlefield/pic/ping/2.png").convert("RGBA")
-        Ping3 = Ping3.resize(
-            (int(Ping3.size[0] * 0.04), int(Ping3.size[1] * 0.04)),
-            Image.Resampling.BILINEAR,
-        )
-        Ping4 = Image.open("./data/battlefield/pic/ping/1.png").convert("RGBA")
-        Ping4 = Ping4.resize(
-            (int(Ping4.size[0] * 0.04), int(Ping4.size[1] * 0.04)),
-            Image.Resampling.BILINEAR,
-        )
-        Ping5 = Image.open("./data/battlefield/pic/ping/0.png").convert("RGBA")
-        Ping5 = Ping5.resize(
-            (int(Ping5.size[0] * 0.04), int(Ping5.size[1] * 0.04)),
-            Image.Resampling.BILINEAR,
-        )
-
-        draw = ImageDraw.Draw(IMG)
-        # 字体路径
-        font_path = "./data/battlefield/font/BFText-Regular-SC-19cf572c.ttf"
-        title_font = ImageFont.truetype(font_path, 40)
-        team_font = ImageFont.truetype(font_path, 25)
-        title_font_small = ImageFont.truetype(font_path, 22)
-        player_font = ImageFont.truetype(font_path, 20)
-        rank_font = ImageFont.truetype(font_path, 15)
-        info_font = ImageFont.truetype(font_path, 22)
-        # 服务器名字
-        draw.text((97, 30), f"服务器名:{server_name}", fill="white", font=title_font)
-        # 更新时间
-        draw.text((100, 80), update_time, fill="white", font=rank_font)
-        max_level_color = (255, 132, 0)
-
-        KD_counter1 = 0
-        KPM_counter1 = 0
-        RANK_counter1 = 0
-        TIME_counter1 = 0
-        WIN_counter1 = 0
-        # 队伍1
-        # 队伍1图片
-        IMG.paste(team1_pic, (100, 101))
-        # 队伍1名
-        draw.text((152, 105), team1_name, fill="white", font=team_font)
-        draw.text((520, 113), "胜率", fill="white", font=title_font_small)
-        draw.text((600, 113), "K/D", fill="white", font=title_font_small)
-        draw.text((670, 113), "KPM", fill="white", font=title_font_small)
-        draw.text((750, 113), "时长(h)", fill="white", font=title_font_small)
-        draw.text((840, 113), "延迟", fill="white", font=title_font_small)
-        draw.text((900, 113), "语言", fill="white", font=title_font_small)
-        # 队伍1横线
-        draw.line([100, 141, 950, 141], fill=(114, 114, 114), width=2, joint=None)
-        # 队伍1竖线
-        draw.line([100, 155, 100, 915], fill=(114, 114, 114), width=2, joint=None)
-        leve_position_1 = None
-        for i, player_item in enumerate(playerlist_data["teams"][0]):
-            # 序号
-            draw.text(
-                (135, 156 + i * 23),
-                f"{i + 1}",
-                anchor="ra",
-                fill="white",
-                font=player_font,
-            )
-
-            # 等级框 30*15  等级 居中显示
-            draw.rectangle(
-                [155, 159 + i * 23, 185, 173.5 + i * 23],
-                fill=max_level_color if player_item["rank"] == 150 else None,
-                outline=None,
-                width=1,
-            )
-            RANK_counter1 += player_item["rank"]
-            if player_item["rank"] == 150:
-                max_level_counter += 1
-            rank_font_temp = ImageFont.truetype(font_path, 15)
-            left_box, top_box, ascent, descent = rank_font_temp.getbbox(
-                f"{player_item['rank']}"
+        img = img.crop((0, 70, 1920, 1150))
+
+        draw = ImageDraw.Draw(img)
+        team_font = get_font(25)
+        title_font_small = get_font(22)
+        for team_name, dx in zip((team1_name, team2_name), PlayerListPic.team_offsets):
+            # 队伍图片
+            team_pic = Image.open(PlayerListPic.get_team_pic(team_name)).convert("RGBA")
+            team_pic = team_pic.resize((40, 40), Image.Resampling.BILINEAR)
+            img.paste(team_pic, (100 + dx, 101))
+            # 队伍名
+            draw.text((152 + dx, 105), team_name, fill="white", font=team_font)
+            for x, title in (
+                (520, "胜率"),
+                (600, "K/D"),
+                (670, "KPM"),
+                (750, "时长(h)"),
+                (840, "延迟"),
+                (900, "语言"),
+            ):
+                draw.text((x + dx, 113), title, fill="white", font=title_font_small)
+            # 横线
+            draw.line(
+                [100 + dx, 141, 950 + dx, 141], fill=PlayerListPic.line_color, width=2
             )
-            leve_position_1 = 170 - ascent / 2, 165.5 + i * 23 - descent / 2
-            draw.text(
-                leve_position_1, f"{player_item['rank']}", fill="white", font=rank_font
-            )
-            # 战队 名字
-            color_temp = "white"
-            if str(player_item["display_name"]).upper() in bind_pid_list:
-                color_temp = bind_color
-                bind_counter += 1
-            if str(player_item["pid"]) in vip_pid_list:
-                color_temp = vip_color
-                vip_counter += 1
-            if str(player_item["pid"]) in admin_pid_list:
-                color_temp = admin_color
-                admin_counter += 1
-            if player_item["platoon"]:
-                draw.text(
-                    (195, 155 + i * 23),
-                    f"[{player_item['platoon']['tag']}]{player_item['display_name']}",
-                    fill=color_temp,
-                    font=player_font,
-                )
-            else:
-                draw.text(
-                    (195, 155 + i * 23),
-                    player_item["display_name"],
-                    fill=color_temp,
-                    font=player_font,
-                )
-
-            # 延迟 靠右显示
-            ping_pic = Ping5
-            if player_item["latency"] <= 50:
-                ping_pic = Ping1
-            elif 50 < player_item["latency"] <= 100:
-                ping_pic = Ping2
-            elif 100 < player_item["latency"] <= 150:
-                ping_pic = Ping3
-            elif 150 < player_item["latency"]:
-                ping_pic = Ping4
-            IMG.paste(ping_pic, (830, 158 + i * 23), ping_pic)
-            draw.text(
-                (880, 155 + i * 23),
-                f"{player_item['latency']}",
-                anchor="ra",
-                fill="white",
-                font=player_font,
+            # 竖线
+            draw.line(
+                [100 + dx, 155, 100 + dx, 915], fill=PlayerListPic.line_color, width=2
             )
 
-            # 语言
-            draw.text(
-                (940, 155 + i * 23),
-                f"{player_item['language']}",
-                anchor="ra",
-                fill="white",
-                font=player_font,
-            )
+        # 颜色标识: 管理、VIP、群友、150数量
+        for x, color in zip(
+            (1100, 1250, 1400, 1550),
+            (
+                PlayerListPic.admin_color,
+                PlayerListPic.vip_color,
+                PlayerListPic.bind_color,
+                PlayerListPic.max_level_color,
+            ),
+        ):
+            draw.rectangle([x, 925, x + 20, 945], fill=color)
 
-            # 生涯数据
-            try:
-                player_stat_data = stat_dict[player_item["pid"]]
-                if not player_stat_data:
-                    continue
+        # 水印
+        draw.text(
+            (1860, 1060), "by.13", fill=PlayerListPic.line_color, font=get_font(20)
+        )
+        return img
 
-                # 胜率
-                win_p = int(
-                    player_stat_data["basicStats"]["wins"]
-                    / (
-                        player_stat_data["basicStats"]["losses"]
-                        + player_stat_data["basicStats"]["wins"]
-                    )
-                    * 100
-                )
-                WIN_counter1 += win_p
-                draw.text(
-                    (565, 155 + i * 23),
-                    f"{win_p}%",
-                    anchor="ra",
-                    fill=max_level_color if win_p >= 70 else "white",
-                    font=player_font,
-                )
-                # kd
-                kd = player_stat_data["kdr"]
-                KD_counter1 += kd
-                draw.text(
-                    (635, 155 + i * 23),
-                    f"{kd}",
-                    anchor="ra",
-                    fill=max_level_color if kd >= 3 else "white",
-                    font=player_font,
-                )
-                # kpm
-                kpm = player_stat_data["basicStats"]["kpm"]
-                KPM_counter1 += kpm
-                draw.text(
-                    (710, 155 + i * 23),
-                    f"{kpm}",
-                    fill=max_level_color if kpm >= 2 else "white",
-                    anchor="ra",
-                    font=player_font,
-                )
-                # 时长
-                time_played = "{:.1f}".format(
-                    player_stat_data["basicStats"]["timePlayed"] / 3600
-                )
-                TIME_counter1 += float(time_played)
-                draw.text(
-                    (810, 155 + i * 23),
-                    f"{time_played}",
-                    anchor="ra",
-                    fill=max_level_color if float(time_played) >= 1000 else "white",
-                    font=player_font,
-                )
-            except Exception as e:
-                logger.warning(f"Error drawing player data: {e}")
-
-        # x相差860
-
-        KD_counter2 = 0
-        KPM_counter2 = 0
-        RANK_counter2 = 0
-        TIME_counter2 = 0
-        WIN_counter2 = 0
-        # 队伍2
-        # 队伍2图片
-        IMG.paste(team2_pic, (960, 101))
-        # 队伍2名
-        draw.text((1012, 105), team2_name, fill="white", font=team_font)
-        draw.text((1380, 113), "胜率", fill="white", font=title_font_small)
-        draw.text((1460, 113), "K/D", fill="white", font=title_font_small)
-        draw.text((1530, 113), "KPM", fill="white", font=title_font_small)
-        draw.text((1610, 113), "时长(h)", fill="white", font=title_font_small)
-        draw.text((1700, 113), "延迟", fill="white", font=title_font_small)
-        draw.text((1760, 113), "语言", fill="white", font=title_font_small)
-        # 队伍2横线
-        draw.line([960, 141, 1810, 141], fill=(114, 114, 114), width=2, joint=None)
-        # 队伍2竖线
-        draw.line([960, 155, 960, 915], fill=(114, 114, 114), width=2, joint=None)
-        leve_position_2 = None
-        for i, player_item in enumerate(playerlist_data["teams"][1]):
+    @staticmethod
+    def draw_team_rows(
+        img: Image.Image, rows: list[tuple], index_offset: float, dx: int
+    ) -> list[float]:
+        """绘制一队玩家，返回等级、胜率、KD、KPM、时长的总和"""
+        draw = ImageDraw.Draw(img)
+        player_font = get_font(20)
+        rank_font = get_font(15)
+        ping_icons = PlayerListPic.load_ping_icons()
+        max_level_color = PlayerListPic.max_level_color
+        sums = [0, 0, 0, 0, 0]
+        for i, (rank, name, color, latency, language, stats) in enumerate(rows):
+            y = 155 + i * 23
             # 序号
-            draw.text(
-                (995, 156 + i * 23),
-                f"{int(i + 1 + server_info['serverInfo']['slots']['Soldier']['max'] / 2)}",
-                anchor="ra",
-                fill="white",
-                font=player_font,
-            )
-            # 等级框 30*15 等级居中显示
-            draw.rectangle(
-                [1015, 159 + i * 23, 1045, 173.5 + i * 23],
-                fill=max_level_color if player_item["rank"] == 150 else None,
-                outline=None,
-                width=1,
-            )
-            RANK_counter2 += player_item["rank"]
-            if player_item["rank"] == 150:
-                max_level_counter += 1
-            rank_font_temp = ImageFont.truetype(font_path, 15)
-            left_box, top_box, ascent, descent = rank_font_temp.getbbox(
-                f"{player_item['rank']}"
+            paste_text(
+                img,
+                (135 + dx, y + 1),
+                f"{int(i + 1 + index_offset)}",
+                player_font,
+                ColorWhite,
+                "ra",
             )
-            leve_position_2 = 1030 - ascent / 2, 165.5 + i * 23 - descent / 2
-            draw.text(
-                leve_position_2, f"{player_item['rank']}", fill="white", font=rank_font
+            # 等级框 30*15  等级 居中显示
+            if rank == 150:
+                draw.rectangle(
+                    [155 + dx, y + 4, 185 + dx, y + 18.5], fill=max_level_color
+                )
+            _, (_, _, right, bottom) = text_mask(f"{rank}", rank_font)
+            paste_text(
+                img,
+                (170 + dx - right / 2, y + 10.5 - bottom / 2),
+                f"{rank}",
+                rank_font,
+                ColorWhite,
             )
+            sums[0] += rank
             # 战队 名字
-            color_temp = "white"
-            if str(player_item["display_name"]).upper() in bind_pid_list:
-                color_temp = bind_color
-                bind_counter += 1
-            if str(player_item["pid"]) in vip_pid_list:
-                color_temp = vip_color
-                vip_counter += 1
-            if str(player_item["pid"]) in admin_pid_list:
-                color_temp = admin_color
-                admin_counter += 1
-            if player_item["platoon"]:
-                draw.text(
-                    (1055, 155 + i * 23),
-                    f"[{player_item['platoon']['tag']}]{player_item['display_name']}",
-                    fill=color_temp,
-                    font=player_font,
-                )
-            else:
-                draw.text(
-                    (1055, 155 + i * 23),
-                    player_item["display_name"],
-                    fill=color_temp,
-                    font=player_font,
-                )
+            paste_text(img, (195 + dx, y), name, player_font, color)
             # 延迟 靠右显示
-            ping_pic = Ping5
-            if player_item["latency"] <= 50:
-                ping_pic = Ping1
-            elif 50 < player_item["latency"] <= 100:
-                ping_pic = Ping2
-            elif 100 < player_item["latency"] <= 150:
-                ping_pic = Ping3
-            elif 150 < player_item["latency"]:
-                ping_pic = Ping4
-            IMG.paste(ping_pic, (1690, 158 + i * 23), ping_pic)
-            draw.text(
-                (1740, 155 + i * 23),
-                f"{player_item['latency']}",
-                anchor="ra",
-                fill="white",
-                font=player_font,
-            )
-
+            ping_icon = ping_icons[bisect_left((50, 100, 150), latency)]
+            img.paste(ping_icon, (830 + dx, y + 3), ping_icon)
+            paste_text(img, (880 + dx, y), f"{latency}", player_font, ColorWhite, "ra")
             # 语言
-            draw.text(
-                (1800, 155 + i * 23),
-                f"{player_item['language']}",
-                anchor="ra",
-                fill="white",
-                font=player_font,
-            )
-            # 生涯数据
-            try:
-                player_stat_data = stat_dict[player_item["pid"]]
-                if not player_stat_data:
-                    continue
+            paste_text(img, (940 + dx, y), f"{language}", player_font, ColorWhite, "ra")
 
+            # 生涯数据
+            if not stats:
+                continue
+            win_p, kd, kpm, time_played = stats
+            for x, text, highlight in (
                 # 胜率
-                win_p = int(
-                    player_stat_data["basicStats"]["wins"]
-                    / (
-                        player_stat_data["basicStats"]["losses"]
-                        + player_stat_data["basicStats"]["wins"]
-                    )
-                    * 100
-                )
-                WIN_counter2 += win_p
-                draw.text(
-                    (1425, 155 + i * 23),
-                    f"{win_p}%",
-                    anchor="ra",
-                    fill=max_level_color if win_p >= 70 else "white",
-                    font=player_font,
-                )
+                (565, f"{win_p}%", win_p >= 70),
                 # kd
-                kd = player_stat_data["kdr"]
-                KD_counter2 += kd
-                draw.text(
-                    (1495, 155 + i * 23),
-                    f"{kd}",
-                    anchor="ra",
-                    fill=max_level_color if kd >= 3 else "white",
-                    font=player_font,
-                )
+                (635, f"{kd}", kd >= 3),
                 # kpm
-                kpm = player_stat_data["basicStats"]["kpm"]
-                KPM_counter2 += kpm
-                draw.text(
-                    (1570, 155 + i * 23),
-                    f"{kpm}",
-                    fill=max_level_color if kpm >= 2 else "white",
-                    anchor="ra",
-                    font=player_font,
-                )
+                (710, f"{kpm}", kpm >= 2),
                 # 时长
-                time_played = "{:.1f}".format(
-                    player_stat_data["basicStats"]["timePlayed"] / 3600
-                )
-                TIME_counter2 += float(time_played)
-                draw.text(
-                    (1670, 155 + i * 23),
-                    f"{time_played}",
-                    anchor="ra",
-                    fill=max_level_color if float(time_played) >= 1000 else "white",
-                    font=player_font,
+                (810, time_played, float(time_played) >= 1000),
+            ):
+                paste_text(
+                    img,
+                    (x + dx, y),
+                    text,
+                    player_font,
+                    max_level_color if highlight else ColorWhite,
+                    "ra",
                 )
-            except Exception as e:
-                logger.warning(f"Error drawing player data: {e}")
-
-        i_temp = (
-            len(playerlist_data["teams"][0])
-            if len(playerlist_data["teams"][0]) >= len(playerlist_data["teams"][1])
-            else len(playerlist_data["teams"][1])
-        )
-        avg_color = (250, 183, 39)
-        avg_1_1 = 0
-        avg_1_2 = 0
-        avg_1_3 = 0
-        avg_1_4 = 0
-        avg_1_5 = 0
-        if len(playerlist_data["teams"][0]) != 0:
-            avg_1_1 = int(RANK_counter1 / len(playerlist_data["teams"][0]))
-            avg_1_2 = KD_counter1 / len(playerlist_data["teams"][0])
-            avg_1_3 = KPM_counter1 / len(playerlist_data["teams"][0])
-            avg_1_4 = TIME_counter1 / len(playerlist_data["teams"][0])
-            avg_1_5 = int(WIN_counter1 / len(playerlist_data["teams"][0]))
-        avg_2_1 = 0
-        avg_2_2 = 0
-        avg_2_3 = 0
-        avg_2_4 = 0
-        avg_2_5 = 0
-        if len(playerlist_data["teams"][1]) != 0:
-            avg_2_1 = int(RANK_counter2 / len(playerlist_data["teams"][1]))
-            avg_2_2 = KD_counter2 / len(playerlist_data["teams"][1])
-            avg_2_3 = KPM_counter2 / len(playerlist_data["teams"][1])
-            avg_2_4 = TIME_counter2 / len(playerlist_data["teams"][1])
-            avg_2_5 = int(WIN_counter2 / len(playerlist_data["teams"][1]))
-
-        if leve_position_1:
-            rank_font_temp = ImageFont.truetype(font_path, 15)
-            left_box, top_box, ascent, descent = rank_font_temp.getbbox(
-                f"{int(RANK_counter1 / len(playerlist_data['teams'][0]))}"
+            sums[1] += win_p
+            sums[2] += kd
+            sums[3] += kpm
+            sums[4] += float(time_played)
+        return sums
+
+    @staticmethod
+    def render(data: dict) -> bytes:
+        """在底图上绘制玩家和服务器信息并编码为jpeg，在渲染进程中执行"""
+        img = PlayerListPic.base_layer(data["map_pic"], *data["team_names"])
+        title_font = get_font(40)
+        player_font = get_font(20)
+        rank_font = get_font(15)
+        info_font = get_font(22)
+        # 服务器名字
+        paste_text(
+            img, (97, 30), f"服务器名:{data['server_name']}", title_font, ColorWhite
+        )
+        # 更新时间
+        paste_text(img, (100, 80), data["update_time"], rank_font, ColorWhite)
+
+        # 玩家，队伍2的序号从服务器人数的一半开始
+        teams = data["teams"]
+        sums = [
+            PlayerListPic.draw_team_rows(img, rows, index_offset, dx)
+            for rows, index_offset, dx in zip(
+                teams, (0, data["slots"] / 2), PlayerListPic.team_offsets
             )
-            leve_position_1 = 168 - ascent / 2, 156 + i_temp * 23
-            draw.text((115, 156 + i_temp * 23), "平均:", fill="white", font=player_font)
-            if RANK_counter1 != 0:
-                draw.text(
-                    leve_position_1,
-                    f"{int(RANK_counter1 / len(playerlist_data['teams'][0]))}",
-                    fill=avg_color if avg_1_1 > avg_2_1 else "white",
-                    font=player_font,
-                )
-            if WIN_counter1 != 0:
-                draw.text(
-                    (565, 156 + i_temp * 23),
-                    f"{int(WIN_counter1 / len(playerlist_data['teams'][0]))}%",
-                    anchor="ra",
-                    fill=avg_color if avg_1_5 > avg_2_5 else "white",
-                    font=player_font,
-                )
-            if KD_counter1 != 0:
-                draw.text(
-                    (635, 156 + i_temp * 23),
-                    "{:.2f}".format(KD_counter1 / len(playerlist_data["teams"][0])),
-                    anchor="ra",
-                    fill=avg_color if avg_1_2 > avg_2_2 else "white",
-                    font=player_font,
-                )
-            if KPM_counter1 != 0:
-                draw.text(
-                    (710, 156 + i_temp * 23),
-                    "{:.2f}".format(KPM_counter1 / len(playerlist_data["teams"][0])),
-                    anchor="ra",
-                    fill=avg_color if avg_1_3 > avg_2_3 else "white",
-                    font=player_font,
-                )
-            if TIME_counter1 != 0:
-                draw.text(
-                    (810, 156 + i_temp * 23),
-                    "{:.1f}".format(TIME_counter1 / len(playerlist_data["teams"][0])),
-                    anchor="ra",
-                    fill=avg_color if avg_1_4 > avg_2_4 else "white",
-                    font=player_font,
-                )
+        ]
 
-        if leve_position_2:
-            rank_font_temp = ImageFont.truetype(font_path, 15)
-            left_box, top_box, ascent, descent = rank_font_temp.getbbox(
-                f"{int(RANK_counter1 / len(playerlist_data['teams'][1]))}"
+        # 平均值，高于另一队时高亮
+        averages = [
+            (
+                int(rank / len(rows)),
+                int(win / len(rows)),
+                kd / len(rows),
+                kpm / len(rows),
+                time_played / len(rows),
             )
-            leve_position_2 = 1028 - ascent / 2, 156 + i_temp * 23
-            draw.text((975, 156 + i_temp * 23), "平均:", fill="white", font=player_font)
-            if RANK_counter2 != 0:
-                draw.text(
-                    leve_position_2,
-                    f"{int(RANK_counter2 / len(playerlist_data['teams'][1]))}",
-                    fill=avg_color if avg_1_1 < avg_2_1 else "white",
-                    font=player_font,
-                )
-            if WIN_counter2 != 0:
-                draw.text(
-                    (1425, 156 + i_temp * 23),
-                    f"{int(WIN_counter2 / len(playerlist_data['teams'][1]))}%",
-                    anchor="ra",
-                    fill=avg_color if avg_1_5 < avg_2_5 else "white",
-                    font=player_font,
-                )
-            if KD_counter2 != 0:
-                draw.text(
-                    (1495, 156 + i_temp * 23),
-                    "{:.2f}".format(KD_counter2 / len(playerlist_data["teams"][1])),
-                    anchor="ra",
-                    fill=avg_color if avg_1_2 < avg_2_2 else "white",
-                    font=player_font,
-                )
-            if KPM_counter2 != 0:
-                draw.text(
-                    (1570, 156 + i_temp * 23),
-                    "{:.2f}".format(KPM_counter2 / len(playerlist_data["teams"][1])),
-                    anchor="ra",
-                    fill=avg_color if avg_1_3 < avg_2_3 else "white",
-                    font=player_font,
-                )
-            if TIME_counter2 != 0:
-                draw.text(
-                    (1670, 156 + i_temp * 23),
-                    "{:.1f}".format(TIME_counter2 / len(playerlist_data["teams"][1])),
-                    anchor="ra",
-                    fill=avg_color if avg_1_4 < avg_2_4 else "white",
-                    font=player_font,
+            if rows
+            else (0, 0, 0, 0, 0)
+            for rows, (rank, win, kd, kpm, time_played) in zip(teams, sums)
+        ]
+        y = 156 + max(len(rows) for rows in teams) * 23
+        for team_id, dx in enumerate(PlayerListPic.team_offsets):
+            if not teams[team_id]:
+                continue
+            average = averages[team_id]
+            other = averages[1 - team_id]
+            paste_text(img, (115 + dx, y), "平均:", player_font, ColorWhite)
+            texts = (
+                f"{average[0]}",
+                f"{average[1]}%",
+                f"{average[2]:.2f}",
+                f"{average[3]:.2f}",
+                f"{average[4]:.1f}",
+            )
+            for index, x in enumerate((None, 565, 635, 710, 810)):
+                if sums[team_id][index] == 0:
+                    continue
+                fill = (
+                    PlayerListPic.avg_color
+                    if average[index] > other[index]
+                    else ColorWhite
                 )
+                if x is None:
+                    # 等级与上方的等级框对齐
+                    _, (_, _, right, _) = text_mask(texts[index], rank_font)
+                    paste_text(
+                        img, (168 + dx - right / 2, y), texts[index], player_font, fill
+                    )
+                else:
+                    paste_text(img, (x + dx, y), texts[index], player_font, fill, "ra")
 
         # 服务器信息
-        server_info_text = (
-            f"服务器状态:{server_info['serverInfo']['mapModePretty']}-{server_info['serverInfo']['mapNamePretty']}  "
-            f"在线人数:{server_info['serverInfo']['slots']['Soldier']['current']}/{server_info['serverInfo']['slots']['Soldier']['max']}"
-            f"[{server_info['serverInfo']['slots']['Queue']['current']}]({server_info['serverInfo']['slots']['Spectator']['current']})  "
-            f"收藏:{server_info['serverInfo']['serverBookmarkCount']}"
-        )
-
-        draw.text((240, 925), server_info_text, fill="white", font=info_font)
+        paste_text(img, (240, 925), data["server_info_text"], info_font, ColorWhite)
 
         # 服务器简介
-        server_dscr = f"        {server_info['serverInfo']['description']}"
+        server_dscr = f"        {data['description']}"
         test_temp = ""
         i = 0
         for letter in server_dscr:
             if i * 11 % 125 == 0 or (i + 1) * 11 % 125 == 0:
                 test_temp += "\n"
                 i = 0
-            i += PlayerListPic.get_width(ord(letter))
+            i += PilImageUtils.get_width(ord(letter))
             test_temp += letter
-        draw.text((240, 955), f"服务器简介:{test_temp}", fill="white", font=info_font)
+        paste_text(img, (240, 955), f"服务器简介:{test_temp}", info_font, ColorWhite)
 
-        # 颜色标识
-        # 管理
-        draw.rectangle([1100, 925, 1120, 945], fill=admin_color, outline=None, width=1)
-        draw.text(
-            (1130, 925), f"在线管理:{admin_counter}", fill="white", font=player_font
-        )
-        # vip
-        draw.rectangle([1250, 925, 1270, 945], fill=vip_color, outline=None, width=1)
-        draw.text((1280, 925), f"在线VIP:{vip_counter}", fill="white", font=player_font)
-        # 群友
-        draw.rectangle([1400, 925, 1420, 945], fill=bind_color, outline=None, width=1)
-        draw.text(
-            (1430, 925), f"在线群友:{bind_counter}", fill="white", font=player_font
-        )
-        # 150数量
-        draw.rectangle(
-            [1550, 925, 1570, 945], fill=max_level_color, outline=None, width=1
+        # 颜色标识的数量
+        for x, label, count in zip(
+            (1130, 1280, 1430, 1580),
+            ("在线管理", "在线VIP", "在线群友", "150数量"),
+            data["counters"],
+        ):
+            paste_text(img, (x, 925), f"{label}:{count}", player_font, ColorWhite)
+
+        img_bytes = BytesIO()
+        img.save(img_bytes, format="JPEG", quality=95)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    async def draw(playerlist_data, server_info, bind_pid_list) -> bytes | None | str:
+        # MP_xxx
+        server_mapName = server_info["serverInfo"]["mapName"]
+        # 地图路径
+        server_map_pic = await PlayerListPic.get_server_map_pic(server_mapName)
+        if server_map_pic is None:
+            logger.warning(f"获取地图{server_mapName}图片出错")
+            return "网络出错，请稍后再试!"
+
+        # 获取玩家生涯战绩
+        players = playerlist_data["players"]
+        api = await BF1DA.get_api_instance()
+        results = []
+        try:
+            results = await asyncio.gather(
+                *[api.detailedStatsByPersonaId(player["pid"]) for player in players]
+            )
+        except asyncio.TimeoutError:
+            pass
+        stat_dict = PlayerListPic.apply_stats(players, results)
+        data = PlayerListPic.build_data(
+            playerlist_data, server_info, bind_pid_list, server_map_pic, stat_dict
         )
-        draw.text(
-            (1580, 925), f"150数量:{max_level_counter}", fill="white", font=player_font
+        # 只有玩家行、平均值和服务器信息需要每次绘制，在渲染进程中完成
+        return await render_pool.run(PlayerListPic.render, data)
+
+    @staticmethod
+    def apply_stats(players: list[dict], results: list) -> dict:
+        """用生涯战绩重新计算等级，返回{pid: 战绩}
+
+        获取失败的玩家保留游戏内的等级(BlazeData.player_list_handle中的PATT rank)
+        """
+        stat_dict = {}
+        for player, result in zip(players, results):
+            if not result or not isinstance(result, dict):
+                continue
+            player_stat_data = result["result"]
+            player["rank"] = PlayerListPic.get_rank(player_stat_data.get("basicStats"))
+            stat_dict[player["pid"]] = player_stat_data
+        return stat_dict
+
+    @staticmethod
+    def build_data(
+        playerlist_data, server_info, bind_pid_list, server_map_pic, stat_dict
+    ) -> dict:
+        """整理渲染需要的数据，同时按等级排序playerlist_data["teams"]"""
+        server_mapName = server_info["serverInfo"]["mapName"]
+        players = playerlist_data["players"]
+        # 按等级排序，回复踢出时按这里的顺序查找序号对应的玩家
+        playerlist_data["teams"] = {
+            team_id: sorted(
+                (player for player in players if player["team"] == team_id),
+                key=lambda x: x["rank"],
+                reverse=True,
+            )
+            for team_id in (0, 1)
+        }
+
+        admin_pid_list = {
+            str(item["personaId"]) for item in server_info["rspInfo"]["adminList"]
+        }
+        vip_pid_list = {
+            str(item["personaId"]) for item in server_info["rspInfo"]["vipList"]
+        }
+        # 在线管理、VIP、群友、150数量
+        counters = [0, 0, 0, 0]
+        teams = []
+        for team_id in (0, 1):
+            rows = []
+            for player_item in playerlist_data["teams"][team_id]:
+                color_temp = ColorWhite
+                if str(player_item["display_name"]).upper() in bind_pid_list:
+                    color_temp = PlayerListPic.bind_color
+                    counters[2] += 1
+                if str(player_item["pid"]) in vip_pid_list:
+                    color_temp = PlayerListPic.vip_color
+                    counters[1] += 1
+                if str(player_item["pid"]) in admin_pid_list:
+                    color_temp = PlayerListPic.admin_color
+                    counters[0] += 1
+                if player_item["rank"] == 150:
+                    counters[3] += 1
+                if player_item["platoon"]:
+                    name = f"[{player_item['platoon']['tag']}]{player_item['display_name']}"
+                else:
+                    name = player_item["display_name"]
+                rows.append(
+                    (
+                        player_item["rank"],
+                        name,
+                        color_temp,
+                        player_item["latency"],
+                        player_item["language"],
+                        PlayerListPic.row_stats(stat_dict.get(player_item["pid"])),
+                    )
+                )
+            teams.append(rows)
+
+        slots = server_info["serverInfo"]["slots"]
+        server_info_text = (
+            f"服务器状态:{server_info['serverInfo']['mapModePretty']}-{server_info['serverInfo']['mapNamePretty']}  "
+            f"在线人数:{slots['Soldier']['current']}/{slots['Soldier']['max']}"
+            f"[{slots['Queue']['current']}]({slots['Spectator']['current']})  "
+            f"收藏:{server_info['serverInfo']['serverBookmarkCount']}"
         )
+        return {
+            "map_pic": server_map_pic,
+            "team_names": (
+                MapData.MapTeamDict[server_mapName]["Team1"],
+                MapData.MapTeamDict[server_mapName]["Team2"],
+            ),
+            "server_name": server_info["serverInfo"]["name"],
+            "update_time": time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(playerlist_data["time"])
+            ),
+            "server_info_text": server_info_text,
+            "description": server_info["serverInfo"]["description"],
+            "slots": slots["Soldier"]["max"],
+            "teams": teams,
+            "counters": counters,
+        }
 
-        # 水印
-        draw.text((1860, 1060), "by.13", fill=(114, 114, 114), font=player_font)
-
-        # IMG.show()
-        # SavePic = f"./data/battlefield/Temp/{round(time.time())}.jpg"
-        # IMG.save(SavePic, quality=100)
-        # 直接IO流发送
-        img_bytes = io.BytesIO()
-        IMG.save(img_bytes, format="PNG")
-        return img_bytes.getvalue()
+
+async def prefetch_map_pics():
+    """启动后下载本地没有的地图图片，查询玩家列表时不需要等待下载"""
+    urls = await asyncio.to_thread(PlayerListPic.load_map_urls)
+    if downloaded := await map_store.prefetch(urls.values()):
+        logger.success(f"已下载{downloaded}张地图图片")
+
+
+add_prefetch(prefetch_map_pics)
 
 
 class Bf1Status:
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+@lru_cache(maxsize=64)
+def _decode_template(data: bytes) -> Image.Image:
+    return Image.open(BytesIO(data)).convert("RGBA")
+
+
+def open_template(data: bytes) -> Image.Image:
+    """打开模块级的模板图片(bytes)，同一模板只解码一次，返回的是副本，可以直接在上面绘制"""
+    return _decode_template(data).copy()
+
+
+# 只用于计算文字边界
+_measure_draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+@lru_cache(maxsize=4096)
+def text_mask(
+    text: str, font: ImageFont.FreeTypeFont, anchor: str | None = None
+) -> tuple[Image.Image, tuple[int, int, int, int]]:
+    """
+    文字的灰度遮罩和相对绘制坐标的边界(left, top, right, bottom)
+    字体对象由get_font复用，以字体对象为键；同一段文字只光栅化一次
+    """
+    bbox = _measure_draw.textbbox((0, 0), text, font=font, anchor=anchor)
+    left, top, right, bottom = bbox
+    mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font, anchor=anchor)
+    return mask, bbox
+
+
+def paste_text(
+    image: Image.Image,
+    xy: tuple[float, float],
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    fill: tuple[int, ...],
+    anchor: str | None = None,
+):
+    """与ImageDraw.text(xy, text, fill, font, anchor)效果相同，使用缓存的文字遮罩，
+    重复出现的序号、数值和名字只需要粘贴一次遮罩"""
+    mask, (left, top, _, _) = text_mask(text, font, anchor)
+    image.paste(fill, (round(xy[0] + left), round(xy[1] + top)), mask)
+
+
+class ImageCache:
+    """已解码(并缩放)的皮肤、战队徽章、头像以及合成好的背景图片的LRU缓存
+
+    以图片bytes和目标尺寸等生成参数为键，按像素数据和键中bytes占用的内存淘汰。
+    每个渲染进程各有一份，返回的都是副本，调用者修改不会影响缓存。
+    """
+
+    def __init__(self, budget: int = 64 * 1024 * 1024):
+        """
+        :param budget: 内存上限(字节)
+        """
+        self.budget = budget
+        self.used = 0
+        self.images: OrderedDict[tuple, tuple[Image.Image, int]] = OrderedDict()
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, data: bytes, size: tuple[int, int] | None = None) -> Image.Image:
+        """
+        解码图片并转换为RGBA
+        :param data: 图片bytes
+        :param size: 缩放后的尺寸，为None时不缩放
+        """
+
+        def decode() -> Image.Image:
+            image = Image.open(BytesIO(data)).convert("RGBA")
+            if size:
+                image = image.resize(size, Image.Resampling.LANCZOS)
+            return image
+
+        return self.cached((data, size), decode)
+
+    def cached(self, key: tuple, create: Callable[[], Image.Image]) -> Image.Image:
+        """
+        获取缓存的图片，不存在时调用create生成
+        :param key: 需要包含生成图片用到的全部输入，其中的bytes计入占用的内存
+        """
+        if entry := self.images.get(key):
+            self.hits += 1
+            self.images.move_to_end(key)
+            return entry[0].copy()
+        self.misses += 1
+        image = create()
+        cost = image.width * image.height * len(image.getbands()) + sum(
+            len(item) for item in key if isinstance(item, bytes)
+        )
+        if cost <= self.budget:
+            self.images[key] = (image, cost)
+            self.used += cost
+            while self.used > self.budget:
+                _, (_, evicted_cost) = self.images.popitem(last=False)
+                self.used -= evicted_cost
+                self.evictions += 1
+        return image.copy()
+
+    def clear(self):
+        self.images.clear()
+        self.used = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "images": len(self.images),
+            "used": self.used,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+image_cache = ImageCache()
@@ -5,9 +5,17 @@ import uuid
 
 import aiohttp
 from creart import create
-import httpx
 from loguru import logger
 from core.config import GlobalConfig
+from utils.http_session import get_http_session
+from utils.bf1.gateway_batcher import BatchRejected, RpcBatcher
+from utils.bf1.gateway_cache import gateway_cache
+from utils.bf1.gateway_limiter import (
+    OVERLOAD_STATUS,
+    WRITE_METHODS,
+    GatewayOverloaded,
+    gateway_limiter,
+)
 
 config = create(GlobalConfig)
 proxy = config.proxy if config.proxy != "proxy" else ""
@@ -219,7 +227,12 @@ class bf1_api:
             },
         }
         self.auto_login_count = 0
-        self.http_session = aiohttp.ClientSession()
+        self.rpc_batcher = RpcBatcher(self.post_rpc)
+
+    @property
+    def http_session(self) -> aiohttp.ClientSession:
+        """所有账号共用的连接池"""
+        return get_http_session()
 
     # api调用
     async def check_session_expire(self) -> bool:
@@ -255,19 +268,72 @@ class bf1_api:
         self.api_header["X-Gatewaysession"] = await self.get_session()
         return self.api_header
 
-    async def api_call(self, body: dict, proxied=False) -> dict | str:
+    async def api_call(self, body: dict, proxied=False, use_cache=True) -> dict | str:
+        """
+        调用网关JSON-RPC方法
+        :param body: JSON-RPC请求
+        :param proxied: 是否走代理网关
+        :param use_cache: 只读方法是否使用响应缓存，需要最新数据时传False
+        :return: 成功:返回dict，失败:返回str
+        """
+        method = body.get("method")
+        if use_cache and not proxied and gateway_cache.cacheable(method):
+            return await gateway_cache.get_or_fetch(
+                body, lambda: self.call_gateway(body)
+            )
+        result = await self.call_gateway(body, proxied)
+        if method in WRITE_METHODS and isinstance(result, dict):
+            gateway_cache.on_write(method)
+        return result
+
+    async def call_gateway(self, body: dict, proxied=False) -> dict | str:
         try:
+            if proxied or body.get("method") in WRITE_METHODS:
+                data = await self.post_rpc(body, proxied)
+            else:
+                # 并发的读请求在合并窗口内合并为一个批量请求
+                data = await self.rpc_batcher.call(body)
+        except asyncio.exceptions.TimeoutError:
+            return "网络超时!"
+        except GatewayOverloaded as e:
+            return f"网关繁忙!HTTP {e.status}"
+        return await self.error_handle(data)
+
+    async def post_rpc(self, payload: dict | list, proxied=False) -> dict | list:
+        """
+        发送一次JSON-RPC请求
+        :param payload: 单个请求或批量请求数组
+        :return: 解析后的json
+        """
+        headers = await self.get_api_header()
+        is_batch = isinstance(payload, list)
+
+        async def request() -> dict | list:
             async with self.http_session.post(
                 url=self.api_url if not proxied else self.proxied_api_url,
-                headers=await self.get_api_header(),
-                data=json.dumps(body),
+                headers=headers,
+                data=json.dumps(payload),
                 timeout=10,
                 ssl=False,
                 proxy=proxy,
             ) as response:
-                return await self.error_handle(await response.json())
-        except asyncio.exceptions.TimeoutError:
-            return "网络超时!"
+                if response.status in OVERLOAD_STATUS:
+                    raise GatewayOverloaded(response.status)
+                if is_batch and 400 <= response.status < 500:
+                    raise BatchRejected(f"HTTP {response.status}")
+                try:
+                    return await response.json()
+                except aiohttp.ContentTypeError:
+                    if is_batch:
+                        raise BatchRejected(response.content_type)
+                    raise
+
+        # 批量请求记到其中的每个方法上
+        if is_batch:
+            methods = [item.get("method", "") for item in payload]
+        else:
+            methods = payload.get("method", "")
+        return await gateway_limiter.call(methods, request)
 
     # 玩家信息相关
     async def login(self, remid: str, sid: str) -> str | None:
@@ -343,9 +409,10 @@ class bf1_api:
             "X-Origin-Platform": "PCWIN",
         }
         try:
-            async with httpx.AsyncClient() as client:
-                response2 = await client.get(url2, headers=header2)
-            authcode = response2.headers["location"]
+            async with self.http_session.get(
+                url2, headers=header2, allow_redirects=False, timeout=10
+            ) as response2:
+                authcode = response2.headers["location"]
             authcode = authcode[authcode.rfind("=") + 1 :]
             self.authcode = authcode
             logger.success(f"获取authcode成功!authcode:{self.authcode}")
@@ -422,9 +489,8 @@ class bf1_api:
             "password": password,
             "bypass2fa": "true",
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, data=data) as response:
-                return await response.json()
+        async with get_http_session().post(url, headers=headers, data=data) as response:
+            return await response.json()
 
     async def auto_login(self, pid):
         file_path = "utils/bf1/ap_info.json"
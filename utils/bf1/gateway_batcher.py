@@ -0,0 +1,121 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
+
+
+class BatchRejected(Exception):
+    """网关不接受JSON-RPC批量请求"""
+
+
+class RpcBatcher:
+    """JSON-RPC 2.0 批量请求合并
+
+    在很短的窗口内到达的请求合并为一个数组通过一次POST发送，再按id把结果分发给各自的调用者。
+    网关不接受批量请求时(返回的不是与请求一一对应的数组)，本次请求改为逐个发送，并且之后不再合并。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict | list], Awaitable],
+        window: float = 0.005,
+        max_batch_size: int = 20,
+    ):
+        """
+        :param send: 发送一次POST并返回解析后json的协程函数
+        :param window: 合并窗口(秒)
+        :param max_batch_size: 每批最多合并的请求数
+        """
+        self.send = send
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.supported = True
+        self.pending: list[tuple[dict, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        # 统计
+        self.batches = 0
+        self.batched_calls = 0
+        self.fallbacks = 0
+
+    async def call(self, body: dict) -> dict:
+        if not self.supported or self.window <= 0:
+            return await self.send(body)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((body, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """立即发送已合并的请求"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        items, self.pending = self.pending, []
+        if not items:
+            return
+        task = asyncio.create_task(self._dispatch(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, items: list[tuple[dict, asyncio.Future]]):
+        if len(items) == 1:
+            await self._send_single(*items[0])
+            return
+        try:
+            results = self._split(items, await self.send([body for body, _ in items]))
+        except BatchRejected as e:
+            if self.supported:
+                self.supported = False
+                logger.warning(f"网关不支持JSON-RPC批量请求({e})，改为逐个请求")
+            self.fallbacks += 1
+            await asyncio.gather(*[self._send_single(*item) for item in items])
+            return
+        except asyncio.CancelledError:
+            for _, future in items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.batched_calls += len(items)
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _send_single(self, body: dict, future: asyncio.Future):
+        try:
+            result = await self.send(body)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _split(items: list[tuple[dict, asyncio.Future]], data) -> list[dict]:
+        """按id把批量结果与请求对应起来"""
+        if not isinstance(data, list):
+            raise BatchRejected(
+                data.get("error") if isinstance(data, dict) else type(data).__name__
+            )
+        results = {item.get("id"): item for item in data if isinstance(item, dict)}
+        if any(body.get("id") not in results for body, _ in items):
+            raise BatchRejected("返回结果与请求id不对应")
+        return [results[body.get("id")] for body, _ in items]
+
+    def stats(self) -> dict:
+        return {
+            "supported": self.supported,
+            "batches": self.batches,
+            "batched_calls": self.batched_calls,
+            "fallbacks": self.fallbacks,
+        }
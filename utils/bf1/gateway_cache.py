@@ -0,0 +1,144 @@
+import asyncio
+import copy
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from utils.bf1.gateway_limiter import WRITE_METHODS
+
+# 可缓存的只读方法及其缓存时间(秒)，未列出的方法不缓存
+# searchServers每次返回随机结果，不缓存
+METHOD_TTLS = {
+    "Stats.detailedStatsByPersonaId": 300,
+    "Progression.getWeaponsByPersonaId": 300,
+    "Progression.getVehiclesByPersonaId": 300,
+    "Progression.getDogtagsByPersonaId": 600,
+    "Progression.getMedalsByPersonaId": 600,
+    "ServerHistory.mostRecentServers": 300,
+    "RSP.getPersonasByIds": 600,
+    "GameServer.getServersByPersonaIds": 30,
+    "GameServer.getServerDetails": 30,
+    "GameServer.getFullServerDetails": 30,
+    "Platoons.getActivePlatoon": 600,
+    "Platoons.getActiveTagsByPersonaIds": 600,
+    "Platoons.getPlatoon": 300,
+    "Platoons.getPlatoons": 600,
+    "Emblems.getEquippedEmblem": 600,
+    "Loadout.getEquippedDogtagsByPersonaId": 600,
+    "Loadout.getPresetsByPersonaId": 300,
+    "Gamedata.getGameData": 3600,
+}
+# 写方法成功后需要失效的缓存
+WRITE_INVALIDATES = (
+    "GameServer.getServerDetails",
+    "GameServer.getFullServerDetails",
+)
+
+
+class ResponseCache:
+    """网关只读方法的响应缓存
+
+    按 (方法, 参数) 缓存成功的响应，每个方法有独立的缓存时间，总条目数超过上限时按LRU淘汰；
+    相同的请求同时到达时只发出一次，其余请求等待同一个结果。
+    写方法不经过缓存，成功后使服务器详情类的缓存失效。
+    """
+
+    def __init__(self, max_entries: int = 4096, ttls: dict[str, float] = None):
+        self.max_entries = max_entries
+        self.ttls = METHOD_TTLS if ttls is None else ttls
+        # {key: (过期时间, 响应)}
+        self.entries: OrderedDict[tuple[str, str], tuple[float, dict]] = OrderedDict()
+        self.in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        # {method: [命中, 未命中, 合并]}
+        self.counters: dict[str, list[int]] = {}
+        self.evictions = 0
+
+    def cacheable(self, method: str) -> bool:
+        return method in self.ttls and method not in WRITE_METHODS
+
+    @staticmethod
+    def make_key(body: dict) -> tuple[str, str]:
+        # id每次都不同，不参与缓存键
+        return body.get("method", ""), json.dumps(
+            body.get("params"), sort_keys=True, ensure_ascii=False
+        )
+
+    async def get_or_fetch(
+        self, body: dict, fetch: Callable[[], Awaitable[dict | str]]
+    ) -> dict | str:
+        """
+        获取缓存的响应，没有时调用fetch
+        :param body: JSON-RPC请求
+        :param fetch: 实际发出请求的协程函数，返回dict时缓存，返回str(错误信息)时不缓存
+        """
+        key = self.make_key(body)
+        counter = self.counters.setdefault(key[0], [0, 0, 0])
+        if entry := self.entries.get(key):
+            expire_time, data = entry
+            if expire_time > time.monotonic():
+                counter[0] += 1
+                self.entries.move_to_end(key)
+                return copy.deepcopy(data)
+            del self.entries[key]
+        if task := self.in_flight.get(key):
+            counter[2] += 1
+        else:
+            counter[1] += 1
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # 调用者被取消时不影响其他等待同一结果的调用者
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result) if isinstance(result, dict) else result
+
+    async def _fetch(
+        self, key: tuple[str, str], fetch: Callable[[], Awaitable[dict | str]]
+    ) -> dict | str:
+        result = await fetch()
+        if isinstance(result, dict) and "error" not in result:
+            self.entries[key] = (time.monotonic() + self.ttls[key[0]], result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def invalidate(self, methods: tuple[str, ...] | None = None):
+        """使指定方法(默认全部)的缓存失效"""
+        if methods is None:
+            self.entries.clear()
+            return
+        for key in [key for key in self.entries if key[0] in methods]:
+            del self.entries[key]
+
+    def on_write(self, method: str):
+        """写方法成功后调用"""
+        if method in WRITE_METHODS:
+            self.invalidate(WRITE_INVALIDATES)
+
+    def stats(self) -> dict:
+        hits = sum(counter[0] for counter in self.counters.values())
+        misses = sum(counter[1] for counter in self.counters.values())
+        coalesced = sum(counter[2] for counter in self.counters.values())
+        total = hits + misses + coalesced
+        return {
+            "entries": len(self.entries),
+            "in_flight": len(self.in_flight),
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_rate": (hits + coalesced) / total if total else 0.0,
+            "evictions": self.evictions,
+            "methods": {
+                method: {
+                    "hits": counter[0],
+                    "misses": counter[1],
+                    "coalesced": counter[2],
+                }
+                for method, counter in self.counters.items()
+            },
+        }
+
+
+gateway_cache = ResponseCache()
@@ -0,0 +1,236 @@
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import aiohttp
+from loguru import logger
+
+# 有副作用的方法，失败后不自动重试
+WRITE_METHODS = frozenset(
+    {
+        "Authentication.getEnvIdViaAuthCode",
+        "CloudBan.addServerBan",
+        "CloudBan.removeServerBan",
+        "CompanionSettings.setLocale",
+        "Game.leaveGame",
+        "Game.reserveSlot",
+        "RSP.addServerAdmin",
+        "RSP.addServerBan",
+        "RSP.addServerVip",
+        "RSP.chooseLevel",
+        "RSP.kickPlayer",
+        "RSP.movePlayer",
+        "RSP.removeServerAdmin",
+        "RSP.removeServerBan",
+        "RSP.removeServerVip",
+        "RSP.updateServer",
+    }
+)
+# 视为网关过载的HTTP状态码
+OVERLOAD_STATUS = frozenset({429, 502, 503, 504})
+
+
+class GatewayOverloaded(Exception):
+    """网关返回过载状态码"""
+
+    def __init__(self, status: int):
+        self.status = status
+        super().__init__(f"网关过载: HTTP {status}")
+
+
+class MethodMetrics:
+    """单个JSON-RPC方法的统计"""
+
+    def __init__(self, sample_size: int = 256):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.latencies: deque[float] = deque(maxlen=sample_size)
+
+    def percentile(self, q: float) -> float:
+        """最近样本的延迟分位数(秒)"""
+        if not self.latencies:
+            return 0.0
+        samples = sorted(self.latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class AdaptiveLimiter:
+    """AIMD自适应并发限制
+
+    请求成功且延迟低于阈值时加法增大并发上限(每个窗口约+1)，
+    超时、网关过载或延迟超过阈值时乘法减小，每个冷却时间内最多减小一次。
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 16,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        slow_threshold: float = 3.0,
+        backoff: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.slow_threshold = slow_threshold
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已经拿到名额后被取消需要归还
+            if future.done() and not future.cancelled():
+                self.release()
+            elif future in self._waiters:
+                # 取消后、恢复执行前被release唤醒的future已经从队列中取出
+                self._waiters.remove(future)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self, latency: float):
+        if latency > self.slow_threshold:
+            self.on_overload()
+            return
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self):
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+class GatewayLimiter:
+    """按JSON-RPC方法划分的网关请求限流器，所有bf1_api实例共用"""
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        retry_base_delay: float = 0.5,
+        limiter_factory: Callable[[], AdaptiveLimiter] = AdaptiveLimiter,
+    ):
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.limiter_factory = limiter_factory
+        self.limiters: dict[str, AdaptiveLimiter] = {}
+        self.metrics: dict[str, MethodMetrics] = {}
+
+    def get_limiter(self, method: str) -> AdaptiveLimiter:
+        if method not in self.limiters:
+            self.limiters[method] = self.limiter_factory()
+            self.metrics[method] = MethodMetrics()
+        return self.limiters[method]
+
+    async def call(self, method: str | Iterable[str], request: Callable[[], Awaitable]):
+        """
+        在并发限制下执行请求，读方法在超时/网络错误/网关过载时带抖动重试
+        :param method: JSON-RPC方法名，批量请求传入其中的所有方法名，
+            占用每个方法的并发名额，延迟和结果也记到每个方法上
+        :param request: 发起一次请求的协程函数
+        :return: request的返回值，重试用尽后抛出最后一次的异常
+        """
+        methods = sorted({method} if isinstance(method, str) else set(method))
+        limiters = [self.get_limiter(name) for name in methods]
+        metrics = [self.metrics[name] for name in methods]
+        retries = 0 if WRITE_METHODS.intersection(methods) else self.max_retries
+        for attempt in range(retries + 1):
+            async with AsyncExitStack() as stack:
+                # 按方法名顺序获取名额，避免两个批量请求互相等待
+                for limiter in limiters:
+                    await stack.enter_async_context(limiter.slot())
+                for method_metrics in metrics:
+                    method_metrics.requests += 1
+                start = time.monotonic()
+                try:
+                    result = await request()
+                except (
+                    asyncio.TimeoutError,
+                    aiohttp.ClientError,
+                    GatewayOverloaded,
+                ) as e:
+                    for method_metrics in metrics:
+                        if isinstance(e, asyncio.TimeoutError):
+                            method_metrics.timeouts += 1
+                        else:
+                            method_metrics.errors += 1
+                    for limiter in limiters:
+                        limiter.on_overload()
+                    if attempt >= retries:
+                        raise
+                    error = e
+                else:
+                    latency = time.monotonic() - start
+                    for method_metrics in metrics:
+                        method_metrics.latencies.append(latency)
+                    for limiter in limiters:
+                        limiter.on_success(latency)
+                    return result
+            # 等待期间不占用并发名额
+            for method_metrics in metrics:
+                method_metrics.retries += 1
+            delay = random.uniform(0, self.retry_base_delay * 2**attempt)
+            logger.debug(f"{','.join(methods)}请求失败({error!r}), {delay:.2f}秒后重试")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, dict]:
+        """
+        各方法的统计
+        :return: {method: {limit, in_flight, queued, requests, errors, timeouts, retries, p50, p95}}
+        """
+        return {
+            method: {
+                "limit": round(limiter.limit, 2),
+                "in_flight": limiter.in_flight,
+                "queued": limiter.queued,
+                "requests": self.metrics[method].requests,
+                "errors": self.metrics[method].errors,
+                "timeouts": self.metrics[method].timeouts,
+                "retries": self.metrics[method].retries,
+                "p50": self.metrics[method].percentile(0.5),
+                "p95": self.metrics[method].percentile(0.95),
+            }
+            for method, limiter in self.limiters.items()
+        }
+
+
+gateway_limiter = GatewayLimiter()
@@ -0,0 +1,181 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
+
+from utils.bf1.data_handle import BlazeData
+
+# 不存在(未开启)的服务器也缓存，避免反复查询
+_MISSING = object()
+
+
+class PlayerListService:
+    """Blaze玩家列表查询服务
+
+    同一时间窗口内对不同gameId的查询合并为一个GLST列表请求；每个gameId解析后的快照缓存几秒，
+    同一gameId正在查询时，其他调用者等待同一个结果。调用者拿到的是快照的副本，可以随意修改。
+    """
+
+    def __init__(
+        self,
+        ttl: float = 5,
+        batch_delay: float = 0.01,
+        max_batch: int = 16,
+        max_entries: int = 1024,
+    ):
+        """
+        :param ttl: 快照缓存时间(秒)
+        :param batch_delay: 等待合并请求的时间(秒)
+        :param max_batch: 单个GLST请求的gameId数量上限
+        :param max_entries: 快照数量上限，超过时按LRU淘汰
+        """
+        self.ttl = ttl
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self.max_entries = max_entries
+        # {gameId: (过期时间, 快照)}
+        self.snapshots: OrderedDict[int, tuple[float, dict | object]] = OrderedDict()
+        # 已发出或等待合并的查询 {gameId: Future}
+        self.in_flight: dict[int, asyncio.Future] = {}
+        self._pending: list[int] = []
+        self._flush_task: asyncio.Task | None = None
+        self._fetch: Callable[[list[int]], Awaitable[dict | str]] | None = None
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.requests = 0
+        self.evictions = 0
+
+    async def get(
+        self,
+        game_ids: list[int],
+        fetch: Callable[[list[int]], Awaitable[dict | str]],
+        use_cache: bool = True,
+    ) -> dict | str:
+        """
+        获取玩家列表
+        :param game_ids: gameId列表
+        :param fetch: 发出GLST请求的协程函数，参数为gameId列表，返回Blaze响应，出错时返回错误信息
+        :param use_cache: 为False时不使用缓存的快照(仍会合并正在进行的查询)
+        :return: {gameId: 玩家列表}，不存在的服务器不在结果中；出错时返回错误信息
+        """
+        now = time.monotonic()
+        result = {}
+        futures = {}
+        for game_id in dict.fromkeys(game_ids):
+            if use_cache and (entry := self.snapshots.get(game_id)):
+                expire_time, snapshot = entry
+                if expire_time > now:
+                    self.hits += 1
+                    self.snapshots.move_to_end(game_id)
+                    if snapshot is not _MISSING:
+                        result[game_id] = copy.deepcopy(snapshot)
+                    continue
+            if future := self.in_flight.get(game_id):
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self._enqueue(game_id, fetch)
+            futures[game_id] = future
+        for game_id, future in futures.items():
+            # 调用者被取消时不影响其他等待同一结果的调用者
+            snapshot = await asyncio.shield(future)
+            if isinstance(snapshot, str):
+                return snapshot
+            if snapshot is not _MISSING:
+                result[game_id] = copy.deepcopy(snapshot)
+        return result
+
+    def _enqueue(
+        self, game_id: int, fetch: Callable[[list[int]], Awaitable[dict | str]]
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[game_id] = future
+        self._pending.append(game_id)
+        self._fetch = fetch
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush())
+            self._flush_task.add_done_callback(self._flush_done)
+        return future
+
+    def _flush_done(self, task: asyncio.Task):
+        # 还没有发出请求就被取消(可能还没开始执行)，已发出的请求由_request结束
+        if task is self._flush_task:
+            pending, self._pending = self._pending, []
+            self._flush_task = None
+            self._abort(pending)
+
+    async def _flush(self):
+        # 等待同一时间窗口内的其他查询
+        await asyncio.sleep(self.batch_delay)
+        pending, self._pending = self._pending, []
+        fetch, self._flush_task = self._fetch, None
+        batches = [
+            pending[i : i + self.max_batch]
+            for i in range(0, len(pending), self.max_batch)
+        ]
+        await asyncio.gather(*(self._request(batch, fetch) for batch in batches))
+
+    async def _request(
+        self, game_ids: list[int], fetch: Callable[[list[int]], Awaitable[dict | str]]
+    ):
+        self.requests += 1
+        try:
+            try:
+                response = await fetch(game_ids)
+                if not isinstance(response, str):
+                    response = BlazeData.player_list_handle(response)
+            except Exception as e:
+                logger.error(f"Blaze玩家列表查询出错: {e!r}")
+                response = f"Blaze玩家列表查询出错: {e!r}"
+            expire_time = time.monotonic() + self.ttl
+            for game_id in game_ids:
+                future = self.in_flight.pop(game_id)
+                if isinstance(response, str):
+                    # 错误不缓存
+                    future.set_result(response)
+                    continue
+                snapshot = response.get(game_id, _MISSING)
+                self.snapshots[game_id] = (expire_time, snapshot)
+                self.snapshots.move_to_end(game_id)
+                future.set_result(snapshot)
+            while len(self.snapshots) > self.max_entries:
+                self.snapshots.popitem(last=False)
+                self.evictions += 1
+        finally:
+            # 被取消时也要结束这些查询，否则之后的调用者会一直等待in_flight中的future
+            self._abort(game_ids)
+
+    def _abort(self, game_ids: list[int]):
+        """结束还没有结果的查询，等待的调用者收到错误信息，之后的查询重新发出请求"""
+        for game_id in game_ids:
+            future = self.in_flight.pop(game_id, None)
+            if future is not None and not future.done():
+                future.set_result("Blaze玩家列表查询被取消")
+
+    def invalidate(self, game_id: int | None = None):
+        """使指定gameId(默认全部)的快照失效，例如踢人/换图之后"""
+        if game_id is None:
+            self.snapshots.clear()
+        else:
+            self.snapshots.pop(game_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "snapshots": len(self.snapshots),
+            "in_flight": len(self.in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "requests": self.requests,
+            "hit_rate": (self.hits + self.coalesced) / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+player_list_service = PlayerListService()
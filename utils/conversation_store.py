@@ -0,0 +1,319 @@
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Protocol, TypeVar
+
+from launart import Launart, Launchable
+from loguru import logger
+
+
+class Storable(Protocol):
+    def to_state(self) -> dict:
+        """导出可以json序列化的状态，用于写入磁盘"""
+
+    def memory_size(self) -> int:
+        """估算占用的内存(字节)"""
+
+
+T = TypeVar("T", bound=Storable)
+
+
+class ConversationStore:
+    """AI对话的内存LRU + sqlite持久化
+
+    - 内存中只保留最近使用的对话，数量超过上限或闲置超过一段时间的对话写入磁盘后释放
+    - 下次使用时从磁盘恢复，重启后对话不丢失
+    - 正在处理消息的对话(hold中)不会被换出，避免换出后继续修改的内容丢失
+    - 换出的状态先放在pending中，由save()在线程中批量写入；pending中为None表示待删除
+    - 数据库的读写都在线程中执行，磁盘上的记录数和大小保存在内存中，不阻塞事件循环
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_hot: int = 256,
+        idle_ttl: float = 1800,
+        max_age: float = 30 * 86400,
+    ):
+        """
+        :param path: sqlite数据库文件
+        :param max_hot: 内存中保留的对话数量上限
+        :param idle_ttl: 闲置多长时间(秒)后换出到磁盘
+        :param max_age: 磁盘上的对话多长时间(秒)未使用后删除
+        """
+        self.path = path
+        self.max_hot = max_hot
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+        # {key: (对话, 最后使用时间)}
+        self.hot: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        # {key: 正在使用的次数}
+        self.holding: dict[str, int] = {}
+        # {key: 压缩后的状态，None为删除}，尚未写入磁盘
+        self.pending: dict[str, bytes | None] = {}
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        # {key: 磁盘上的状态大小}，open()之后可用
+        self.stored_sizes: dict[str, int] | None = None
+        self.stored_bytes = 0
+        # 统计
+        self.hits = 0
+        self.rehydrations = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations "
+                "(key TEXT PRIMARY KEY, state BLOB NOT NULL, updated REAL NOT NULL)"
+            )
+        return self._db
+
+    async def open(self):
+        """读取磁盘上已有记录的大小"""
+        if self.stored_sizes is None:
+            sizes = await asyncio.to_thread(self._read_sizes)
+            if self.stored_sizes is None:
+                self.stored_sizes = sizes
+                self.stored_bytes = sum(sizes.values())
+
+    def _read_sizes(self) -> dict[str, int]:
+        with self._db_lock:
+            return dict(
+                self._connect().execute("SELECT key, LENGTH(state) FROM conversations")
+            )
+
+    def _read(self, key: str) -> bytes | None:
+        with self._db_lock:
+            row = (
+                self._connect()
+                .execute("SELECT state FROM conversations WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def _touch(self, key: str) -> Any | None:
+        if entry := self.hot.get(key):
+            self.hot[key] = (entry[0], time.time())
+            self.hot.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        return None
+
+    async def get(self, key: str, restore: Callable[[dict], T]) -> T | None:
+        """获取对话，不在内存中时从磁盘恢复，都没有时返回None"""
+        if (conversation := self._touch(key)) is not None:
+            return conversation
+        if key in self.pending:
+            data = self.pending[key]
+        else:
+            data = await asyncio.to_thread(self._read, key)
+            # 读取期间对话可能已被其他协程恢复、新建或删除
+            if (conversation := self._touch(key)) is not None:
+                return conversation
+            if key in self.pending:
+                data = self.pending[key]
+        if data is None:
+            self.misses += 1
+            return None
+        try:
+            conversation = restore(json.loads(zlib.decompress(data)))
+        except Exception as e:
+            logger.warning(f"恢复对话{key}失败，将创建新对话: {e!r}")
+            self.misses += 1
+            return None
+        self.rehydrations += 1
+        self._insert(key, conversation)
+        return conversation
+
+    def put(self, key: str, conversation: Storable):
+        """保存新的对话，替换内存和磁盘上的旧对话"""
+        self.pending[key] = None
+        self._insert(key, conversation)
+
+    def peek(self, key: str) -> Any | None:
+        """获取内存中的对话，不从磁盘恢复，也不更新使用时间"""
+        entry = self.hot.get(key)
+        return entry[0] if entry else None
+
+    def remove(self, key: str) -> bool:
+        """删除对话，磁盘上的记录在下次save()时删除，返回对话是否在内存中"""
+        self.pending[key] = None
+        return self.hot.pop(key, None) is not None
+
+    def _insert(self, key: str, conversation: Storable):
+        self.hot[key] = (conversation, time.time())
+        self.hot.move_to_end(key)
+        if len(self.hot) > self.max_hot:
+            for old_key in list(self.hot):
+                if len(self.hot) <= self.max_hot:
+                    break
+                if old_key != key and not self.holding.get(old_key):
+                    self._evict(old_key)
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        """处理消息期间不换出对话"""
+        self.holding[key] = self.holding.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            if self.holding[key] > 1:
+                self.holding[key] -= 1
+            else:
+                del self.holding[key]
+            if key in self.hot:
+                self.hot[key] = (self.hot[key][0], time.time())
+
+    def _evict(self, key: str):
+        conversation, _ = self.hot.pop(key)
+        try:
+            state = conversation.to_state()
+            self.pending[key] = zlib.compress(
+                json.dumps(state, ensure_ascii=False, default=str).encode()
+            )
+        except Exception as e:
+            logger.error(f"保存对话{key}失败: {e!r}")
+            self.pending[key] = None
+        self.evictions += 1
+
+    async def evict_idle(self) -> int:
+        """换出闲置的对话并写入磁盘，删除磁盘上过旧的记录，返回换出的数量"""
+        deadline = time.time() - self.idle_ttl
+        keys = [
+            key
+            for key, (_, last_used) in self.hot.items()
+            if last_used < deadline and not self.holding.get(key)
+        ]
+        for key in keys:
+            self._evict(key)
+        await self.save(expire=True)
+        return len(keys)
+
+    async def flush(self):
+        """换出所有未在使用的对话并写入磁盘，用于关闭或重新加载时"""
+        for key in [key for key in self.hot if not self.holding.get(key)]:
+            self._evict(key)
+        await self.save()
+
+    async def save(self, expire: bool = False):
+        """把pending中的状态写入磁盘"""
+        if not self.pending and not expire:
+            return
+        pending = self.pending.copy()
+        try:
+            expired = await asyncio.to_thread(self._write, pending, expire)
+        except sqlite3.Error as e:
+            logger.error(f"写入对话数据库失败: {e!r}")
+            return
+        # 写入期间又被换出的对话留到下次写入
+        for key, data in pending.items():
+            if key in self.pending and self.pending[key] is data:
+                del self.pending[key]
+            self._set_size(key, None if data is None else len(data))
+        for key in expired:
+            self._set_size(key, None)
+
+    def _set_size(self, key: str, size: int | None):
+        if self.stored_sizes is None:
+            return
+        self.stored_bytes -= self.stored_sizes.pop(key, 0)
+        if size is not None:
+            self.stored_sizes[key] = size
+            self.stored_bytes += size
+
+    def _write(self, pending: dict[str, bytes | None], expire: bool) -> list[str]:
+        """写入pending中的状态，返回因过旧被删除的key"""
+        now = time.time()
+        expired = []
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                db.executemany(
+                    "DELETE FROM conversations WHERE key = ?",
+                    [(key,) for key, data in pending.items() if data is None],
+                )
+                db.executemany(
+                    "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)",
+                    [
+                        (key, data, now)
+                        for key, data in pending.items()
+                        if data is not None
+                    ],
+                )
+                if expire:
+                    expired = [
+                        key
+                        for (key,) in db.execute(
+                            "SELECT key FROM conversations WHERE updated < ?",
+                            (now - self.max_age,),
+                        )
+                    ]
+                    db.executemany(
+                        "DELETE FROM conversations WHERE key = ?",
+                        [(key,) for key in expired],
+                    )
+        return expired
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        return {
+            "hot": len(self.hot),
+            "max_hot": self.max_hot,
+            "memory": sum(
+                conversation.memory_size() for conversation, _ in self.hot.values()
+            )
+            + sum(sys.getsizeof(data) for data in self.pending.values()),
+            "stored": len(self.stored_sizes or ()),
+            "stored_bytes": self.stored_bytes,
+            "hits": self.hits,
+            "rehydrations": self.rehydrations,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# AI对话的存储
+conversation_store = ConversationStore(Path("./data/ai_chat/conversations.db"))
+
+
+class ConversationStoreService(Launchable):
+    id = "umaru.core.conversation_store"
+
+    @property
+    def required(self):
+        return set()
+
+    @property
+    def stages(self):
+        return {"preparing", "blocking", "cleanup"}
+
+    async def launch(self, _mgr: Launart):
+        async with self.stage("preparing"):
+            try:
+                await conversation_store.open()
+            except sqlite3.Error as e:
+                logger.error(f"读取对话数据库失败: {e!r}")
+        async with self.stage("blocking"):
+            await _mgr.status.wait_for_sigexit()
+        async with self.stage("cleanup"):
+            await conversation_store.flush()
+            logger.success(f"已保存AI对话: {conversation_store.stats()}")
+            conversation_store.close()
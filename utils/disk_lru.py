@@ -0,0 +1,89 @@
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class DiskLRU:
+    """目录中缓存文件的LRU索引
+
+    记录每个文件的大小和写入时间，首次使用时从目录读取，按修改时间作为初始的使用顺序；
+    写入时先写临时文件再替换，总大小超过上限时删除最久未使用的文件。
+    只管理匹配pattern的文件，目录中的其他文件不会被删除。
+    文件的读写由调用者放到线程中执行，索引只在事件循环中修改。
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int | None = None,
+        suffix: str = "",
+        pattern: str | None = None,
+    ):
+        """
+        :param root: 保存目录
+        :param max_bytes: 文件总大小上限(字节)，None为不限制
+        :param suffix: 文件名为键加上suffix
+        :param pattern: 由这里管理的文件名，默认为所有以suffix结尾的文件
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.pattern = pattern or f"*{suffix}"
+        # {键: (文件大小, 写入时间)}，首次使用时从目录读取
+        self.entries: OrderedDict[str, tuple[int, float]] | None = None
+        self.used = 0
+
+    def load(self):
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = [
+            (file, file.stat())
+            for file in self.root.glob(self.pattern)
+            if file.is_file() and file.suffix != ".tmp"
+        ]
+        for file, stat in sorted(files, key=lambda item: item[1].st_mtime):
+            key = file.name[: len(file.name) - len(self.suffix)]
+            self.entries[key] = (stat.st_size, stat.st_mtime)
+            self.used += stat.st_size
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> tuple[int, float] | None:
+        """返回(文件大小, 写入时间)，不存在时返回None"""
+        self.load()
+        return self.entries.get(key)
+
+    def touch(self, key: str):
+        """标记为最近使用"""
+        self.entries.move_to_end(key)
+
+    def write(self, key: str, data: bytes):
+        """写入文件，在线程中执行，写入后需要调用add记录"""
+        path = self.path(key)
+        # 先写入临时文件再替换，避免并发读取到写了一半的文件
+        temp_path = path.with_name(f".{path.name}.{time.time_ns()}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    def add(self, key: str, size: int) -> list[str]:
+        """记录写入的文件，总大小超过上限时删除最久未使用的文件，返回删除的键"""
+        self.load()
+        if key in self.entries:
+            self.used -= self.entries.pop(key)[0]
+        self.entries[key] = (size, time.time())
+        self.used += size
+        evicted = []
+        if self.max_bytes is not None:
+            while self.used > self.max_bytes and len(self.entries) > 1:
+                evicted.append(next(iter(self.entries)))
+                self.remove(evicted[-1])
+        return evicted
+
+    def remove(self, key: str):
+        size, _ = self.entries.pop(key)
+        self.used -= size
+        self.path(key).unlink(missing_ok=True)
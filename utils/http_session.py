@@ -0,0 +1,111 @@
+import asyncio
+
+import aiohttp
+from launart import Launart, Launchable
+from loguru import logger
+
+
+class SharedHttpSession:
+    """进程内共用的aiohttp连接池
+
+    所有BF1账号的网关请求和EA登录请求共用一个连接池，复用keep-alive连接，减少TLS握手；
+    不保存cookie，避免不同账号之间互相带上对方的cookie(登录时cookie都显式写在请求头中)。
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 32,
+        keepalive_timeout: float = 60,
+        ttl_dns_cache: int = 300,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self._session: aiohttp.ClientSession | None = None
+        # 统计
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_create(*_):
+            self.connections_created += 1
+
+        async def on_reuse(*_):
+            self.connections_reused += 1
+
+        async def on_dns_hit(*_):
+            self.dns_cache_hits += 1
+
+        async def on_dns_miss(*_):
+            self.dns_cache_misses += 1
+
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        trace_config.on_dns_cache_hit.append(on_dns_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_miss)
+        return trace_config
+
+    def get(self) -> aiohttp.ClientSession:
+        """获取共用的session，不存在或已关闭时创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.ttl_dns_cache,
+                use_dns_cache=True,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=[self.trace_config()],
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            # 等待底层TLS连接关闭
+            await asyncio.sleep(0.25)
+        self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+
+shared_http_session = SharedHttpSession()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    return shared_http_session.get()
+
+
+class HttpSessionService(Launchable):
+    id = "umaru.core.http_session"
+
+    @property
+    def required(self):
+        return set()
+
+    @property
+    def stages(self):
+        return {"blocking", "cleanup"}
+
+    async def launch(self, _mgr: Launart):
+        async with self.stage("blocking"):
+            await _mgr.status.wait_for_sigexit()
+        async with self.stage("cleanup"):
+            await shared_http_session.close()
+            logger.success(f"已关闭共用HTTP连接池: {shared_http_session.stats()}")
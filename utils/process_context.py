@@ -0,0 +1,37 @@
+import multiprocessing
+import sys
+import types
+from contextlib import contextmanager
+
+# forkserver进程在整个bot中只有一个，所有进程池的预先导入模块合并后在它首次启动时导入
+_preload: list[str] = []
+
+
+def worker_context(preload: list[str]) -> multiprocessing.context.BaseContext:
+    """子进程的启动方式：支持forkserver时使用forkserver，否则使用spawn
+
+    bot进程中已有其他线程，fork可能继承被持有的锁而死锁，还会继承bot的连接、会话和文件描述符；
+    forkserver进程由干净的解释器启动，只预先导入子进程需要的模块，之后fork的开销很小。
+    forkserver启动后再添加的模块不会预先导入，由子进程自己导入。
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        _preload.extend(name for name in preload if name not in _preload)
+        context.set_forkserver_preload(list(_preload))
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+@contextmanager
+def hide_main():
+    """启动子进程时隐藏主进程的__main__
+
+    spawn和forkserver的子进程默认会重新导入主进程的__main__(bot的main.py)，
+    这会在子进程中读取bot的配置并导入全部依赖；子进程执行的函数都来自可导入的模块，不需要__main__。
+    """
+    main_module = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from utils.disk_lru import DiskLRU
+
+
+class RenderCache:
+    """渲染结果缓存
+
+    以绘制输入数据的哈希为键，编码好的图片保存在临时目录的cache子目录下，总大小超过上限时按LRU淘汰。
+    命中时跳过素材下载和渲染，返回缓存图片的一份临时文件，调用者发送后仍可以照常删除；
+    调用者没有删除的临时文件和过期的缓存由clean()定期清理。
+    """
+
+    def __init__(
+        self,
+        temp_root: Path,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: float = 3600,
+        temp_max_age: float = 3600,
+    ):
+        """
+        :param temp_root: 临时文件目录
+        :param max_bytes: 缓存文件总大小上限(字节)
+        :param max_age: 缓存有效时间(秒)，图片上的时间水印不会太旧
+        :param temp_max_age: 临时文件保留时间(秒)
+        """
+        self.temp_root = temp_root
+        self.files = DiskLRU(temp_root / "cache", max_bytes, suffix=".jpg")
+        self.max_age = max_age
+        self.temp_max_age = temp_max_age
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        """根据绘制输入数据(可以json序列化)计算缓存键"""
+        data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _temp_path(self, key: str) -> Path:
+        return self.temp_root / f"{round(time.time() * 1000)}_{key[:8]}.png"
+
+    async def get(self, key: str) -> Path | None:
+        """命中时返回缓存图片的一份临时文件，否则返回None"""
+        entry = self.files.get(key)
+        if entry and entry[1] + self.max_age > time.time():
+            self.files.touch(key)
+            try:
+                path = self._temp_path(key)
+                await asyncio.to_thread(shutil.copyfile, self.files.path(key), path)
+                self.hits += 1
+                return path
+            except OSError as e:
+                logger.warning(f"读取图片缓存失败: {e!r}")
+        if entry:
+            self._evict(key)
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, data: bytes) -> Path:
+        """保存渲染结果，返回一份临时文件"""
+        self.files.load()
+        path = self._temp_path(key)
+        await asyncio.to_thread(self._write, key, data, path)
+        self.evictions += len(self.files.add(key, len(data)))
+        return path
+
+    def _write(self, key: str, data: bytes, path: Path):
+        path.write_bytes(data)
+        self.files.write(key, data)
+
+    def _evict(self, key: str):
+        self.files.remove(key)
+        self.evictions += 1
+
+    async def clean(self) -> int:
+        """清理过期的缓存和临时目录中超过保留时间的文件，返回删除的临时文件数"""
+        self.files.load()
+        now = time.time()
+        for key in [
+            key
+            for key, (_, created) in self.files.entries.items()
+            if created + self.max_age <= now
+        ]:
+            self._evict(key)
+        return await asyncio.to_thread(self._clean_temp, now)
+
+    def _clean_temp(self, now: float) -> int:
+        removed = 0
+        for file in self.temp_root.iterdir():
+            try:
+                if file.is_file() and file.stat().st_mtime + self.temp_max_age < now:
+                    file.unlink()
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"清理临时文件{file}失败: {e!r}")
+        return removed
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.files.entries or ()),
+            "used": self.files.used,
+            "max_bytes": self.files.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# BF1战绩/武器/载具图的渲染缓存
+render_cache = RenderCache(Path("./data/battlefield/Temp/"))
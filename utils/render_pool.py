@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from launart import Launart, Launchable
+from loguru import logger
+
+from utils.process_context import hide_main, worker_context
+
+
+def _init_worker(warm_ups: list[Callable[[], None]]):
+    for warm_up in warm_ups:
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"渲染进程预热失败: {e!r}")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RenderPool:
+    """图片渲染进程池
+
+    PIL的合成、文字绘制和编码都是同步的CPU密集操作，在事件循环中执行会阻塞所有群的消息处理。
+    渲染函数和参数需要可以pickle(纯数据)，在子进程中执行后返回编码好的图片bytes。
+    子进程启动时执行预热函数(加载字体、模板)，之后一直保留；进程池损坏时重建一次，仍失败则在线程中执行。
+    子进程不从bot进程fork，不继承bot的连接、会话和账号信息：
+    支持forkserver时从预先导入了utils.bf1.draw的forkserver进程fork，否则使用spawn。
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.warm_ups: list[Callable[[], None]] = []
+        self._executor: ProcessPoolExecutor | None = None
+        self.start_method: str | None = None
+        # 统计
+        self.renders = 0
+        self.failures = 0
+        self.restarts = 0
+        self.fallbacks = 0
+        self.render_time = 0.0
+        self.max_render_time = 0.0
+
+    def add_warm_up(self, func: Callable[[], None]):
+        """添加子进程启动时执行的预热函数，需要是模块级函数"""
+        if func not in self.warm_ups:
+            self.warm_ups.append(func)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 模板和字体由预热函数在每个子进程中加载
+            context = worker_context(["utils.bf1.draw"])
+            self.start_method = context.get_start_method()
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.warm_ups,),
+            )
+        return self._executor
+
+    def _submit(self, func: Callable, *args) -> asyncio.Future:
+        # 进程池在提交任务时按需启动子进程
+        with hide_main():
+            return asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), func, *args
+            )
+
+    async def start(self):
+        """启动全部子进程并完成预热"""
+        pids = await asyncio.gather(*(self._submit(_ping) for _ in range(self.workers)))
+        logger.success(f"渲染进程池已启动: {len(set(pids))}个进程")
+
+    async def run(self, func: Callable, *args):
+        """在子进程中执行func(*args)并返回结果"""
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                try:
+                    result = await self._submit(func, *args)
+                    break
+                except BrokenProcessPool:
+                    # 子进程异常退出(例如内存不足被杀)，重建进程池
+                    logger.warning("渲染进程池已损坏，重建进程池")
+                    self.restarts += 1
+                    self._shutdown()
+                    if attempt:
+                        self.fallbacks += 1
+                        result = await asyncio.to_thread(func, *args)
+        except Exception:
+            self.failures += 1
+            raise
+        elapsed = time.perf_counter() - start
+        self.renders += 1
+        self.render_time += elapsed
+        self.max_render_time = max(self.max_render_time, elapsed)
+        return result
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def close(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "renders": self.renders,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "fallbacks": self.fallbacks,
+            "avg_time": self.render_time / self.renders if self.renders else 0.0,
+            "max_time": self.max_render_time,
+        }
+
+
+render_pool = RenderPool()
+
+
+class RenderPoolService(Launchable):
+    id = "umaru.core.render_pool"
+
+    @property
+    def required(self):
+        return set()
+
+    @property
+    def stages(self):
+        return {"preparing", "blocking", "cleanup"}
+
+    async def launch(self, _mgr: Launart):
+        async with self.stage("preparing"):
+            # 提前启动子进程并完成预热，避免首次渲染变慢
+            try:
+                await render_pool.start()
+            except Exception as e:
+                logger.error(f"渲染进程池启动失败，将在首次渲染时重试: {e!r}")
+        async with self.stage("blocking"):
+            await _mgr.status.wait_for_sigexit()
+        async with self.stage("cleanup"):
+            await render_pool.close()
+            logger.success(f"已关闭渲染进程池: {render_pool.stats()}")
@@ -0,0 +1,87 @@
+import time
+
+
+class ReplyChunker:
+    """把流式输出的markdown文本切分成多条消息
+
+    - 在代码块外的空行(段落结束)处切分，累计达到min_chars或距上次发出超过interval秒时发出
+    - 代码块单独成为一条消息：开始前发出之前的文本，结束时立即发出
+    - 超过max_chars时在最后一个换行处强制切分，在代码块中切分时关闭代码块，下一条消息重新打开
+    """
+
+    fence = "```"
+
+    def __init__(
+        self, min_chars: int = 200, max_chars: int = 3000, interval: float = 3
+    ):
+        """
+        :param min_chars: 段落结束时累计达到多少字符发出
+        :param max_chars: 单条消息的最大字符数
+        :param interval: 段落结束时距上次发出超过多少秒也发出
+        """
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.interval = interval
+        self.buffer = ""
+        # buffer中已经检查过的完整行的结束位置
+        self.scanned = 0
+        self.in_code = False
+        # 当前代码块的首行(包括语言)，切分后重新打开代码块时使用
+        self.fence_line = self.fence
+        self.last_flush = time.monotonic()
+
+    def feed(self, text: str) -> list[str]:
+        """加入新的文本，返回可以发出的消息"""
+        self.buffer += text
+        messages = []
+        while (end := self.buffer.find("\n", self.scanned)) != -1:
+            start, self.scanned = self.scanned, end + 1
+            line = self.buffer[start:end].strip()
+            if line.startswith(self.fence):
+                self.in_code = not self.in_code
+                if self.in_code:
+                    self.fence_line = line
+                # 代码块开始前发出之前的文本，结束时发出整个代码块
+                self._cut(start if self.in_code else self.scanned, messages)
+            elif not self.in_code and not line and self._due(self.scanned):
+                self._cut(self.scanned, messages)
+        while len(self.buffer) > self.max_chars:
+            # 代码块中buffer以代码块的首行开始，不在首行之后立即切分；预留关闭代码块的长度
+            head = self.buffer.find("\n") + 1 if self.in_code else 0
+            limit = self.max_chars - (len(self.fence) + 1 if self.in_code else 0)
+            end = self.buffer.rfind("\n", head, limit)
+            self._cut(
+                end + 1 if end > 0 else max(limit, head + 1), messages, self.in_code
+            )
+        return messages
+
+    def finish(self) -> list[str]:
+        """输出结束，返回剩余的文本"""
+        messages = []
+        # 输出在代码块中结束(被截断)时补上结束标记，最后一行可能是没有换行的结束标记
+        if self.in_code and not self.buffer[self.scanned :].strip().startswith(
+            self.fence
+        ):
+            self.buffer = self.buffer.rstrip() + "\n" + self.fence
+        self.in_code = False
+        self._cut(len(self.buffer), messages)
+        return messages
+
+    def _due(self, end: int) -> bool:
+        return (
+            end >= self.min_chars or time.monotonic() - self.last_flush >= self.interval
+        )
+
+    def _cut(self, end: int, messages: list[str], split_code: bool = False):
+        text = self.buffer[:end].strip()
+        self.buffer = self.buffer[end:]
+        self.scanned = max(self.scanned - end, 0)
+        if split_code:
+            # 关闭代码块，剩余的内容重新打开代码块；重新打开的首行已经检查过
+            text += "\n" + self.fence
+            reopen = self.fence_line + "\n"
+            self.buffer = reopen + self.buffer
+            self.scanned += len(reopen)
+        if text:
+            messages.append(text)
+            self.last_flush = time.monotonic()
@@ -0,0 +1,195 @@
+"""
+在沙箱子进程中执行RestrictedPython代码
+
+代码的安全检查(AST校验)在主进程中完成，这里只负责构建受限的执行环境、执行并整理输出。
+函数需要能在子进程中导入，所以放在utils而不是ai_chat插件中。
+"""
+
+import asyncio
+import math
+from functools import lru_cache
+
+from loguru import logger
+from RestrictedPython import compile_restricted
+from RestrictedPython.Eval import default_guarded_getitem
+from RestrictedPython.Guards import (
+    full_write_guard,
+    guarded_iter_unpack_sequence,
+    guarded_unpack_sequence,
+    safe_builtins,
+    safer_getattr,
+)
+
+# PrintCollector 用于收集用户代码中 print 的输出
+from RestrictedPython.PrintCollector import PrintCollector
+from RestrictedPython.Utilities import utility_builtins
+
+# 子进程中正在运行的异步任务数
+_active_tasks = 0
+
+
+def _inplacevar_(op, x, y):
+    """处理就地运算符，如 +=, -=, *=, /= 等"""
+    if op == "+=":
+        return x + y
+    elif op == "-=":
+        return x - y
+    elif op == "*=":
+        return x * y
+    elif op == "/=":
+        return x / y
+    elif op == "//=":
+        return x // y
+    elif op == "%=":
+        return x % y
+    elif op == "**=":
+        return x**y
+    elif op == "<<=":
+        return x << y
+    elif op == ">>=":
+        return x >> y
+    elif op == "&=":
+        return x & y
+    elif op == "^=":
+        return x ^ y
+    elif op == "|=":
+        return x | y
+    raise NotImplementedError(f"不支持的就地运算符: {op}")
+
+
+@lru_cache(maxsize=8)
+def build_safe_globals(allowed_modules: frozenset[str]) -> dict:
+    """构建受限的执行环境，并预加载允许的模块
+
+    每个子进程按允许的模块缓存一份，执行时复制使用。
+    """
+
+    # 定义安全的导入函数
+    def safe_import(name, *args, **kwargs):
+        if name not in allowed_modules:
+            root_module = name.split(".")[0]
+            if root_module not in allowed_modules:
+                raise ImportError(f"模块 '{name}' 不在允许列表中")
+        return __import__(name, *args, **kwargs)
+
+    # 将安全导入函数加入到内置函数中
+    safe_builtins_with_import = dict(safe_builtins)
+    safe_builtins_with_import["__import__"] = safe_import
+
+    collected_output = []
+
+    class MyPrintCollector(PrintCollector):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.printed = collected_output
+
+        def _call_print(self, *values):
+            self.printed.append(" ".join(map(str, values)))
+
+    safe_builtins_with_import["_print_"] = MyPrintCollector
+
+    # 在 globals 中启用 PrintCollector，用于捕获 print 输出
+    safe_globals = {
+        "__builtins__": safe_builtins_with_import,  # 使用包含 __import__ 的内置函数
+        "_getattr_": safer_getattr,
+        "_getitem_": default_guarded_getitem,
+        "_iter_unpack_sequence_": guarded_iter_unpack_sequence,
+        "_unpack_sequence_": guarded_unpack_sequence,
+        "_getiter_": iter,  # 基本迭代器控制
+        "_write_": full_write_guard,  # 写入操作控制
+        "_inplacevar_": _inplacevar_,  # 就地运算符支持
+        "math": math,
+        "_print_": PrintCollector,  # 关键：允许 print 收集
+        **utility_builtins,
+    }
+
+    # 预加载允许的模块到安全环境
+    for mod_name in allowed_modules:
+        try:
+            module = __import__(mod_name)
+            # 存储完整模块
+            safe_globals[mod_name] = module
+            # 处理常用的模块别名
+            if mod_name == "numpy":
+                safe_globals["np"] = module
+        except ImportError:
+            logger.warning(f"模块 '{mod_name}' 无法导入")
+    return safe_globals
+
+
+def _make_async_limiter(max_tasks: int, timeout: float):
+    async def _run_with_async_limits(coro):
+        """运行异步代码并实施限制。"""
+        global _active_tasks
+        if _active_tasks >= max_tasks:
+            raise RuntimeError(f"并发异步任务数超过限制({max_tasks})")
+
+        _active_tasks += 1
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        finally:
+            _active_tasks -= 1
+
+    return _run_with_async_limits
+
+
+def run_restricted(
+    code: str,
+    allowed_modules: frozenset[str],
+    max_async_tasks: int,
+    async_timeout: float,
+) -> str:
+    """执行已经通过校验的代码，返回输出或最后一个变量的值"""
+    try:
+        # 创建执行环境（注意：要 copy 一份，避免多次调用间互相影响）
+        env = build_safe_globals(allowed_modules).copy()
+
+        # 编译受限字节码
+        compiled_code = compile_restricted(code, filename="<user_code>", mode="exec")
+
+        # 添加异步运行需要的安全函数
+        env.update(
+            {
+                "asyncio": asyncio,
+                "_run_with_async_limits": _make_async_limiter(
+                    max_async_tasks, async_timeout
+                ),
+            }
+        )
+
+        exec(compiled_code, env)
+
+        # 获取 MyPrintCollector 输出
+        collector = env.get("_print_")
+        captured_output = (
+            "\n".join(collector.printed)
+            if collector and hasattr(collector, "printed")
+            else ""
+        )
+
+        # 获取最后一个有效变量的值
+        last_value = None
+        # env.keys() 至少包含我们注入的安全环境键
+        # 如果用户代码中有新变量，可以尝试获取
+        if len(env) > 0:
+            last_var = list(env.keys())[-1]
+            last_value = env[last_var]
+
+        # 根据是否有输出、是否有最后值组合返回
+        if captured_output and last_value is not None:
+            return f"{captured_output}\n计算结果: {last_value}"
+        elif captured_output:
+            return captured_output
+        elif last_value is not None:
+            if isinstance(last_value, str):
+                return f"计算结果: '{last_value}'"
+            elif isinstance(last_value, PrintCollector) and hasattr(last_value, "txt"):
+                return f"输出结果: {''.join(last_value.txt)}"
+            return f"变量结果: {last_value}"
+        else:
+            return "无输出结果"
+
+    except MemoryError:
+        return "错误：代码使用的内存超过限制"
+    except Exception as e:
+        return f"错误：{str(e)}"
@@ -0,0 +1,407 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections.abc import Callable
+from multiprocessing.connection import Connection
+
+from launart import Launart, Launchable
+from loguru import logger
+
+from utils.process_context import hide_main, worker_context
+
+# Windows不支持resource，此时只有超时强杀，没有CPU和内存限制
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+class SandboxError(Exception):
+    """沙箱任务没有正常完成"""
+
+
+class SandboxBusy(SandboxError):
+    """排队的任务已满"""
+
+
+class SandboxTimeout(SandboxError):
+    """任务超时，执行的子进程已被杀死"""
+
+
+class SandboxCrashed(SandboxError):
+    """执行任务的子进程异常退出(超出CPU时间、被系统杀死等)"""
+
+
+def _read_status_kb(field: str) -> int | None:
+    """读取/proc/self/status中的内存字段(KB)，非Linux返回None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """重置进程的内存峰值(VmHWM)，使其只统计本次任务，不支持时忽略"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> int:
+    """本次任务的内存峰值(字节)，无法重置峰值时为进程启动以来的峰值"""
+    if (kb := _read_status_kb("VmHWM:")) is not None:
+        return kb * 1024
+    if not RESOURCE_AVAILABLE:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS的单位是字节，Linux是KB
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _cpu_time() -> float:
+    if not RESOURCE_AVAILABLE:
+        return time.process_time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_limits(cpu_time: float | None, memory: int | None, used_cpu: float):
+    """设置本次任务的CPU时间和内存限制
+
+    RLIMIT_CPU统计的是进程累计的CPU时间，所以软限制为已用时间加上本次的限制，超出时收到SIGXCPU退出；
+    RLIMIT_AS以当前的虚拟内存为基准再加上本次的限制，超出时分配失败抛出MemoryError。
+    只修改软限制，任务结束后恢复原来的限制。
+    """
+    if not RESOURCE_AVAILABLE:
+        return
+    if cpu_time:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = math.ceil(used_cpu + cpu_time)
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    if memory:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = (_read_status_kb("VmSize:") or 0) * 1024 + memory
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _get_limits() -> dict[int, tuple[int, int]]:
+    if not RESOURCE_AVAILABLE:
+        return {}
+    return {
+        limit: resource.getrlimit(limit)
+        for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS)
+    }
+
+
+def _restore_limits(limits: dict[int, tuple[int, int]]):
+    for limit, value in limits.items():
+        resource.setrlimit(limit, value)
+
+
+def _worker_main(conn: Connection, warm_ups: list[Callable[[], None]]):
+    """沙箱子进程：循环接收(函数, 参数, CPU时间, 内存)并返回(是否成功, 结果或异常, 资源使用)"""
+    # Ctrl+C由主进程处理，子进程在主进程关闭时退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if RESOURCE_AVAILABLE:
+        # 超出CPU时间时不生成core文件
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    limits = _get_limits()
+    for warm_up in warm_ups:
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"沙箱进程预热失败: {e!r}")
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        func, args, cpu_time, memory = job
+        _reset_peak_rss()
+        start_cpu = _cpu_time()
+        ok = True
+        try:
+            _set_limits(cpu_time, memory, start_cpu)
+            value = func(*args)
+        except BaseException as e:
+            ok, value = False, e
+        finally:
+            _restore_limits(limits)
+        usage = {"cpu": _cpu_time() - start_cpu, "max_rss": _peak_rss()}
+        try:
+            conn.send((ok, value, usage))
+        except Exception as e:
+            # 结果或异常无法pickle
+            conn.send((False, SandboxError(f"无法传回执行结果: {e!r}"), usage))
+
+
+class _Worker:
+    def __init__(
+        self,
+        context: multiprocessing.context.BaseContext,
+        warm_ups: list[Callable[[], None]],
+    ):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, warm_ups),
+            name="sandbox-worker",
+            daemon=True,
+        )
+        with hide_main():
+            self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+
+class SandboxPool:
+    """执行不可信代码的子进程池
+
+    用户代码可能死循环或占用大量内存，在线程中执行时无法中止，设置资源限制也会限制整个bot。
+    这里预先启动几个子进程，每个任务只在一个子进程中执行：
+    - 任务开始前在子进程中设置CPU时间和内存限制，结束后恢复
+    - 超时或子进程异常退出时杀死子进程并重新启动一个
+    - 子进程执行max_jobs个任务或内存峰值超过recycle_rss后替换，避免内存碎片和残留状态累积
+    - 所有子进程都在忙时任务排队，排队数量超过max_queue时直接拒绝(SandboxBusy)
+    子进程不从bot进程fork，不继承bot的连接、文件描述符和内存中的账号信息：
+    支持forkserver时从forkserver进程fork(与渲染进程池共用，只预先导入utils.restricted_exec和绘图模块)，否则使用spawn。
+    执行的函数和参数需要可以pickle，返回值同样需要可以pickle，且函数不能定义在__main__中。
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_queue: int = 8,
+        max_jobs: int = 100,
+        recycle_rss: int = 512 * 1024 * 1024,
+    ):
+        """
+        :param workers: 子进程数量
+        :param max_queue: 最多排队等待的任务数
+        :param max_jobs: 子进程执行多少个任务后替换
+        :param recycle_rss: 任务内存峰值(字节)超过多少后替换子进程
+        """
+        self.workers = workers or max(1, min(2, (os.cpu_count() or 2) // 2))
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self.recycle_rss = recycle_rss
+        self.warm_ups: list[Callable[[], None]] = []
+        self.waiting = 0
+        self._idle: asyncio.Queue[_Worker] | None = None
+        self._all: set[_Worker] = set()
+        self._start_lock = asyncio.Lock()
+        self._respawns: set[asyncio.Task] = set()
+        # 统计
+        self.jobs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.rejected = 0
+        self.recycles = 0
+        self.cpu_time = 0.0
+        self.max_cpu_time = 0.0
+        self.max_rss = 0
+
+    def add_warm_up(self, func: Callable[[], None]):
+        """添加子进程启动时执行的预热函数，需要是模块级函数"""
+        if func not in self.warm_ups:
+            self.warm_ups.append(func)
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(worker_context(["utils.restricted_exec"]), self.warm_ups)
+        self._all.add(worker)
+        return worker
+
+    async def start(self):
+        """启动全部子进程"""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            idle: asyncio.Queue[_Worker] = asyncio.Queue()
+            for _ in range(self.workers):
+                idle.put_nowait(await asyncio.to_thread(self._spawn))
+            self._idle = idle
+        logger.success(f"沙箱进程池已启动: {self.workers}个进程")
+
+    async def run(
+        self,
+        func: Callable,
+        *args,
+        timeout: float,
+        cpu_time: float | None = None,
+        memory: int | None = None,
+    ):
+        """在子进程中执行func(*args)并返回结果
+
+        :param timeout: 执行时间上限(秒)，不包括排队时间，超时后杀死子进程
+        :param cpu_time: CPU时间上限(秒)，默认与timeout相同
+        :param memory: 本次任务可以新分配的内存上限(字节)，None为不限制
+        :raises SandboxBusy: 排队的任务已满
+        :raises SandboxTimeout: 执行超时
+        :raises SandboxCrashed: 子进程异常退出
+        """
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise SandboxBusy(f"沙箱繁忙，已有{self.waiting}个任务在排队")
+        self.waiting += 1
+        try:
+            await self.start()
+            worker = await self._idle.get()
+        finally:
+            self.waiting -= 1
+
+        healthy = False
+        try:
+            if not worker.process.is_alive():
+                self.crashes += 1
+                raise SandboxCrashed("沙箱进程已退出")
+            worker.conn.send((func, args, cpu_time or timeout, memory))
+            if not await asyncio.to_thread(worker.conn.poll, timeout):
+                self.timeouts += 1
+                raise SandboxTimeout(f"执行超时(>{timeout}秒)")
+            try:
+                ok, value, usage = worker.conn.recv()
+            except EOFError:
+                await asyncio.to_thread(worker.process.join, 1)
+                self.crashes += 1
+                raise SandboxCrashed(self._exit_reason(worker.process.exitcode))
+            healthy = True
+            worker.jobs += 1
+            self._record(usage)
+            logger.debug(
+                f"沙箱任务完成: CPU {usage['cpu'] * 1000:.0f}ms, "
+                f"内存峰值 {usage['max_rss'] / 1024 / 1024:.1f}MB"
+            )
+            if worker.jobs >= self.max_jobs or usage["max_rss"] >= self.recycle_rss:
+                self.recycles += 1
+                healthy = False
+            if not ok:
+                self.failures += 1
+                if not isinstance(value, Exception):
+                    # 不把子进程中的SystemExit等抛到主进程
+                    raise SandboxError(f"代码异常退出: {value!r}")
+                raise value
+            return value
+        finally:
+            self._release(worker, healthy)
+
+    @staticmethod
+    def _exit_reason(exitcode: int | None) -> str:
+        if exitcode == -getattr(signal, "SIGXCPU", 0):
+            return "超出CPU时间限制"
+        if exitcode == -signal.SIGKILL:
+            return "沙箱进程被系统杀死(可能是内存不足)"
+        return f"沙箱进程异常退出(退出码{exitcode})"
+
+    def _record(self, usage: dict):
+        self.jobs += 1
+        self.cpu_time += usage["cpu"]
+        self.max_cpu_time = max(self.max_cpu_time, usage["cpu"])
+        self.max_rss = max(self.max_rss, usage["max_rss"])
+
+    def _release(self, worker: _Worker, healthy: bool):
+        """把子进程放回空闲队列，状态未知(超时、出错、取消)的子进程杀死后替换"""
+        if healthy and self._idle is not None:
+            self._idle.put_nowait(worker)
+            return
+        worker.process.kill()
+        if self._idle is None:
+            # 进程池已关闭
+            return
+        task = asyncio.create_task(self._respawn(worker))
+        self._respawns.add(task)
+        task.add_done_callback(self._respawns.discard)
+
+    async def _respawn(self, old: _Worker):
+        self._all.discard(old)
+        await asyncio.to_thread(old.kill)
+        while True:
+            try:
+                worker = await asyncio.to_thread(self._spawn)
+                break
+            except Exception as e:
+                logger.error(f"沙箱进程启动失败，稍后重试: {e!r}")
+                await asyncio.sleep(5)
+        self._idle.put_nowait(worker)
+
+    async def close(self):
+        for task in list(self._respawns):
+            task.cancel()
+        workers, self._all = list(self._all), set()
+        self._idle = None
+        await asyncio.gather(*(asyncio.to_thread(worker.stop) for worker in workers))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "alive": sum(worker.process.is_alive() for worker in self._all),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "waiting": self.waiting,
+            "jobs": self.jobs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "rejected": self.rejected,
+            "recycles": self.recycles,
+            "avg_cpu": self.cpu_time / self.jobs if self.jobs else 0.0,
+            "max_cpu": self.max_cpu_time,
+            "max_rss": self.max_rss,
+        }
+
+
+sandbox_pool = SandboxPool()
+
+
+class SandboxPoolService(Launchable):
+    id = "umaru.core.sandbox_pool"
+
+    @property
+    def required(self):
+        return set()
+
+    @property
+    def stages(self):
+        return {"preparing", "blocking", "cleanup"}
+
+    async def launch(self, _mgr: Launart):
+        async with self.stage("preparing"):
+            # 提前启动子进程，首次执行代码时不必等待
+            try:
+                await sandbox_pool.start()
+            except Exception as e:
+                logger.error(f"沙箱进程池启动失败，将在首次执行时重试: {e!r}")
+        async with self.stage("blocking"):
+            await _mgr.status.wait_for_sigexit()
+        async with self.stage("cleanup"):
+            await sandbox_pool.close()
+            logger.success(f"已关闭沙箱进程池: {sandbox_pool.stats()}")